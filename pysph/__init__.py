@@ -59,6 +59,7 @@ def in_parallel():
 
 # Utility function to determine the possible output files
 _has_h5py = None
+_has_hdf5plugin = None
 _has_pyvisfile = None
 _has_tvtk = None
 
@@ -76,6 +77,20 @@ def has_h5py():
     return _has_h5py
 
 
+def has_hdf5plugin():
+    """Return True if hdf5plugin (which provides additional HDF5
+    compression filters like LZ4 and Zstd) is available.
+    """
+    global _has_hdf5plugin
+    if _has_hdf5plugin is None:
+        _has_hdf5plugin = True
+        try:
+            import hdf5plugin  # noqa: 401
+        except ImportError:
+            _has_hdf5plugin = False
+    return _has_hdf5plugin
+
+
 def has_tvtk():
     """Return True if tvtk is available.
     """
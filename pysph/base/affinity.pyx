@@ -0,0 +1,165 @@
+#cython: embedsignature=True
+"""Pin the processes and OpenMP threads of a run to the cores of a machine.
+
+The processes on a host are given disjoint, contiguous blocks of the cores
+ordered by their NUMA node, so that the processes fill the sockets in order,
+and each OpenMP thread of a process is pinned to one core of its block.
+Combined with a static OpenMP schedule and the parallel first touch of the
+particle arrays this keeps each thread working on memory local to it.
+
+Pinning the individual threads is only supported on Linux, elsewhere the
+functions here do nothing.
+"""
+
+# malloc and friends
+from libc.stdlib cimport malloc, free
+
+from cython.parallel import parallel, prange
+
+import glob
+import os
+import re
+
+from pysph.base.nnps_base import get_number_of_threads, set_number_of_threads
+
+IF UNAME_SYSNAME == "Linux":
+    cdef extern from "<sched.h>" nogil:
+        ctypedef struct cpu_set_t:
+            pass
+        void CPU_ZERO(cpu_set_t *set)
+        void CPU_SET(int cpu, cpu_set_t *set)
+        int sched_setaffinity(int pid, size_t cpusetsize, cpu_set_t *mask)
+        int sched_getcpu()
+
+    cdef int _pin_current_thread(int cpu) nogil:
+        cdef cpu_set_t mask
+        CPU_ZERO(&mask)
+        CPU_SET(cpu, &mask)
+        return sched_setaffinity(0, sizeof(cpu_set_t), &mask)
+
+    cdef int _get_current_cpu() nogil:
+        return sched_getcpu()
+ELSE:
+    cdef int _pin_current_thread(int cpu) nogil:
+        return -1
+
+    cdef int _get_current_cpu() nogil:
+        return -1
+
+
+def parse_cpu_list(text):
+    """Return the CPUs in a list such as "0-3,8,10-11" as a list of ints.
+    """
+    cpus = []
+    for part in text.strip().split(','):
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-')
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def get_allowed_cpus():
+    """Return the sorted CPUs this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    import multiprocessing
+    return list(range(multiprocessing.cpu_count()))
+
+
+def get_numa_nodes():
+    """Return a list of the CPUs of each NUMA node which this process may
+    run on.
+
+    If the NUMA topology is not available, all the allowed CPUs are returned
+    as a single node.
+    """
+    allowed = set(get_allowed_cpus())
+    pattern = re.compile(r'node(\d+)$')
+    nodes = []
+    for path in glob.glob('/sys/devices/system/node/node*'):
+        match = pattern.search(path)
+        if match is None:
+            continue
+        try:
+            with open(os.path.join(path, 'cpulist')) as f:
+                cpus = parse_cpu_list(f.read())
+        except (IOError, OSError, ValueError):
+            continue
+        cpus = [cpu for cpu in cpus if cpu in allowed]
+        if len(cpus) > 0:
+            nodes.append((int(match.group(1)), cpus))
+    if len(nodes) == 0:
+        return [sorted(allowed)]
+    return [cpus for node, cpus in sorted(nodes)]
+
+
+def get_local_rank_cpus(int local_rank, int local_size, nodes=None):
+    """Return the CPUs to be used by a process on a host.
+
+    Parameters
+    ----------
+
+    local_rank: int
+        Rank of the process amongst the processes on the same host.
+
+    local_size: int
+        Number of processes on the host.
+
+    nodes: list
+        The CPUs of each NUMA node, defaults to `get_numa_nodes()`.
+
+    The CPUs, ordered by node, are split into `local_size` contiguous blocks
+    of the same size.  If there are more processes than CPUs, the processes
+    share the CPUs one each.
+    """
+    if nodes is None:
+        nodes = get_numa_nodes()
+    cpus = [cpu for node in nodes for cpu in node]
+    n = len(cpus)//local_size
+    if n == 0:
+        return [cpus[local_rank % len(cpus)]]
+    return cpus[local_rank*n:(local_rank + 1)*n]
+
+
+def get_thread_cpus():
+    """Return the CPU each OpenMP thread is currently running on, the CPUs
+    are -1 where this is not supported.
+    """
+    cdef int n_threads = get_number_of_threads()
+    cdef int *cpus = <int*>malloc(n_threads*sizeof(int))
+    cdef int i
+    try:
+        with nogil, parallel(num_threads=n_threads):
+            for i in prange(n_threads, schedule='static', chunksize=1):
+                cpus[i] = _get_current_cpu()
+        return [cpus[i] for i in range(n_threads)]
+    finally:
+        free(cpus)
+
+
+def pin_threads(cpus):
+    """Restrict the process to the given CPUs, use one OpenMP thread for each
+    and pin the i'th thread to the i'th CPU.
+
+    Returns the CPUs the threads run on as given by `get_thread_cpus`.
+    """
+    cpus = list(cpus)
+    cdef int n_threads = len(cpus)
+    cdef int *c_cpus = <int*>malloc(n_threads*sizeof(int))
+    cdef int i
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    set_number_of_threads(n_threads)
+    try:
+        for i in range(n_threads):
+            c_cpus[i] = cpus[i]
+        with nogil, parallel(num_threads=n_threads):
+            for i in prange(n_threads, schedule='static', chunksize=1):
+                _pin_current_thread(c_cpus[i])
+    finally:
+        free(c_cpus)
+    return get_thread_cpus()
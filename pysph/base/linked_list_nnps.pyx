@@ -226,6 +226,22 @@ cdef class LinkedListNNPS(NNPS):
         self.next = self.nexts[ src_index ]
         self.head = self.heads[ src_index ]
 
+    def memory_usage(self):
+        """Return the memory used by the neighbor search, see
+        :py:meth:`NNPSBase.memory_usage`, with the head of each cell and the
+        next particle of each particle.
+        """
+        cdef dict usage = NNPS.memory_usage(self)
+        cdef UIntArray arr
+        for key, arrays in (('heads', self.heads), ('nexts', self.nexts)):
+            allocated = used = 0
+            for arr in arrays:
+                a, u = arr.memory_usage()
+                allocated += a
+                used += u
+            usage[key] = (allocated, used)
+        return usage
+
 
     #### Private protocol ################################################
 
@@ -240,6 +240,7 @@ cdef class NeighborCache:
     cdef void get_neighbors_raw(self, size_t d_idx, UIntArray nbrs) nogil
     cpdef get_neighbors(self, int src_index, size_t d_idx, UIntArray nbrs)
     cpdef find_all_neighbors(self)
+    cpdef get_thread_work(self)
     cpdef update(self)
 
     cdef void _update_last_avg_nbr_size(self)
@@ -278,6 +279,7 @@ cdef class NNPSBase:
 
     cpdef get_nearest_particles(self, int src_index, int dst_index,
                                 size_t d_idx, UIntArray nbrs)
+    cpdef get_thread_work(self)
     cpdef set_context(self, int src_index, int dst_index)
 
 # Nearest neighbor locator
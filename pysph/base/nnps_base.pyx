@@ -894,26 +894,59 @@ cdef class NeighborCache:
                 if self._cached.data[d_idx] == 0:
                     self._find_neighbors(d_idx)
 
+    cpdef get_thread_work(self):
+        """Return the number of neighbors found by each thread since the
+        last update.
+        """
+        cdef int i
+        cdef np.ndarray result = np.zeros(self._n_threads, dtype=np.int64)
+        for i in range(self._n_threads):
+            result[i] = (<UIntArray>self._neighbors[i]).length
+        return result
+
+    def memory_usage(self):
+        """Return a dictionary of the bytes allocated and used by the
+        neighbors found by all the threads and by the per particle indices.
+        """
+        cdef UIntArray arr
+        cdef long allocated = 0, used = 0
+        for arr in self._neighbor_arrays:
+            a, u = arr.memory_usage()
+            allocated += a
+            used += u
+        return dict(
+            neighbors=(allocated, used),
+            start_stop=self._start_stop.memory_usage(),
+            pid_to_tid=self._pid_to_tid.memory_usage(),
+            cached=self._cached.memory_usage()
+        )
+
     cpdef update(self):
         self._update_last_avg_nbr_size()
         cdef int n_threads = self._n_threads
         cdef int dst_index = self._dst_index
-        cdef size_t i
+        cdef long i
         cdef long np = self._particles[dst_index].get_number_of_particles()
         self._start_stop.resize(np*2)
         self._pid_to_tid.resize(np)
         self._cached.resize(np)
-        for i in range(np):
-            self._cached.data[i] = 0
-            self._start_stop.data[2*i] = 0
-            self._start_stop.data[2*i+1] = 0
+        # The arrays are reset with the same static schedule as the loops
+        # over the particles so that, on first touch, their pages are local
+        # to the threads using them.
+        with nogil:
+            for i in prange(np, schedule='static'):
+                self._cached.data[i] = 0
+                self._start_stop.data[2*i] = 0
+                self._start_stop.data[2*i+1] = 0
         # This is an upper limit for the number of neighbors in a worst
         # case scenario.
         cdef size_t safety = 1024
-        for i in range(n_threads):
-            (<UIntArray>self._neighbors[i]).c_reserve(
-                self._last_avg_nbr_size*np/n_threads + safety
-            )
+        cdef size_t size = self._last_avg_nbr_size*np/n_threads + safety
+        # Each thread empties and reserves its own neighbor array.
+        with nogil, parallel(num_threads=n_threads):
+            for i in prange(n_threads, schedule='static', chunksize=1):
+                (<UIntArray>self._neighbors[i]).c_reset()
+                (<UIntArray>self._neighbors[i]).c_reserve(size)
 
     #### Private protocol ################################################
 
@@ -1094,6 +1127,39 @@ cdef class NNPSBase:
                 src_index, dst_index, d_idx, nbrs, False
             )
 
+    cpdef get_thread_work(self):
+        """Return the number of neighbors found by each thread over all the
+        neighbor caches since the last update, or None if the cache is not
+        used.
+        """
+        if not self.use_cache or self.cache is None:
+            return None
+        cdef NeighborCache cache
+        result = None
+        for cache in self.cache:
+            work = cache.get_thread_work()
+            result = work if result is None else result + work
+        return result
+
+    def memory_usage(self):
+        """Return the memory used by the neighbor search.
+
+        Returns a dictionary of the tuple of the bytes allocated and used by
+        each of its data structures.  The neighbor caches of all the pairs
+        of arrays are summed and keyed on `cache_` followed by the name of
+        the structure.  Subclasses add the memory used by their cells.
+        """
+        cdef dict usage = {}
+        if not self.use_cache or self.cache is None:
+            return usage
+        for cache in self.cache:
+            if not isinstance(cache, NeighborCache):
+                continue
+            for name, (a, u) in cache.memory_usage().items():
+                allocated, used = usage.get('cache_' + name, (0, 0))
+                usage['cache_' + name] = (allocated + a, used + u)
+        return usage
+
     cpdef set_context(self, int src_index, int dst_index):
         """Setup the context before asking for neighbors.  The `dst_index`
         represents the particles for whom the neighbors are to be determined
@@ -21,6 +21,15 @@ IF UNAME_SYSNAME == "Windows":
         return x if x > y else y
 
 
+cdef long _count_nodes(cOctreeNode* node) nogil:
+    """Return the number of nodes in the tree rooted at `node`."""
+    cdef long n = 1
+    cdef int i
+    for i from 0<=i<8:
+        if node.children[i] != NULL:
+            n += _count_nodes(node.children[i])
+    return n
+
 ########################################################################
 
 cdef class OctreeNode:
@@ -531,6 +540,34 @@ cdef class Octree:
         cdef OctreeNode root = self.get_root()
         self._plot_tree(root, ax)
 
+    def memory_usage(self):
+        """ Get the memory used by the tree
+
+        Returns
+        -------
+
+        usage : dict
+        Tuple of the bytes allocated and used by the nodes, the particle
+        ids and the list of leaf cells
+
+        """
+        cdef long n_nodes = 0
+        cdef long n_pids = 0
+        cdef long n_cells = 0, cell_capacity = 0
+        if self.root != NULL:
+            n_nodes = _count_nodes(self.root)
+        if self.pids != NULL:
+            n_pids = self.num_particles
+        if self.leaf_cells != NULL:
+            n_cells = self.leaf_cells.size()
+            cell_capacity = self.leaf_cells.capacity()
+        return dict(
+            nodes=(n_nodes*sizeof(cOctreeNode), n_nodes*sizeof(cOctreeNode)),
+            pids=(n_pids*sizeof(u_int), n_pids*sizeof(u_int)),
+            leaf_cells=(cell_capacity*sizeof(cOctreeNode*),
+                        n_cells*sizeof(cOctreeNode*))
+        )
+
 
 cdef class CompressedOctree(Octree):
     def __init__(self, int leaf_max_particles):
@@ -99,6 +99,18 @@ cdef class OctreeNNPS(NNPS):
                 &nbrs.data[orig_length], nbrs.length - orig_length, s_gid
             )
 
+    def memory_usage(self):
+        """Return the memory used by the neighbor search, see
+        :py:meth:`NNPSBase.memory_usage`, with the nodes, particle ids and
+        leaf cells of the trees of all the arrays.
+        """
+        cdef dict usage = NNPS.memory_usage(self)
+        for tree in self.tree:
+            for name, (a, u) in tree.memory_usage().items():
+                allocated, used = usage.get(name, (0, 0))
+                usage[name] = (allocated + a, used + u)
+        return usage
+
 
     #### Private protocol ################################################
 
@@ -1,6 +1,7 @@
 cimport numpy as np
 
-from pyzoltan.core.carray cimport BaseArray, UIntArray, IntArray, LongArray
+from pyzoltan.core.carray cimport (BaseArray, UIntArray, IntArray, LongArray,
+    DoubleArray)
 
 # ParticleTag
 # Declares various tags for particles, and functions to check them.
@@ -71,11 +72,33 @@ cdef class ParticleArray:
     # time for the particle array
     cdef public double time
 
+    ########################################
+    # Pooled layout, see set_pooled.
+
+    # the memory shared by all the properties, None if not pooled.
+    cdef public DoubleArray arena
+
+    # offset in bytes of each property in the arena.
+    cdef public dict arena_offsets
+
+    # number of particles each property has room for in the arena.
+    cdef public long pool_capacity
+
     cdef object _create_c_array_from_npy_array(self, np.ndarray arr)
     cdef _check_property(self, str)
 
     cdef np.ndarray _get_real_particle_prop(self, str prop)
 
+    cdef _layout_arena(self, long capacity)
+    cdef _reserve_pool(self, long size)
+    cdef _copy_from(self, ParticleArray source, list props,
+                    LongArray indices, long start, long end)
+    cdef _permute_properties(self, LongArray new_indices)
+
+    cdef bint _is_aligned(self)
+    cdef _remove_aligned(self, np.ndarray sorted_indices)
+    cdef _remove_sorted(self, np.ndarray sorted_indices, bint aligned)
+
     # set/get the time
     cpdef set_time(self, double time)
     cpdef double get_time(self)
@@ -90,7 +113,7 @@ cdef class ParticleArray:
     cpdef BaseArray get_carray(self, str prop)
 
     cpdef int get_number_of_particles(self, bint real=*)
-    cpdef remove_particles(self, indices)
+    cpdef remove_particles(self, indices, bint aligned=*)
     cpdef remove_tagged_particles(self, int tag)
 
     # function to add any property
@@ -108,6 +131,12 @@ cdef class ParticleArray:
 
     # add particles from the parray to self.
     cpdef int append_parray(self, ParticleArray parray) except -1
+    cpdef int append_particles(self, ParticleArray source,
+                               LongArray indices) except -1
+    cpdef LongArray get_indices_in_box(self, double xmin, double xmax,
+                                       double ymin, double ymax,
+                                       double zmin, double zmax,
+                                       bint inside=*)
 
     # create a new particle array with the given particles indices and the
     # properties.
@@ -134,3 +163,9 @@ cdef class ParticleArray:
 
     # resize all arrays to a new size
     cpdef resize(self, long size)
+
+    # reserve memory for a number of particles
+    cpdef reserve(self, long size)
+
+    # release the memory not used by the particles
+    cpdef squeeze(self)
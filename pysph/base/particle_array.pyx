@@ -19,6 +19,11 @@ from pyzoltan.core.carray cimport *
 from cpython cimport PyObject
 from cpython cimport *
 from cython cimport *
+from libc.stdint cimport uint32_t, uint64_t
+from libc.stdlib cimport malloc, free
+from libc.string cimport memcpy
+
+from cython.parallel import prange
 
 # Parallel imports
 try:
@@ -26,12 +31,111 @@ try:
 except ImportError:
     MPI = None
 
+# MPI tag of the messages of ParticleArray.Send.
+PARTICLES_TAG = 1000
+
 # Maximum value of an unsigned int
 cdef extern from "limits.h":
     cdef unsigned int UINT_MAX
 
 _UINT_MAX = UINT_MAX
 
+# Alignment in bytes of each property in the arena of a pooled array.
+cdef long ARENA_ALIGNMENT = 64
+
+# Number of particles in each block handed to the OpenMP threads when the
+# particles are aligned, extracted or copied.
+cdef long ALIGN_BLOCK_SIZE = 1024
+
+cdef inline long _align_bytes(long n_bytes):
+    return ((n_bytes + ARENA_ALIGNMENT - 1)//ARENA_ALIGNMENT)*ARENA_ALIGNMENT
+
+cdef void _move_items(char *data, int itemsize, long *dst, long *src,
+                      long n_moves) nogil:
+    """Copy the `src[i]`th item of `data` to the `dst[i]`th in order."""
+    cdef long i
+    cdef uint32_t *d32 = <uint32_t*>data
+    cdef uint64_t *d64 = <uint64_t*>data
+    if itemsize == 8:
+        for i in range(n_moves):
+            d64[dst[i]] = d64[src[i]]
+    else:
+        for i in range(n_moves):
+            d32[dst[i]] = d32[src[i]]
+
+cdef void _gather_items(char *dst, char *src, int itemsize, long *indices,
+                        long n) nogil:
+    """Copy the `indices[i]`th item of `src` to the `i`th of `dst`."""
+    cdef long i
+    cdef uint32_t *d32 = <uint32_t*>dst
+    cdef uint32_t *s32 = <uint32_t*>src
+    cdef uint64_t *d64 = <uint64_t*>dst
+    cdef uint64_t *s64 = <uint64_t*>src
+    if itemsize == 8:
+        for i in range(n):
+            d64[i] = s64[indices[i]]
+    else:
+        for i in range(n):
+            d32[i] = s32[indices[i]]
+
+cdef void _count_local(int *tag, long start, long end, long *count,
+                       long *first_other) nogil:
+    """Count the 'Local' particles in `[start, end)` and find the first one
+    which is not 'Local', -1 if there is none.
+    """
+    cdef long i, n_local = 0
+    first_other[0] = -1
+    for i in range(start, end):
+        if tag[i] == Local:
+            n_local += 1
+        elif first_other[0] < 0:
+            first_other[0] = i
+    count[0] = n_local
+
+cdef void _partition_local(int *tag, long start, long end, long next_local,
+                           long next_other, long *index) nogil:
+    """Write the indices of the 'Local' particles in `[start, end)` from
+    `next_local` and those of the others from `next_other`, in order.
+    """
+    cdef long i
+    for i in range(start, end):
+        if tag[i] == Local:
+            index[next_local] = i
+            next_local += 1
+        else:
+            index[next_other] = i
+            next_other += 1
+
+cdef void _copy_block(char **dst, char **src, int *itemsize, int n_props,
+                      long *index, long start, long end) nogil:
+    """Copy the items `[start, end)` of each of the `n_props` arrays of `src`
+    to `dst`, gathering them with `index` if it is not NULL.
+    """
+    cdef int j
+    cdef long offset
+    for j in range(n_props):
+        offset = start*itemsize[j]
+        if index == NULL:
+            memcpy(dst[j] + offset, src[j] + offset, (end - start)*itemsize[j])
+        else:
+            _gather_items(dst[j] + offset, src[j], itemsize[j], index + start,
+                          end - start)
+
+cdef void _copy_blocks(char **dst, char **src, int *itemsize, int n_props,
+                       long *index, long n) nogil:
+    """Copy `n` items of each array in blocks of `ALIGN_BLOCK_SIZE`, the
+    blocks are copied by the OpenMP threads in parallel.
+    """
+    cdef long b, start
+    cdef long n_blocks = (n + ALIGN_BLOCK_SIZE - 1)//ALIGN_BLOCK_SIZE
+    if n_blocks < 2:
+        _copy_block(dst, src, itemsize, n_props, index, 0, n)
+        return
+    for b in prange(n_blocks, schedule='static'):
+        start = b*ALIGN_BLOCK_SIZE
+        _copy_block(dst, src, itemsize, n_props, index, start,
+                    min(start + ALIGN_BLOCK_SIZE, n))
+
 # Declares various tags for particles, and functions to check them.
 
 # Note that these tags are the ones set in the 'tag' property of the
@@ -192,6 +296,7 @@ cdef class ParticleArray:
             props[prop] = pinfo
 
         d['constants'] = props
+        d['pooled'] = self.arena is not None
 
         return (ParticleArray, (), d)
 
@@ -215,6 +320,8 @@ cdef class ParticleArray:
             self.add_constant(**consts[prop])
 
         self.num_real_particles = numpy.sum(props['tag']['data']==Local)
+        if d.get('pooled', False):
+            self.set_pooled(True)
 
     def _initialize(self, **props):
         """Initialize the particle array with the given properties.
@@ -392,6 +499,9 @@ cdef class ParticleArray:
         tag_def_values = self.default_values['tag']
         self.default_values.clear()
         self.default_values = {'tag':tag_def_values, 'pid':0, 'gid':_UINT_MAX}
+        if self.arena is not None:
+            self.arena = None
+            self._layout_arena(self.pool_capacity)
 
         self.is_dirty = True
         self.indices_invalid = True
@@ -428,13 +538,19 @@ cdef class ParticleArray:
             else:
                 return 0
 
-    cpdef remove_particles(self, indices):
+    cpdef remove_particles(self, indices, bint aligned=False):
         """ Remove particles whose indices are given in index_list.
 
         We repeatedly interchange the values of the last element and values from
         the index_list and reduce the size of the array by one. This is done for
         every property that is being maintained.
 
+        If the array is aligned, a removed real particle is instead replaced
+        by the last real particle, whose place is taken by the last particle,
+        so that the array stays aligned and only the removed particles are
+        touched.  Checking that the array is aligned scans the tags of all
+        the particles once, pass `aligned` to skip this.
+
         Parameters
         ----------
 
@@ -442,6 +558,11 @@ cdef class ParticleArray:
             an array of indices, this array can be a list, numpy array
             or a LongArray.
 
+        aligned : bool
+            if True the array is taken to be aligned without checking its
+            tags, only pass this when it is known, for example right after
+            `align_particles`.
+
         Notes
         -----
 
@@ -466,28 +587,17 @@ cdef class ParticleArray:
 
         cdef str msg
         cdef numpy.ndarray sorted_indices
-        cdef BaseArray prop_array
-        cdef int num_arrays, i
-        cdef list property_arrays
 
         if index_list.length > self.get_number_of_particles():
             msg = 'Number of particles to be removed is greater than'
             msg += 'number of particles in array'
             raise ValueError, msg
 
-        sorted_indices = numpy.sort(index_list.get_npy_array())
-        num_arrays = len(self.properties)
-
-        property_arrays = list(self.properties.values())
-
-        for i in range(num_arrays):
-            prop_array = property_arrays[i]
-            prop_array.remove(sorted_indices, 1)
+        if index_list.length == 0:
+            return
 
-        if index_list.length > 0:
-            self.align_particles()
-            self.is_dirty = True
-            self.indices_invalid = True
+        sorted_indices = numpy.sort(index_list.get_npy_array())
+        self._remove_sorted(sorted_indices, aligned or self._is_aligned())
 
     cpdef remove_tagged_particles(self, int tag):
         """ Remove particles that have the given tag.
@@ -502,15 +612,21 @@ cdef class ParticleArray:
         cdef LongArray indices = LongArray()
         cdef IntArray tag_array = self.properties['tag']
         cdef int *tagarrptr = tag_array.get_data_ptr()
+        cdef long num_real = self.num_real_particles
+        cdef bint aligned = num_real <= tag_array.length
         cdef int i
 
-        # find the indices of the particles to be removed.
+        # find the indices of the particles to be removed and check in the
+        # same pass that the array is aligned.
         for i in range(tag_array.length):
             if tagarrptr[i] == tag:
                 indices.append(i)
+            if (tagarrptr[i] == Local) != (i < num_real):
+                aligned = False
 
         # remove the particles.
-        self.remove_particles(indices)
+        if indices.length > 0:
+            self._remove_sorted(indices.get_npy_array(), aligned)
 
     def add_particles(self, **particle_props):
         """
@@ -547,6 +663,7 @@ cdef class ParticleArray:
         num_extra_particles = len(list(particle_props.values())[0])
         old_num_particles = self.get_number_of_particles()
         new_num_particles = num_extra_particles + old_num_particles
+        self._reserve_pool(new_num_particles)
 
         for prop in self.properties:
             arr = <BaseArray>PyDict_GetItem(self.properties, prop)
@@ -619,6 +736,90 @@ cdef class ParticleArray:
 
         return 0
 
+    cpdef int append_particles(self, ParticleArray source,
+                               LongArray indices) except -1:
+        """Append the particles of `source` with the given indices.
+
+        The data is copied directly from the properties of `source` into the
+        new slots, which are usually available from the capacity reserved by
+        earlier growth or `reserve`.  Properties missing in `source` are set
+        to their defaults and those missing in this array are ignored.  The
+        array is only realigned if it has non-local particles or a non-local
+        particle is added, so the cost is proportional to the number of
+        particles appended.
+        """
+        cdef long n = indices.length
+        cdef long old_n = self.get_number_of_particles()
+        cdef long n_src = source.get_number_of_particles()
+        cdef long i, n_local = 0
+        cdef int itemsize
+        cdef char *dst_data
+        cdef str prop
+        cdef BaseArray arr, src
+        cdef IntArray tag
+        cdef numpy.ndarray nparr, src_arr
+
+        if n == 0:
+            return 0
+        for i in range(n):
+            if indices.data[i] < 0 or indices.data[i] >= n_src:
+                raise IndexError('Particle index %d out of range.'
+                                 % indices.data[i])
+
+        self._reserve_pool(old_n + n)
+        for prop, arr in self.properties.items():
+            arr.resize(old_n + n)
+            nparr = arr.get_npy_array()
+            if prop not in source.properties:
+                nparr[old_n:] = self.default_values[prop]
+                continue
+            src = source.properties[prop]
+            src_arr = src.get_npy_array()
+            if src_arr.dtype == nparr.dtype:
+                itemsize = nparr.itemsize
+                dst_data = <char*>nparr.data
+                _gather_items(dst_data + old_n*itemsize, <char*>src_arr.data,
+                              itemsize, indices.data, n)
+            else:
+                nparr[old_n:] = src_arr[indices.get_npy_array()]
+
+        tag = self.properties['tag']
+        for i in range(old_n, old_n + n):
+            if tag.data[i] == Local:
+                n_local += 1
+        if self.num_real_particles == old_n and n_local == n:
+            self.num_real_particles += n
+        else:
+            self.align_particles()
+        self.is_dirty = True
+        self.indices_invalid = True
+        return 0
+
+    cpdef LongArray get_indices_in_box(self, double xmin, double xmax,
+                                       double ymin, double ymax,
+                                       double zmin, double zmax,
+                                       bint inside=True):
+        """Return the indices of the real particles inside the closed box,
+        or of those outside it if `inside` is False.
+
+        The positions are scanned once without creating any temporary
+        arrays.
+        """
+        cdef DoubleArray x = self.get_carray('x')
+        cdef DoubleArray y = self.get_carray('y')
+        cdef DoubleArray z = self.get_carray('z')
+        cdef long i, n = self.num_real_particles
+        cdef LongArray result = LongArray()
+        cdef bint found
+        with nogil:
+            for i in range(n):
+                found = (x.data[i] >= xmin and x.data[i] <= xmax and
+                         y.data[i] >= ymin and y.data[i] <= ymax and
+                         z.data[i] >= zmin and z.data[i] <= zmax)
+                if found == inside:
+                    result.c_append(i)
+        return result
+
     cpdef extend(self, int num_particles):
         """ Increase the total number of particles by the requested amount
 
@@ -633,6 +834,7 @@ cdef class ParticleArray:
         cdef BaseArray arr
         cdef numpy.ndarray nparr
 
+        self._reserve_pool(new_size)
         for key in self.properties:
             arr = self.properties[key]
             arr.resize(new_size)
@@ -955,6 +1157,8 @@ cdef class ParticleArray:
                         np_arr = arr.get_npy_array()
                         arr.get_npy_array()[:] = numpy.asarray(data)
                         self.properties[prop_name] = arr
+        if self.arena is not None:
+            self._reserve_pool(self.get_number_of_particles())
         if self.gpu is not None:
             self.gpu.add_prop(prop_name, self.properties[prop_name])
 
@@ -1042,81 +1246,167 @@ cdef class ParticleArray:
         Notes
         -----
 
-        Pseudo-code::
-
-            index_arr = LongArray(n)
-
-            next_insert = 0
-            for i from 0 to n
-                p <- ith particle
-                if p is Local
-                    if i != next_insert
-                        tmp = index_arr[next_insert]
-                        index_arr[next_insert] = i
-                        index_arr[i] = tmp
-                        next_insert += 1
-                    else
-                        index_arr[i] = i
-                        next_insert += 1
-                else
-                    index_arr[i] = i
-
-             # we now have the new index assignment.
-             # swap the required values as needed.
-             for every property array:
-                 for i from 0 to n:
-                     if index_arr[i] != i:
-                         tmp = prop[i]
-                         prop[i] = prop[index_arr[i]]
-                         prop[index_arr[i]] = tmp
+        The particles are partitioned stably, the 'Local' particles and the
+        others each keep their relative order.  The tags are processed in
+        blocks of particles by the OpenMP threads in parallel:
+
+            - count the 'Local' particles of each block and find the first
+              particle which is not 'Local'.  If there is none before the
+              number of 'Local' particles the array is aligned and nothing
+              is moved.
+            - the prefix sum of the counts gives, for each block, where its
+              'Local' and other particles go and the new index of every
+              particle is written.
+            - all the properties are permuted at once, block by block.
+
         """
-        cdef size_t i, num_particles
-        cdef size_t next_insert
-        cdef size_t num_arrays
-        cdef int tmp
-        cdef IntArray tag_arr
+        cdef long n = self.get_number_of_particles()
+        cdef long n_blocks = (n + ALIGN_BLOCK_SIZE - 1)//ALIGN_BLOCK_SIZE
+        cdef IntArray tag_arr = self.get_carray('tag')
+        cdef int *tag = tag_arr.data
+        cdef long *counts
+        cdef long *first_other
+        cdef long *offsets
+        cdef long b, start, end
+        cdef long num_real_particles = 0, first = n
         cdef LongArray index_array
-        cdef BaseArray arr
-        cdef list arrays
-        cdef long num_real_particles = 0
-        cdef long num_moves = 0
-
-        next_insert = 0
-        num_particles = self.get_number_of_particles()
-
-        tag_arr = self.get_carray('tag')
-
-        # malloc the new index array
-        index_array = LongArray(num_particles)
-
-        for i in range(num_particles):
-            if tag_arr.data[i] == Local:
-                num_real_particles += 1
-                if i != next_insert:
-                    tmp = index_array.data[next_insert]
-                    index_array.data[next_insert] = i
-                    index_array.data[i] = tmp
-                    next_insert += 1
-                    num_moves += 1
+
+        if n == 0:
+            self.num_real_particles = 0
+            return 0
+
+        counts = <long*>malloc(3*n_blocks*sizeof(long))
+        first_other = counts + n_blocks
+        offsets = counts + 2*n_blocks
+        try:
+            with nogil:
+                if n_blocks < 2:
+                    _count_local(tag, 0, n, counts, first_other)
                 else:
-                    index_array.data[i] = i
-                    next_insert += 1
-            else:
-                index_array.data[i] = i
+                    for b in prange(n_blocks, schedule='static'):
+                        start = b*ALIGN_BLOCK_SIZE
+                        _count_local(
+                            tag, start, min(start + ALIGN_BLOCK_SIZE, n),
+                            counts + b, first_other + b
+                        )
+
+                for b in range(n_blocks):
+                    offsets[b] = num_real_particles
+                    num_real_particles += counts[b]
+                    if first_other[b] >= 0:
+                        first = min(first, first_other[b])
+
+            self.num_real_particles = num_real_particles
+            if first >= num_real_particles:
+                # already aligned.
+                return 0
 
-        self.num_real_particles = num_real_particles
-        # we now have the aligned indices. Rearrange the particles
-        # accordingly.
-        arrays = list(self.properties.values())
-        num_arrays = len(arrays)
+            index_array = LongArray(n)
+            with nogil:
+                if n_blocks < 2:
+                    _partition_local(tag, 0, n, 0, num_real_particles,
+                                     index_array.data)
+                else:
+                    for b in prange(n_blocks, schedule='static'):
+                        start = b*ALIGN_BLOCK_SIZE
+                        _partition_local(
+                            tag, start, min(start + ALIGN_BLOCK_SIZE, n),
+                            offsets[b],
+                            num_real_particles + start - offsets[b],
+                            index_array.data
+                        )
+        finally:
+            free(counts)
+
+        self._permute_properties(index_array)
+        self.is_dirty = True
+        self.indices_invalid = True
 
-        for i in range(num_arrays):
-            arr = arrays[i]
-            arr.c_align_array(index_array)
+    cdef bint _is_aligned(self):
+        """Return True if exactly the first `num_real_particles` particles
+        are real.
+        """
+        cdef IntArray tag_arr = self.get_carray('tag')
+        cdef int *tag = tag_arr.data
+        cdef long i, num_real = self.num_real_particles
+        if num_real > tag_arr.length:
+            return False
+        for i in range(num_real):
+            if tag[i] != Local:
+                return False
+        for i in range(num_real, tag_arr.length):
+            if tag[i] == Local:
+                return False
+        return True
+
+    cdef _remove_sorted(self, numpy.ndarray sorted_indices, bint aligned):
+        """Remove the particles with the given sorted indices, `aligned`
+        is True if the array is aligned, see `remove_particles`.
+        """
+        cdef BaseArray prop_array
+        if aligned:
+            self._remove_aligned(sorted_indices)
+            return
 
-        if num_moves > 0:
-            self.is_dirty = True
-            self.indices_invalid = True
+        for prop_array in self.properties.values():
+            prop_array.remove(sorted_indices, 1)
+
+        self.align_particles()
+        self.is_dirty = True
+        self.indices_invalid = True
+
+    cdef _remove_aligned(self, numpy.ndarray sorted_indices):
+        """Remove the particles with the given sorted indices from an aligned
+        array keeping it aligned, see `remove_particles`.
+
+        The moves are worked out once on the indices and then applied to each
+        property, so the cost is proportional to the number of particles
+        removed and not to the size of the array.  Checking that the array is
+        aligned is left to the caller.
+        """
+        cdef long n = self.get_number_of_particles()
+        cdef long num_real = self.num_real_particles
+        cdef long num_indices = len(sorted_indices)
+        cdef LongArray index_arr = LongArray(num_indices)
+        cdef LongArray dst = LongArray(2*num_indices)
+        cdef LongArray src = LongArray(2*num_indices)
+        cdef long i, idx, last = -1, n_moves = 0
+        cdef BaseArray arr
+        cdef numpy.ndarray nparr
+        index_arr.set_data(numpy.asarray(sorted_indices, dtype=numpy.int64))
+
+        # Going down, the indices still to be removed are always below the
+        # slots that are moved.
+        for i in range(num_indices - 1, -1, -1):
+            idx = index_arr.data[i]
+            if idx >= n or idx < 0 or idx == last:
+                continue
+            last = idx
+            if idx < num_real:
+                num_real -= 1
+                if idx != num_real:
+                    dst.data[n_moves] = idx
+                    src.data[n_moves] = num_real
+                    n_moves += 1
+                idx = num_real
+            n -= 1
+            if idx != n:
+                dst.data[n_moves] = idx
+                src.data[n_moves] = n
+                n_moves += 1
+
+        if n == self.get_number_of_particles():
+            return
+
+        for arr in self.properties.values():
+            nparr = arr.get_npy_array()
+            _move_items(<char*>nparr.data, nparr.itemsize, dst.data, src.data,
+                        n_moves)
+            arr.resize(n)
+
+        self.num_real_particles = num_real
+        self.is_dirty = True
+        self.indices_invalid = True
 
     cpdef ParticleArray extract_particles(self, indices, list props=None):
         """Create new particle array for particles with indices in index_array
@@ -1142,17 +1432,18 @@ cdef class ParticleArray:
              - copy the properties from the existing array to the new array.
 
         """
-        cdef BaseArray index_array
-        if isinstance(indices, BaseArray):
+        cdef LongArray index_array
+        if isinstance(indices, LongArray):
             index_array = indices
         else:
+            if isinstance(indices, BaseArray):
+                indices = indices.get_npy_array()
             indices = numpy.asarray(indices)
             index_array = LongArray(indices.size)
             index_array.set_data(indices)
 
         cdef ParticleArray result_array = ParticleArray()
         cdef list prop_names, output_arrays
-        cdef BaseArray dst_prop_array, src_prop_array
         cdef str prop_type, prop
 
         if props is None:
@@ -1168,17 +1459,12 @@ cdef class ParticleArray:
                                       default=prop_default)
 
         # now we have the result array setup.
-        # resize it
-        if index_array.length == 0:
-            return result_array
-
-        result_array.extend(index_array.length)
-
-        # copy the required indices for each property.
-        for prop in prop_names:
-            src_prop_array = self.get_carray(prop)
-            dst_prop_array = result_array.get_carray(prop)
-            src_prop_array.copy_values(index_array, dst_prop_array)
+        # resize it and gather the required indices of all the properties
+        # at once.
+        if index_array.length > 0:
+            result_array.extend(index_array.length)
+            result_array._copy_from(self, prop_names, index_array, 0,
+                                    index_array.length)
 
         for const in self.constants:
             result_array.constants[const] = self.constants[const]
@@ -1222,13 +1508,38 @@ cdef class ParticleArray:
 
         """
         cdef BaseArray src_array, dst_array
+        cdef long n_dst = self.get_number_of_particles()
+        cdef long n_src = source.get_number_of_particles()
+        cdef list props = []
         for prop_name in source.properties:
             src_array = source.get_carray(prop_name)
-            dst_array = self.get_carray(prop_name)
-
-            if src_array != None and dst_array != None:
+            dst_array = self.properties.get(prop_name)
+            if dst_array is None:
+                continue
+            if src_array.get_c_type() == dst_array.get_c_type():
+                props.append(prop_name)
+            else:
                 dst_array.copy_subset(src_array, start_index, end_index)
 
+        if len(props) == 0:
+            return
+        if start_index < 0 and end_index < 0:
+            if n_src != n_dst:
+                raise ValueError('Source length should be same as dest length')
+            start_index, end_index = 0, n_dst
+        elif end_index < 0:
+            end_index = n_dst
+            if start_index >= n_dst:
+                raise ValueError('start_index beyond array length')
+            if end_index - start_index > n_src:
+                raise ValueError('Not enough values in source')
+        elif (start_index < 0 or start_index >= n_dst or end_index > n_dst or
+              start_index > end_index):
+            raise ValueError(
+                'start_index : %d, end_index : %d' % (start_index, end_index)
+            )
+        self._copy_from(source, props, None, start_index, end_index)
+
     cpdef copy_over_properties(self, dict props):
         """ Copy the properties from one set to another.
 
@@ -1301,10 +1612,16 @@ cdef class ParticleArray:
         """Removes property prop_name from the particle array """
 
         if self.properties.has_key(prop_name):
-            self.properties.pop(prop_name)
+            arr = self.properties.pop(prop_name)
             self.default_values.pop(prop_name)
+            if self.arena is not None:
+                # the array may still be used elsewhere.
+                arr.set_arena(None, 0, 0)
+                self.arena_offsets.pop(prop_name)
         if prop_name in self.output_property_arrays:
             self.output_property_arrays.remove(prop_name)
+        if self.lb_props is not None and prop_name in self.lb_props:
+            self.lb_props.remove(prop_name)
         if self.gpu is not None:
             self.gpu.remove_prop(prop_name)
 
@@ -1320,104 +1637,280 @@ cdef class ParticleArray:
 
     cpdef resize(self, long size):
         """Resize all arrays to the new size"""
+        self._reserve_pool(size)
         for prop, array in self.properties.items():
             array.resize(size)
 
+    cpdef reserve(self, long size):
+        """Make room for `size` particles in all the arrays without changing
+        the number of particles.
+
+        Reserve the memory when the final number of particles is known to
+        avoid the geometric growth of the arrays as particles are added.
+        """
+        cdef BaseArray array
+        if self.arena is not None:
+            if size > self.pool_capacity:
+                self._layout_arena(size)
+            return
+        for array in self.properties.values():
+            array.reserve(size)
+
+    cpdef squeeze(self):
+        """Release the memory reserved for particles beyond the current
+        number of particles in all the arrays.
+        """
+        cdef BaseArray array
+        if self.arena is not None:
+            self._layout_arena(self.get_number_of_particles())
+            return
+        for array in self.properties.values():
+            array.squeeze()
+
+    def set_pooled(self, bint value, long capacity=0):
+        """Store all the properties in one arena or each in its own memory.
+
+        In the pooled layout the properties are laid out one after the other
+        in a single aligned allocation with room for the same number of
+        particles, `pool_capacity`, which is at least `capacity`.  When more
+        room is needed the arena is reallocated at twice the size for all the
+        properties at once and `align_particles` moves the particles of all
+        the properties in one blocked pass over the arena.
+
+        The arena can be sent or saved as a whole without copying, see
+        `get_arena_buffer` and `get_pool_layout`.
+        """
+        cdef BaseArray arr
+        if value:
+            self._layout_arena(max(capacity, self.pool_capacity))
+        elif self.arena is not None:
+            for arr in self.properties.values():
+                arr.set_arena(None, 0, 0)
+            self.arena = None
+            self.arena_offsets = None
+            self.pool_capacity = 0
+
+    def is_pooled(self):
+        """Return True if the properties are stored in one arena."""
+        return self.arena is not None
+
+    def get_arena_buffer(self):
+        """Return the arena of a pooled array as a numpy array of bytes which
+        shares its memory, or None if the array is not pooled.
+        """
+        if self.arena is None:
+            return None
+        self._reserve_pool(self.get_number_of_particles())
+        return self.arena.get_npy_array().view(numpy.uint8)
+
+    def get_pool_layout(self):
+        """Return the layout of the arena of a pooled array or None.
+
+        The layout is a dictionary with the `capacity` of the arena in
+        particles, the number of particles `n`, the size of the arena
+        `nbytes` and, for each property, its byte `offset` in the arena and
+        numpy `dtype`.
+        """
+        cdef BaseArray arr
+        if self.arena is None:
+            return None
+        self._reserve_pool(self.get_number_of_particles())
+        properties = {}
+        for name, arr in self.properties.items():
+            properties[name] = dict(
+                offset=self.arena_offsets[name],
+                dtype=arr.get_npy_array().dtype.str
+            )
+        return dict(
+            capacity=self.pool_capacity, n=self.get_number_of_particles(),
+            nbytes=self.arena.length*sizeof(double), properties=properties
+        )
+
+    def memory_usage(self):
+        """Return the memory used by the particle array.
+
+        Returns a dictionary of the tuple of the bytes allocated and used
+        by each property, the sum for all the constants is keyed on
+        `constants`.  For a pooled array, the memory of the arena not held
+        by a property is keyed on `arena`.
+        """
+        cdef BaseArray arr
+        cdef dict usage = {}
+        cdef long allocated = 0, used = 0, in_arena = 0
+        for name, arr in self.properties.items():
+            usage[name] = arr.memory_usage()
+            if self.arena is not None and arr.get_arena() is self.arena:
+                in_arena += usage[name][0]
+        for arr in self.constants.values():
+            a, u = arr.memory_usage()
+            allocated += a
+            used += u
+        usage['constants'] = (allocated, used)
+        if self.arena is not None:
+            usage['arena'] = (
+                max(self.arena.memory_usage()[0] - in_arena, 0), 0
+            )
+        return usage
+
+    cdef _layout_arena(self, long capacity):
+        """Move all the properties into a new arena with room for `capacity`
+        particles.
+        """
+        cdef BaseArray arr
+        cdef DoubleArray arena
+        cdef dict offsets = {}
+        cdef long offset = 0
+        cdef str name
+        cdef list names = sorted(self.properties)
+        capacity = max(capacity, self.get_number_of_particles(), 16)
+        for name in names:
+            arr = self.properties[name]
+            offsets[name] = offset
+            offset += _align_bytes(capacity*arr.get_npy_array().itemsize)
+
+        arena = DoubleArray(max(offset//sizeof(double), 1))
+        if get_parallel_first_touch():
+            arena.first_touch()
+        for name in names:
+            arr = self.properties[name]
+            arr.set_arena(arena, offsets[name], capacity)
+        self.arena = arena
+        self.arena_offsets = offsets
+        self.pool_capacity = capacity
+
+    cdef _reserve_pool(self, long size):
+        """Grow the arena geometrically if it cannot hold `size` particles
+        or if a property has left it.
+        """
+        cdef BaseArray arr
+        if self.arena is None:
+            return
+        if size > self.pool_capacity:
+            self._layout_arena(max(size, 2*self.pool_capacity))
+            return
+        for arr in self.properties.values():
+            if arr.get_arena() is not self.arena:
+                self._layout_arena(self.pool_capacity)
+                return
+
+    cdef _copy_from(self, ParticleArray source, list props,
+                    LongArray indices, long start, long end):
+        """Copy the given properties of `source` to the particles `[start,
+        end)` of self, in blocks of particles by the OpenMP threads.
+
+        The i'th particle copied is the `indices[i]`th of the source if
+        `indices` is not None and the i'th otherwise.  The properties must
+        have the same types in both the arrays.
+        """
+        cdef numpy.ndarray nparr
+        cdef int n_props = len(props)
+        cdef char **dst = <char**>malloc(n_props*sizeof(char*))
+        cdef char **src = <char**>malloc(n_props*sizeof(char*))
+        cdef int *itemsize = <int*>malloc(n_props*sizeof(int))
+        cdef long *index = NULL
+        cdef char *data
+        cdef int j
+        if indices is not None:
+            index = indices.data
+        try:
+            for j in range(n_props):
+                nparr = self.properties[props[j]].get_npy_array()
+                itemsize[j] = nparr.itemsize
+                data = <char*>nparr.data
+                dst[j] = data + start*itemsize[j]
+                nparr = source.properties[props[j]].get_npy_array()
+                src[j] = <char*>nparr.data
+            with nogil:
+                _copy_blocks(dst, src, itemsize, n_props, index, end - start)
+        finally:
+            free(dst)
+            free(src)
+            free(itemsize)
+
+    cdef _permute_properties(self, LongArray new_indices):
+        """Permute all the properties so that the i'th particle is the
+        `new_indices[i]`th one.
+
+        The properties are first copied to one scratch buffer and then
+        gathered back in blocks of particles by the OpenMP threads, each
+        block of the indices being read once for all the properties.
+        """
+        cdef BaseArray arr
+        cdef numpy.ndarray nparr
+        cdef long n = new_indices.length
+        cdef int n_props = len(self.properties)
+        cdef char **dst = <char**>malloc(n_props*sizeof(char*))
+        cdef char **src = <char**>malloc(n_props*sizeof(char*))
+        cdef int *itemsize = <int*>malloc(n_props*sizeof(int))
+        cdef char *scratch = NULL
+        cdef long total = 0
+        cdef int j
+        if self.arena is not None:
+            self._reserve_pool(self.get_number_of_particles())
+        try:
+            j = 0
+            for arr in self.properties.values():
+                nparr = arr.get_npy_array()
+                dst[j] = <char*>nparr.data
+                itemsize[j] = nparr.itemsize
+                total += n*itemsize[j]
+                j += 1
+            scratch = <char*>malloc(max(total, 1))
+            total = 0
+            for j in range(n_props):
+                src[j] = scratch + total
+                total += n*itemsize[j]
+            with nogil:
+                _copy_blocks(src, dst, itemsize, n_props, NULL, n)
+                _copy_blocks(dst, src, itemsize, n_props, new_indices.data, n)
+        finally:
+            free(scratch)
+            free(dst)
+            free(src)
+            free(itemsize)
+
+    def first_touch(self):
+        """Reallocate all the property arrays so that their pages are first
+        touched by the OpenMP threads in the static layout of the parallel
+        loops over the particles.
+
+        See :py:func:`pyzoltan.core.carray.set_parallel_first_touch`.
+        """
+        cdef BaseArray array
+        for array in self.properties.values():
+            array.first_touch()
+
     ######################################################################
     # Parallel interface
     ######################################################################
-    def Send(self, int recv_proc, props=None) :
+    def Send(self, int recv_proc, props=None):
+        """Send the given properties of the real particles to `recv_proc`
+        as a single message, see `Receive`.
+
+        The properties, all by default, are packed into one buffer with
+        :py:func:`pysph.base.particle_buffer.pack_particle_array`.
+        """
+        from pysph.base.particle_buffer import pack_particle_array
         comm = MPI.COMM_WORLD
-        rank = comm.Get_rank()
-        nprocs = comm.Get_size()
-        if rank < 10 :
-            rank_str = '0' + str(rank)
-        else :
-            rank_str = str(rank)
-        if recv_proc < 10 :
-            recv_proc_str = '0' + str(recv_proc)
-        else :
-            recv_proc_str = str(recv_proc)
-        pre_tag = str(1) + rank_str + recv_proc_str
-        tag_count = 0
-        if recv_proc < nprocs :
-            datasize = numpy.zeros(1)
-            for prop in props :
-                if self.properties.has_key(prop) :
-                    datasize[0] = len(self.properties[prop])
-                else :
-                    props.remove(prop)
-            if datasize[0] != 0 and len(props) != 0 :
-                prop_count = numpy.zeros(1)
-                prop_count[0] = len(props)
-                tag = int(pre_tag + str(tag_count))
-                comm.Send(prop_count, recv_proc, tag=tag)
-                tag_count+=1
-                tag = int(pre_tag + str(tag_count))
-                comm.Send(datasize, recv_proc, tag=tag)
-                tag_count+=1
-                prop_len = numpy.zeros(len(props))
-                i = 0
-                for prop in props :
-                    prop_len[i] = len(prop)
-                    i+=1
-                tag = int(pre_tag + str(tag_count))
-                comm.Send(prop_len, recv_proc, tag=tag)
-                tag_count+=1
-                for prop in props :
-                    prop_char = numpy.zeros(len(prop), dtype=numpy.character)
-                    prop_char[0:] = list(prop)
-                    tag = int(pre_tag + str(tag_count))
-                    comm.Send([prop_char, MPI.CHARACTER], recv_proc, tag=tag)
-                    tag_count+=1
-                for prop in props :
-                    tag = int(pre_tag + str(tag_count))
-                    comm.Send(self.get(prop), recv_proc, tag=tag)
-                    tag_count+=1
-
-    def Receive(self, int send_proc) :
+        if props is None:
+            props = list(self.properties.keys())
+        props = [prop for prop in props if prop in self.properties]
+        buf = pack_particle_array(self, props, only_real=True)
+        comm.Send([buf, MPI.BYTE], recv_proc, tag=PARTICLES_TAG)
+
+    def Receive(self, int send_proc):
+        """Receive the particles sent by `send_proc` with `Send` and add
+        them to this array.
+        """
+        from pysph.base.particle_buffer import unpack_arrays
         comm = MPI.COMM_WORLD
-        rank = comm.Get_rank()
-        nprocs = comm.Get_size()
-        if rank < 10 :
-            rank_str = '0' + str(rank)
-        else :
-            rank_str = str(rank)
-        if send_proc < 10 :
-            send_proc_str = '0' + str(send_proc)
-        else :
-            send_proc_str = str(send_proc)
-        pre_tag = str(1) + send_proc_str + rank_str
-        tag_count = 0
-        recv_props = {}
-        props = []
-        if send_proc < nprocs :
-            prop_count = numpy.zeros(1)
-            tag = int(pre_tag + str(tag_count))
-            comm.Recv(prop_count, send_proc, tag=tag)
-            tag_count+=1
-            datasize = numpy.zeros(1)
-            tag = int(pre_tag + str(tag_count))
-            comm.Recv(datasize, send_proc, tag=tag)
-            tag_count+=1
-            if datasize[0] != 0 and prop_count[0] != 0 :
-                prop_len = numpy.zeros(int(prop_count[0]))
-                tag = int(pre_tag + str(tag_count))
-                comm.Recv(prop_len, send_proc, tag=tag)
-                tag_count+=1
-                for i in range(int(prop_count[0])) :
-                    prop_char = numpy.zeros(int(prop_len[i]), dtype=numpy.character)
-                    tag = int(pre_tag + str(tag_count))
-                    comm.Recv([prop_char, MPI.CHARACTER], send_proc, tag=tag)
-                    tag_count+=1
-                    prop = "".join(prop_char)
-                    props.append(prop)
-                    recv_props[prop] = numpy.zeros(int(datasize[0]))
-                for prop in props :
-                    tag = int(pre_tag + str(tag_count))
-                    comm.Recv(recv_props[prop], send_proc, tag=tag)
-                    tag_count+=1
-                self.add_particles(**recv_props)
+        status = MPI.Status()
+        comm.Probe(send_proc, tag=PARTICLES_TAG, status=status)
+        buf = numpy.empty(status.Get_count(MPI.BYTE), dtype=numpy.uint8)
+        comm.Recv([buf, MPI.BYTE], send_proc, tag=PARTICLES_TAG)
+        header, props, constants = unpack_arrays(buf)
+        if header['n'] > 0 and len(props) > 0:
+            self.add_particles(**props)
 
 # End of ParticleArray class
 ##############################################################################
@@ -0,0 +1,235 @@
+"""Pack particle arrays into a single contiguous buffer.
+
+A packed particle array is one block of bytes holding a small JSON header,
+with the name, number of particles and the type, default and offset of each
+property and constant, followed by the data of each of them aligned to 64
+bytes.  The buffer can be sent as a single message, written to a file or
+placed in shared memory, and the properties can be read back as numpy arrays
+that share its memory.
+
+:class:`SharedParticleArray` publishes a particle array in a
+:mod:`multiprocessing.shared_memory` segment which other processes, for
+example a viewer of a running simulation, can attach to by name.  This
+requires Python 3.8 or above.
+"""
+
+import json
+import struct
+
+import numpy
+
+from pysph.base.particle_array import ParticleArray
+
+MAGIC = b'PYSPHPA1'
+ALIGNMENT = 64
+
+# The magic bytes and the length of the header.
+_PREFIX = struct.Struct('<8sQ')
+
+# Names of the segments published by this process.
+_published = set()
+
+
+def _align(n):
+    return ((n + ALIGNMENT - 1)//ALIGNMENT)*ALIGNMENT
+
+
+def _to_python(value):
+    if isinstance(value, numpy.ndarray):
+        return value.tolist()
+    elif isinstance(value, numpy.generic):
+        return value.item()
+    raise TypeError('Cannot serialize %r' % value)
+
+
+def _get_layout(pa, props=None, only_real=False):
+    """Return the header, its encoding and the data of a packed array."""
+    if props is None:
+        props = sorted(pa.properties.keys())
+    n = pa.get_number_of_particles(real=only_real)
+    entries, data = [], []
+    offset = 0
+    for kind, names, arrays in (('properties', props, pa.properties),
+                                ('constants', sorted(pa.constants.keys()),
+                                 pa.constants)):
+        for name in names:
+            carray = arrays[name]
+            array = carray.get_npy_array()
+            if kind == 'properties':
+                array = array[:n]
+                default = pa.default_values[name]
+            else:
+                default = None
+            entries.append(dict(
+                name=name, kind=kind, type=carray.get_c_type(),
+                dtype=array.dtype.str, size=len(array), offset=offset,
+                default=default
+            ))
+            data.append(array)
+            offset += _align(array.nbytes)
+
+    header = dict(
+        name=pa.name, n=n, time=pa.time, arrays=entries,
+        output_arrays=[x for x in pa.output_property_arrays if x in props]
+    )
+    encoded = json.dumps(header, default=_to_python).encode('utf-8')
+    start = _align(_PREFIX.size + len(encoded))
+    return encoded, start, start + offset, data
+
+
+def get_packed_size(pa, props=None, only_real=False):
+    """Return the size in bytes of the packed particle array."""
+    return _get_layout(pa, props, only_real)[2]
+
+
+def pack_particle_array(pa, props=None, only_real=False, out=None):
+    """Pack a particle array into a single buffer.
+
+    Parameters
+    ----------
+
+    pa: ParticleArray
+        The particle array.
+
+    props: list
+        Optional names of the properties to pack, all by default.  The
+        constants are always packed.
+
+    only_real: bool
+        Pack only the real particles.
+
+    out: numpy.ndarray
+        Optional uint8 array of at least `get_packed_size` bytes to pack into.
+
+    Returns the uint8 array holding the packed data.
+    """
+    encoded, start, nbytes, data = _get_layout(pa, props, only_real)
+    if out is None:
+        out = numpy.empty(nbytes, dtype=numpy.uint8)
+    elif len(out) < nbytes:
+        raise ValueError('Buffer of %d bytes cannot hold %d bytes.'
+                         % (len(out), nbytes))
+    out[:_PREFIX.size] = numpy.frombuffer(
+        _PREFIX.pack(MAGIC, len(encoded)), dtype=numpy.uint8
+    )
+    out[_PREFIX.size:_PREFIX.size + len(encoded)] = numpy.frombuffer(
+        encoded, dtype=numpy.uint8
+    )
+    offset = start
+    for array in data:
+        out[offset:offset + array.nbytes] = array.view(numpy.uint8)
+        offset += _align(array.nbytes)
+    return out
+
+
+def unpack_arrays(buf):
+    """Return the header, properties and constants of a packed particle
+    array.
+
+    The properties and constants are dictionaries of numpy arrays keyed on
+    the name which share the memory of `buf`.
+    """
+    buf = numpy.frombuffer(buf, dtype=numpy.uint8)
+    magic, length = _PREFIX.unpack(buf[:_PREFIX.size].tobytes())
+    if magic != MAGIC:
+        raise ValueError('Not a packed particle array.')
+    encoded = buf[_PREFIX.size:_PREFIX.size + length].tobytes()
+    header = json.loads(encoded.decode('utf-8'))
+    start = _align(_PREFIX.size + length)
+    result = dict(properties={}, constants={})
+    for entry in header['arrays']:
+        dtype = numpy.dtype(entry['dtype'])
+        offset = start + entry['offset']
+        data = buf[offset:offset + entry['size']*dtype.itemsize]
+        result[entry['kind']][entry['name']] = data.view(dtype)
+    return header, result['properties'], result['constants']
+
+
+def unpack_particle_array(buf):
+    """Return a new particle array with a copy of the data of a packed one.
+    """
+    header, properties, constants = unpack_arrays(buf)
+    props = {}
+    for entry in header['arrays']:
+        if entry['kind'] == 'properties':
+            props[entry['name']] = dict(
+                data=properties[entry['name']].copy(), type=entry['type'],
+                default=entry['default']
+            )
+    constants = dict((k, v.copy()) for k, v in constants.items())
+    pa = ParticleArray(name=header['name'], constants=constants, **props)
+    pa.set_time(header['time'])
+    pa.set_output_arrays(header['output_arrays'])
+    return pa
+
+
+def _get_shared_memory():
+    try:
+        from multiprocessing import shared_memory
+    except ImportError:
+        msg = 'Shared memory requires Python 3.8 or above.'
+        raise RuntimeError(msg)
+    return shared_memory
+
+
+###############################################################################
+class SharedParticleArray(object):
+    """A packed particle array in a shared memory segment.
+
+    The publishing process creates the segment with :meth:`publish` and
+    removes it with :meth:`unlink` once it is no longer needed, other
+    processes :meth:`attach` to it by its name.  The arrays returned by
+    :meth:`get_arrays` share the memory of the segment and must be dropped
+    before it is closed.
+    """
+    def __init__(self, shm):
+        self.shm = shm
+        self.name = shm.name
+
+    @classmethod
+    def publish(cls, pa, props=None, only_real=False, name=None):
+        """Pack the particle array into a new shared memory segment.
+
+        The arguments are those of :func:`pack_particle_array`, `name` is
+        the optional name of the segment.
+        """
+        shared_memory = _get_shared_memory()
+        nbytes = get_packed_size(pa, props, only_real)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=nbytes)
+        out = numpy.frombuffer(shm.buf, dtype=numpy.uint8, count=nbytes)
+        pack_particle_array(pa, props, only_real, out=out)
+        del out
+        _published.add(shm.name)
+        return cls(shm)
+
+    @classmethod
+    def attach(cls, name):
+        """Attach to the segment published with the given name."""
+        shared_memory = _get_shared_memory()
+        shm = shared_memory.SharedMemory(name=name)
+        if shm.name not in _published:
+            # The publisher removes the segment, it must not be removed when
+            # this process exits.
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return cls(shm)
+
+    def get_arrays(self):
+        """Return the header, properties and constants as given by
+        :func:`unpack_arrays` without copying them.
+        """
+        return unpack_arrays(self.shm.buf)
+
+    def get_particle_array(self):
+        """Return a new particle array with a copy of the data."""
+        return unpack_particle_array(self.shm.buf)
+
+    def close(self):
+        """Detach from the segment."""
+        self.shm.close()
+
+    def unlink(self):
+        """Close and remove the segment, call this in the publisher."""
+        self.shm.close()
+        self.shm.unlink()
+        _published.discard(self.name)
@@ -0,0 +1,35 @@
+import os
+import unittest
+
+from pysph.base.affinity import (get_local_rank_cpus, get_numa_nodes,
+    parse_cpu_list)
+
+
+class TestAffinity(unittest.TestCase):
+    def test_parse_cpu_list(self):
+        self.assertEqual(parse_cpu_list('0-3,8,10-11\n'),
+                         [0, 1, 2, 3, 8, 10, 11])
+        self.assertEqual(parse_cpu_list('5'), [5])
+
+    def test_local_ranks_get_contiguous_blocks_by_node(self):
+        # Given
+        nodes = [[0, 1, 2, 3], [4, 5, 6, 7]]
+
+        # When
+        cpus = [get_local_rank_cpus(i, 4, nodes) for i in range(4)]
+
+        # Then
+        self.assertEqual(cpus, [[0, 1], [2, 3], [4, 5], [6, 7]])
+        self.assertEqual(get_local_rank_cpus(0, 1, nodes), list(range(8)))
+        # More ranks than CPUs share them.
+        self.assertEqual(get_local_rank_cpus(9, 16, nodes), [1])
+
+    def test_numa_nodes_are_allowed_cpus(self):
+        if not hasattr(os, 'sched_getaffinity'):
+            self.skipTest('sched_getaffinity is not available.')
+        cpus = [cpu for node in get_numa_nodes() for cpu in node]
+        self.assertEqual(sorted(cpus), sorted(os.sched_getaffinity(0)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -15,7 +15,8 @@ except ImportError:
 import numpy
 
 # local imports
-from pyzoltan.core.carray import LongArray, py_aligned
+from pyzoltan.core.carray import (LongArray, get_parallel_first_touch,
+    py_aligned, set_parallel_first_touch)
 
 
 class TestAligned(unittest.TestCase):
@@ -178,6 +179,74 @@ class TestLongArray(unittest.TestCase):
         self.assertEqual(l.alloc >= l.length, True)
         del l # This should work and not segfault.
 
+    def test_first_touch(self):
+        # Given
+        l = LongArray(10)
+        l.set_data(numpy.arange(10))
+        view = LongArray()
+        view.set_view(l, 2, 5)
+
+        # When
+        l.first_touch()
+
+        # Then
+        self.assertEqual(l.length, 10)
+        self.assertTrue(numpy.all(l.get_npy_array() == numpy.arange(10)))
+        self.assertRaises(RuntimeError, view.first_touch)
+
+    def test_resize_with_parallel_first_touch(self):
+        # Given
+        n = 500000
+        l = LongArray(10)
+        l.set_data(numpy.arange(10))
+        self.assertFalse(get_parallel_first_touch())
+        set_parallel_first_touch(True)
+
+        try:
+            # When
+            l.resize(n)
+            l.get_npy_array()[10:] = numpy.arange(10, n)
+            l.append(n)
+        finally:
+            set_parallel_first_touch(False)
+
+        # Then
+        self.assertEqual(l.length, n + 1)
+        self.assertTrue(numpy.all(l.get_npy_array() == numpy.arange(n + 1)))
+
+    def test_set_arena(self):
+        # Given
+        arena = LongArray(32)
+        l = LongArray(5)
+        l.set_data(numpy.arange(5))
+
+        # When
+        l.set_arena(arena, 8*16, 10)
+        l.append(5)
+
+        # Then
+        self.assertTrue(l.get_arena() is arena)
+        self.assertEqual(l.alloc, 10)
+        self.assertTrue(numpy.all(arena.get_npy_array()[16:22] ==
+                                  numpy.arange(6)))
+        self.assertRaises(ValueError, l.set_arena, arena, 8*30, 10)
+
+        # When
+        l.resize(20)
+
+        # Then
+        self.assertEqual(l.get_arena(), None)
+        self.assertTrue(numpy.all(l.get_npy_array()[:6] == numpy.arange(6)))
+
+        # When
+        l.set_arena(arena, 0, 20)
+        l.set_arena(None, 0, 0)
+        arena.get_npy_array()[:] = -1
+
+        # Then
+        self.assertEqual(l.get_arena(), None)
+        self.assertTrue(numpy.all(l.get_npy_array()[:6] == numpy.arange(6)))
+
     def test_reset(self):
         """
         Tests the reset function.
@@ -208,6 +277,36 @@ class TestLongArray(unittest.TestCase):
         self.assertEqual(l1.length, 10)
         self.assertEqual(numpy.allclose(l1.get_npy_array(), numpy.arange(10)), True)
 
+    def test_extend_and_resize_grow_geometrically(self):
+        # Given
+        l = LongArray(100)
+        l.set_data(numpy.arange(100))
+
+        # When
+        l.extend(numpy.array([100, 101], dtype=numpy.int32))
+
+        # Then
+        self.assertEqual(l.length, 102)
+        self.assertEqual(l.alloc, 200)
+        self.assertTrue(numpy.all(l.get_npy_array() == numpy.arange(102)))
+
+        # When
+        for i in range(98):
+            l.resize(l.length + 1)
+
+        # Then
+        self.assertEqual(l.length, 200)
+        self.assertEqual(l.alloc, 200)
+
+        # When
+        l.resize(1000)
+        l.resize(10)
+        l.squeeze()
+
+        # Then
+        self.assertEqual(l.alloc, 16)
+        self.assertTrue(numpy.all(l.get_npy_array() == numpy.arange(10)))
+
     def test_remove(self):
         """
         Tests the remove function.
@@ -319,6 +418,24 @@ class TestLongArray(unittest.TestCase):
         l1_load = pickle.loads(l1_dump)
         self.assertEqual((l1_load.get_npy_array() == l1.get_npy_array()).all(), True)
 
+    def test_memory_usage(self):
+        # Given
+        l = LongArray(10)
+        itemsize = l.get_npy_array().itemsize
+
+        # When
+        l.reserve(100)
+
+        # Then
+        self.assertEqual(l.memory_usage(), (100*itemsize, 10*itemsize))
+
+        # When
+        view = LongArray()
+        view.set_view(l, 2, 6)
+
+        # Then
+        self.assertEqual(view.memory_usage()[1], 0)
+
     def test_set_view(self):
         # Given
         src = LongArray()
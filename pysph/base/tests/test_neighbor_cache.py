@@ -89,6 +89,55 @@ class TestNeighborCache(unittest.TestCase):
             nb_c = nb_cached.get_npy_array()
             self.assertTrue(np.all(nb_e == nb_c))
 
+    def test_thread_work_counts_all_neighbors(self):
+        # Given
+        pa1 = self._make_random_parray('pa1', 5)
+        particles = [pa1]
+        nnps = LinkedListNNPS(dim=3, particles=particles, cache=True)
+        nnps.set_context(0, 0)
+        cache = NeighborCache(nnps, dst_index=0, src_index=0)
+        cache.update()
+
+        # When
+        cache.find_all_neighbors()
+        cache.update()
+        cache.find_all_neighbors()
+        work = cache.get_thread_work()
+
+        # Then
+        nbrs = UIntArray()
+        expect = 0
+        for i in range(len(pa1.x)):
+            nnps.get_nearest_particles_no_cache(0, 0, i, nbrs, False)
+            expect += nbrs.length
+        self.assertEqual(work.sum(), expect)
+
+    def test_thread_work_is_reset_by_update(self):
+        # Given
+        pa1 = self._make_random_parray('pa1', 6)
+        particles = [pa1]
+        nnps = LinkedListNNPS(dim=3, particles=particles, cache=True)
+        nnps.set_context(0, 0)
+        cache = NeighborCache(nnps, dst_index=0, src_index=0)
+        cache.update()
+        cache.find_all_neighbors()
+
+        # When
+        pa1.remove_particles(np.arange(100, dtype=np.uint32))
+        nnps.update()
+        nnps.set_context(0, 0)
+        cache.update()
+        cache.find_all_neighbors()
+        work = cache.get_thread_work()
+
+        # Then
+        nbrs = UIntArray()
+        expect = 0
+        for i in range(len(pa1.x)):
+            nnps.get_nearest_particles_no_cache(0, 0, i, nbrs, False)
+            expect += nbrs.length
+        self.assertEqual(work.sum(), expect)
+
 
 if __name__ == '__main__':
     unittest.main()
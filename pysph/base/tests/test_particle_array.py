@@ -328,6 +328,191 @@ class ParticleArrayTest(unittest.TestCase):
         self.assertEqual(check_array(p.m, [1., 1.]), True)
         self.assertEqual(check_array(p.h, [.1, .1]), True)
 
+    def test_remove_particles_keeps_array_aligned(self):
+        # Given
+        numpy.random.seed(1)
+        n = 50
+        tag = numpy.random.randint(0, 3, n)
+        p = particle_array.ParticleArray(
+            name='f', x=numpy.arange(n, dtype=float), tag=tag,
+            gid=dict(data=numpy.arange(n), type='unsigned int')
+        )
+
+        for i in range(5):
+            x = p.get('x', only_real_particles=False)
+            tag = p.get('tag', only_real_particles=False).copy()
+            indices = numpy.random.choice(len(x), 5, replace=False)
+            expected = numpy.delete(x, indices)
+            expected_tag = numpy.delete(tag, indices)
+
+            # When
+            p.remove_particles(indices)
+
+            # Then
+            x = p.get('x', only_real_particles=False)
+            tag = p.get('tag', only_real_particles=False)
+            n_real = numpy.sum(expected_tag == 0)
+            self.assertEqual(p.get_number_of_particles(), len(expected))
+            self.assertEqual(p.get_number_of_particles(real=True), n_real)
+            self.assertTrue(numpy.all(tag[:n_real] == 0))
+            self.assertTrue(numpy.all(tag[n_real:] != 0))
+            self.assertEqual(sorted(x), sorted(expected))
+            self.assertTrue(check_array(
+                p.get('gid', only_real_particles=False), x
+            ))
+
+    def test_remove_particles_of_known_aligned_array(self):
+        # Given
+        tag = numpy.array([0, 1, 0, 2, 0, 1])
+        p = particle_array.ParticleArray(
+            name='f', x=numpy.arange(6, dtype=float), tag=tag
+        )
+        p.align_particles()
+        x = p.get('x', only_real_particles=False).copy()
+
+        # When
+        p.remove_particles([0, 4], aligned=True)
+
+        # Then
+        self.assertEqual(p.get_number_of_particles(real=True), 2)
+        self.assertEqual(p.get_number_of_particles(), 4)
+        self.assertTrue(numpy.all(p.tag[:2] == 0))
+        self.assertEqual(
+            sorted(p.get('x', only_real_particles=False)),
+            sorted(numpy.delete(x, [0, 4]))
+        )
+
+    def test_remove_tagged_particles_of_unaligned_array(self):
+        # Given
+        tag = numpy.array([0, 1, 0, 2, 0, 1])
+        p = particle_array.ParticleArray(
+            name='f', x=numpy.arange(6, dtype=float), tag=tag
+        )
+        p.align_particles()
+        # Tags changed directly leave the array unaligned.
+        p.tag[0] = 2
+
+        # When
+        p.remove_tagged_particles(1)
+
+        # Then
+        tag = p.get('tag', only_real_particles=False)
+        self.assertEqual(sorted(tag), [0, 0, 2, 2])
+        self.assertEqual(p.get_number_of_particles(real=True), 2)
+        self.assertTrue(numpy.all(tag[:2] == 0))
+        self.assertEqual(
+            sorted(p.get('x', only_real_particles=False)), [0., 2., 3., 4.]
+        )
+
+    def test_append_particles(self):
+        # Given
+        src = particle_array.ParticleArray(
+            name='s', x=[1., 2., 3., 4.], m=[1., 2., 3., 4.],
+            tag=[0, 0, 0, 1], n=dict(data=[5, 6, 7, 8], type='int')
+        )
+        src.add_property('p', type='float', data=[0.5, 1.5, 2.5, 3.5])
+        dst = particle_array.ParticleArray(name='d', x=[10.], tag=[0])
+        dst.add_property('p', data=[20.])
+        dst.add_property('m', default=-1.0)
+        indices = LongArray(2)
+        indices.set_data(numpy.array([2, 0]))
+
+        # When
+        dst.append_particles(src, indices)
+
+        # Then
+        self.assertEqual(dst.get_number_of_particles(), 3)
+        self.assertEqual(dst.num_real_particles, 3)
+        self.assertTrue(check_array(dst.x, [10., 3., 1.]))
+        self.assertTrue(check_array(dst.p, [20., 2.5, 0.5]))
+        self.assertTrue(check_array(dst.m, [-1., 3., 1.]))
+        self.assertFalse('n' in dst.properties)
+
+        # When
+        indices.set_data(numpy.array([3, 1]))
+        dst.append_particles(src, indices)
+
+        # Then
+        self.assertEqual(dst.num_real_particles, 4)
+        self.assertTrue(check_array(dst.x, [10., 3., 1., 2.]))
+        self.assertEqual(dst.get('x', only_real_particles=False)[-1], 4.)
+
+        # When/Then
+        indices.set_data(numpy.array([4]))
+        self.assertRaises(IndexError, dst.append_particles, src, indices)
+
+    def test_get_indices_in_box(self):
+        # Given
+        p = particle_array.ParticleArray(
+            name='f', x=[0., 1., 2., 3., 1.5], y=[0., 1., 5., 0., 1.],
+            z=[0., 0., 0., 0., 0.], tag=[0, 0, 0, 0, 1]
+        )
+
+        # When
+        inside = p.get_indices_in_box(0.5, 2.0, -1.0, 1.0, -1.0, 1.0)
+        outside = p.get_indices_in_box(
+            0.5, 2.0, -1.0, 1.0, -1.0, 1.0, inside=False
+        )
+
+        # Then
+        self.assertEqual(list(inside.get_npy_array()), [1])
+        self.assertEqual(list(outside.get_npy_array()), [0, 2, 3])
+
+    def test_get_indices_in_box_includes_the_boundary(self):
+        # Given
+        p = particle_array.ParticleArray(
+            name='f', x=[0.5, 2.0, 1.0, 2.0 + 1e-12],
+            y=[-1.0, 1.0, 0.0, 0.0], z=[1.0, -1.0, 0.0, 0.0]
+        )
+
+        # When
+        inside = p.get_indices_in_box(0.5, 2.0, -1.0, 1.0, -1.0, 1.0)
+        outside = p.get_indices_in_box(
+            0.5, 2.0, -1.0, 1.0, -1.0, 1.0, inside=False
+        )
+
+        # Then
+        self.assertEqual(list(inside.get_npy_array()), [0, 1, 2])
+        self.assertEqual(list(outside.get_npy_array()), [3])
+
+    def test_get_indices_in_box_skips_remote_and_ghost_particles(self):
+        # Given
+        p = particle_array.ParticleArray(
+            name='f', x=[0., 1., 1., 0., 1., 0.], y=[0.]*6, z=[0.]*6,
+            tag=[0, 0, 1, 1, 2, 2]
+        )
+
+        # When
+        inside = p.get_indices_in_box(0.5, 2.0, -1.0, 1.0, -1.0, 1.0)
+        outside = p.get_indices_in_box(
+            0.5, 2.0, -1.0, 1.0, -1.0, 1.0, inside=False
+        )
+
+        # Then
+        self.assertEqual(list(inside.get_npy_array()), [1])
+        self.assertEqual(list(outside.get_npy_array()), [0])
+
+    def test_get_indices_in_box_with_no_matches(self):
+        # Given
+        p = particle_array.ParticleArray(
+            name='f', x=[0., 1.], y=[0., 0.], z=[0., 0.]
+        )
+        empty = particle_array.ParticleArray(name='e', x=[], y=[], z=[])
+
+        # When
+        inside = p.get_indices_in_box(5.0, 6.0, -1.0, 1.0, -1.0, 1.0)
+        outside = p.get_indices_in_box(
+            -1.0, 2.0, -1.0, 1.0, -1.0, 1.0, inside=False
+        )
+        from_empty = empty.get_indices_in_box(
+            -1.0, 2.0, -1.0, 1.0, -1.0, 1.0
+        )
+
+        # Then
+        self.assertEqual(inside.length, 0)
+        self.assertEqual(outside.length, 0)
+        self.assertEqual(from_empty.length, 0)
+
     def test_add_particles(self):
         """
         Tests the add_particles function.
@@ -404,12 +589,12 @@ class ParticleArrayTest(unittest.TestCase):
 
         self.assertEqual(p.get_number_of_particles(), 3)
         self.assertEqual(
-            check_array(p.get('x', only_real_particles=False), [1, 2, 3.]),
+            check_array(p.get('x', only_real_particles=False), [3, 1, 2.]),
             True
         )
         self.assertEqual(
             check_array(
-                p.get('y', only_real_particles=False), [0., 1, 2]
+                p.get('y', only_real_particles=False), [2., 0, 1]
             ), True
         )
         self.assertEqual(
@@ -514,22 +699,68 @@ class ParticleArrayTest(unittest.TestCase):
         p.set_dirty(False)
         p.set(**{'tag': [0, 0, 1, 1, 1, 0, 4, 0, 1, 5]})
         self.assertEqual(check_array(p.get('x', only_real_particles=False),
-                                     [1, 2, 6, 8, 5, 3, 7, 4, 9, 10]),
+                                     [1, 2, 6, 8, 3, 4, 5, 7, 9, 10]),
                          True)
         self.assertEqual(check_array(p.get('y', only_real_particles=False),
-                                     [10, 9, 5, 3, 6, 8, 4, 7, 2, 1]), True)
+                                     [10, 9, 5, 3, 8, 7, 6, 4, 2, 1]), True)
 
         self.assertEqual(p.is_dirty, True)
 
         p.set_dirty(False)
         p.set(**{'tag': [0, 0, 0, 0, 1, 1, 1, 1, 1, 1]})
         self.assertEqual(check_array(p.get('x', only_real_particles=False),
-                                     [1, 2, 6, 8, 5, 3, 7, 4, 9, 10]),
+                                     [1, 2, 6, 8, 3, 4, 5, 7, 9, 10]),
                          True)
         self.assertEqual(check_array(p.get('y', only_real_particles=False),
-                                     [10, 9, 5, 3, 6, 8, 4, 7, 2, 1]), True)
+                                     [10, 9, 5, 3, 8, 7, 6, 4, 2, 1]), True)
         self.assertEqual(p.is_dirty, False)
 
+    def test_align_extract_and_copy_many_particles(self):
+        # Given
+        n = 10000
+        x = numpy.arange(n, dtype=float)
+        tag = numpy.where(x % 7 == 3, 1, 0)
+        p = particle_array.ParticleArray(
+            x=x, n={'data': numpy.arange(n), 'type': 'int'}
+        )
+        p.set_dirty(False)
+
+        # When
+        p.set(tag=tag)
+
+        # Then
+        local = x[tag == 0]
+        self.assertEqual(p.get_number_of_particles(real=True), len(local))
+        self.assertTrue(check_array(
+            p.get('x', only_real_particles=False),
+            numpy.concatenate((local, x[tag == 1]))
+        ))
+        self.assertTrue(check_array(p.n, local))
+        self.assertTrue(p.is_dirty)
+
+        # When
+        p.set_dirty(False)
+        p.align_particles()
+
+        # Then
+        self.assertFalse(p.is_dirty)
+
+        # When
+        indices = numpy.arange(len(local) - 1, 0, -3)
+        p1 = p.extract_particles(indices)
+        p2 = particle_array.ParticleArray(
+            x=numpy.zeros(n), n={'data': numpy.zeros(n), 'type': 'int'}
+        )
+        p2.copy_properties(p1, start_index=5, end_index=5 + len(indices))
+
+        # Then
+        expect = p.get('x', only_real_particles=False)[indices]
+        self.assertTrue(check_array(p1.get('x', only_real_particles=False),
+                                    expect))
+        self.assertTrue(check_array(p2.x[5:5 + len(indices)], expect))
+        self.assertTrue(check_array(p2.n[5:5 + len(indices)], expect))
+        self.assertTrue(numpy.all(p2.x[5 + len(indices):] == 0))
+
     def test_append_parray(self):
         """
         Tests the append_parray function.
@@ -699,6 +930,22 @@ class ParticleArrayTest(unittest.TestCase):
         self.assertEqual(n.x[0], 2.0)
         self.assertEqual(n.output_property_arrays, p.output_property_arrays)
 
+    def test_extract_no_particles_keeps_name_and_constants(self):
+        # Given
+        p = particle_array.ParticleArray(
+            name='f', x=[1, 2, 3], constants=dict(c0=[1.0, 2.0])
+        )
+        p.set_output_arrays(['x'])
+
+        # When.
+        n = p.extract_particles(indices=[])
+
+        # Then.
+        self.assertEqual(n.get_number_of_particles(), 0)
+        self.assertEqual(n.name, 'f')
+        self.assertTrue(check_array(n.c0, [1.0, 2.0]))
+        self.assertEqual(n.output_property_arrays, ['x'])
+
     def test_extract_particles_works_with_specific_props(self):
         # Given
         p = particle_array.ParticleArray(name='f', x=[1, 2, 3], y=[0, 0, 0])
@@ -727,6 +974,131 @@ class ParticleArrayTest(unittest.TestCase):
         # Then
         self.assertEqual(p.output_property_arrays, ['x', 'y'])
 
+    def test_pooled_layout_shares_one_arena(self):
+        # Given
+        p = particle_array.ParticleArray(
+            name='f', x=[1., 2., 3.], tag=[0, 1, 0],
+            gid=dict(data=[0, 1, 2], type='unsigned int')
+        )
+
+        # When
+        p.set_pooled(True)
+
+        # Then
+        self.assertTrue(p.is_pooled())
+        layout = p.get_pool_layout()
+        buf = p.get_arena_buffer()
+        self.assertEqual(layout['n'], 3)
+        self.assertEqual(len(buf), layout['nbytes'])
+        for name, info in layout['properties'].items():
+            self.assertEqual(info['offset'] % 64, 0)
+            data = buf[info['offset']:].view(info['dtype'])[:3]
+            self.assertTrue(numpy.all(
+                data == p.get(name, only_real_particles=False)
+            ))
+        self.assertTrue(check_array(p.x, [1., 3.]))
+        self.assertTrue(check_array(p.gid, [0, 2]))
+
+        # When
+        p.set_pooled(False)
+
+        # Then
+        self.assertFalse(p.is_pooled())
+        self.assertEqual(p.get_arena_buffer(), None)
+        self.assertTrue(check_array(p.x, [1., 3.]))
+
+    def test_pooled_array_grows_and_aligns_all_properties(self):
+        # Given
+        p = particle_array.ParticleArray(name='f', x=[0., 1.])
+        p.set_pooled(True)
+        capacity = p.pool_capacity
+
+        # When
+        n = 3*capacity
+        x = numpy.arange(2, n, dtype=float)
+        tag = numpy.where(x % 3 == 0, 1, 0)
+        p.add_particles(x=x, tag=tag)
+        p.add_property('y', data=-p.get('x', only_real_particles=False))
+
+        # Then
+        self.assertTrue(p.pool_capacity >= n)
+        self.assertEqual(len(p.get_pool_layout()['properties']), 5)
+        x = numpy.arange(n, dtype=float)
+        local = x[(x % 3 != 0) | (x < 2)]
+        self.assertEqual(p.get_number_of_particles(real=True), len(local))
+        self.assertEqual(sorted(p.x), sorted(local))
+        self.assertTrue(check_array(p.y, -p.x))
+        self.assertTrue(numpy.all(p.tag == 0))
+
+        # When
+        p.remove_particles(numpy.where(p.x < 10)[0])
+        p.remove_property('y')
+
+        # Then
+        self.assertEqual(sorted(p.x), sorted(local[local >= 10]))
+        self.assertFalse('y' in p.get_pool_layout()['properties'])
+
+    def test_reserve_and_squeeze(self):
+        for pooled in (False, True):
+            # Given
+            p = particle_array.ParticleArray(name='f', x=[1., 2.])
+            p.set_pooled(pooled)
+
+            # When
+            p.reserve(1000)
+
+            # Then
+            for prop in p.properties:
+                self.assertTrue(p.get_carray(prop).alloc >= 1000)
+                self.assertEqual(p.get_carray(prop).length, 2)
+
+            # When
+            p.add_particles(x=numpy.arange(3, 900))
+            p.remove_particles(numpy.arange(10, 899))
+            p.squeeze()
+
+            # Then
+            self.assertEqual(p.get_number_of_particles(), 10)
+            for prop in p.properties:
+                self.assertEqual(p.get_carray(prop).alloc, 16)
+            self.assertTrue(check_array(
+                sorted(p.x), [1., 2.] + list(range(3, 11))
+            ))
+
+    def test_memory_usage(self):
+        for pooled in (False, True):
+            # Given
+            p = particle_array.ParticleArray(
+                name='f', x=[1., 2.], tag=[0, 0], constants={'c': [1., 2.]}
+            )
+            p.set_pooled(pooled)
+
+            # When
+            p.reserve(100)
+            usage = p.memory_usage()
+
+            # Then
+            for prop in p.properties:
+                arr = p.get_carray(prop)
+                itemsize = arr.get_npy_array().itemsize
+                self.assertEqual(
+                    usage[prop], (arr.alloc*itemsize, 2*itemsize)
+                )
+            self.assertEqual(usage['constants'][1], 16)
+            self.assertEqual('arena' in usage, pooled)
+
+    def test_pickle_keeps_pooled_layout(self):
+        # Given
+        p = particle_array.ParticleArray(name='f', x=[1., 2.])
+        p.set_pooled(True)
+
+        # When
+        p1 = pickle.loads(pickle.dumps(p))
+
+        # Then
+        self.assertTrue(p1.is_pooled())
+        self.assertTrue(check_array(p1.x, p.x))
+
 
 class ParticleArrayUtils(unittest.TestCase):
     def test_that_get_particles_info_works(self):
@@ -757,6 +1129,56 @@ class ParticleArrayUtils(unittest.TestCase):
         self.assertTrue(numpy.allclose(numpy.ones(4), pa.rho))
         self.assertTrue(numpy.allclose(numpy.ravel(data), pa.data))
 
+    def test_storage_policy_sets_property_types(self):
+        # Given
+        old = utils.set_storage_policy(
+            {'a*': 'float', 'color*': 'int'}, vmag='float'
+        )
+        try:
+            # When
+            pa = utils.get_particle_array(
+                name='f', x=[1., 2.], au=[0.5, 1.5],
+                additional_props=['vmag', 'color_f', 'rho']
+            )
+
+            # Then
+            types = dict((k, v.get_c_type())
+                         for k, v in pa.properties.items())
+            self.assertEqual(types['au'], 'float')
+            self.assertEqual(types['av'], 'float')
+            self.assertEqual(types['vmag'], 'float')
+            self.assertEqual(types['color_f'], 'int')
+            self.assertEqual(types['rho'], 'double')
+            self.assertEqual(types['x'], 'double')
+            self.assertTrue(check_array(pa.au, [0.5, 1.5]))
+            self.assertEqual(utils.get_property_type('ax'), 'float')
+            self.assertEqual(
+                utils.get_property_type('ax', policy={'ax': 'double'}),
+                'double'
+            )
+        finally:
+            utils.set_storage_policy(old)
+        self.assertEqual(utils.get_storage_policy(), {})
+        self.assertRaises(ValueError, utils.set_storage_policy, x='float')
+        self.assertRaises(ValueError, utils.set_storage_policy, n='short')
+
+    def test_apply_storage_policy_converts_properties(self):
+        # Given
+        pa = utils.get_particle_array(name='f', x=[1., 2.], rho=[1.25, 2.])
+        pa.add_property('n', data=[1., 3.])
+        pa.set_output_arrays(['x', 'rho', 'n'])
+
+        # When
+        utils.apply_storage_policy(pa, {'rho': 'float', 'n': 'int'})
+
+        # Then
+        self.assertEqual(pa.properties['rho'].get_c_type(), 'float')
+        self.assertEqual(pa.properties['n'].get_c_type(), 'int')
+        self.assertEqual(pa.properties['m'].get_c_type(), 'double')
+        self.assertTrue(check_array(pa.rho, [1.25, 2.]))
+        self.assertTrue(check_array(pa.n, [1, 3]))
+        self.assertEqual(pa.output_property_arrays, ['x', 'rho', 'n'])
+
 
 if __name__ == '__main__':
     import logging
@@ -0,0 +1,120 @@
+import pickle
+import unittest
+
+import numpy as np
+
+from pysph.base.particle_buffer import (
+    SharedParticleArray, get_packed_size, pack_particle_array,
+    unpack_arrays, unpack_particle_array
+)
+from pysph.base.utils import get_particle_array
+
+
+def _get_particle_array():
+    pa = get_particle_array(
+        name='fluid', x=[1., 2., 3.], m=[1., 1., 2.], tag=[0, 1, 0],
+        constants={'c0': [1., 2.]}
+    )
+    pa.add_property('n', type='int', default=2)
+    pa.set_output_arrays(['x', 'm'])
+    pa.set_time(0.5)
+    return pa
+
+
+class TestParticleBuffer(unittest.TestCase):
+    def test_pack_and_unpack(self):
+        # Given
+        pa = _get_particle_array()
+
+        # When
+        buf = pack_particle_array(pa)
+        header, props, constants = unpack_arrays(buf)
+
+        # Then
+        self.assertEqual(len(buf), get_packed_size(pa))
+        self.assertEqual(header['name'], 'fluid')
+        self.assertEqual(header['n'], 3)
+        self.assertEqual(sorted(props.keys()), sorted(pa.properties.keys()))
+        for name, data in props.items():
+            np.testing.assert_array_equal(
+                data, pa.get(name, only_real_particles=False)
+            )
+            self.assertEqual(data.ctypes.data % 64, buf.ctypes.data % 64)
+        np.testing.assert_array_equal(constants['c0'], [1., 2.])
+
+        # When
+        pa1 = unpack_particle_array(buf)
+
+        # Then
+        self.assertEqual(pa1.name, 'fluid')
+        self.assertEqual(pa1.get_time(), 0.5)
+        self.assertEqual(pa1.get_carray('n').get_c_type(), 'int')
+        self.assertEqual(pa1.get_carray('gid').get_c_type(), 'unsigned int')
+        self.assertEqual(pa1.default_values['n'], 2)
+        self.assertEqual(sorted(pa1.output_property_arrays), ['m', 'x'])
+        np.testing.assert_array_equal(pa1.x, pa.x)
+        np.testing.assert_array_equal(pa1.c0, [1., 2.])
+
+    def test_pack_real_particles_and_some_props(self):
+        # Given
+        pa = _get_particle_array()
+
+        # When
+        buf = pack_particle_array(pa, props=['x', 'tag'], only_real=True)
+        header, props, constants = unpack_arrays(buf)
+
+        # Then
+        self.assertEqual(header['n'], 2)
+        self.assertEqual(sorted(props.keys()), ['tag', 'x'])
+        np.testing.assert_array_equal(props['x'], [1., 3.])
+
+    def test_shared_particle_array(self):
+        try:
+            from multiprocessing import shared_memory
+        except ImportError:
+            raise unittest.SkipTest('Requires Python 3.8 or above.')
+
+        # Given
+        pa = _get_particle_array()
+        shared = SharedParticleArray.publish(pa)
+
+        try:
+            # When
+            other = SharedParticleArray.attach(shared.name)
+            header, props, constants = other.get_arrays()
+            x = props['x'].copy()
+            del props, constants
+            pa1 = other.get_particle_array()
+            other.close()
+
+            # Then
+            np.testing.assert_array_equal(x, [1., 3., 2.])
+            np.testing.assert_array_equal(pa1.m, pa.m)
+        finally:
+            shared.unlink()
+
+
+class TestOutOfBandPickling(unittest.TestCase):
+    def setUp(self):
+        if pickle.HIGHEST_PROTOCOL < 5:
+            raise unittest.SkipTest('Requires pickle protocol 5.')
+
+    def test_particle_array_properties_are_not_copied(self):
+        # Given
+        pa = _get_particle_array()
+        buffers = []
+
+        # When
+        data = pickle.dumps(pa, protocol=5, buffer_callback=buffers.append)
+        pa1 = pickle.loads(data, buffers=buffers)
+
+        # Then
+        self.assertEqual(len(buffers), len(pa.properties) + 1)
+        self.assertTrue(len(data) < 2048)
+        np.testing.assert_array_equal(pa1.x, pa.x)
+        np.testing.assert_array_equal(pa1.n, pa.n)
+        np.testing.assert_array_equal(pa1.c0, pa.c0)
+
+
+if __name__ == '__main__':
+    unittest.main()
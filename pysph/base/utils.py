@@ -3,6 +3,8 @@ try:
 except ImportError:
     from ordereddict import OrderedDict
 
+from fnmatch import fnmatchcase
+
 import numpy
 from .particle_array import ParticleArray, \
     get_local_tag, get_remote_tag, get_ghost_tag
@@ -43,13 +45,137 @@ DEFAULT_PROPS = set(
      'au', 'av', 'aw', 'gid', 'pid', 'tag')
 )
 
+# The C types a property may be stored as and the numpy type of each.
+STORAGE_TYPES = {
+    'double': numpy.float64, 'float': numpy.float32, 'int': numpy.int32,
+    'unsigned int': numpy.uint32, 'long': numpy.int64
+}
+
+# Properties whose types are used directly by the NNPS and the parallel
+# manager and cannot be changed by a storage policy.
+FIXED_STORAGE_TYPES = {
+    'x': 'double', 'y': 'double', 'z': 'double', 'h': 'double',
+    'gid': 'unsigned int', 'pid': 'int', 'tag': 'int'
+}
+
+# The global storage policy, see `set_storage_policy`.
+_storage_policy = OrderedDict()
+
+
+def _check_storage_policy(policy):
+    for name, c_type in policy.items():
+        if c_type not in STORAGE_TYPES:
+            msg = 'Unknown type %r for %r, must be one of %s.' % (
+                c_type, name, sorted(STORAGE_TYPES.keys())
+            )
+            raise ValueError(msg)
+        if name in FIXED_STORAGE_TYPES and \
+           c_type != FIXED_STORAGE_TYPES[name]:
+            msg = 'The type of %r cannot be changed from %r.' % (
+                name, FIXED_STORAGE_TYPES[name]
+            )
+            raise ValueError(msg)
+
+
+def _find_storage_type(name, policy):
+    if name in policy:
+        return policy[name]
+    for pattern, c_type in policy.items():
+        if fnmatchcase(name, pattern):
+            return c_type
+    return None
+
+
+def set_storage_policy(policy=None, **types):
+    """Set the global storage policy and return the previous one.
+
+    The storage policy chooses the C type used to store each property of the
+    particle arrays created by `get_particle_array` and the scheme
+    `setup_properties` methods.  It maps property names, or shell style
+    patterns such as ``'color*'``, to one of the types in `STORAGE_TYPES`.
+    Exact names take precedence over patterns, which are tried in order.
+    Properties not matched are stored as doubles.
+
+    The types of the properties in `FIXED_STORAGE_TYPES` cannot be changed.
+
+    Parameters
+    ----------
+
+    policy : dict
+        The new policy, the policy is cleared if this is None.
+
+    types : str
+        Additional types keyed on the property name.
+
+    Examples
+    --------
+
+    >>> old = set_storage_policy({'a*': 'float'}, vmag='float', n='int')
+    >>> pa = get_particle_array(name='fluid', additional_props=['arho'])
+    >>> pa.properties['arho'].get_c_type()
+    'float'
+    >>> _ = set_storage_policy(old)
+
+    """
+    global _storage_policy
+    new = OrderedDict(policy or {})
+    new.update(types)
+    _check_storage_policy(new)
+    old = _storage_policy
+    _storage_policy = new
+    return old
+
+
+def get_storage_policy():
+    """Return a copy of the global storage policy."""
+    return OrderedDict(_storage_policy)
+
+
+def get_property_type(name, policy=None, default='double'):
+    """Return the C type used to store the named property.
+
+    The given `policy`, if any, is searched before the global storage policy
+    and `default` is returned if neither of them has the property.
+    """
+    if name in FIXED_STORAGE_TYPES:
+        return FIXED_STORAGE_TYPES[name]
+    for _policy in (policy or {}, _storage_policy):
+        c_type = _find_storage_type(name, _policy)
+        if c_type is not None:
+            return c_type
+    return default
+
+
+def apply_storage_policy(pa, policy=None):
+    """Convert the properties of a particle array to the types given by the
+    storage policy.
+
+    Properties which neither `policy` nor the global policy mention are left
+    as they are.  This should be called before the particle array is used on
+    a GPU.
+    """
+    if policy is not None:
+        _check_storage_policy(policy)
+    output_arrays = list(pa.output_property_arrays)
+    for name in list(pa.properties.keys()):
+        arr = pa.properties[name]
+        c_type = get_property_type(name, policy, default=None)
+        if c_type is None or c_type == arr.get_c_type():
+            continue
+        data = arr.get_npy_array().copy()
+        default = pa.default_values[name]
+        pa.remove_property(name)
+        pa.add_property(name, type=c_type, default=default, data=data)
+    pa.set_output_arrays(output_arrays)
+
 
 def get_particle_array(additional_props=None, constants=None, **props):
     """Create and return a particle array with default properties.
 
     The default properties are ['x', 'y', 'z', 'u', 'v', 'w', 'm', 'h', 'rho',
     'p', 'au', 'av', 'aw', 'gid', 'pid', 'tag'], this set is available in
-    `DEFAULT_PROPS`.
+    `DEFAULT_PROPS`.  Properties other than 'gid', 'pid' and 'tag' are stored
+    with the type given by the storage policy, see `set_storage_policy`.
 
 
     Parameters
@@ -113,7 +239,7 @@ def get_particle_array(additional_props=None, constants=None, **props):
                                'name': prop}
         else:
             prop_dict[prop] = {'data': data,
-                               'type': 'double',
+                               'type': get_property_type(prop),
                                'name': prop}
 
     # Add the default props
@@ -133,7 +259,8 @@ def get_particle_array(additional_props=None, constants=None, **props):
                                    'data': data, 'default': UINT_MAX}
 
             else:
-                prop_dict[prop] = {'name': prop, 'type': 'double',
+                prop_dict[prop] = {'name': prop,
+                                   'type': get_property_type(prop),
                                    'default': 0}
 
     # create the particle array
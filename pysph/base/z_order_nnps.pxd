@@ -29,6 +29,9 @@ cdef class ZOrderNNPS(NNPS):
 
     cdef uint64_t** keys
 
+    # number of particles each of the pids and keys have room for
+    cdef list num_allocated
+
     cdef key_to_idx_t** pid_indices
     cdef key_to_idx_t* current_indices
 
@@ -40,8 +40,10 @@ cdef class ZOrderNNPS(NNPS):
             num_particles = pa_wrapper.get_number_of_particles()
 
             self.pids[i] = <uint32_t*> malloc(num_particles*sizeof(uint32_t))
+            self.keys[i] = NULL
             self.pid_indices[i] = new key_to_idx_t()
 
+        self.num_allocated = [0]*self.narrays
         self.src_index = 0
         self.dst_index = 0
         self.sort_gids = sort_gids
@@ -89,6 +91,26 @@ cdef class ZOrderNNPS(NNPS):
         self.dst = <NNPSParticleArrayWrapper> self.pa_wrappers[dst_index]
         self.src = <NNPSParticleArrayWrapper> self.pa_wrappers[src_index]
 
+    def memory_usage(self):
+        """Return the memory used by the neighbor search, see
+        :py:meth:`NNPSBase.memory_usage`, with the sorted particle ids and
+        keys and the map from each key to its particles.  The size of the
+        nodes of the map is estimated.
+        """
+        cdef dict usage = NNPS.memory_usage(self)
+        cdef int i
+        cdef long n = sum(self.num_allocated)
+        cdef long n_keys = 0
+        cdef long node_size = sizeof(pair[uint64_t, pair[uint32_t, uint32_t]])
+        for i in range(self.narrays):
+            n_keys += self.pid_indices[i].size()
+        usage['pids'] = (n*sizeof(uint32_t), n*sizeof(uint32_t))
+        usage['keys'] = (n*sizeof(uint64_t), n*sizeof(uint64_t))
+        # Each node of the map also holds its color and three pointers.
+        node_size += 4*sizeof(void*)
+        usage['pid_indices'] = (n_keys*node_size, n_keys*node_size)
+        return usage
+
     cdef void find_nearest_neighbors(self, size_t d_idx, UIntArray nbrs) nogil:
         """Low level, high-performance non-gil method to find neighbors.
         This requires that `set_context()` be called beforehand.  This method
@@ -285,6 +307,7 @@ cdef class ZOrderNNPS(NNPS):
 
         for i from 0<=i<self.narrays:
             free(self.pids[i])
+            free(self.keys[i])
             del self.pid_indices[i]
 
             pa_wrapper = <NNPSParticleArrayWrapper> self.pa_wrappers[i]
@@ -293,6 +316,7 @@ cdef class ZOrderNNPS(NNPS):
             self.pids[i] = <uint32_t*> malloc(num_particles*sizeof(uint32_t))
             self.keys[i] = <uint64_t*> malloc(num_particles*sizeof(uint64_t))
             self.pid_indices[i] = new key_to_idx_t()
+            self.num_allocated[i] = num_particles
 
         self.current_pids = self.pids[self.src_index]
         self.current_indices = self.pid_indices[self.src_index]
@@ -0,0 +1,34 @@
+# Numpy
+cimport numpy as np
+
+from pyzoltan.core.carray cimport DoubleArray
+
+# Flat cell indexing structure for the parallel managers
+cdef class CellIndex:
+    ############################################################################
+    # Data Attributes
+    ############################################################################
+    cdef public int narrays              # number of arrays binned
+    cdef public double cell_size         # cell size used for binning
+
+    cdef public int ncells_local         # cells with local particles
+    cdef public int ncells_total         # local and remote only cells
+
+    cdef public np.ndarray cids          # (ncells, 3) cell indices
+    cdef public np.ndarray keys          # packed key of each cell
+    cdef public np.ndarray sizes         # number of particles in each cell
+
+    # for each array, the offsets of the cells (ncells + 1) into the
+    # particle indices which are sorted by the cell
+    cdef public list starts
+    cdef public list indices
+
+    # for each array, the key of each local particle when last indexed
+    cdef public list particle_keys
+
+    # keys sorted for lookups and the corresponding cells
+    cdef np.ndarray _lookup_keys
+    cdef np.ndarray _lookup_cells
+
+cpdef np.ndarray get_cell_keys(DoubleArray x, DoubleArray y, DoubleArray z,
+                               long start, long end, double cell_size)
@@ -0,0 +1,387 @@
+#cython: embedsignature=True
+"""Flat, array based indexing of particles into cells.
+
+The parallel managers bin the particles of all the arrays into cells which
+are the objects that are partitioned and used to find the remote particles.
+Instead of a dictionary of cell objects, the cells are stored as arrays of
+sorted cell keys and for each particle array, the offsets of each cell into
+the particle indices sorted by their cell.  The keys of the particles are
+computed in parallel when OpenMP is available and the rest of the
+construction uses numpy.
+"""
+
+# Numpy
+import numpy as np
+cimport numpy as np
+
+cimport cython
+from cython.parallel import prange
+
+from pysph.base.nnps_base cimport NNPSParticleArrayWrapper
+
+cdef extern from 'math.h':
+    double floor(double) nogil
+
+# The three cell indices are packed into KEY_BITS bits each of the keys.
+cdef int KEY_BITS = 21
+cdef long long KEY_OFFSET = 1 << (KEY_BITS - 1)
+cdef long long KEY_MASK = (1 << KEY_BITS) - 1
+
+
+cdef inline long long _pack(long long ix, long long iy, long long iz) nogil:
+    return (((ix + KEY_OFFSET) << (2*KEY_BITS)) |
+            ((iy + KEY_OFFSET) << KEY_BITS) | (iz + KEY_OFFSET))
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cpdef np.ndarray get_cell_keys(DoubleArray x, DoubleArray y, DoubleArray z,
+                               long start, long end, double cell_size):
+    """Return the keys of the cells of the particles in [start, end).
+
+    The cell of a particle is the same as that given by `find_cell_id`.
+    """
+    cdef long n = max(end - start, 0)
+    cdef np.ndarray result = np.empty(n, dtype=np.int64)
+    cdef np.int64_t[:] keys = result
+    cdef double* _x = x.data
+    cdef double* _y = y.data
+    cdef double* _z = z.data
+    cdef long i
+    cdef long long ix, iy, iz
+    cdef int bad = 0
+
+    with nogil:
+        for i in prange(n):
+            ix = <long long>floor(_x[start + i]/cell_size)
+            iy = <long long>floor(_y[start + i]/cell_size)
+            iz = <long long>floor(_z[start + i]/cell_size)
+            if (ix < -KEY_OFFSET or ix >= KEY_OFFSET or
+                iy < -KEY_OFFSET or iy >= KEY_OFFSET or
+                iz < -KEY_OFFSET or iz >= KEY_OFFSET):
+                bad += 1
+            keys[i] = _pack(ix, iy, iz)
+
+    if bad > 0:
+        msg = '%d particles are too far from the origin for a cell size %g' % (
+            bad, cell_size
+        )
+        raise RuntimeError(msg)
+    return result
+
+
+def pack_cell_ids(np.ndarray cids):
+    """Return the keys of the given (n, 3) cell indices, -1 for the cells
+    that cannot be represented.
+    """
+    cids = np.asarray(cids, dtype=np.int64).reshape(-1, 3)
+    valid = np.all((cids >= -KEY_OFFSET) & (cids < KEY_OFFSET), axis=1)
+    shifted = cids + KEY_OFFSET
+    keys = ((shifted[:, 0] << (2*KEY_BITS)) | (shifted[:, 1] << KEY_BITS) |
+            shifted[:, 2])
+    keys[~valid] = -1
+    return keys
+
+
+def unpack_cell_keys(np.ndarray keys):
+    """Return the (n, 3) cell indices of the given keys."""
+    keys = np.asarray(keys, dtype=np.int64)
+    cids = np.empty((len(keys), 3), dtype=np.int64)
+    cids[:, 0] = ((keys >> (2*KEY_BITS)) & KEY_MASK) - KEY_OFFSET
+    cids[:, 1] = ((keys >> KEY_BITS) & KEY_MASK) - KEY_OFFSET
+    cids[:, 2] = (keys & KEY_MASK) - KEY_OFFSET
+    return cids
+
+
+cdef class CellIndex:
+    """Particles of several arrays binned into cells.
+
+    The cells with local particles are numbered first followed by the cells
+    that only have remote particles, each sorted on their keys.  The
+    particles of array `i` in cell `c` are
+    ``indices[i][starts[i][c]:starts[i][c+1]]``.
+    """
+    def __init__(self, int narrays):
+        self.narrays = narrays
+        self.cell_size = 1.0
+        self.ncells_local = 0
+        self.ncells_total = 0
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.cids = np.zeros((0, 3), dtype=np.int64)
+        self.sizes = np.zeros(0, dtype=np.int64)
+        self.starts = [np.zeros(1, dtype=np.int64) for i in range(narrays)]
+        self.indices = [np.zeros(0, dtype=np.uint32) for i in range(narrays)]
+        self.particle_keys = [
+            np.zeros(0, dtype=np.int64) for i in range(narrays)
+        ]
+        self._lookup_keys = np.zeros(0, dtype=np.int64)
+        self._lookup_cells = np.zeros(0, dtype=np.int64)
+
+    #### Public protocol ################################################
+    def build(self, list pa_wrappers, double cell_size, list num_local,
+              list num_remote=None):
+        """Bin the particles of the arrays.
+
+        Parameters
+        ----------
+
+        pa_wrappers : list
+            NNPSParticleArrayWrapper for each array.
+
+        cell_size : double
+            Cell size used for binning.
+
+        num_local : list
+            Number of local particles of each array.
+
+        num_remote : list
+            Optional number of remote particles of each array which follow
+            the local particles.
+        """
+        cdef NNPSParticleArrayWrapper pa_wrapper
+        cdef int i
+        cdef long n_local, n_total, offset
+        cdef list keys = []
+
+        for i in range(self.narrays):
+            pa_wrapper = pa_wrappers[i]
+            n_local = num_local[i]
+            n_total = n_local
+            if num_remote is not None:
+                n_total += num_remote[i]
+            keys.append(get_cell_keys(
+                pa_wrapper.x, pa_wrapper.y, pa_wrapper.z, 0, n_total,
+                cell_size
+            ))
+
+        ukeys, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+        ncells = len(ukeys)
+
+        # flag the cells with local particles
+        is_local = np.zeros(ncells, dtype=bool)
+        offset = 0
+        for i in range(self.narrays):
+            is_local[inverse[offset:offset + num_local[i]]] = True
+            offset += len(keys[i])
+
+        # local cells first, each part sorted on the key
+        order = np.lexsort((ukeys, ~is_local))
+        cell_of_key = np.empty(ncells, dtype=np.int64)
+        cell_of_key[order] = np.arange(ncells)
+
+        self.cell_size = cell_size
+        self.ncells_local = int(is_local.sum())
+        self.ncells_total = ncells
+        self.keys = ukeys[order]
+        self.cids = unpack_cell_keys(self.keys)
+        self.sizes = np.zeros(ncells, dtype=np.int64)
+        self._lookup_keys = ukeys
+        self._lookup_cells = cell_of_key
+
+        self.starts = []
+        self.indices = []
+        self.particle_keys = []
+        offset = 0
+        for i in range(self.narrays):
+            self.particle_keys.append(keys[i][:num_local[i]])
+            cells = cell_of_key[inverse[offset:offset + len(keys[i])]]
+            offset += len(keys[i])
+            counts = np.bincount(cells, minlength=ncells)
+            self.indices.append(
+                np.argsort(cells, kind='mergesort').astype(np.uint32)
+            )
+            self.starts.append(np.concatenate(([0], np.cumsum(counts))))
+            self.sizes += counts
+
+    def memory_usage(self):
+        """Return a dictionary of the bytes allocated and used by the cells,
+        the particle indices sorted by cell and the keys of the particles.
+        """
+        cells = (self.cids, self.keys, self.sizes, self._lookup_keys,
+                 self._lookup_cells)
+        usage = dict(
+            cells=sum(a.nbytes for a in cells),
+            particle_indices=sum(
+                a.nbytes for a in self.starts + self.indices
+            ),
+            particle_keys=sum(a.nbytes for a in self.particle_keys)
+        )
+        return dict((k, (v, v)) for k, v in usage.items())
+
+    def patch(self, list pa_wrappers, double cell_size, list num_local):
+        """Re-index the local particles after they have moved without binning
+        all of them again.
+
+        The result is the same as that of ``build(pa_wrappers, cell_size,
+        num_local)`` but only the particles whose cell key differs from that
+        of the particle at the same index when last indexed are re-inserted
+        into the index.  Between load balancing steps these are the particles
+        that changed cell, those exchanged with the other processors and
+        those moved by the removal of the exported particles, so the cost
+        beyond computing the keys is proportional to the motion across the
+        cells.  Any remote particles and remote only cells are dropped.
+
+        The particles are binned again if the cell size has changed.
+        """
+        if cell_size != self.cell_size:
+            self.build(pa_wrappers, cell_size, num_local)
+            return
+
+        cdef NNPSParticleArrayWrapper pa_wrapper
+        cdef int i
+        cdef long n, n_old
+        cdef list new_keys = []
+        cdef list kept = []
+        cdef list added = []
+
+        for i in range(self.narrays):
+            pa_wrapper = pa_wrappers[i]
+            n = num_local[i]
+            keys = get_cell_keys(
+                pa_wrapper.x, pa_wrapper.y, pa_wrapper.z, 0, n, cell_size
+            )
+            old_keys = self.particle_keys[i]
+            n_old = len(old_keys)
+            m = min(n, n_old)
+
+            same = np.zeros(max(n, n_old), dtype=bool)
+            same[:m] = keys[:m] == old_keys[:m]
+
+            # the cell of each of the indexed particles
+            cells = np.repeat(
+                np.arange(self.ncells_total), np.diff(self.starts[i])
+            )
+            ids = self.indices[i]
+            # remote particles have ids beyond the old local particles
+            valid = ids < n_old
+            keep = np.zeros(len(ids), dtype=bool)
+            keep[valid] = same[ids[valid]]
+
+            changed = np.where(~same[:n])[0].astype(np.uint32)
+            new_keys.append(keys)
+            kept.append((ids[keep], cells[keep]))
+            added.append((changed, keys[changed]))
+
+        # the cells with kept particles and those of the added particles
+        old_cells = np.unique(np.concatenate([x[1] for x in kept]))
+        ukeys = np.union1d(
+            self.keys[old_cells], np.concatenate([x[1] for x in added])
+        )
+        ncells = len(ukeys)
+        cell_map = np.searchsorted(ukeys, self.keys)
+
+        self.starts = []
+        self.indices = []
+        self.sizes = np.zeros(ncells, dtype=np.int64)
+        for i in range(self.narrays):
+            kept_ids, kept_cells = kept[i]
+            kept_cells = cell_map[kept_cells]
+            add_ids, add_keys = added[i]
+            add_cells = np.searchsorted(ukeys, add_keys)
+
+            # merge keeping the particles of each cell sorted by their index
+            n = max(num_local[i], 1)
+            add_pos = add_cells*n + add_ids
+            order = np.argsort(add_pos, kind='mergesort')
+            pos = np.searchsorted(kept_cells*n + kept_ids, add_pos[order])
+            self.indices.append(
+                np.insert(kept_ids, pos, add_ids[order]).astype(np.uint32)
+            )
+            counts = np.bincount(kept_cells, minlength=ncells) + \
+                np.bincount(add_cells, minlength=ncells)
+            self.starts.append(np.concatenate(([0], np.cumsum(counts))))
+            self.sizes += counts
+
+        self.particle_keys = new_keys
+        self.ncells_local = ncells
+        self.ncells_total = ncells
+        self.keys = ukeys
+        self.cids = unpack_cell_keys(ukeys)
+        self._lookup_keys = ukeys
+        self._lookup_cells = np.arange(ncells, dtype=np.int64)
+
+    def get_changed_particles(self, int pa_index,
+                              NNPSParticleArrayWrapper pa_wrapper, long n,
+                              double cell_size):
+        """Return the indices of the first `n` particles of the array whose
+        cell key differs from that of the particle at the same index when
+        last indexed, all of them if the cell size has changed.
+
+        A particle moving within its cell is not reported, even if it
+        crosses a partition boundary.
+        """
+        cdef np.ndarray old_keys = self.particle_keys[pa_index]
+        cdef np.ndarray keys
+        cdef long m
+        if self.cell_size != cell_size:
+            return np.arange(n, dtype=np.uint32)
+        keys = get_cell_keys(
+            pa_wrapper.x, pa_wrapper.y, pa_wrapper.z, 0, n, cell_size
+        )
+        m = min(n, len(old_keys))
+        changed = np.ones(n, dtype=bool)
+        changed[:m] = keys[:m] != old_keys[:m]
+        return np.where(changed)[0].astype(np.uint32)
+
+    def find(self, cids):
+        """Return the index of the given (n, 3) cells, -1 if a cell does
+        not exist.
+        """
+        keys = pack_cell_ids(cids)
+        result = np.empty(len(keys), dtype=np.int64)
+        result[:] = -1
+        if self.ncells_total == 0:
+            return result
+        pos = np.searchsorted(self._lookup_keys, keys)
+        pos[pos == self.ncells_total] = 0
+        found = (self._lookup_keys[pos] == keys) & (keys >= 0)
+        result[found] = self._lookup_cells[pos[found]]
+        return result
+
+    def get_particles(self, int pa_index, long cell):
+        """Return the indices of the particles of the array in the cell."""
+        cdef np.ndarray starts = self.starts[pa_index]
+        return self.indices[pa_index][starts[cell]:starts[cell + 1]]
+
+    def get_counts(self):
+        """Return an (narrays, ncells) array of the number of particles of
+        each array in the cells.
+        """
+        result = np.zeros((self.narrays, self.ncells_total), dtype=np.int64)
+        for i in range(self.narrays):
+            result[i] = np.diff(self.starts[i])
+        return result
+
+    def get_centroids(self):
+        """Return the (ncells, 3) centroids of the cells."""
+        return (self.cids + 0.5)*self.cell_size
+
+    def get_neighbor_sizes(self, int layers=1):
+        """Return the number of particles in each cell and its neighbors
+        within `layers` cells.
+        """
+        result = np.zeros(self.ncells_total, dtype=np.int64)
+        r = range(-layers, layers + 1)
+        for ix in r:
+            for iy in r:
+                for iz in r:
+                    nbrs = self.find(self.cids + np.array([ix, iy, iz]))
+                    found = nbrs >= 0
+                    result[found] += self.sizes[nbrs[found]]
+        return result
+
+    def expand(self, int pa_index, cells, procs):
+        """Return the particle indices in the given cells of the array and
+        the processor of each particle given the processor of each cell.
+
+        The cells and processors may be repeated.
+        """
+        cells = np.asarray(cells, dtype=np.int64)
+        procs = np.asarray(procs, dtype=np.int32)
+        cdef np.ndarray starts = self.starts[pa_index]
+        lengths = starts[cells + 1] - starts[cells]
+        first = np.cumsum(lengths) - lengths
+        pos = np.repeat(starts[cells] - first, lengths) + \
+            np.arange(lengths.sum(), dtype=np.int64)
+        return (self.indices[pa_index][pos].astype(np.uint32),
+                np.repeat(procs, lengths))
@@ -14,6 +14,7 @@ from pyzoltan.czoltan.czoltan_types cimport ZOLTAN_ID_TYPE, ZOLTAN_ID_PTR, ZOLTA
 from pysph.base.nnps_base cimport NNPSParticleArrayWrapper
 from pysph.base.particle_array cimport ParticleArray
 from pysph.base.point cimport *
+from pysph.parallel.cell_index cimport CellIndex
 
 cdef class ParticleArrayExchange:
     ############################################################################
@@ -58,11 +59,30 @@ cdef class ParticleArrayExchange:
     cdef public IntArray importParticleProcs
     cdef public int numParticleImport
 
+    # communication plan and exported global ids of the last remote exchange
+    # used to refresh the remote particles
+    cdef public ZComm remote_zcomm
+    cdef public np.ndarray remote_export_gids
+
+    # point to point plan (rank -> indices) to send and receive the remote
+    # particles without Zoltan
+    cdef public dict remote_send_plan
+    cdef public dict remote_recv_plan
+
+    # packed record types keyed on the tuple of properties
+    cdef dict _pack_dtypes
+
+    # send and receive buffers of packed records reused by the exchanges
+    cdef dict _pack_buffers
+
     ############################################################################
     # Member functions
     ############################################################################
-    # exchange data given send and receive lists
-    cdef exchange_data(self, ZComm zcomm, dict sendbufs, int count)
+    # exchange packed data given send and receive lists
+    cdef exchange_data(self, ZComm zcomm, np.ndarray sendbuf, int count)
+
+    # reusable buffer for n packed records
+    cdef np.ndarray _get_buffer(self, str kind, int n, object dtype)
 
 # base class for all parallel managers
 cdef class ParallelManager:
@@ -83,9 +103,8 @@ cdef class ParallelManager:
     cdef public int ncells_local         # number of local cells
     cdef public int ncells_remote        # number of remote cells
     cdef public int ncells_total         # total number of cells
-    cdef public list cell_list           # list of cells
 
-    cdef public dict cell_map            # index structure
+    cdef public CellIndex cells          # index structure
     cdef public int ghost_layers         # BOunding box size
     cdef public double cell_size         # cell size used for binning
 
@@ -104,6 +123,40 @@ cdef class ParallelManager:
     cdef public bint initial_update
     cdef public bint update_cell_sizes
 
+    # halo-only refresh of the remote particles between full updates
+    cdef public bint halo_refresh        # flag to enable the halo refresh
+    cdef public double halo_skin         # allowed motion, <= 0 for default
+    cdef public dict halo_props          # remote properties to refresh
+    cdef public double halo_cell_size    # cell size at the last full update
+    cdef public int n_halo_refreshes     # number of halo refreshes
+    cdef public int n_full_updates       # number of full updates
+    cdef bint _halo_built
+    cdef list _halo_positions            # local positions at the last update
+
+    # overlap of the halo refresh with the evaluation of interior particles
+    cdef public bint halo_overlap        # flag to overlap the halo refresh
+    cdef public bint halo_pending        # a non-blocking refresh is pending
+    cdef public list interior_masks      # IntArray of interior particles
+    cdef list _halo_requests
+    cdef dict _halo_recvbufs
+    cdef list _halo_sendbufs
+    cdef list _halo_pending_props
+
+    # load balancing based on the measured cost
+    cdef public bint dynamic_lb          # flag to use the measured cost
+    cdef public double lb_threshold      # imbalance to trigger a balance
+    cdef public double imbalance         # max/mean work in the last step
+    cdef public double lb_lost_time      # time lost since the last balance
+    cdef public double lb_cost           # time taken by the last balance
+    cdef public double rank_work         # work on this rank since then
+    cdef public int n_rebalances         # number of load balancing steps
+    cdef public dict array_weights       # relative cost of each array
+    cdef double _work                    # compute time since the update
+    cdef double _halo_wait               # time waiting for the halo data
+
+    # neighboring processors of each cell key since the last load balance
+    cdef dict _cell_procs
+
     # number of arrays
     cdef int narrays
 
@@ -138,10 +191,6 @@ cdef class ParallelManager:
     ############################################################################
     # Member functions
     ############################################################################
-    # Index particles given by a list of indices. The indices are
-    # assumed to be of type unsigned int and local to the NNPS object
-    cdef _bin(self, int pa_index, UIntArray indices)
-
     # Compute the cell size across processors. The cell size is taken
     # as max(h)*radius_scale
     cpdef compute_cell_size(self)
@@ -1,13 +1,18 @@
 #cython: embedsignature=True
 
 # Numpy
+import itertools
+
 import numpy as np
 cimport numpy as np
 
 # MPI4PY
 import mpi4py.MPI as mpi
 
-from cpython.list cimport PyList_Append, PyList_GET_SIZE
+try:
+    from time import perf_counter as _timer
+except ImportError:
+    from time import time as _timer
 
 # PyZoltan
 from pyzoltan.czoltan cimport czoltan
@@ -15,7 +20,7 @@ from pyzoltan.czoltan.czoltan cimport Zoltan_Struct
 from pyzoltan.core import zoltan_utils
 
 # PySPH imports
-from pysph.base.nnps_base cimport DomainManager, Cell, find_cell_id, arange_uint
+from pysph.base.nnps_base cimport DomainManager, find_cell_id
 from pysph.base.utils import ParticleTAGS
 
 cdef int Local = ParticleTAGS.Local
@@ -30,6 +35,71 @@ cdef extern from 'limits.h':
     cdef int INT_MAX
     cdef unsigned int UINT_MAX
 
+# MPI tag for the point to point messages of the halo refresh
+cdef int HALO_TAG = 7919
+
+def group_by_proc(np.ndarray procs, np.ndarray indices, np.ndarray gids):
+    """Return a dictionary of processor -> indices, the indices of each
+    processor being sorted by their global ids.
+    """
+    cdef dict plan = {}
+    cdef np.ndarray order = np.lexsort((gids, procs))
+    procs = procs[order]
+    indices = indices[order]
+    uniq, starts = np.unique(procs, return_index=True)
+    ends = list(starts[1:]) + [len(procs)]
+    for proc, start, end in zip(uniq, starts, ends):
+        plan[int(proc)] = indices[start:end]
+    return plan
+
+def get_interior_mask(tuple local, tuple remote, double length, int dim):
+    """Return a boolean array that is True for the local points with no
+    remote point closer than `length`.
+
+    The points are given as tuples of the (x, y, z) coordinate arrays.  This
+    is conservative, points are binned in cells of size `length` and a
+    point is not interior if any of its neighboring cells have a remote
+    point.
+    """
+    cdef int n = len(local[0])
+    cdef int d
+    if n == 0 or len(remote[0]) == 0:
+        return np.ones(n, dtype=bool)
+    lcells = [np.floor(np.asarray(local[d])/length).astype(np.int64)
+              for d in range(dim)]
+    rcells = [np.floor(np.asarray(remote[d])/length).astype(np.int64)
+              for d in range(dim)]
+    lows = [min(lcells[d].min(), rcells[d].min()) - 1 for d in range(dim)]
+    sizes = [max(lcells[d].max(), rcells[d].max()) - lows[d] + 2
+             for d in range(dim)]
+
+    def _keys(cells, offset):
+        key = np.zeros(len(cells[0]), dtype=np.int64)
+        for d in range(dim):
+            key = key*sizes[d] + (cells[d] + offset[d] - lows[d])
+        return key
+
+    remote_keys = [_keys(rcells, offset)
+                   for offset in itertools.product((-1, 0, 1), repeat=dim)]
+    remote_keys = np.unique(np.concatenate(remote_keys))
+    return ~np.in1d(_keys(lcells, (0,)*dim), remote_keys)
+
+def get_arrays_memory_usage(arrays):
+    """Return the bytes allocated and used by the given carrays and numpy
+    arrays, None is ignored.
+    """
+    allocated = used = 0
+    for arr in arrays:
+        if arr is None:
+            continue
+        elif isinstance(arr, np.ndarray):
+            a = u = arr.nbytes
+        else:
+            a, u = arr.memory_usage()
+        allocated += a
+        used += u
+    return allocated, used
+
 ################################################################
 # ParticleArrayExchange
 ################################################################w
@@ -69,6 +139,14 @@ cdef class ParticleArrayExchange:
         self.importParticleProcs = IntArray()
         self.numParticleImport = 0
 
+        # plan of the last remote exchange
+        self.remote_zcomm = None
+        self.remote_export_gids = None
+        self.remote_send_plan = None
+        self.remote_recv_plan = None
+        self._pack_dtypes = {}
+        self._pack_buffers = {}
+
         # load balancing props are taken from the particle array
         lb_props = pa.get_lb_props()
         lb_props.sort()
@@ -111,12 +189,16 @@ cdef class ParticleArrayExchange:
         cdef ZComm zcomm = ZComm(comm, dtag, numExport, exportProcs.get_npy_array())
         numImport = zcomm.nreturn
 
-        # extract particles to be exported
-        cdef dict sendbufs = self.get_sendbufs( exportLocalids )
+        # pack the particles to be exported
+        cdef np.ndarray sendbuf = self.pack(exportLocalids.get_npy_array())
 
-        # remove particles to be exported
-        pa.remove_particles(exportLocalids)
-        pa.align_particles()
+        # remove particles to be exported, the remote particles have been
+        # removed so the array is aligned if all the particles are real and
+        # stays aligned after the removal
+        pa.remove_particles(
+            exportLocalids, aligned=pa.get_number_of_particles(real=True) ==
+            pa.get_number_of_particles()
+        )
 
         # old and new sizes
         cdef int current_size = self.num_local
@@ -127,7 +209,7 @@ cdef class ParticleArrayExchange:
         pa.resize( newsize )
 
         # exchange data
-        self.exchange_data(zcomm, sendbufs, count)
+        self.exchange_data(zcomm, sendbuf, count)
 
         # set all particle tags to local
         self.set_tag(count, newsize, Local)
@@ -173,12 +255,19 @@ cdef class ParticleArrayExchange:
         count = current_size
         newsize = current_size + numImport
 
-        # copy particles to be exported
-        cdef dict sendbufs = self.get_sendbufs( exportLocalids )
+        # pack the particles to be exported
+        cdef np.ndarray indices = exportLocalids.get_npy_array()
+        cdef np.ndarray sendbuf = self.pack(indices)
+
+        # save the plan to refresh the remote particles later
+        self.remote_zcomm = zcomm
+        self.remote_export_gids = self.pa_wrapper.gid.get_npy_array()[indices]
+        self.remote_send_plan = None
+        self.remote_recv_plan = None
 
         # update the size of the array
         pa.resize( newsize )
-        self.exchange_data(zcomm, sendbufs, count)
+        self.exchange_data(zcomm, sendbuf, count)
 
         # set tags for all received particles as Remote
         self.set_tag(count, newsize, Remote)
@@ -187,34 +276,140 @@ cdef class ParticleArrayExchange:
         # store the number of remote particles
         self.num_remote = newsize - current_size
 
-    cdef exchange_data(self, ZComm zcomm, dict sendbufs, int count):
-        cdef ParticleArray pa = self.pa
-        cdef str prop
-        cdef int prop_tag, nbytes, i, nprops = self.nprops
+    def has_valid_remote_plan(self):
+        """Return True if the plan of the last remote exchange can be used
+        to refresh the remote particles.
 
-        cdef np.ndarray prop_arr, sendbuf, recvbuf
+        This is not the case if local particles were added, removed or
+        reordered since the exchange.
+        """
+        cdef ParticleArray pa = self.pa
+        if self.remote_zcomm is None:
+            return False
+        if pa.get_number_of_particles(real=True) != self.num_local or \
+           pa.get_number_of_particles() != self.num_local + self.num_remote:
+            return False
+        cdef np.ndarray indices = self.exportParticleLocalids.get_npy_array()
+        cdef np.ndarray gid = self.pa_wrapper.gid.get_npy_array()
+        return np.array_equal(gid[indices], self.remote_export_gids)
+
+    def remote_refresh_data(self, list props):
+        """Refresh the given properties of the existing remote particles.
+
+        The communication plan of the last call to `remote_exchange_data`
+        is reused so the same particles are sent to the same processors and
+        only the values of `props` are communicated.
+        """
+        cdef ZComm zcomm = self.remote_zcomm
+        cdef np.ndarray indices = self.exportParticleLocalids.get_npy_array()
+        cdef np.ndarray sendbuf = self.pack(indices, props)
+        cdef np.ndarray recvbuf = self._get_buffer(
+            'recv', self.num_remote, sendbuf.dtype
+        )
 
-        cdef list props = self.lb_props
+        zcomm.set_nbytes( sendbuf.dtype.itemsize )
+        zcomm.set_tag( 0 )
+        zcomm.Comm_Do( sendbuf, recvbuf )
+        self.unpack(recvbuf, self.num_local)
 
-        for i in range(nprops):
-            prop = props[i]
+    def build_remote_plan(self):
+        """Build the point to point plan to refresh the remote particles.
 
-            prop_arr = pa.properties[prop].get_npy_array()
-            nbytes = prop_arr.dtype.itemsize
+        The ranks the remote particles were received from are obtained
+        using the plan of the last remote exchange.  The particles sent to
+        and received from each rank are then ordered by their global ids so
+        both sides agree on the order.  This is a collective operation.
+        """
+        cdef ZComm zcomm = self.remote_zcomm
+        cdef int start = self.num_local
+        cdef int end = self.num_local + self.num_remote
+        cdef np.ndarray indices = self.exportParticleLocalids.get_npy_array()
+        cdef np.ndarray procs = self.exportParticleProcs.get_npy_array()
+        cdef np.ndarray gid = self.pa_wrapper.gid.get_npy_array()
+
+        cdef np.ndarray sendbuf = np.ones(len(indices), dtype=np.int32)
+        cdef np.ndarray recvbuf = np.zeros(end - start, dtype=np.int32)
+        sendbuf *= self.rank
+        zcomm.set_nbytes( sendbuf.dtype.itemsize )
+        zcomm.set_tag( self.nprops )
+        zcomm.Comm_Do( sendbuf, recvbuf )
+
+        self.remote_send_plan = group_by_proc(
+            procs[:len(indices)], indices, gid[indices]
+        )
+        self.remote_recv_plan = group_by_proc(
+            recvbuf, np.arange(start, end), gid[start:end]
+        )
 
-            # the send and receive buffers
-            sendbuf = sendbufs[prop]
-            recvbuf = prop_arr[count:]
+    def get_pack_dtype(self, props=None):
+        """Return the record type used to pack the given properties (the
+        load balancing properties by default) of a particle.
 
-            # tag for this property
-            prop_tag = i
+        The fields are ordered by decreasing size so they are aligned
+        without any padding between them.  The types are built once for
+        each list of properties.
+        """
+        cdef ParticleArray pa = self.pa
+        key = tuple(props) if props is not None else tuple(self.lb_props)
+        dtype = self._pack_dtypes.get(key)
+        if dtype is None:
+            fields = [(prop, pa.properties[prop].get_npy_array().dtype)
+                      for prop in key]
+            fields.sort(key=lambda x: (-x[1].itemsize, x[0]))
+            dtype = np.dtype(fields, align=True)
+            self._pack_dtypes[key] = dtype
+        return dtype
+
+    cdef np.ndarray _get_buffer(self, str kind, int n, object dtype):
+        # The buffers only grow so the exchanges of a simulation do not
+        # allocate once the largest message has been seen.
+        key = (kind, dtype)
+        cdef np.ndarray buf = self._pack_buffers.get(key)
+        if buf is None or len(buf) < n:
+            buf = np.empty(n, dtype=dtype)
+            self._pack_buffers[key] = buf
+        return buf[:n]
+
+    def pack(self, np.ndarray indices, props=None):
+        """Pack the given properties (the load balancing properties by
+        default) of the particles at `indices` into a contiguous array of
+        records, see `get_pack_dtype`.
+
+        The returned array is a view of a send buffer which is reused by
+        the next call.
+        """
+        cdef ParticleArray pa = self.pa
+        cdef np.ndarray buf = self._get_buffer(
+            'send', len(indices), self.get_pack_dtype(props)
+        )
+        for prop in buf.dtype.names:
+            np.take(pa.properties[prop].get_npy_array(), indices,
+                    out=buf[prop])
+        return buf
+
+    def unpack(self, np.ndarray buf, int start):
+        """Scatter the packed records into the particles starting at
+        `start`, each property is copied once from its field of `buf`.
+        """
+        cdef ParticleArray pa = self.pa
+        cdef int end = start + len(buf)
+        for prop in buf.dtype.names:
+            pa.properties[prop].get_npy_array()[start:end] = buf[prop]
+
+    cdef exchange_data(self, ZComm zcomm, np.ndarray sendbuf, int count):
+        # All the properties of a particle are sent as one item so Zoltan
+        # sends a single message to each processor, they are received in a
+        # reused buffer and scattered to the particles.
+        cdef int numImport = zcomm.nreturn
+        cdef np.ndarray recvbuf = self._get_buffer(
+            'recv', numImport, sendbuf.dtype
+        )
 
-            # set the nbytes and tag for the zoltan communicator
-            zcomm.set_nbytes( nbytes )
-            zcomm.set_tag( prop_tag )
+        zcomm.set_nbytes( sendbuf.dtype.itemsize )
+        zcomm.set_tag( 0 )
+        zcomm.Comm_Do( sendbuf, recvbuf )
 
-            # exchange the data
-            zcomm.Comm_Do( sendbuf, recvbuf )
+        self.unpack(recvbuf, count)
 
     def remove_remote_particles(self):
         self.num_local = self.pa.get_number_of_particles(real=True)
@@ -284,6 +479,45 @@ cdef class ParticleArrayExchange:
         self.importParticleLocalids.reset()
         self.importParticleProcs.reset()
 
+    def memory_usage(self):
+        """Return a dictionary of the bytes allocated and used by the import
+        and export lists and by the plans of the remote exchange.
+        """
+        plans = []
+        for plan in (self.remote_send_plan, self.remote_recv_plan):
+            if plan is not None:
+                plans.extend(plan.values())
+        return dict(
+            exchange_lists=get_arrays_memory_usage((
+                self.exportParticleGlobalids, self.exportParticleLocalids,
+                self.exportParticleProcs, self.importParticleGlobalids,
+                self.importParticleLocalids, self.importParticleProcs
+            )),
+            remote_plan=get_arrays_memory_usage(
+                [self.remote_export_gids] + plans
+            ),
+            pack_buffers=get_arrays_memory_usage(
+                list(self._pack_buffers.values())
+            )
+        )
+
+    def set_export_lists(self, np.ndarray indices, np.ndarray procs):
+        """Set the particle export lists given the local indices of the
+        particles to export and the processor for each.
+        """
+        cdef int n = len(indices)
+        cdef np.ndarray gid = self.pa_wrapper.gid.get_npy_array()
+
+        self.reset_lists()
+        self.exportParticleLocalids.resize(n)
+        self.exportParticleGlobalids.resize(n)
+        self.exportParticleProcs.resize(n)
+        if n > 0:
+            self.exportParticleLocalids.get_npy_array()[:] = indices
+            self.exportParticleGlobalids.get_npy_array()[:] = gid[indices]
+            self.exportParticleProcs.get_npy_array()[:] = procs
+        self.numParticleExport = n
+
     def extend(self, int currentsize, int newsize):
         self.pa.resize( newsize )
 
@@ -382,10 +616,9 @@ cdef class ParallelManager:
         self.in_parallel = True
         if self.size == 1: self.in_parallel = False
 
-        # The cell_map dictionary, radius scale for binning and ghost
-        # layers for remote neighbors.
-        self.cell_map = {}
-        self.cell_list = []
+        # The flat cell index used for the partitioning and to find the
+        # remote particles.
+        self.cells = CellIndex(self.narrays)
 
         # number of loca/remote cells
         self.ncells_local = 0
@@ -414,6 +647,39 @@ cdef class ParallelManager:
         # array for global reduction of time steps
         self.dt_sendbuf = np.array( [1.0], dtype=np.float64 )
 
+        # halo refresh is disabled by default
+        self.halo_refresh = False
+        self.halo_skin = 0.0
+        self.halo_props = None
+        self.halo_cell_size = 0.0
+        self.n_halo_refreshes = 0
+        self.n_full_updates = 0
+        self._halo_built = False
+        self._halo_positions = []
+        self.halo_overlap = False
+        self.halo_pending = False
+        self.interior_masks = []
+        self._halo_requests = []
+        self._halo_recvbufs = {}
+        self._halo_sendbufs = []
+        self._halo_pending_props = []
+
+        # fixed frequency load balancing by default
+        self.dynamic_lb = False
+        self.lb_threshold = 1.1
+        self.imbalance = 1.0
+        self.lb_lost_time = 0.0
+        self.lb_cost = 0.0
+        self.rank_work = 0.0
+        self.n_rebalances = 0
+        self.array_weights = {}
+        self._work = 0.0
+        self._halo_wait = 0.0
+
+        # neighboring processors of the cells keyed on the cell key, valid
+        # until the partition changes
+        self._cell_procs = {}
+
     def update_time_steps(self, double local_dt):
         """Peform a reduction to compute the globally stable time steps"""
         cdef np.ndarray dt_sendbuf = self.dt_sendbuf
@@ -449,7 +715,7 @@ cdef class ParallelManager:
         self.cell_size = cell_size
 
     def update_cell_gids(self):
-        """Update global indices for the cell_map dictionary.
+        """Update global indices for the cells.
 
         The objects to be partitioned in this class are the cells and
         we need to number them uniquely across processors. The
@@ -460,7 +726,7 @@ cdef class ParallelManager:
         # update the cell gids
         cdef PyZoltan pz = self.pz
 
-        pz.num_local_objects = PyList_GET_SIZE( self.cell_list )
+        pz.num_local_objects = self.cells.ncells_total
         pz._update_gid( self.cell_gid )
 
     def update_particle_gids(self):
@@ -475,19 +741,474 @@ cdef class ParallelManager:
     def update(self):
         cdef int lb_freq = self.lb_freq
         cdef int lb_count = self.lb_count
+        cdef bint rebalance
+        cdef double t0
 
         lb_count += 1
 
+        if self.dynamic_lb:
+            rebalance = self.measure_imbalance() and lb_count >= lb_freq
+        else:
+            rebalance = lb_count == lb_freq
+
+        # complete any refresh that was not waited for, this is not part of
+        # the measured work
+        if self.halo_pending:
+            self.finish_remote_refresh()
+            self._halo_wait = 0.0
+
+        # only refresh the remote particles if they still cover the halo
+        if self.halo_refresh and not rebalance and self.halo_is_valid():
+            if self.halo_overlap:
+                self.start_halo_overlap()
+            else:
+                self.refresh_remote_particles()
+            self.lb_count = lb_count
+            return
+
         # remove remote particles from a previous step
         self.remove_remote_particles()
 
-        if ( lb_count == lb_freq ):
+        if rebalance:
+            t0 = _timer()
             self.update_partition()
             self.lb_count = 0
+            if self.dynamic_lb:
+                self._reset_lb_cost(_timer() - t0)
         else:
             self.migrate_partition()
             self.lb_count = lb_count
 
+        self.n_full_updates += 1
+        if self.halo_refresh:
+            self._save_halo_state()
+
+    def set_dynamic_lb(self, bint dynamic, double threshold=1.1):
+        """Enable or disable load balancing based on the measured cost.
+
+        When enabled, the compute time of each processor between calls to
+        `update`, reported by the integrator with `add_work`, is gathered and
+        the imbalance, i.e. the ratio of the maximum to the mean time, is
+        stored in `imbalance`.  The partition
+        is updated when the imbalance exceeds `threshold` and the time lost
+        to the imbalance since the last load balancing exceeds the time
+        the last load balancing took.  The load balancing frequency is then
+        the minimum number of updates between two load balancing steps.
+
+        The cells are weighted by an estimate of the neighbor work of their
+        particles (see `get_cell_work`) scaled so the weights of each
+        processor add up to its measured compute time.
+        """
+        self.dynamic_lb = dynamic
+        self.lb_threshold = threshold
+        self.lb_lost_time = 0.0
+        self.rank_work = 0.0
+
+    def set_array_weights(self, dict weights):
+        """Set the relative cost of the particles of each array keyed on
+        the array name, arrays not given have a weight of 1.
+        """
+        self.array_weights = dict(weights)
+
+    def add_work(self, double seconds):
+        """Add to the compute time of this processor since the last update.
+
+        Only the time spent computing must be added, not the time blocked in
+        collective operations, since the processors with less work wait
+        longer in these, which would hide the imbalance.  The time waiting
+        for the halo data while evaluating the interior particles is
+        subtracted.
+        """
+        self._work += seconds
+
+    def measure_imbalance(self):
+        """Gather the compute time since the last update of all the
+        processors and return True if a load balancing is worthwhile, see
+        `set_dynamic_lb` and `add_work`.
+
+        This is a collective operation.
+        """
+        cdef double work = max(self._work - self._halo_wait, 0.0)
+        cdef double tmax, tmean
+        self._work = 0.0
+        self._halo_wait = 0.0
+        self.rank_work += work
+
+        sendbuf = np.array([work], dtype=np.float64)
+        recvbuf = np.zeros(self.size, dtype=np.float64)
+        if self.in_parallel:
+            self.comm.Allgather(sendbuf=sendbuf, recvbuf=recvbuf)
+        else:
+            recvbuf[:] = sendbuf
+
+        tmax = recvbuf.max()
+        tmean = recvbuf.mean()
+        self.imbalance = tmax/tmean if tmean > 0.0 else 1.0
+        self.lb_lost_time += tmax - tmean
+        return (self.imbalance > self.lb_threshold and
+                self.lb_lost_time > self.lb_cost)
+
+    def _reset_lb_cost(self, double elapsed):
+        sendbuf = np.array([elapsed], dtype=np.float64)
+        recvbuf = np.zeros_like(sendbuf)
+        if self.in_parallel:
+            self.comm.Allreduce(sendbuf=sendbuf, recvbuf=recvbuf, op=mpi.MAX)
+        else:
+            recvbuf[:] = sendbuf
+        self.lb_cost = recvbuf[0]
+        self.lb_lost_time = 0.0
+        self.rank_work = 0.0
+        self.n_rebalances += 1
+
+    def get_cell_work(self):
+        """Return an estimate of the work for each of the local cells.
+
+        The work of a cell is the sum over the arrays of the array weight
+        times the number of its particles times the number of particles in
+        the cell and its neighboring cells, i.e. an estimate of the number
+        of neighbors it has to visit.
+        """
+        cdef CellIndex cells = self.cells
+        cdef np.ndarray weights = np.array([
+            self.array_weights.get(pa.name, 1.0) for pa in self.particles
+        ])
+        cdef np.ndarray work = np.dot(weights, cells.get_counts())
+        work *= cells.get_neighbor_sizes()
+        return work
+
+    def set_halo_refresh(self, bint refresh, double skin=0.0,
+                         bint overlap=False):
+        """Enable or disable the halo-only refresh of remote particles.
+
+        When enabled, `update` keeps the remote particles (and the
+        communication plan used to obtain them) of the last full update and
+        only sends the current values of the properties given by
+        `set_halo_props` as long as no particle has moved enough to leave
+        the halo.  A full update, i.e. migration and recomputation of the
+        remote particles, is performed when
+
+        2*max(displacement) + radius_scale*max(h) > cell_size + skin
+
+        where the cell size and displacements are those since the last full
+        update, when local particles are added, removed or reordered, and
+        at every load balancing step.  The default `skin` (<= 0) is
+        (ghost_layers - 1)*cell_size which is the width of the additional
+        layers of remote particles.
+
+        If `overlap` is True, only the positions and smoothing lengths are
+        refreshed in `update`, the other properties are sent with
+        non-blocking messages which are completed by
+        `finish_remote_refresh`, see `start_halo_overlap`.
+        """
+        self.halo_refresh = refresh
+        self.halo_skin = skin
+        self.halo_overlap = refresh and overlap
+        self._halo_built = False
+
+    def set_halo_props(self, dict props):
+        """Set the properties to refresh for the remote particles of each
+        array, keyed on the array name.  The positions and smoothing lengths
+        are always refreshed.  Arrays not present use all the load balancing
+        properties.
+        """
+        self.halo_props = dict(props) if props is not None else None
+
+    def update_lb_props(self):
+        """Update the properties exchanged for each array from those of the
+        particle array, call this after `ParticleArray.set_lb_props` or
+        after properties are removed.
+        """
+        cdef ParticleArrayExchange pa_exchange
+        for pa_exchange in self.pa_exchanges:
+            lb_props = sorted(pa_exchange.pa.get_lb_props())
+            pa_exchange.lb_props = lb_props
+            pa_exchange.nprops = len(lb_props)
+
+    def memory_usage(self):
+        """Return the memory used by the parallel manager.
+
+        Returns a dictionary of the tuple of the bytes allocated and used by
+        the cell map, the cell ids, coordinates and export lists, the
+        particle export lists and plans of all the arrays and the data kept
+        for the halo refresh.
+        """
+        cdef ParticleArrayExchange pa_exchange
+        usage = {}
+        if self.cells is not None:
+            for name, (a, u) in self.cells.memory_usage().items():
+                usage['cell_map_' + name] = (a, u)
+        usage['cell_lists'] = get_arrays_memory_usage((
+            self.cell_gid, self.cx, self.cy, self.cz,
+            self.exportCellGlobalids, self.exportCellLocalids,
+            self.exportCellProcs, self.importCellGlobalids,
+            self.importCellLocalids, self.importCellProcs
+        ))
+        for pa_exchange in self.pa_exchanges:
+            for name, (a, u) in pa_exchange.memory_usage().items():
+                allocated, used = usage.get('particle_' + name, (0, 0))
+                usage['particle_' + name] = (allocated + a, used + u)
+        halo = [x for pos in self._halo_positions for x in pos]
+        halo.extend(self.interior_masks)
+        halo.extend(self._halo_recvbufs.values())
+        halo.extend(self._halo_sendbufs)
+        usage['halo'] = get_arrays_memory_usage(halo)
+        return usage
+
+    def get_halo_props(self, int pa_index):
+        """Return the sorted list of properties refreshed for the remote
+        particles of the given array.
+        """
+        cdef ParticleArrayExchange pa_exchange = self.pa_exchanges[pa_index]
+        cdef ParticleArray pa = pa_exchange.pa
+        if self.halo_props is None or pa.name not in self.halo_props:
+            return list(pa_exchange.lb_props)
+        props = set(self.halo_props[pa.name])
+        props.update(('x', 'y', 'z', 'h'))
+        return sorted(p for p in props if p in pa.properties)
+
+    def halo_is_valid(self):
+        """Return True on all processors if the remote particles of the last
+        full update can be refreshed, see `set_halo_refresh`.
+
+        This is a collective operation.
+        """
+        cdef int i, n
+        cdef double dmax = 0.0, hmax = 0.0, skin
+        cdef double invalid = 0.0
+        cdef ParticleArrayExchange pa_exchange
+        cdef NNPSParticleArrayWrapper pa_wrapper
+
+        if not self._halo_built:
+            invalid = 1.0
+        else:
+            for i in range(self.narrays):
+                pa_exchange = self.pa_exchanges[i]
+                if not pa_exchange.has_valid_remote_plan():
+                    invalid = 1.0
+                    break
+                pa_wrapper = self.pa_wrappers[i]
+                n = pa_exchange.num_local
+                if n == 0:
+                    continue
+                x0, y0, z0 = self._halo_positions[i]
+                dx = pa_wrapper.x.get_npy_array()[:n] - x0
+                dy = pa_wrapper.y.get_npy_array()[:n] - y0
+                dz = pa_wrapper.z.get_npy_array()[:n] - z0
+                dmax = max(dmax, np.sqrt(np.max(dx*dx + dy*dy + dz*dz)))
+                hmax = max(hmax, np.max(pa_wrapper.h.get_npy_array()[:n]))
+
+        sendbuf = np.array(
+            [invalid, 2.0*dmax + self.radius_scale*hmax], dtype=np.float64
+        )
+        recvbuf = np.zeros_like(sendbuf)
+        if self.in_parallel:
+            self.comm.Allreduce(sendbuf=sendbuf, recvbuf=recvbuf, op=mpi.MAX)
+        else:
+            recvbuf[:] = sendbuf
+
+        return recvbuf[0] == 0.0 and recvbuf[1] <= self._get_halo_length()
+
+    def _get_halo_length(self):
+        # distance the particles may approach each other before a full
+        # update is needed
+        cdef double skin = self.halo_skin
+        if skin <= 0.0:
+            skin = (self.ghost_layers - 1)*self.halo_cell_size
+        return self.halo_cell_size + skin
+
+    def refresh_remote_particles(self):
+        """Refresh the properties of the remote particles using the
+        communication plan of the last full update.
+        """
+        cdef int i
+        cdef ParticleArrayExchange pa_exchange
+        for i in range(self.narrays):
+            pa_exchange = self.pa_exchanges[i]
+            pa_exchange.remote_refresh_data(self.get_halo_props(i))
+        self.n_halo_refreshes += 1
+
+    def _save_halo_state(self):
+        cdef int i, n
+        cdef NNPSParticleArrayWrapper pa_wrapper
+        self._halo_positions = []
+        for i in range(self.narrays):
+            pa_wrapper = self.pa_wrappers[i]
+            n = self.pa_exchanges[i].num_local
+            self._halo_positions.append(
+                (pa_wrapper.x.get_npy_array()[:n].copy(),
+                 pa_wrapper.y.get_npy_array()[:n].copy(),
+                 pa_wrapper.z.get_npy_array()[:n].copy())
+            )
+        self.halo_cell_size = self.cell_size
+        self._halo_built = True
+
+        if self.halo_overlap:
+            for i in range(self.narrays):
+                self.pa_exchanges[i].build_remote_plan()
+            self._compute_interior_masks()
+
+    def start_halo_overlap(self):
+        """Refresh the positions and smoothing lengths of the remote
+        particles and start a non-blocking refresh of their other properties.
+
+        The interior particles (see `get_interior_masks`) do not have any
+        remote neighbors and may be evaluated before the refresh is
+        completed with `finish_remote_refresh`.
+        """
+        cdef int i
+        cdef list positions = []
+        cdef list others = []
+        cdef tuple xyzh = ('x', 'y', 'z', 'h')
+        for i in range(self.narrays):
+            props = self.get_halo_props(i)
+            positions.append([p for p in props if p in xyzh])
+            others.append([p for p in props if p not in xyzh])
+        self.start_remote_refresh(positions)
+        self.finish_remote_refresh()
+        self.start_remote_refresh(others)
+        self.n_halo_refreshes += 1
+
+    def start_remote_refresh(self, list props):
+        """Post the non-blocking sends and receives to refresh the given
+        properties (a list of the properties of each array) of the remote
+        particles.
+
+        The properties of all arrays sent to a rank are packed into a single
+        message.  This requires the point to point plans built at the last
+        full update when the halo overlap is enabled.
+        """
+        cdef int i, nbytes
+        cdef object comm = self.comm
+        cdef ParticleArrayExchange pa_exchange
+        cdef ParticleArray pa
+        cdef list requests = []
+        cdef list sendbufs = []
+        cdef dict recvbufs = {}
+        cdef dict recv_sizes = {}
+        cdef dict send_parts = {}
+        cdef np.ndarray prop_arr
+
+        # the properties in the same (deterministic) order on all ranks
+        props = [sorted(p, key=lambda x, pa=self.particles[i]:
+                        (-pa.properties[x].get_npy_array().itemsize, x))
+                 for i, p in enumerate(props)]
+
+        for i in range(self.narrays):
+            pa_exchange = self.pa_exchanges[i]
+            pa = pa_exchange.pa
+            nbytes = sum(pa.properties[prop].get_npy_array().itemsize
+                         for prop in props[i])
+            for proc, slots in pa_exchange.remote_recv_plan.items():
+                recv_sizes[proc] = recv_sizes.get(proc, 0) + \
+                    len(slots)*nbytes
+            for proc, indices in pa_exchange.remote_send_plan.items():
+                parts = send_parts.setdefault(proc, [])
+                for prop in props[i]:
+                    prop_arr = pa.properties[prop].get_npy_array()
+                    parts.append(prop_arr[indices].view(np.uint8))
+
+        for proc, size in recv_sizes.items():
+            recvbufs[proc] = recvbuf = np.empty(size, dtype=np.uint8)
+            requests.append(
+                comm.Irecv([recvbuf, mpi.BYTE], source=proc, tag=HALO_TAG)
+            )
+        for proc, parts in send_parts.items():
+            sendbuf = np.concatenate(parts) if parts else \
+                np.empty(0, dtype=np.uint8)
+            sendbufs.append(sendbuf)
+            requests.append(
+                comm.Isend([sendbuf, mpi.BYTE], dest=proc, tag=HALO_TAG)
+            )
+
+        self._halo_requests = requests
+        self._halo_recvbufs = recvbufs
+        self._halo_sendbufs = sendbufs
+        self._halo_pending_props = props
+        self.halo_pending = True
+
+    def finish_remote_refresh(self):
+        """Wait for the refresh started by `start_remote_refresh` and copy
+        the received data into the remote particles.
+        """
+        cdef int i, offset, nbytes
+        cdef ParticleArrayExchange pa_exchange
+        cdef ParticleArray pa
+        cdef np.ndarray recvbuf, prop_arr, slots
+        cdef double t0
+        if not self.halo_pending:
+            return
+        t0 = _timer()
+        mpi.Request.Waitall(self._halo_requests)
+        self._halo_wait += _timer() - t0
+
+        props = self._halo_pending_props
+        for proc, recvbuf in self._halo_recvbufs.items():
+            offset = 0
+            for i in range(self.narrays):
+                pa_exchange = self.pa_exchanges[i]
+                pa = pa_exchange.pa
+                slots = pa_exchange.remote_recv_plan.get(proc)
+                if slots is None:
+                    continue
+                for prop in props[i]:
+                    prop_arr = pa.properties[prop].get_npy_array()
+                    nbytes = len(slots)*prop_arr.itemsize
+                    prop_arr[slots] = recvbuf[offset:offset + nbytes].view(
+                        prop_arr.dtype
+                    )
+                    offset += nbytes
+
+        self._halo_requests = []
+        self._halo_recvbufs = {}
+        self._halo_sendbufs = []
+        self._halo_pending_props = []
+        self.halo_pending = False
+
+    def get_interior_masks(self):
+        """Return a dictionary of the interior masks keyed on the array
+        name.  The mask is non-zero for the local particles that have no
+        remote neighbors as long as the halo is valid.
+        """
+        return dict(
+            (self.particles[i].name, self.interior_masks[i])
+            for i in range(len(self.interior_masks))
+        )
+
+    def _compute_interior_masks(self):
+        # A particle with no remote particle within the halo length at the
+        # last full update does not have a remote neighbor as long as the
+        # halo is valid, see `halo_is_valid`.
+        cdef int i, n_local, n_total
+        cdef ParticleArrayExchange pa_exchange
+        cdef NNPSParticleArrayWrapper pa_wrapper
+        cdef IntArray mask
+        cdef list remote = [[], [], []]
+        cdef list local = []
+        for i in range(self.narrays):
+            pa_exchange = self.pa_exchanges[i]
+            pa_wrapper = self.pa_wrappers[i]
+            n_local = pa_exchange.num_local
+            n_total = n_local + pa_exchange.num_remote
+            pos = (pa_wrapper.x.get_npy_array(), pa_wrapper.y.get_npy_array(),
+                   pa_wrapper.z.get_npy_array())
+            local.append(tuple(p[:n_local] for p in pos))
+            for j in range(3):
+                remote[j].append(pos[j][n_local:n_total])
+        remote = [np.concatenate(r) for r in remote]
+
+        self.interior_masks = []
+        for i in range(self.narrays):
+            n_local = self.pa_exchanges[i].num_local
+            n_total = n_local + self.pa_exchanges[i].num_remote
+            mask = IntArray(n_total)
+            mask_arr = mask.get_npy_array()
+            mask_arr[:] = 0
+            # the unused coordinates are zero so binning in 3D is fine
+            mask_arr[:n_local] = get_interior_mask(
+                local[i], tuple(remote), self._get_halo_length(), 3
+            )
+            self.interior_masks.append(mask)
+
     def update_partition(self):
         """Update the partition.
 
@@ -538,6 +1259,7 @@ cdef class ParallelManager:
         """
         # update particle gids, bin particles and update cell gids
         #self.update_particle_gids()
+        self._cell_procs = {}
         self.local_bin()
         self.update_cell_gids()
 
@@ -571,11 +1293,20 @@ cdef class ParallelManager:
                 pa.set_pid( self.rank )
 
     def migrate_partition(self):
+        """Move the particles that left the local partition between load
+        balancing steps.
+
+        The partition is kept fixed, only the particles that changed cell
+        are checked, exported and the cell index is patched rather than
+        rebuilt.  The remote particles are then found again using the
+        neighboring processors of each cell cached since the last load
+        balancing.
+        """
         # migrate particles
         self.migrate_particles()
 
-        # update local data
-        self.update_local_data()
+        # patch the cell index for the local particles that moved
+        self.patch_local_data()
 
         # compute remote particles and exchange data
         self.compute_remote_particles()
@@ -602,23 +1333,13 @@ cdef class ParallelManager:
             self.num_remote[i] = pa_exchange.num_remote
 
     def local_bin(self):
-        """Create the local cell map.
+        """Create the local cell index.
 
-        Bin the particles by deleting any previous cells and
-        re-computing the indexing structure. This corresponds to a
-        local binning process that is called when each processor has
-        a given list of particles to deal with.
+        Bin the particles by re-computing the indexing structure. This
+        corresponds to a local binning process that is called when each
+        processor has a given list of particles to deal with.
 
         """
-        cdef dict cell_map = self.cell_map
-        cdef int num_particles
-        cdef UIntArray indices
-
-        # clear the indices for the cell_map.
-        self.cell_map.clear()
-        self.cell_list = []
-        self.ncells_total = 0
-
         # compute the cell size
         if self.initial_update or self.update_cell_sizes:
             self.compute_cell_size()
@@ -634,91 +1355,15 @@ cdef class ParallelManager:
         #     # create new ghosts
         #     self._create_ghosts()
 
-        # bin each particle array separately
-        for i in range(self.narrays):
-            num_particles = self.num_local[i]
-
-            # bin the particles
-            indices = arange_uint(num_particles)
-            self._bin( i, indices )
+        # bin all the arrays
+        self.cells.build(self.pa_wrappers, self.cell_size, self.num_local)
 
         # local number of cells at this point are the total number of cells
+        self.ncells_total = self.cells.ncells_total
         self.ncells_local = self.ncells_total
 
-    cdef _bin(self, int pa_index, UIntArray indices):
-        """Bin a given particle array with indices.
-
-        Parameters
-        ----------
-
-        pa_index : int
-            Index of the particle array corresponding to the particles list
-
-        indices : UIntArray
-            Subset of particles to bin
-
-        """
-        cdef NNPSParticleArrayWrapper pa_wrapper = self.pa_wrappers[ pa_index ]
-        cdef DoubleArray x = pa_wrapper.x
-        cdef DoubleArray y = pa_wrapper.y
-        cdef DoubleArray z = pa_wrapper.z
-        cdef UIntArray gid = pa_wrapper.gid
-
-        cdef dict cell_map = self.cell_map
-        cdef list cell_list = self.cell_list
-        cdef double cell_size = self.cell_size
-
-        cdef UIntArray lindices, gindices
-        cdef size_t num_particles, indexi
-        cdef ZOLTAN_ID_TYPE i
-
-        cdef Cell cell
-        cdef cIntPoint _cid
-        cdef IntPoint cid = IntPoint()
-        cdef cPoint pnt
-
-        cdef int ncells_total = 0
-        cdef int narrays = self.narrays
-        cdef int layers = self.ghost_layers
-
-        # now bin the particles
-        num_particles = indices.length
-        for indexi in range(num_particles):
-            i = indices.data[indexi]
-
-            pnt = cPoint_new( x.data[i], y.data[i], z.data[i] )
-            _cid = find_cell_id( pnt, cell_size )
-
-            cid = IntPoint_from_cIntPoint(_cid)
-
-            if not cell_map.has_key( cid ):
-                cell = Cell(cid=cid, cell_size=cell_size,
-                            narrays=self.narrays, layers=layers)
-
-                # store this cell in the cells list and cell map
-                PyList_Append( cell_list, cell )
-                cell_map[ cid ] = cell
-
-                ncells_total = ncells_total + 1
-
-            # add this particle to the list of indicies
-            cell = cell_map[ cid ]
-
-            lindices = cell.lindices[pa_index]
-            gindices = cell.gindices[pa_index]
-
-            lindices.append( i )
-            gindices.append( gid.data[i] )
-
-            # increment the size of the cells to reflect the added
-            # particle. The size will be used to set the weights.
-            cell.size += 1
-
-        # update the total number of cells
-        self.ncells_total = self.ncells_total + ncells_total
-
     def update_local_data(self):
-        """Update the cell map after load balance.
+        """Update the cell index after load balance.
 
         After the load balancing step, each processor has a new set of
         local particles which need to be indexed. This new cell
@@ -726,75 +1371,89 @@ cdef class ParallelManager:
 
         """
         cdef ParticleArrayExchange pa_exchange
-        cdef int num_particles, i
-        cdef UIntArray indices
-
-        # clear the local cell_map dict
-        self.cell_map.clear()
-        self.cell_list = []
-        self.ncells_total = 0
+        cdef int i
 
         for i in range(self.narrays):
             pa_exchange = self.pa_exchanges[i]
-            num_particles = pa_exchange.num_local
 
             # set the number of local and global particles
             self.num_local[i] = pa_exchange.num_local
             self.num_global[i] = pa_exchange.num_global
 
-            # bin the particles
-            indices = arange_uint( num_particles )
-            self._bin(i, indices)
+        self.cells.build(self.pa_wrappers, self.cell_size, self.num_local)
+        self.ncells_total = self.cells.ncells_total
+        self.ncells_local = self.ncells_total
 
+    def patch_local_data(self):
+        """Update the cell index after the particles migrated between load
+        balancing steps.
+
+        Only the local particles that changed cell, were exchanged or were
+        moved by the removal of the exported particles are indexed again,
+        see :py:meth:`CellIndex.patch`.
+        """
+        cdef ParticleArrayExchange pa_exchange
+        cdef int i
+
+        for i in range(self.narrays):
+            pa_exchange = self.pa_exchanges[i]
+            self.num_local[i] = pa_exchange.num_local
+            self.num_global[i] = pa_exchange.num_global
+
+        self.cells.patch(self.pa_wrappers, self.cell_size, self.num_local)
+        self.ncells_total = self.cells.ncells_total
         self.ncells_local = self.ncells_total
 
+    def get_moved_particles(self, int pa_index):
+        """Return the indices of the local particles of the array whose cell
+        has changed since they were last indexed.
+        """
+        return self.cells.get_changed_particles(
+            pa_index, self.pa_wrappers[pa_index], self.num_local[pa_index],
+            self.cell_size
+        )
+
     def update_remote_data(self):
         """Update the cell structure after sharing remote particles.
 
         After exchanging remote particles, we need to index the new
-        remote particles for a possible neighbor query.
+        remote particles for a possible neighbor query. The local cells
+        keep their numbering and the cells with only remote particles are
+        numbered after them.
 
         """
         cdef int narrays = self.narrays
-        cdef int num_local, num_remote, i
+        cdef int i
         cdef ParticleArrayExchange pa_exchange
-        cdef UIntArray indices
 
         for i in range(narrays):
             pa_exchange = self.pa_exchanges[i]
 
-            # get the number of local and remote particles
-            num_local = pa_exchange.num_local
-            num_remote = pa_exchange.num_remote
-
             # update the number of local/remote particles
-            self.num_local[i] = num_local
-            self.num_remote[i] = num_remote
+            self.num_local[i] = pa_exchange.num_local
+            self.num_remote[i] = pa_exchange.num_remote
 
-            indices = arange_uint( num_local, num_local + num_remote )
-            self._bin( i, indices )
+        self.cells.build(
+            self.pa_wrappers, self.cell_size, self.num_local, self.num_remote
+        )
+        self.ncells_local = self.cells.ncells_local
+        self.ncells_total = self.cells.ncells_total
 
         # compute the number of remote cells added
         self.ncells_remote = self.ncells_total - self.ncells_local
 
     def save_partition(self, fname, count=0):
         """Collect cell data from processors and save"""
-        # get the global number of cells
-        cdef cPoint centroid
         cdef int ncells_total = self.ncells_total
         cdef int ncells_local = self.ncells_local
 
         # cell centroid arrays
-        cdef double[:] x = np.zeros( shape=ncells_total, dtype=np.float64 )
-        cdef double[:] y = np.zeros( shape=ncells_total, dtype=np.float64 )
-        cdef int[:] lid = np.zeros( shape=ncells_total, dtype=np.int32 )
-
-        for i in range( ncells_total ):
-            cell = self.cell_list[i]; centroid = cell.centroid
-            x[i] = centroid.x; y[i] = centroid.y
-            lid[i] = i
+        centroids = self.cells.get_centroids()
+        x = centroids[:, 0].copy()
+        y = centroids[:, 1].copy()
+        lid = np.arange(ncells_total, dtype=np.int32)
 
-        cdef int[:] tag = np.zeros(shape=(ncells_total,), dtype=np.int32)
+        tag = np.zeros(shape=(ncells_total,), dtype=np.int32)
         tag[ncells_local:] = 1
 
         cdef double cell_size = self.cell_size
@@ -927,8 +1586,9 @@ cdef class ParallelManager:
             Neighbors for the requested particle are stored here.
 
         """
-        cdef dict cell_map = self.cell_map
-        cdef Cell cell
+        cdef CellIndex cells = self.cells
+        cdef np.ndarray nbr_cells
+        cdef long cell
 
         cdef NNPSParticleArrayWrapper src = self.pa_wrappers[ src_index ]
         cdef NNPSParticleArrayWrapper dst = self.pa_wrappers[ dst_index ]
@@ -947,14 +1607,12 @@ cdef class ParallelManager:
 
         cdef double radius_scale = self.radius_scale
         cdef double cell_size = self.cell_size
-        cdef UIntArray lindices
+        cdef unsigned int[:] lindices
         cdef size_t indexj
         cdef ZOLTAN_ID_TYPE j
 
         cdef cPoint xi = cPoint_new(d_x.data[d_idx], d_y.data[d_idx], d_z.data[d_idx])
         cdef cIntPoint _cid = find_cell_id( xi, cell_size )
-        cdef IntPoint cid = IntPoint_from_cIntPoint( _cid )
-        cdef IntPoint cellid = IntPoint(0, 0, 0)
 
         cdef cPoint xj
         cdef double xij
@@ -964,31 +1622,28 @@ cdef class ParallelManager:
 
         cdef int nnbrs = 0
 
-        cdef int ix, iy, iz
-        for ix in [cid.data.x -1, cid.data.x, cid.data.x + 1]:
-            for iy in [cid.data.y - 1, cid.data.y, cid.data.y + 1]:
-                for iz in [cid.data.z -1, cid.data.z, cid.data.z + 1]:
-                    cellid.data.x = ix; cellid.data.y = iy
-                    cellid.data.z = iz
-
-                    if cell_map.has_key( cellid ):
-                        cell = cell_map[ cellid ]
-                        lindices = cell.lindices[src_index]
-                        for indexj in range( lindices.length ):
-                            j = lindices.data[indexj]
+        # the cell of the particle and its neighbors
+        nbr_cells = cells.find(
+            np.array([_cid.x, _cid.y, _cid.z]) +
+            np.array(list(itertools.product((-1, 0, 1), repeat=3)))
+        )
+        for cell in nbr_cells[nbr_cells >= 0]:
+            lindices = cells.get_particles(src_index, cell)
+            for indexj in range( lindices.shape[0] ):
+                j = lindices[indexj]
 
-                            xj = cPoint_new( s_x.data[j], s_y.data[j], s_z.data[j] )
-                            xij = cPoint_distance( xi, xj )
+                xj = cPoint_new( s_x.data[j], s_y.data[j], s_z.data[j] )
+                xij = cPoint_distance( xi, xj )
 
-                            hj = radius_scale * s_h.data[j]
+                hj = radius_scale * s_h.data[j]
 
-                            if ( (xij < hi) or (xij < hj) ):
-                                if nnbrs == nbrs.length:
-                                    nbrs.resize( nbrs.length + 50 )
-                                    print """Neighbor search :: Extending the neighbor list to %d"""%(nbrs.length)
+                if ( (xij < hi) or (xij < hj) ):
+                    if nnbrs == nbrs.length:
+                        nbrs.resize( nbrs.length + 50 )
+                        print """Neighbor search :: Extending the neighbor list to %d"""%(nbrs.length)
 
-                                nbrs.data[ nnbrs ] = j
-                                nnbrs = nnbrs + 1
+                    nbrs.data[ nnbrs ] = j
+                    nnbrs = nnbrs + 1
 
         # update the length for nbrs to indicate the number of neighbors
         nbrs.length = nnbrs
@@ -997,10 +1652,10 @@ cdef class ZoltanParallelManager(ParallelManager):
     """Base class for Zoltan enabled parallel cell managers.
 
     To partition a list of arrays, we do an NNPS like box sort on all
-    arrays to create a global spatial indexing structure. The cell_map
-    are then used as 'objects' to be partitioned by Zoltan. The cell_map
-    dictionary (cell-map) need not be unique across processors. We are
-    responsible for assignning unique global ids for the cells.
+    arrays to create a global spatial indexing structure. The cells
+    are then used as 'objects' to be partitioned by Zoltan. The cells
+    need not be unique across processors. We are responsible for
+    assignning unique global ids for the cells.
 
     The Zoltan generated (cell) import/export lists are then used to
     construct particle import/export lists which are used to perform
@@ -1051,66 +1706,27 @@ cdef class ZoltanParallelManager(ParallelManager):
         generate local export indices for the particles which must
         then be inverted to get the requisite import lists.
 
-        We first construct the particle export lists in local arrays
-        using the information from Zoltan_LB_Balance and subsequently
-        call Zoltan_Invert_Lists to get the import lists. These arrays
-        are then copied to the ParticleArrayExchange import/export
-        lists.
+        The particles of the exported cells are found from the cell
+        index for all the cells at once and copied to the
+        ParticleArrayExchange export lists.
 
         """
         # these are the Zoltan generated lists that correspond to cells
-        cdef UIntArray exportCellLocalids = self.exportCellLocalids
-        cdef UIntArray exportCellGlobalids = self.exportCellGlobalids
-        cdef IntArray exportCellProcs = self.exportCellProcs
         cdef int numCellExport = self.numCellExport
+        cdef np.ndarray cells = \
+            self.exportCellLocalids.get_npy_array()[:numCellExport]
+        cdef np.ndarray procs = \
+            self.exportCellProcs.get_npy_array()[:numCellExport]
 
-        # the local cell map and cellids
-        cdef int narrays = self.narrays
-        cdef list cell_list = self.cell_list
         cdef ParticleArrayExchange pa_exchange
+        cdef int pa_index
 
-        cdef UIntArray exportLocalids, exportGlobalids
-        cdef IntArray exportProcs
-
-        cdef int indexi, i, j, export_proc, nindices, pa_index
-        cdef UIntArray lindices, gindices
-        cdef IntPoint cellid
-        cdef Cell cell
-
-        # initialize the particle export lists
         for pa_index in range(self.narrays):
             pa_exchange = self.pa_exchanges[pa_index]
-            pa_exchange.reset_lists()
-
-        # Iterate over the cells to be exported
-        for indexi in range(numCellExport):
-            i = <int>exportCellLocalids[indexi]            # local index for the cell to export
-            cell = cell_list[i]                            # local cell to export
-            export_proc = exportCellProcs.data[indexi]     # processor to export cell to
-
-            # populate the export lists for each array in this cell
-            for pa_index in range(self.narrays):
-                # the ParticleArrayExchange object for this array
-                pa_exchange = self.pa_exchanges[pa_index]
-
-                exportLocalids = pa_exchange.exportParticleLocalids
-                exportGlobalids = pa_exchange.exportParticleGlobalids
-                exportProcs = pa_exchange.exportParticleProcs
-
-                # local and global indices in this cell
-                lindices = cell.lindices[pa_index]
-                gindices = cell.gindices[pa_index]
-                nindices = lindices.length
-
-                for j in range( nindices ):
-                    exportLocalids.append( lindices.data[j] )
-                    exportGlobalids.append( gindices.data[j] )
-                    exportProcs.append( export_proc )
-
-        # save the number of particles
-        for pa_index in range(narrays):
-            pa_exchange = self.pa_exchanges[pa_index]
-            pa_exchange.numParticleExport = pa_exchange.exportParticleProcs.length
+            indices, particle_procs = self.cells.expand(
+                pa_index, cells, procs
+            )
+            pa_exchange.set_export_lists(indices, particle_procs)
 
     def compute_remote_particles(self):
         """Compute remote particles.
@@ -1123,80 +1739,64 @@ cdef class ZoltanParallelManager(ParallelManager):
         # the PyZoltan object used to find intersections
         cdef PyZoltan pz = self.pz
 
-        cdef Cell cell
-        cdef cPoint boxmin, boxmax
-
-        cdef object comm = self.comm
+        cdef CellIndex cells = self.cells
         cdef int rank = self.rank, narrays = self.narrays
+        cdef int ncells = cells.ncells_total
+        cdef double extent = (self.ghost_layers + 0.5) * cells.cell_size
 
-        cdef list cell_list = self.cell_list
-        cdef UIntArray lindices, gindices
-
-        cdef np.ndarray nbrprocs
+        cdef np.ndarray centroids = cells.get_centroids()
+        cdef np.ndarray[ndim=2, dtype=np.float64_t] boxmin = centroids - extent
+        cdef np.ndarray[ndim=2, dtype=np.float64_t] boxmax = centroids + extent
         cdef np.ndarray[ndim=1, dtype=np.int32_t] procs
 
-        cdef int nbrproc, num_particles, indexi, pa_index
-        cdef ZOLTAN_ID_TYPE i
-
-        cdef int numprocs = 0
+        cdef list export_cells = []
+        cdef list export_procs = []
+        cdef np.ndarray nbrprocs
+        cdef int i, pa_index
 
         cdef ParticleArrayExchange pa_exchange
-        cdef UIntArray exportGlobalids, exportLocalids
-        cdef IntArray exportProcs
-
-        # reset the export lists
-        for pa_index in range(narrays):
-            pa_exchange = self.pa_exchanges[pa_index]
-            pa_exchange.reset_lists()
-
-        # Chaeck for each cell
-        for cell in cell_list:
-
-            # get the bounding box for this cell
-            boxmin = cell.boxmin; boxmax = cell.boxmax
 
-            numprocs = pz.Zoltan_Box_PP_Assign(
-                boxmin.x, boxmin.y, boxmin.z,
-                boxmax.x, boxmax.y, boxmax.z)
-
-            # the array of processors that this box intersects with
-            procs = pz.procs
-
-            # array of neighboring processors
-            nbrprocs = procs[np.where( (procs != -1) * (procs != rank) )[0]]
+        # the partition is fixed between load balancing steps, so the
+        # neighboring processors of each cell are cached on its key
+        cdef dict cell_procs = self._cell_procs
+        cdef np.ndarray keys = cells.keys
+
+        # Check for each cell
+        for i in range(ncells):
+            key = keys[i]
+            nbrprocs = cell_procs.get(key)
+            if nbrprocs is None:
+                pz.Zoltan_Box_PP_Assign(
+                    boxmin[i, 0], boxmin[i, 1], boxmin[i, 2],
+                    boxmax[i, 0], boxmax[i, 1], boxmax[i, 2])
+
+                # the array of processors that this box intersects with
+                procs = pz.procs
+
+                # array of neighboring processors
+                nbrprocs = procs[
+                    np.where( (procs != -1) * (procs != rank) )[0]
+                ].copy()
+                cell_procs[key] = nbrprocs
 
             if nbrprocs.size > 0:
-                cell.is_boundary = True
-
-                # store the neighboring processors for this cell
-                cell.nbrprocs.resize( nbrprocs.size )
-                cell.nbrprocs.set_data( nbrprocs )
+                export_cells.append(np.ones(nbrprocs.size, dtype=np.int64)*i)
+                export_procs.append(nbrprocs)
 
-                # populate the particle export lists for each array
-                for pa_index in range(narrays):
-                    pa_exchange = self.pa_exchanges[pa_index]
-
-                    exportGlobalids = pa_exchange.exportParticleGlobalids
-                    exportLocalids = pa_exchange.exportParticleLocalids
-                    exportProcs = pa_exchange.exportParticleProcs
-
-                    # local and global indices in this cell
-                    lindices = cell.lindices[pa_index]
-                    gindices = cell.gindices[pa_index]
-                    num_particles = lindices.length
-
-                    for nbrproc in nbrprocs:
-                        for indexi in range( num_particles ):
-                            i = lindices.data[indexi]
-
-                            exportLocalids.append( i )
-                            exportGlobalids.append( gindices.data[indexi] )
-                            exportProcs.append( nbrproc )
+        if export_cells:
+            cell_arr = np.concatenate(export_cells)
+            proc_arr = np.concatenate(export_procs)
+        else:
+            cell_arr = np.zeros(0, dtype=np.int64)
+            proc_arr = np.zeros(0, dtype=np.int32)
 
-        # set the numParticleExport for each array
+        # populate the particle export lists for each array
         for pa_index in range(narrays):
             pa_exchange = self.pa_exchanges[pa_index]
-            pa_exchange.numParticleExport = pa_exchange.exportParticleProcs.length
+            indices, particle_procs = cells.expand(
+                pa_index, cell_arr, proc_arr
+            )
+            pa_exchange.set_export_lists(indices, particle_procs)
 
     def load_balance(self):
         """Use Zoltan to generate import/export lists for the cells.
@@ -1309,7 +1909,7 @@ cdef class ZoltanParallelManagerGeometric(ZoltanParallelManager):
 
         """
         cdef ZoltanGeometricPartitioner pz = self.pz
-        cdef list cell_list = self.cell_list
+        cdef CellIndex cells = self.cells
 
         cdef int num_local_objects = pz.num_local_objects
         cdef double num_global_objects1 = 1.0/pz.num_global_objects
@@ -1322,9 +1922,15 @@ cdef class ZoltanParallelManagerGeometric(ZoltanParallelManager):
         # the weights array for PyZoltan
         cdef DoubleArray weights = pz.weights
 
-        cdef int i
-        cdef Cell cell
-        cdef cPoint centroid
+        cdef np.ndarray centroids = cells.get_centroids()
+        cdef np.ndarray work
+        cdef double scale = 1.0
+
+        # weights from the estimated work scaled by the measured time
+        if self.dynamic_lb:
+            work = self.get_cell_work()
+            if self.rank_work > 0 and work.sum() > 0:
+                scale = self.rank_work/work.sum()
 
         # resize the coordinate and PyZoltan weight arrays
         x.resize( num_local_objects )
@@ -1333,20 +1939,27 @@ cdef class ZoltanParallelManagerGeometric(ZoltanParallelManager):
 
         weights.resize( num_local_objects )
 
-        # populate the arrays
-        for i in range( num_local_objects ):
-            cell = cell_list[ i ]
-            centroid = cell.centroid
-
-            # weights are defined as cell.size/num_total
-            weights.data[i] = num_global_objects1 * cell.size
+        # populate the arrays, weights are defined as cell.size/num_total
+        if self.dynamic_lb:
+            weights.get_npy_array()[:] = scale*work[:num_local_objects]
+        else:
+            weights.get_npy_array()[:] = (
+                num_global_objects1 * cells.sizes[:num_local_objects]
+            )
 
-            x.data[i] = centroid.x
-            y.data[i] = centroid.y
-            z.data[i] = centroid.z
+        x.get_npy_array()[:] = centroids[:num_local_objects, 0]
+        y.get_npy_array()[:] = centroids[:num_local_objects, 1]
+        z.get_npy_array()[:] = centroids[:num_local_objects, 2]
 
     def migrate_particles(self):
-        """Update an existing partition"""
+        """Update an existing partition.
+
+        Only the particles that changed cell since they were last indexed
+        are assigned a processor using the cuts kept from the last load
+        balancing, the others remain local.  A particle crossing a cut
+        without changing cell therefore moves when it next changes cell,
+        which the ghost layers allow for.
+        """
         cdef PyZoltan pz = self.pz
         cdef int pa_index, narrays=self.narrays
         cdef double xi, yi, zi
@@ -1362,8 +1975,9 @@ cdef class ZoltanParallelManagerGeometric(ZoltanParallelManager):
 
         cdef ZOLTAN_ID_TYPE local_id, global_id
 
-        cdef int num_particles, i, proc
+        cdef int num_particles, i, j, proc
         cdef int rank = self.rank
+        cdef np.ndarray[ndim=1, dtype=np.uint32_t] moved
 
         # iterate over all arrays
         for pa_index in range(narrays):
@@ -1380,8 +1994,10 @@ cdef class ZoltanParallelManagerGeometric(ZoltanParallelManager):
             x = pa_wrapper.x; y = pa_wrapper.y; z = pa_wrapper.z
             gid = pa_wrapper.gid
 
-            num_particles = self.num_local[pa_index]
-            for i in range(num_particles):
+            moved = self.get_moved_particles(pa_index)
+            num_particles = len(moved)
+            for j in range(num_particles):
+                i = moved[j]
                 xi = x.data[i]; yi = y.data[i]; zi = z.data[i]
 
                 # find the processor to which this point belongs
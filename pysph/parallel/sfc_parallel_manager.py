@@ -0,0 +1,546 @@
+"""A parallel manager using a space filling curve for the decomposition.
+
+The domain is binned into cells and the cells are ordered along a Hilbert or
+Morton curve, or simply along the longest direction to obtain slabs.  The
+curve is then cut into contiguous ranges of equal work, one per processor,
+using a distributed search for the splitters.  Since nearby cells are close
+along the curve the partitions are compact and as the particles move the
+splitters only shift slightly, so few particles migrate at each load
+balancing step.
+
+Unlike the :class:`ZoltanParallelManagerGeometric` this only requires mpi4py
+and numpy, all the communication is done using collectives.
+"""
+
+import itertools
+
+import numpy
+
+from pysph.base.utils import ParticleTAGS
+
+Local = ParticleTAGS.Local
+Remote = ParticleTAGS.Remote
+
+# The particle keys are stored in 64 bit integers.
+MAX_KEY_BITS = 63
+
+
+###############################################################################
+def _interleave(coords, nbits):
+    """Interleave the bits of the given (n, dim) unsigned coordinates with
+    the bits of the first coordinate being the most significant.
+    """
+    n, dim = coords.shape
+    keys = numpy.zeros(n, dtype=numpy.uint64)
+    one = numpy.uint64(1)
+    for bit in range(nbits - 1, -1, -1):
+        shift = numpy.uint64(bit)
+        for i in range(dim):
+            keys = (keys << one) | ((coords[:, i] >> shift) & one)
+    return keys
+
+
+def _as_coords(cells):
+    """Return the cells as an (n, dim) array of unsigned coordinates, a one
+    dimensional array is taken as the cells of a one dimensional problem.
+    """
+    coords = numpy.asarray(cells, dtype=numpy.int64).astype(numpy.uint64)
+    if coords.ndim == 1:
+        coords = coords.reshape(-1, 1)
+    return coords
+
+
+def get_morton_keys(cells, nbits):
+    """Return the Morton (Z-order) keys of the given cells.
+
+    Parameters
+    ----------
+
+    cells: numpy.ndarray
+        (n, dim) integer indices of the cells, each in [0, 2**nbits).
+
+    nbits: int
+        Number of bits used for each coordinate.
+    """
+    return _interleave(_as_coords(cells), nbits)
+
+
+def get_hilbert_keys(cells, nbits):
+    """Return the Hilbert keys of the given cells.
+
+    This uses the algorithm of J. Skilling, "Programming the Hilbert curve",
+    AIP Conf. Proc. 707, 381 (2004), vectorized over the cells.  Consecutive
+    keys are always neighboring cells.
+
+    Parameters
+    ----------
+
+    cells: numpy.ndarray
+        (n, dim) integer indices of the cells, each in [0, 2**nbits).
+
+    nbits: int
+        Number of bits used for each coordinate.
+    """
+    X = _as_coords(cells).copy()
+    dim = X.shape[1]
+    zero = numpy.uint64(0)
+
+    # Inverse undo the excess work.
+    Q = 1 << (nbits - 1)
+    while Q > 1:
+        P = numpy.uint64(Q - 1)
+        _Q = numpy.uint64(Q)
+        for i in range(dim):
+            bit = (X[:, i] & _Q) != zero
+            X[:, 0] = numpy.where(bit, X[:, 0] ^ P, X[:, 0])
+            t = numpy.where(bit, zero, (X[:, 0] ^ X[:, i]) & P)
+            X[:, 0] ^= t
+            X[:, i] ^= t
+        Q >>= 1
+
+    # Gray encode.
+    for i in range(1, dim):
+        X[:, i] ^= X[:, i - 1]
+    t = numpy.zeros(len(X), dtype=numpy.uint64)
+    Q = 1 << (nbits - 1)
+    while Q > 1:
+        bit = (X[:, dim - 1] & numpy.uint64(Q)) != zero
+        t = numpy.where(bit, t ^ numpy.uint64(Q - 1), t)
+        Q >>= 1
+    for i in range(dim):
+        X[:, i] ^= t
+
+    return _interleave(X, nbits)
+
+
+def find_splitters(keys, weights, nparts, nkeys, comm=None):
+    """Find the keys that cut the curve into `nparts` ranges of equal work.
+
+    The keys of all the processors are considered when a communicator is
+    passed.  The splitters are found by a simultaneous bisection on the key
+    space, each iteration requiring a single reduction, so this takes at
+    most log2(nkeys) reductions.
+
+    Parameters
+    ----------
+
+    keys: numpy.ndarray
+        The keys of the local objects.
+
+    weights: numpy.ndarray
+        The work of each object.
+
+    nparts: int
+        The number of ranges.
+
+    nkeys: int
+        The keys lie in [0, nkeys).
+
+    comm: mpi4py.MPI.Comm
+        Optional communicator to find the splitters of the global keys.
+
+    Returns an array of `nparts - 1` keys such that part `p` owns the keys in
+    [splitters[p-1], splitters[p]).  Use `get_owners` to find the owner of
+    the keys.
+    """
+    order = numpy.argsort(keys, kind='mergesort')
+    skeys = numpy.asarray(keys, dtype=numpy.uint64)[order]
+    cumw = numpy.concatenate(
+        ([0.0], numpy.cumsum(numpy.asarray(weights, dtype=float)[order]))
+    )
+
+    total = numpy.array([cumw[-1]])
+    if comm is not None:
+        comm.Allreduce(total.copy(), total)
+    targets = total[0]*numpy.arange(1, nparts, dtype=float)/nparts
+
+    # Invariant: the work below lo is less than the target and that below
+    # hi is at least the target.
+    lo = numpy.zeros(nparts - 1, dtype=numpy.uint64)
+    hi = numpy.empty(nparts - 1, dtype=numpy.uint64)
+    hi[:] = nkeys
+    one = numpy.uint64(1)
+    while numpy.any(hi - lo > one):
+        mid = lo + (hi - lo)//numpy.uint64(2)
+        below = cumw[numpy.searchsorted(skeys, mid, side='left')]
+        if comm is not None:
+            comm.Allreduce(below.copy(), below)
+        done = hi - lo <= one
+        upper = (below >= targets) & ~done
+        lower = (below < targets) & ~done
+        hi[upper] = mid[upper]
+        lo[lower] = mid[lower]
+    return hi
+
+
+def get_owners(keys, splitters):
+    """Return the part owning each of the keys given the splitters."""
+    return numpy.searchsorted(splitters, keys, side='right')
+
+
+def get_record_dtype(pa, props):
+    """Return an aligned record dtype to pack the given properties of the
+    particle array with the largest fields first.
+    """
+    fields = []
+    for prop in props:
+        array = pa.properties[prop].get_npy_array()
+        fields.append((prop, array.dtype))
+    fields.sort(key=lambda x: (-x[1].itemsize, x[0]))
+    return numpy.dtype(fields, align=True)
+
+
+###############################################################################
+class SFCParallelManager(object):
+    """Parallel manager using a space filling curve to partition the cells.
+
+    The interface is the same as that of the Zoltan based parallel managers
+    so this may be passed to the solver as is.
+
+    Notes
+    -----
+
+    The keys are computed on a grid of cells fixed at the load balancing
+    steps so the splitters remain valid between them.  Particles leaving the
+    grid are assigned to the nearest boundary cell until the next load
+    balancing step.  A load balance is also forced if the cell size grows
+    beyond that of the grid.
+
+    Periodic domains are not supported.
+    """
+    def __init__(self, dim, particles, comm, radius_scale=2.0,
+                 ghost_layers=2, domain=None, update_cell_sizes=True,
+                 curve='hilbert'):
+        """Constructor.
+
+        Parameters
+        ----------
+
+        dim: int
+            Dimension of the problem.
+
+        particles: list(ParticleArray)
+            The particle arrays to distribute.
+
+        comm: mpi4py.MPI.Comm
+            The MPI communicator.
+
+        radius_scale: float
+            The cell size is `radius_scale` times the maximum smoothing
+            length.
+
+        ghost_layers: float
+            Number of layers of cells to share with the neighbors.
+
+        domain: DomainManager
+            Accepted for compatibility with the other parallel managers.
+
+        update_cell_sizes: bool
+            Accepted for compatibility, the cell size is always checked at
+            each update and the grid rebuilt if it has grown.
+
+        curve: str
+            One of 'hilbert', 'morton' or 'slab'.  The 'slab' ordering cuts
+            the domain into slabs normal to its longest direction.
+        """
+        if curve not in ('hilbert', 'morton', 'slab'):
+            raise ValueError('Unknown space filling curve %r' % curve)
+
+        self.dim = dim
+        self.particles = particles
+        self.narrays = len(particles)
+        self.comm = comm
+        self.rank = comm.Get_rank()
+        self.size = comm.Get_size()
+        self.radius_scale = radius_scale
+        self.ghost_layers = ghost_layers
+        self.domain = domain
+        self.update_cell_sizes = update_cell_sizes
+        self.curve = curve
+
+        self.initial_update = True
+        self.lb_freq = 10
+        self.lb_count = 0
+        self.n_full_updates = 0
+        self.n_rebalances = 0
+
+        # Relative cost of the particles of each array.
+        self.array_weights = {}
+
+        # The grid used to compute the keys.
+        self.cell_size = 0.0
+        self.origin = numpy.zeros(3)
+        self.nbits = 1
+        self.axis = 0
+        self.splitters = numpy.zeros(self.size - 1, dtype=numpy.uint64)
+
+        # Properties exchanged between the processors.
+        self.lb_props = []
+        for pa in particles:
+            props = sorted(pa.properties.keys())
+            self.lb_props.append(props)
+
+        self._assign_gids()
+
+    ##########################################################################
+    # Public interface.
+    ##########################################################################
+    def set_lb_freq(self, lb_freq):
+        self.lb_freq = lb_freq
+
+    def set_array_weights(self, weights):
+        """Set the relative cost of the particles of each array, a dictionary
+        keyed on the array name.
+        """
+        self.array_weights = dict(weights)
+
+    def update_time_steps(self, local_dt):
+        """Return the minimum time step of all the processors."""
+        dt = numpy.array([local_dt], dtype=float)
+        self._allreduce(dt, 'min')
+        return dt[0]
+
+    def update(self):
+        """Redistribute the particles and exchange the remote particles."""
+        self._remove_remote_particles()
+
+        mins, maxs, hmax = self._compute_bounds()
+        cell_size = max(self.radius_scale*hmax, 1e-6)
+
+        rebalance = (self.initial_update or self.lb_count >= self.lb_freq or
+                     cell_size > self.cell_size)
+        if rebalance:
+            self._setup_grid(mins, maxs, cell_size)
+            self._update_splitters()
+            self.lb_count = 0
+            self.n_rebalances += 1
+        self.lb_count += 1
+
+        self._migrate_particles()
+        self._exchange_remote_particles()
+        self.n_full_updates += 1
+
+    def get_keys(self, pa):
+        """Return the cell indices and keys of the particles of the array on
+        the current grid.
+        """
+        cells = self._get_cells(pa)
+        return cells, self._get_cell_keys(cells)
+
+    ##########################################################################
+    # Private interface.
+    ##########################################################################
+    def _assign_gids(self):
+        comm = self.comm
+        for pa in self.particles:
+            n = pa.get_number_of_particles()
+            offset = comm.exscan(n)
+            if offset is None:
+                offset = 0
+            gid = pa.get('gid', only_real_particles=False)
+            gid[:] = numpy.arange(offset, offset + n)
+
+    def _remove_remote_particles(self):
+        for pa in self.particles:
+            pa.remove_tagged_particles(Remote)
+
+    def _allreduce(self, data, op):
+        """Reduce the array over all the processors in place, `op` is one
+        of 'sum', 'min' or 'max'.
+        """
+        from mpi4py import MPI
+        mpi_op = {'sum': MPI.SUM, 'min': MPI.MIN, 'max': MPI.MAX}[op]
+        self.comm.Allreduce(data.copy(), data, op=mpi_op)
+
+    def _alltoallv(self, sendbuf, send_counts):
+        """Send `send_counts[p]` consecutive records of `sendbuf` to each
+        processor `p` and return the records received from all of them.
+        """
+        from mpi4py import MPI
+        comm = self.comm
+        recv_counts = numpy.empty(self.size, dtype=numpy.int64)
+        comm.Alltoall(send_counts, recv_counts)
+        recvbuf = numpy.empty(int(recv_counts.sum()), dtype=sendbuf.dtype)
+
+        itemsize = sendbuf.dtype.itemsize
+        send_bytes = send_counts*itemsize
+        recv_bytes = recv_counts*itemsize
+        comm.Alltoallv(
+            [sendbuf.view(numpy.uint8),
+             (send_bytes, numpy.cumsum(send_bytes) - send_bytes), MPI.BYTE],
+            [recvbuf.view(numpy.uint8),
+             (recv_bytes, numpy.cumsum(recv_bytes) - recv_bytes), MPI.BYTE]
+        )
+        return recvbuf
+
+    def _compute_bounds(self):
+        mins = numpy.empty(3)
+        mins[:] = numpy.inf
+        maxs = -mins
+        hmax = numpy.zeros(1)
+        for pa in self.particles:
+            if pa.get_number_of_particles() == 0:
+                continue
+            for i, name in enumerate('xyz'):
+                data = pa.get(name)
+                mins[i] = min(mins[i], data.min())
+                maxs[i] = max(maxs[i], data.max())
+            hmax[0] = max(hmax[0], pa.get('h').max())
+
+        self._allreduce(mins, 'min')
+        self._allreduce(maxs, 'max')
+        self._allreduce(hmax, 'max')
+        return mins, maxs, hmax[0]
+
+    def _setup_grid(self, mins, maxs, cell_size):
+        """Setup a grid of 2**nbits cells along each direction centered on
+        the particles.
+        """
+        dim = self.dim
+        extent = numpy.where(numpy.isfinite(maxs - mins), maxs - mins, 0.0)
+        ncells = int(numpy.floor(extent[:dim].max()/cell_size)) + 1
+        nbits = max(1, int(numpy.ceil(numpy.log2(ncells))))
+        if nbits*dim > MAX_KEY_BITS:
+            msg = 'Too many cells (%d) along a direction for the keys.' % (
+                ncells
+            )
+            raise RuntimeError(msg)
+        pad = 0.5*((1 << nbits)*cell_size - extent)
+        self.origin = numpy.where(numpy.isfinite(mins), mins, 0.0) - pad
+        self.cell_size = cell_size
+        self.nbits = nbits
+        self.axis = int(numpy.argmax(extent[:dim]))
+
+    def _get_cells(self, pa):
+        dim = self.dim
+        n = pa.get_number_of_particles()
+        cells = numpy.empty((n, dim), dtype=numpy.int64)
+        upper = (1 << self.nbits) - 1
+        for i, name in enumerate('xyz'[:dim]):
+            data = pa.get(name, only_real_particles=False)[:n]
+            idx = numpy.floor((data - self.origin[i])/self.cell_size)
+            cells[:, i] = numpy.clip(idx, 0, upper)
+        return cells
+
+    def _get_cell_keys(self, cells):
+        if self.curve == 'hilbert':
+            return get_hilbert_keys(cells, self.nbits)
+        elif self.curve == 'morton':
+            return get_morton_keys(cells, self.nbits)
+        else:
+            return cells[:, self.axis].astype(numpy.uint64)
+
+    def _get_nkeys(self):
+        if self.curve == 'slab':
+            return 1 << self.nbits
+        else:
+            return 1 << (self.nbits*self.dim)
+
+    def _update_splitters(self):
+        keys, weights = [], []
+        for pa in self.particles:
+            cells, pa_keys = self.get_keys(pa)
+            keys.append(pa_keys)
+            weights.append(numpy.ones(len(pa_keys))*self.array_weights.get(
+                pa.name, 1.0
+            ))
+        nkeys = self._get_nkeys()
+        self.splitters = find_splitters(
+            numpy.concatenate(keys), numpy.concatenate(weights), self.size,
+            nkeys, self.comm
+        )
+
+    def _migrate_particles(self):
+        rank = self.rank
+        for pa, props in zip(self.particles, self.lb_props):
+            cells, keys = self.get_keys(pa)
+            owners = get_owners(keys, self.splitters)
+            indices = numpy.where(owners != rank)[0]
+            self._exchange(pa, props, indices, owners[indices], Local,
+                           remove=True)
+            pa.set_pid(rank)
+
+    def _exchange_remote_particles(self):
+        """Send the particles in the cells near a partition boundary to the
+        processors owning the neighboring cells.
+        """
+        dim = self.dim
+        rank = self.rank
+        layers = max(1, int(numpy.ceil(self.ghost_layers)))
+        upper = (1 << self.nbits) - 1
+        offsets = numpy.array(
+            list(itertools.product(range(-layers, layers + 1), repeat=dim)),
+            dtype=numpy.int64
+        )
+        local_props = []
+        for pa in self.particles:
+            cells, keys = self.get_keys(pa)
+            if len(cells) == 0:
+                local_props.append((numpy.zeros(0, dtype=int),
+                                    numpy.zeros(0, dtype=int)))
+                continue
+            ucells, inverse = numpy.unique(cells, axis=0, return_inverse=True)
+            # Find the distinct (cell, processor) pairs.
+            pairs = []
+            for offset in offsets:
+                nbr = ucells + offset
+                valid = numpy.all((nbr >= 0) & (nbr <= upper), axis=1)
+                cell_ids = numpy.where(valid)[0]
+                owners = get_owners(
+                    self._get_cell_keys(nbr[valid]), self.splitters
+                )
+                remote = owners != rank
+                pairs.append(cell_ids[remote]*self.size + owners[remote])
+            pairs = numpy.unique(numpy.concatenate(pairs))
+            pair_cells, pair_procs = pairs//self.size, pairs % self.size
+
+            # Expand the cells into the particles in them.
+            order = numpy.argsort(inverse, kind='mergesort')
+            counts = numpy.bincount(inverse, minlength=len(ucells))
+            starts = numpy.cumsum(counts) - counts
+            lengths = counts[pair_cells]
+            first = numpy.cumsum(lengths) - lengths
+            idx = numpy.repeat(starts[pair_cells] - first, lengths) + \
+                numpy.arange(lengths.sum())
+            local_props.append((order[idx], numpy.repeat(pair_procs, lengths)))
+
+        for pa, props, (indices, procs) in zip(self.particles, self.lb_props,
+                                               local_props):
+            self._exchange(pa, props, indices, procs, Remote, remove=False)
+
+    def _exchange(self, pa, props, indices, procs, tag, remove):
+        """Send the particles `indices` to the processors `procs` and append
+        the received particles with the given tag.
+        """
+        size = self.size
+
+        order = numpy.argsort(procs, kind='mergesort')
+        indices = numpy.asarray(indices)[order]
+        procs = numpy.asarray(procs)[order]
+
+        dtype = get_record_dtype(pa, props)
+        sendbuf = numpy.empty(len(indices), dtype=dtype)
+        for prop in props:
+            sendbuf[prop] = pa.get(prop, only_real_particles=False)[indices]
+
+        send_counts = numpy.bincount(procs, minlength=size).astype(numpy.int64)
+        recvbuf = self._alltoallv(sendbuf, send_counts)
+
+        if remove and len(indices) > 0:
+            # The remote particles were removed which leaves the array
+            # aligned.
+            pa.remove_particles(numpy.sort(indices), aligned=True)
+
+        nrecv = len(recvbuf)
+        if nrecv == 0:
+            return
+        start = pa.get_number_of_particles()
+        pa.resize(start + nrecv)
+        for prop in pa.properties:
+            data = pa.get(prop, only_real_particles=False)
+            if prop in recvbuf.dtype.names:
+                data[start:] = recvbuf[prop]
+            else:
+                data[start:] = pa.default_values[prop]
+        pa.get('tag', only_real_particles=False)[start:] = tag
+        pa.align_particles()
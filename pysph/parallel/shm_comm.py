@@ -0,0 +1,318 @@
+"""A communicator for several processes on one machine using shared memory.
+
+This provides the subset of the mpi4py communicator interface used by the
+solver, the application and the :class:`SFCParallelManager` so that a
+simulation can be decomposed over the cores of a single machine without MPI.
+
+Each process owns a shared memory segment, its mailbox, into which it writes
+the data it sends.  After a barrier the other processes read the part meant
+for them directly from this segment, and a second barrier ensures that the
+mailbox is not overwritten before everyone has read it.  The workers are
+forked from the launching process with :func:`run_workers`.
+
+This requires Python 3.8 or above for :mod:`multiprocessing.shared_memory`.
+"""
+
+import functools
+import multiprocessing
+import pickle
+import sys
+import threading
+import traceback
+
+import numpy
+
+# Reduction operations, pass these as the `op` of the reductions.
+SUM = 'sum'
+MIN = 'min'
+MAX = 'max'
+
+_REDUCE = {SUM: numpy.add, MIN: numpy.minimum, MAX: numpy.maximum}
+
+# Columns of the control block.
+_GENERATION = 0
+_NBYTES = 1
+_COUNTS = 2
+
+# Smallest size of a mailbox in bytes.
+_MIN_MAILBOX_SIZE = 1 << 16
+
+
+def _get_shared_memory():
+    try:
+        from multiprocessing import shared_memory
+    except ImportError:
+        msg = 'Shared memory parallel runs require Python 3.8 or above.'
+        raise RuntimeError(msg)
+    return shared_memory
+
+
+###############################################################################
+class SharedMemoryComm(object):
+    """A communicator between the processes started by :func:`run_workers`.
+
+    The names follow mpi4py: the lower case methods communicate picklable
+    objects and the capitalized ones numpy arrays.  All the methods are
+    collective and must be called by every process in the same order.
+    """
+    def __init__(self, rank, size, barrier, control, prefix):
+        """Constructor.
+
+        Parameters
+        ----------
+
+        rank: int
+            Rank of this process.
+
+        size: int
+            Number of processes.
+
+        barrier: multiprocessing.Barrier
+            A barrier shared by all the processes.
+
+        control: multiprocessing.shared_memory.SharedMemory
+            Shared segment of at least `size*(size + 2)` int64 values.
+
+        prefix: str
+            Prefix of the names of the mailboxes.
+        """
+        self.rank = rank
+        self.size = size
+        self.prefix = prefix
+        self._barrier = barrier
+        self._control_shm = control
+        self._control = numpy.ndarray(
+            (size, size + _COUNTS), dtype=numpy.int64, buffer=control.buf
+        )
+        # Our own mailbox and the mailboxes of the others attached so far
+        # keyed on the rank, as (generation, shm) pairs.
+        self._mailbox = None
+        self._attached = {}
+
+    ##########################################################################
+    # Public interface.
+    ##########################################################################
+    def Get_rank(self):
+        return self.rank
+
+    def Get_size(self):
+        return self.size
+
+    def barrier(self):
+        self._barrier.wait()
+
+    Barrier = barrier
+
+    def abort(self):
+        """Break the barrier so that the other processes do not wait for
+        this one forever.
+        """
+        self._barrier.abort()
+
+    def bcast(self, obj, root=0):
+        if self.rank == root:
+            self._post(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+        self.barrier()
+        if self.rank != root:
+            obj = pickle.loads(self._read(root).tobytes())
+        self.barrier()
+        return obj
+
+    def gather(self, obj, root=0):
+        self._post(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+        self.barrier()
+        result = None
+        if self.rank == root:
+            result = [self._load(i, obj) for i in range(self.size)]
+        self.barrier()
+        return result
+
+    def allgather(self, obj):
+        self._post(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+        self.barrier()
+        result = [self._load(i, obj) for i in range(self.size)]
+        self.barrier()
+        return result
+
+    def scatter(self, objs, root=0):
+        if self.rank == root:
+            self._post(pickle.dumps(list(objs), pickle.HIGHEST_PROTOCOL))
+        self.barrier()
+        if self.rank == root:
+            obj = objs[root]
+        else:
+            obj = pickle.loads(self._read(root).tobytes())[self.rank]
+        self.barrier()
+        return obj
+
+    def allreduce(self, obj, op=SUM):
+        values = self.allgather(obj)
+        return functools.reduce(_REDUCE[op], values)
+
+    def exscan(self, obj, op=SUM):
+        """Return the reduction of the values of the lower ranks and None
+        on the first one.
+        """
+        values = self.allgather(obj)[:self.rank]
+        if len(values) == 0:
+            return None
+        return functools.reduce(_REDUCE[op], values)
+
+    def Allreduce(self, sendbuf, recvbuf, op=SUM):
+        sendbuf = numpy.ascontiguousarray(sendbuf)
+        self._post(sendbuf.view(numpy.uint8).ravel())
+        self.barrier()
+        result = sendbuf.copy()
+        reduce = _REDUCE[op]
+        for i in range(self.size):
+            if i != self.rank:
+                data = self._read(i).view(sendbuf.dtype)
+                reduce(result, data.reshape(sendbuf.shape), out=result)
+        self.barrier()
+        recvbuf[...] = result
+
+    def alltoallv(self, sendbuf, send_counts):
+        """Send `send_counts[p]` consecutive elements of the array `sendbuf`
+        to each process `p` and return the elements received from all the
+        processes ordered by rank.
+
+        The elements are copied directly from the mailbox of the sender.
+        """
+        sendbuf = numpy.ascontiguousarray(sendbuf)
+        dtype = sendbuf.dtype
+        self._post(sendbuf.view(numpy.uint8).ravel(), send_counts)
+        self.barrier()
+        counts = self._control[:, _COUNTS:]
+        recv_counts = counts[:, self.rank].copy()
+        recvbuf = numpy.empty(int(recv_counts.sum()), dtype=dtype)
+        start = 0
+        for i in range(self.size):
+            n = recv_counts[i]
+            if n == 0:
+                continue
+            if i == self.rank:
+                data = sendbuf
+            else:
+                data = self._read(i).view(dtype)
+            offset = counts[i, :self.rank].sum()
+            recvbuf[start:start + n] = data[offset:offset + n]
+            start += n
+        self.barrier()
+        return recvbuf
+
+    def close(self):
+        """Release the mailboxes, this is not collective."""
+        for generation, shm in self._attached.values():
+            shm.close()
+        self._attached.clear()
+        if self._mailbox is not None:
+            self._mailbox.close()
+            self._mailbox.unlink()
+            self._mailbox = None
+
+    ##########################################################################
+    # Private interface.
+    ##########################################################################
+    def _get_name(self, rank, generation):
+        return '%s_%d_%d' % (self.prefix, rank, generation)
+
+    def _post(self, data, counts=None):
+        """Write the bytes in `data` to our mailbox, growing it if needed.
+
+        The workers are forked after the control block is created, so they
+        share the resource tracker of the launching process and the mailbox
+        is only unregistered once, when it is unlinked here.
+        """
+        data = numpy.frombuffer(data, dtype=numpy.uint8)
+        nbytes = len(data)
+        row = self._control[self.rank]
+        mailbox = self._mailbox
+        if mailbox is None or mailbox.size < nbytes:
+            size = max(_MIN_MAILBOX_SIZE, 2*nbytes)
+            if mailbox is not None:
+                mailbox.close()
+                mailbox.unlink()
+            row[_GENERATION] += 1
+            self._mailbox = mailbox = _get_shared_memory().SharedMemory(
+                name=self._get_name(self.rank, row[_GENERATION]),
+                create=True, size=size
+            )
+        numpy.frombuffer(mailbox.buf, dtype=numpy.uint8, count=nbytes)[:] = \
+            data
+        row[_NBYTES] = nbytes
+        if counts is not None:
+            row[_COUNTS:] = counts
+
+    def _read(self, rank):
+        """Return the bytes in the mailbox of the given rank."""
+        generation, nbytes = self._control[rank, :_COUNTS]
+        cached = self._attached.get(rank)
+        if cached is None or cached[0] != generation:
+            if cached is not None:
+                cached[1].close()
+            shm = _get_shared_memory().SharedMemory(
+                name=self._get_name(rank, generation)
+            )
+            self._attached[rank] = cached = (generation, shm)
+        return numpy.frombuffer(cached[1].buf, dtype=numpy.uint8,
+                                count=nbytes)
+
+    def _load(self, rank, obj):
+        if rank == self.rank:
+            return obj
+        return pickle.loads(self._read(rank).tobytes())
+
+
+###############################################################################
+def _worker(target, rank, size, barrier, control, prefix, args):
+    comm = SharedMemoryComm(rank, size, barrier, control, prefix)
+    status = 0
+    try:
+        target(comm, *args)
+    except threading.BrokenBarrierError:
+        # Another worker failed and has already reported the error.
+        status = 1
+    except BaseException:
+        traceback.print_exc()
+        status = 1
+        comm.abort()
+    finally:
+        comm.close()
+    sys.exit(status)
+
+
+def run_workers(target, nprocs, args=()):
+    """Run `target(comm, *args)` in `nprocs` forked processes, each with a
+    :class:`SharedMemoryComm` connecting them, and wait for them to finish.
+
+    A RuntimeError is raised if any of the processes fails.
+    """
+    shared_memory = _get_shared_memory()
+    ctx = multiprocessing.get_context('fork')
+    barrier = ctx.Barrier(nprocs)
+    control = shared_memory.SharedMemory(
+        create=True, size=8*nprocs*(nprocs + _COUNTS)
+    )
+    numpy.ndarray(nprocs*(nprocs + _COUNTS), dtype=numpy.int64,
+                  buffer=control.buf)[:] = 0
+    prefix = control.name.lstrip('/')
+    try:
+        procs = [
+            ctx.Process(
+                target=_worker,
+                args=(target, rank, nprocs, barrier, control, prefix, args)
+            )
+            for rank in range(nprocs)
+        ]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join()
+    finally:
+        control.close()
+        control.unlink()
+
+    failed = [rank for rank, proc in enumerate(procs) if proc.exitcode != 0]
+    if len(failed) > 0:
+        msg = 'Shared memory worker(s) %s failed.' % failed
+        raise RuntimeError(msg)
@@ -0,0 +1,43 @@
+"""A parallel manager for processes on one machine communicating through
+shared memory.
+
+This is the :class:`SFCParallelManager` with the collectives done by a
+:class:`pysph.parallel.shm_comm.SharedMemoryComm` so neither MPI nor mpi4py
+are needed.  By default each process owns a slab of the domain normal to its
+longest direction.
+"""
+
+from pysph.parallel.sfc_parallel_manager import SFCParallelManager
+
+
+class SharedMemoryParallelManager(SFCParallelManager):
+    """Parallel manager for the workers started by
+    :func:`pysph.parallel.shm_comm.run_workers`.
+
+    The migrating and remote particles are packed by each worker into its
+    shared mailbox and the other workers copy the records meant for them
+    directly from it, so every exchange costs two barriers.
+    """
+    def __init__(self, dim, particles, comm, radius_scale=2.0,
+                 ghost_layers=2, domain=None, update_cell_sizes=True,
+                 curve='slab'):
+        """Constructor.
+
+        The arguments are those of the :class:`SFCParallelManager` except
+        that `comm` is a :class:`SharedMemoryComm` and the partitions are
+        slabs by default.
+        """
+        super(SharedMemoryParallelManager, self).__init__(
+            dim, particles, comm, radius_scale=radius_scale,
+            ghost_layers=ghost_layers, domain=domain,
+            update_cell_sizes=update_cell_sizes, curve=curve
+        )
+
+    ##########################################################################
+    # Private interface.
+    ##########################################################################
+    def _allreduce(self, data, op):
+        self.comm.Allreduce(data.copy(), data, op=op)
+
+    def _alltoallv(self, sendbuf, send_counts):
+        return self.comm.alltoallv(sendbuf, send_counts)
@@ -0,0 +1,55 @@
+"""Test the load imbalance measured by the parallel manager when the work
+of the processors is artificially skewed.
+
+The first processor reports four times the compute time of the others while
+all of them also spend time blocked in a collective, which must not be
+counted as work.
+"""
+import time
+
+import mpi4py.MPI as mpi
+import numpy as np
+
+from pysph.base.utils import get_particle_array_wcsph
+from pysph.parallel.parallel_manager import ZoltanParallelManagerGeometric
+
+comm = mpi.COMM_WORLD
+rank = comm.Get_rank()
+size = comm.Get_size()
+
+# all the particles start on the root
+if rank == 0:
+    x, y = np.mgrid[0:1:20j, 0:1:20j]
+    x, y = x.ravel(), y.ravel()
+else:
+    x, y = np.array([]), np.array([])
+pa = get_particle_array_wcsph(name='fluid', x=x, y=y, h=0.1, m=1.0)
+
+pm = ZoltanParallelManagerGeometric(dim=2, comm=comm, particles=[pa])
+pm.pz.set_lb_method("RCB")
+pm.pz.Zoltan_Set_Param("DEBUG_LEVEL", "0")
+pm.update()
+pm.set_dynamic_lb(True, threshold=1.1)
+pm.set_lb_freq(1)
+
+# skewed work: the lightly loaded processors wait for the root
+work = 0.04 if rank == 0 else 0.01
+pm.add_work(work)
+time.sleep(0.05 - work)
+comm.barrier()
+
+rebalance = pm.measure_imbalance()
+expect = 0.04/((0.04 + 0.01*(size - 1))/size)
+assert abs(pm.imbalance - expect) < 1e-12, (pm.imbalance, expect)
+assert rebalance
+
+# balanced work does not trigger a load balancing
+pm.add_work(0.01)
+assert not pm.measure_imbalance()
+assert pm.imbalance == 1.0
+
+# the skewed work triggers a load balancing in the update
+n_rebalances = pm.n_rebalances
+pm.add_work(work)
+pm.update()
+assert pm.n_rebalances == n_rebalances + 1
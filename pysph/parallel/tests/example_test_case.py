@@ -59,7 +59,8 @@ class ExampleTestCase(unittest.TestCase):
         return cmd_line
 
     def run_example(self, filename, nprocs=2, timeout=300, atol=1e-14,
-                    serial_kwargs=None, extra_parallel_kwargs=None):
+                    serial_kwargs=None, extra_parallel_kwargs=None,
+                    match_gids=None):
         """Run an example and compare the results in serial and parallel.
 
         Parameters:
@@ -85,11 +86,18 @@ class ExampleTestCase(unittest.TestCase):
         extra_parallel_kwargs: dict
             The extra options to pass for the parallel run.
 
+        match_gids: bool
+            If True, the particles of the parallel run are matched to those
+            of the serial run using their global ids, otherwise their order
+            must be the same.  Defaults to True when `nprocs` > 1.
+
         """
         if serial_kwargs is None:
             serial_kwargs = {}
         if extra_parallel_kwargs is None:
             extra_parallel_kwargs = {}
+        if match_gids is None:
+            match_gids = nprocs > 1
 
         parallel_kwargs = dict(serial_kwargs)
         parallel_kwargs.update(extra_parallel_kwargs)
@@ -138,9 +146,9 @@ class ExampleTestCase(unittest.TestCase):
             shutil.rmtree(dir2, True)
 
         # test
-        self._test(serial, parallel, atol, nprocs)
+        self._test(serial, parallel, atol, match_gids)
 
-    def _test(self, serial, parallel, atol, nprocs):
+    def _test(self, serial, parallel, atol, match_gids):
         # make sure the arrays are at the same time
         self.assertAlmostEqual( serial.time, parallel.time, 12)
 
@@ -148,7 +156,7 @@ class ExampleTestCase(unittest.TestCase):
         xs, ys, zs, rhos  = serial.get("x","y", "z", "rho")
         xp, yp, zp, rhop, gid = parallel.get("x", "y", "z", "rho", 'gid')
 
-        if nprocs == 1:
+        if not match_gids:
             # Not really a parallel run (used for openmp support).
             gid = np.arange(xs.size)
 
@@ -0,0 +1,62 @@
+"""Test the validity check of the halo refresh of the parallel manager.
+
+After a full update, the remote particles are refreshed as long as the
+local particles have moved less than the skin allows and a full update is
+done once they have moved more.
+"""
+import mpi4py.MPI as mpi
+import numpy as np
+
+from pysph.base.utils import get_particle_array_wcsph
+from pysph.parallel.parallel_manager import ZoltanParallelManagerGeometric
+
+comm = mpi.COMM_WORLD
+rank = comm.Get_rank()
+
+# all the particles start on the root
+if rank == 0:
+    x, y = np.mgrid[0:1:20j, 0:1:20j]
+    x, y = x.ravel(), y.ravel()
+else:
+    x, y = np.array([]), np.array([])
+h = 0.1
+pa = get_particle_array_wcsph(name='fluid', x=x, y=y, h=h, m=1.0)
+
+pm = ZoltanParallelManagerGeometric(
+    dim=2, comm=comm, particles=[pa], radius_scale=2.0, ghost_layers=2
+)
+pm.pz.set_lb_method("RCB")
+pm.pz.Zoltan_Set_Param("DEBUG_LEVEL", "0")
+skin = 0.1
+pm.set_halo_refresh(True, skin=skin)
+
+# the halo is not valid before the first full update
+assert not pm.halo_is_valid()
+pm.update()
+pm.set_lb_freq(100)
+assert pm.n_full_updates == 1
+assert pm.halo_is_valid()
+
+# the particles may approach each other by cell_size + skin - 2*h
+allowed = 0.5*(pm.halo_cell_size + skin - pm.radius_scale*h)
+assert allowed > 0.0
+
+# moved by less than the skin allows, only the halo is refreshed
+n = pa.get_number_of_particles(real=True)
+pa.x[:n] += 0.5*allowed
+assert pm.halo_is_valid()
+n_refreshes = pm.n_halo_refreshes
+pm.update()
+assert pm.n_full_updates == 1
+assert pm.n_halo_refreshes == n_refreshes + 1
+
+# moved by more than the skin allows, a full update is done
+n = pa.get_number_of_particles(real=True)
+pa.x[:n] += 0.6*allowed
+assert not pm.halo_is_valid()
+pm.update()
+assert pm.n_full_updates == 2
+assert pm.n_halo_refreshes == n_refreshes + 1
+
+# the displacements are measured from the last full update
+assert pm.halo_is_valid()
@@ -0,0 +1,181 @@
+import unittest
+
+import numpy as np
+
+from pysph.base.nnps_base import NNPSParticleArrayWrapper
+from pysph.base.utils import get_particle_array
+from pysph.parallel.cell_index import CellIndex
+
+
+class TestCellIndex(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(123)
+        self.cell_size = 0.25
+        x1, y1 = np.random.uniform(-1, 1, (2, 100))
+        x2, y2 = np.random.uniform(-0.5, 1.5, (2, 50))
+        self.pa1 = get_particle_array(name='a', x=x1, y=y1)
+        self.pa2 = get_particle_array(name='b', x=x2, y=y2)
+        self.wrappers = [NNPSParticleArrayWrapper(self.pa1),
+                         NNPSParticleArrayWrapper(self.pa2)]
+
+    def _get_cids(self, pa):
+        return np.floor(
+            np.c_[pa.x, pa.y, pa.z]/self.cell_size
+        ).astype(np.int64)
+
+    def test_should_bin_all_particles(self):
+        # Given
+        cells = CellIndex(2)
+
+        # When
+        cells.build(self.wrappers, self.cell_size, [100, 50])
+
+        # Then
+        self.assertEqual(cells.ncells_local, cells.ncells_total)
+        self.assertTrue(np.all(np.diff(cells.keys) > 0))
+        self.assertEqual(cells.sizes.sum(), 150)
+        for pa_index, pa in enumerate((self.pa1, self.pa2)):
+            cids = self._get_cids(pa)
+            found = []
+            for cell in range(cells.ncells_total):
+                idx = cells.get_particles(pa_index, cell)
+                found.extend(idx)
+                np.testing.assert_array_equal(
+                    cids[idx], np.tile(cells.cids[cell], (len(idx), 1))
+                )
+            self.assertEqual(
+                sorted(found), list(range(pa.get_number_of_particles()))
+            )
+            self.assertTrue(np.all(cells.find(cids) >= 0))
+
+    def test_remote_only_cells_are_numbered_last(self):
+        # Given
+        cells = CellIndex(2)
+
+        # When
+        # The particles of the second array are treated as remote.
+        cells.build(self.wrappers, self.cell_size, [100, 0], [0, 50])
+
+        # Then
+        local_cids = set(map(tuple, self._get_cids(self.pa1)))
+        all_cids = local_cids | set(map(tuple, self._get_cids(self.pa2)))
+        self.assertEqual(cells.ncells_local, len(local_cids))
+        self.assertEqual(cells.ncells_total, len(all_cids))
+        self.assertEqual(
+            set(map(tuple, cells.cids[:cells.ncells_local])), local_cids
+        )
+        np.testing.assert_array_equal(
+            cells.find(cells.cids), np.arange(cells.ncells_total)
+        )
+        self.assertEqual(cells.find(np.array([[100, 100, 100]]))[0], -1)
+
+    def test_expand_and_neighbor_sizes(self):
+        # Given
+        cells = CellIndex(2)
+        cells.build(self.wrappers, self.cell_size, [100, 50])
+        counts = cells.get_counts()
+
+        # When
+        idx, procs = cells.expand(0, [0, 2, 0], [1, 3, 2])
+        nbr_sizes = cells.get_neighbor_sizes()
+
+        # Then
+        expected = np.concatenate([cells.get_particles(0, c)
+                                   for c in (0, 2, 0)])
+        np.testing.assert_array_equal(idx, expected)
+        np.testing.assert_array_equal(
+            procs, np.repeat([1, 3, 2], counts[0][[0, 2, 0]])
+        )
+        cids = cells.cids
+        for cell in range(cells.ncells_total):
+            near = np.all(np.abs(cids - cids[cell]) <= 1, axis=1)
+            self.assertEqual(nbr_sizes[cell], cells.sizes[near].sum())
+
+    def _assert_same_index(self, cells, expect):
+        self.assertEqual(cells.ncells_local, expect.ncells_local)
+        self.assertEqual(cells.ncells_total, expect.ncells_total)
+        np.testing.assert_array_equal(cells.keys, expect.keys)
+        np.testing.assert_array_equal(cells.sizes, expect.sizes)
+        for i in range(2):
+            np.testing.assert_array_equal(cells.starts[i], expect.starts[i])
+            np.testing.assert_array_equal(cells.indices[i], expect.indices[i])
+        np.testing.assert_array_equal(
+            cells.find(expect.cids), np.arange(expect.ncells_total)
+        )
+
+    def test_patch_matches_build_after_particles_move(self):
+        # Given
+        cells = CellIndex(2)
+        # The last particles of the first array are remote.
+        cells.build(self.wrappers, self.cell_size, [90, 50], [10, 0])
+
+        # When
+        # Move a few particles, remove some as if exported and add others
+        # as if imported.
+        self.pa1.x[:5] += 0.3
+        self.pa1.remove_particles([7, 20, 95, 96, 97, 98, 99])
+        self.pa1.add_particles(x=[0.1, 2.0], y=[0.1, 2.0])
+        self.pa2.y[10:20] -= 0.6
+        self.pa2.remove_particles([3, 49])
+        num_local = [self.pa1.get_number_of_particles(),
+                     self.pa2.get_number_of_particles()]
+        cells.patch(self.wrappers, self.cell_size, num_local)
+
+        # Then
+        expect = CellIndex(2)
+        expect.build(self.wrappers, self.cell_size, num_local)
+        self._assert_same_index(cells, expect)
+
+        # When
+        # A patch with a different cell size bins again.
+        cells.patch(self.wrappers, 0.5, num_local)
+
+        # Then
+        expect.build(self.wrappers, 0.5, num_local)
+        self._assert_same_index(cells, expect)
+
+    def test_particle_crossing_a_cut_within_its_cell_is_not_changed(self):
+        # Given
+        cells = CellIndex(2)
+        cells.build(self.wrappers, self.cell_size, [100, 50])
+        indices = [x.copy() for x in cells.indices]
+        # A partition boundary through the middle of the cell of the first
+        # particle, which is moved across it without leaving the cell.
+        x0 = self.pa1.x[0]
+        lo = np.floor(x0/self.cell_size)*self.cell_size
+        cut = lo + 0.5*self.cell_size
+        self.pa1.x[0] = cut + 0.25*self.cell_size if x0 < cut else \
+            cut - 0.25*self.cell_size
+        # A particle of the other array changes cell.
+        self.pa2.x[3] += self.cell_size
+
+        # When
+        changed = [
+            cells.get_changed_particles(i, self.wrappers[i], n,
+                                        self.cell_size)
+            for i, n in enumerate([100, 50])
+        ]
+
+        # Then
+        self.assertEqual(len(changed[0]), 0)
+        np.testing.assert_array_equal(changed[1], [3])
+        # All the particles are reported when the cell size changes.
+        np.testing.assert_array_equal(
+            cells.get_changed_particles(0, self.wrappers[0], 100, 0.5),
+            np.arange(100)
+        )
+
+        # When
+        cells.patch(self.wrappers, self.cell_size, [100, 50])
+
+        # Then
+        # The particle is still indexed in the same cell, so it remains
+        # local to the processor owning the cell.
+        np.testing.assert_array_equal(cells.indices[0], indices[0])
+        expect = CellIndex(2)
+        expect.build(self.wrappers, self.cell_size, [100, 50])
+        self._assert_same_index(cells, expect)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -28,6 +28,32 @@ class ParticleArrayExchangeTestCase(unittest.TestCase):
         run_parallel_script.run(filename='remote_exchange.py', nprocs=4, path=path)
 
 
+class DynamicLoadBalancingTestCase(unittest.TestCase):
+
+    @classmethod
+    def setup_class(cls):
+        importorskip("mpi4py.MPI")
+        importorskip("pyzoltan.core.zoltan")
+
+    @mark.parallel
+    def test_skewed_work_is_measured(self):
+        run_parallel_script.run(filename='dynamic_lb.py', nprocs=4, path=path)
+
+
+class HaloRefreshTestCase(unittest.TestCase):
+
+    @classmethod
+    def setup_class(cls):
+        importorskip("mpi4py.MPI")
+        importorskip("pyzoltan.core.zoltan")
+
+    @mark.parallel
+    def test_halo_is_valid_within_skin(self):
+        run_parallel_script.run(
+            filename='halo_refresh.py', nprocs=2, path=path
+        )
+
+
 class SummationDensityTestCase(unittest.TestCase):
 
     @classmethod
@@ -44,6 +44,32 @@ class ParallelTests(ExampleTestCase):
             extra_parallel_kwargs=extra_parallel_kwargs
         )
 
+    @mark.slow
+    @mark.parallel
+    def test_elliptical_drop_with_halo_refresh(self):
+        serial_kwargs = dict(sort_gids=None, kernel='CubicSpline', tf=0.0038)
+        extra_parallel_kwargs = dict(
+            ghost_layers=2, lb_freq=5, halo_refresh=None
+        )
+        self.run_example(
+            'elliptical_drop.py', nprocs=2, atol=1e-11,
+            serial_kwargs=serial_kwargs,
+            extra_parallel_kwargs=extra_parallel_kwargs
+        )
+
+    @mark.slow
+    @mark.parallel
+    def test_elliptical_drop_with_halo_overlap(self):
+        serial_kwargs = dict(sort_gids=None, kernel='CubicSpline', tf=0.0038)
+        extra_parallel_kwargs = dict(
+            ghost_layers=2, lb_freq=5, halo_overlap=None
+        )
+        self.run_example(
+            'elliptical_drop.py', nprocs=2, atol=1e-11,
+            serial_kwargs=serial_kwargs,
+            extra_parallel_kwargs=extra_parallel_kwargs
+        )
+
     @mark.parallel
     def test_ldcavity_example(self):
         max_steps = 150
@@ -54,6 +80,46 @@ class ParallelTests(ExampleTestCase):
             extra_parallel_kwargs=extra_parallel_kwargs
         )
 
+
+class SFCParallelTests(ExampleTestCase):
+
+    @classmethod
+    def setup_class(cls):
+        importorskip("mpi4py.MPI")
+
+    @mark.slow
+    @mark.parallel
+    def test_elliptical_drop_with_sfc(self):
+        serial_kwargs = dict(sort_gids=None, kernel='CubicSpline', tf=0.0038)
+        extra_parallel_kwargs = dict(
+            ghost_layers=2, lb_freq=5, with_sfc=None
+        )
+        self.run_example(
+            'elliptical_drop.py', nprocs=2, atol=1e-11,
+            serial_kwargs=serial_kwargs,
+            extra_parallel_kwargs=extra_parallel_kwargs
+        )
+
+
+class SharedMemoryParallelTests(ExampleTestCase):
+
+    @classmethod
+    def setup_class(cls):
+        importorskip("multiprocessing.shared_memory")
+
+    @mark.slow
+    @mark.parallel
+    def test_elliptical_drop_with_shm_procs(self):
+        serial_kwargs = dict(sort_gids=None, kernel='CubicSpline', tf=0.0038)
+        extra_parallel_kwargs = dict(ghost_layers=2, lb_freq=5, shm_procs=2)
+        # The workers are started by the example itself, the output is
+        # still that of a parallel run.
+        self.run_example(
+            'elliptical_drop.py', nprocs=1, atol=1e-11,
+            serial_kwargs=serial_kwargs,
+            extra_parallel_kwargs=extra_parallel_kwargs, match_gids=True
+        )
+
 if __name__ == '__main__':
     import unittest
     unittest.main()
@@ -0,0 +1,91 @@
+"""Tests for the packing of the particles exchanged by the processors."""
+
+import unittest
+
+import numpy as np
+from pytest import importorskip
+
+from pysph.base.utils import get_particle_array_wcsph
+
+
+class SerialComm(object):
+    """Only provides the rank and size of a single processor, the packing
+    does not communicate.
+    """
+    def Get_rank(self):
+        return 0
+
+    def Get_size(self):
+        return 1
+
+
+class TestPackUnpack(unittest.TestCase):
+
+    @classmethod
+    def setup_class(cls):
+        importorskip("mpi4py.MPI")
+        importorskip("pyzoltan.core.zoltan")
+
+    def setUp(self):
+        from pysph.parallel.parallel_manager import ParticleArrayExchange
+        x = np.linspace(0, 1, 10)
+        self.src = get_particle_array_wcsph(
+            name='fluid', x=x, y=2*x, h=np.ones_like(x)*0.1,
+            rho=1000 + x, m=np.ones_like(x)
+        )
+        self.src.tag[:] = np.arange(10) % 3
+        self.src.gid[:] = np.arange(10, 20)
+        self.dest = get_particle_array_wcsph(
+            name='fluid', x=np.zeros(3), h=np.zeros(3), m=np.zeros(3)
+        )
+        self.src_exchange = ParticleArrayExchange(0, self.src, SerialComm())
+        self.dest_exchange = ParticleArrayExchange(
+            0, self.dest, SerialComm()
+        )
+
+    def test_round_trip_copies_all_lb_props(self):
+        # Given
+        indices = np.array([7, 2, 5], dtype=np.uint32)
+
+        # When
+        buf = self.src_exchange.pack(indices)
+        self.dest_exchange.unpack(buf, 0)
+
+        # Then
+        for prop in self.src.get_lb_props():
+            np.testing.assert_array_equal(
+                self.dest.get(prop), self.src.get(prop)[indices]
+            )
+
+    def test_round_trip_of_some_props_at_offset(self):
+        # Given
+        indices = np.array([9, 0], dtype=np.uint32)
+        rho = self.dest.rho.copy()
+
+        # When
+        buf = self.src_exchange.pack(indices, ['x', 'gid'])
+        self.dest_exchange.unpack(buf, 1)
+
+        # Then
+        np.testing.assert_array_equal(self.dest.x[1:], self.src.x[indices])
+        np.testing.assert_array_equal(
+            self.dest.gid[1:], self.src.gid[indices]
+        )
+        np.testing.assert_array_equal(self.dest.rho, rho)
+
+    def test_send_buffer_is_reused(self):
+        # Given
+        buf = self.src_exchange.pack(np.arange(5, dtype=np.uint32))
+
+        # When
+        buf1 = self.src_exchange.pack(np.arange(3, dtype=np.uint32))
+
+        # Then
+        self.assertEqual(len(buf1), 3)
+        self.assertTrue(np.shares_memory(buf, buf1))
+        usage = self.src_exchange.memory_usage()['pack_buffers']
+        self.assertEqual(usage[0], buf.nbytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
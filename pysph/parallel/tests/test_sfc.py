@@ -0,0 +1,134 @@
+import itertools
+import unittest
+
+import numpy as np
+from pytest import importorskip
+
+from pysph.base.utils import get_particle_array
+from pysph.parallel.sfc_parallel_manager import (
+    find_splitters, get_hilbert_keys, get_morton_keys, get_owners
+)
+from pysph.parallel.shm_comm import SUM, run_workers
+from pysph.parallel.shm_parallel_manager import SharedMemoryParallelManager
+
+
+def _get_grid(dim, nbits):
+    n = 1 << nbits
+    return np.array(list(itertools.product(range(n), repeat=dim)))
+
+
+class TestSFCKeys(unittest.TestCase):
+    def test_morton_keys_interleave_bits(self):
+        # Given
+        cells = np.array([[0, 0], [0, 1], [1, 0], [1, 1], [2, 3], [3, 3]])
+
+        # When
+        keys = get_morton_keys(cells, 2)
+
+        # Then
+        np.testing.assert_array_equal(keys, [0, 1, 2, 3, 13, 15])
+
+    def test_hilbert_keys_visit_neighboring_cells(self):
+        for dim, nbits in ((2, 4), (3, 3)):
+            # Given
+            cells = _get_grid(dim, nbits)
+
+            # When
+            keys = get_hilbert_keys(cells, nbits)
+
+            # Then
+            self.assertEqual(
+                sorted(keys.tolist()), list(range(len(cells)))
+            )
+            path = cells[np.argsort(keys)]
+            steps = np.abs(np.diff(path, axis=0)).sum(axis=1)
+            np.testing.assert_array_equal(steps, 1)
+
+    def test_keys_of_no_cells(self):
+        for dim in (1, 2, 3):
+            cells = np.zeros((0, dim), dtype=np.int64)
+            self.assertEqual(len(get_hilbert_keys(cells, 3)), 0)
+            self.assertEqual(len(get_morton_keys(cells, 3)), 0)
+
+
+class TestFindSplitters(unittest.TestCase):
+    def test_splitters_balance_the_weights(self):
+        # Given
+        keys = np.arange(100, dtype=np.uint64)
+        weights = np.ones(100)
+        weights[:60] = 2.0
+
+        # When
+        splitters = find_splitters(keys, weights, 4, 128)
+        owners = get_owners(keys, splitters)
+
+        # Then
+        work = np.bincount(owners, weights=weights, minlength=4)
+        np.testing.assert_array_equal(work, 40.0)
+        np.testing.assert_array_equal(splitters, [20, 40, 60])
+        self.assertTrue(np.all(np.diff(owners) >= 0))
+
+    def test_splitters_with_repeated_keys(self):
+        # Given
+        keys = np.array([5, 5, 5, 5, 9, 9, 9, 9], dtype=np.uint64)
+        weights = np.ones(8)
+
+        # When
+        splitters = find_splitters(keys, weights, 2, 16)
+
+        # Then
+        np.testing.assert_array_equal(get_owners(keys, splitters),
+                                      [0, 0, 0, 0, 1, 1, 1, 1])
+
+
+def _update_from_one_rank(comm, curve):
+    # All the particles start on the root as in a parallel run.
+    if comm.Get_rank() == 0:
+        x, y = np.mgrid[0:1:20j, 0:1:10j]
+        x, y = x.ravel(), y.ravel()
+    else:
+        x, y = np.array([]), np.array([])
+    h = np.ones_like(x)*0.05
+    pa = get_particle_array(name='fluid', x=x, y=y, h=h, m=h)
+    pm = SharedMemoryParallelManager(dim=2, particles=[pa], comm=comm,
+                                     curve=curve)
+    pm.update()
+    n_local = pa.get_number_of_particles(real=True)
+    assert n_local > 0
+    assert comm.allreduce(n_local, op=SUM) == 200
+
+
+def _update_with_ranks_left_empty(comm, curve):
+    # A few particles in a single cell cannot be shared by the processors
+    # so some of them stay empty over repeated updates.
+    if comm.Get_rank() == 0:
+        x = np.array([0.1, 0.11, 0.12, 0.13])
+    else:
+        x = np.array([])
+    h = np.ones_like(x)*0.5
+    pa = get_particle_array(name='fluid', x=x, y=np.zeros_like(x), h=h, m=h)
+    pm = SharedMemoryParallelManager(dim=2, particles=[pa], comm=comm,
+                                     curve=curve)
+    for i in range(3):
+        pm.update()
+        n_local = pa.get_number_of_particles(real=True)
+        counts = comm.allgather(n_local)
+        assert sum(counts) == 4, counts
+        assert min(counts) == 0, counts
+
+
+class TestSFCParallelManager(unittest.TestCase):
+    def setUp(self):
+        importorskip("multiprocessing.shared_memory")
+
+    def test_update_with_empty_ranks(self):
+        for curve in ('hilbert', 'morton', 'slab'):
+            run_workers(_update_from_one_rank, 2, args=(curve,))
+
+    def test_update_with_ranks_left_empty(self):
+        for curve in ('hilbert', 'morton'):
+            run_workers(_update_with_ranks_left_empty, 3, args=(curve,))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+import numpy as np
+from pytest import importorskip
+
+from pysph.parallel.shm_comm import MAX, MIN, run_workers
+
+
+def _check_object_collectives(comm):
+    rank, size = comm.Get_rank(), comm.Get_size()
+
+    data = comm.bcast(dict(x=[1, 2]) if rank == 0 else None, root=0)
+    assert data == dict(x=[1, 2])
+
+    gathered = comm.gather(rank*10, root=1)
+    if rank == 1:
+        assert gathered == [i*10 for i in range(size)]
+    else:
+        assert gathered is None
+
+    assert comm.allgather('r%d' % rank) == ['r%d' % i for i in range(size)]
+    assert comm.scatter(list(range(size)) if rank == 0 else None) == rank
+    assert comm.allreduce(rank + 1) == size*(size + 1)//2
+    assert comm.allreduce(rank + 1.5, op=MIN) == 1.5
+    assert comm.exscan(rank + 1) == (None if rank == 0 else
+                                     rank*(rank + 1)//2)
+
+
+def _check_array_collectives(comm):
+    rank, size = comm.Get_rank(), comm.Get_size()
+
+    # Large enough to grow the mailboxes.
+    data = np.arange(50000, dtype=float) + rank
+    result = np.empty_like(data)
+    comm.Allreduce(data, result, op=MAX)
+    np.testing.assert_array_equal(result, np.arange(50000) + size - 1)
+
+    # Each rank sends p + 1 records with its rank to each processor p.
+    dtype = np.dtype([('gid', np.int64), ('x', np.float32)])
+    send_counts = np.arange(1, size + 1)
+    sendbuf = np.zeros(send_counts.sum(), dtype=dtype)
+    sendbuf['gid'] = rank
+    sendbuf['x'] = np.repeat(np.arange(size), send_counts)
+    recvbuf = comm.alltoallv(sendbuf, send_counts)
+    np.testing.assert_array_equal(
+        recvbuf['gid'], np.repeat(np.arange(size), rank + 1)
+    )
+    np.testing.assert_array_equal(recvbuf['x'], rank)
+
+
+def _fail_on_last_rank(comm):
+    if comm.Get_rank() == comm.Get_size() - 1:
+        raise ValueError('Expected failure.')
+    comm.barrier()
+
+
+class TestSharedMemoryComm(unittest.TestCase):
+    def setUp(self):
+        importorskip("multiprocessing.shared_memory")
+
+    def test_object_collectives(self):
+        run_workers(_check_object_collectives, 3)
+
+    def test_array_collectives(self):
+        run_workers(_check_array_collectives, 3)
+
+    def test_failed_worker_does_not_hang_the_others(self):
+        with self.assertRaises(RuntimeError):
+            run_workers(_fail_on_last_rank, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
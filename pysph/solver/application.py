@@ -21,13 +21,20 @@ from pysph.base.nnps import LinkedListNNPS, BoxSortNNPS, SpatialHashNNPS, \
 
 from pysph.base import kernels
 from pysph.cpy.config import get_config
+from pyzoltan.core.carray import set_parallel_first_touch
+from pysph.solver.checkpoint import (EXTENSION as CHECKPOINT_EXTENSION,
+    find_latest_checkpoint, get_rank_files, load_checkpoint)
 from pysph.solver.controller import CommandManager
+from pysph.solver.output import OutputEncoding, codecs
 from pysph.solver.utils import mkdir, load, get_files
 
 # conditional parallel imports
 from pysph import has_mpi, has_zoltan, in_parallel
 if in_parallel():
     from pysph.parallel.parallel_manager import ZoltanParallelManagerGeometric
+# The space filling curve partitioner only requires mpi4py.
+if has_mpi():
+    from pysph.parallel.sfc_parallel_manager import SFCParallelManager
     import mpi4py.MPI as mpi
 
 logger = logging.getLogger(__name__)
@@ -164,7 +171,7 @@ class Application(object):
         self.comm = None
         self.num_procs = 1
         self.rank = 0
-        if in_parallel():
+        if has_mpi():
             self.comm = comm = mpi.COMM_WORLD
             self.num_procs = comm.Get_size()
             self.rank = comm.Get_rank()
@@ -181,6 +188,8 @@ class Application(object):
         self.output_dir = abspath(self._get_output_dir_from_fname())
         self.particles = []
         self.inlet_outlet = []
+        # Metadata of the checkpoint used to restart, if any.
+        self._restart_meta = None
 
         self.initialize()
         self.scheme = self.create_scheme()
@@ -339,6 +348,47 @@ class Application(object):
             type=int,
             help="Printing frequency for the output")
 
+        # --timings-freq.
+        parser.add_argument(
+            "--timings-freq",
+            action="store",
+            dest="timings_freq",
+            default=0,
+            type=int,
+            help="Write the per-step timings to the output directory "
+            "every these many steps (0 disables this).")
+
+        # --memory-report.
+        parser.add_argument(
+            "--memory-report",
+            action="store",
+            dest="memory_report",
+            default=0,
+            type=int,
+            help="Log the memory used by the particles, neighbor search "
+            "and parallel manager and the peak memory of each phase every "
+            "these many steps and at the end (0 disables this).")
+
+        # --estimate.
+        parser.add_argument(
+            "--estimate",
+            action="store_true",
+            dest="estimate",
+            default=False,
+            help="Setup the case, estimate the memory and run time of the "
+            "simulation and exit without running it.  The report is also "
+            "written to the output directory.")
+
+        # --estimate-fraction.
+        parser.add_argument(
+            "--estimate-fraction",
+            action="store",
+            dest="estimate_fraction",
+            default=0.1,
+            type=float,
+            help="Fraction of the particles used to time the acceleration "
+            "evaluation for --estimate.")
+
         # --detailed-output.
         parser.add_argument(
             "--detailed-output",
@@ -356,6 +406,34 @@ class Application(object):
             default=False,
             help="Compress generated output files.")
 
+        # --output-codec
+        parser.add_argument(
+            "--output-codec",
+            action="store",
+            dest="output_codec",
+            default=None,
+            help="Codec used for the output, one of %s with an optional "
+            "level, for example 'gzip:4' or 'zstd:3'. This implies "
+            "--compress-output." % (codecs,))
+
+        # --output-shuffle
+        parser.add_argument(
+            "--output-shuffle",
+            action="store_true",
+            dest="output_shuffle",
+            default=False,
+            help="Apply the byte shuffle filter to compressed HDF5 output.")
+
+        # --output-precision
+        parser.add_argument(
+            "--output-precision",
+            action="store",
+            dest="output_precision",
+            default=None,
+            help="Comma separated list of prop=dtype to store the given "
+            "properties with reduced precision, for example "
+            "'p=float32,rho=float16'. This is lossy.")
+
         # --output-remote
         parser.add_argument(
             "--output-dump-remote",
@@ -393,9 +471,22 @@ class Application(object):
             "--omp-schedule",
             action="store",
             dest="omp_schedule",
-            default="dynamic,64",
+            default=None,
             help="""Schedule how loop iterations
-            are divided amongst multiple threads""")
+            are divided amongst multiple threads, defaults to
+            "dynamic,64" or to "static" with --pin-threads.""")
+
+        # --pin-threads
+        parser.add_argument(
+            "--pin-threads",
+            action="store_true",
+            dest="pin_threads",
+            default=False,
+            help="Pin the processes on each host to disjoint blocks of "
+            "cores, filling the NUMA nodes in order, and each OpenMP thread "
+            "to one core of its block.  The loops are then statically "
+            "scheduled and the particle arrays first touched in parallel so "
+            "that each thread works on memory local to it.")
 
         # --opencl
         parser.add_argument(
@@ -421,6 +512,20 @@ class Application(object):
             default=False,
             help="Use double precision for OpenCL code.")
 
+        # --unused-props
+        parser.add_argument(
+            "--unused-props",
+            action="store",
+            dest="unused_props",
+            default=None,
+            choices=["keep", "exclude", "remove"],
+            help="What to do with the properties that no equation or "
+            "integrator stepper uses, other than the output arrays: "
+            "keep them, exclude them from the exchange between processors "
+            "or remove them from the particle arrays (default: keep).  "
+            "Properties used only by the tools or callbacks must be kept "
+            "with Solver.set_unused_properties.")
+
         # --kernel
         all_kernels = list_all_kernels()
         parser.add_argument(
@@ -440,7 +545,35 @@ class Application(object):
             action="store",
             dest="restart_file",
             default=None,
-            help=("""Restart a PySPH simulation using a specified file """))
+            help=("""Restart a PySPH simulation using a specified file.
+            This may be an output file, a checkpoint file or a directory in
+            which case the latest checkpoint found there is used."""))
+
+        restart.add_argument(
+            "--checkpoint-freq",
+            action="store",
+            dest="checkpoint_freq",
+            default=0,
+            type=int,
+            help=("Write a checkpoint every these many iterations "
+                  "(0 disables this)."))
+
+        restart.add_argument(
+            "--checkpoint-interval",
+            action="store",
+            dest="checkpoint_interval",
+            default=0.0,
+            type=float,
+            help=("Write a checkpoint every these many minutes of wall clock "
+                  "time (0 disables this)."))
+
+        restart.add_argument(
+            "--checkpoint-keep",
+            action="store",
+            dest="checkpoint_keep",
+            default=2,
+            type=int,
+            help=("Number of checkpoints to retain."))
 
         restart.add_argument(
             "--rescale-dt",
@@ -544,6 +677,34 @@ class Application(object):
             default=True,
             help="Use PyZoltan for dynamic load balancing")
 
+        zoltan.add_argument(
+            "--with-sfc",
+            action="store_true",
+            dest="with_sfc",
+            default=False,
+            help=("Partition along a space filling curve instead of using "
+                  "Zoltan, this only requires mpi4py."))
+
+        zoltan.add_argument(
+            "--sfc-curve",
+            action="store",
+            dest="sfc_curve",
+            default=None,
+            choices=["hilbert", "morton", "slab"],
+            help=("The space filling curve to use with --with-sfc or "
+                  "--shm-procs, 'slab' cuts the domain normal to its longest "
+                  "direction. Defaults to 'hilbert' with --with-sfc and "
+                  "'slab' with --shm-procs."))
+
+        zoltan.add_argument(
+            "--shm-procs",
+            action="store",
+            dest="shm_procs",
+            default=1,
+            type=int,
+            help=("Run on this many processes of this machine communicating "
+                  "through shared memory, this does not require MPI."))
+
         zoltan.add_argument(
             "--zoltan-lb-method",
             action="store",
@@ -604,6 +765,51 @@ class Application(object):
             type=int,
             help=('The frequency for load balancing'))
 
+        zoltan.add_argument(
+            "--halo-refresh",
+            action="store_true",
+            dest="halo_refresh",
+            default=False,
+            help=("Only refresh the properties of the remote particles "
+                  "between load balancing steps while they still cover the "
+                  "halo of the local particles."))
+
+        zoltan.add_argument(
+            "--halo-skin",
+            action='store',
+            dest='halo_skin',
+            default=0.0,
+            type=float,
+            help=("Distance particles may move before a full parallel "
+                  "update when using --halo-refresh, defaults to "
+                  "(ghost_layers - 1)*cell_size."))
+
+        zoltan.add_argument(
+            "--halo-overlap",
+            action="store_true",
+            dest="halo_overlap",
+            default=False,
+            help=("Evaluate the particles with no remote neighbors while "
+                  "the remote data is being sent, implies --halo-refresh."))
+
+        zoltan.add_argument(
+            "--dynamic-lb",
+            action="store_true",
+            dest="dynamic_lb",
+            default=False,
+            help=("Load balance based on the measured compute time when the "
+                  "imbalance exceeds --lb-threshold, --lb-freq is then the "
+                  "minimum number of updates between load balancing."))
+
+        zoltan.add_argument(
+            "--lb-threshold",
+            action='store',
+            dest='lb_threshold',
+            default=1.1,
+            type=float,
+            help=("Ratio of the maximum to the mean compute time of the "
+                  "processors above which to load balance with --dynamic-lb."))
+
         zoltan.add_argument(
             "--zoltan-debug-level",
             action="store",
@@ -639,7 +845,8 @@ class Application(object):
             default='collected',
             choices=['collected', 'distributed'],
             help="""Use 'collected' to dump one output at
-            root or 'distributed' for every processor. """)
+            root or 'distributed' for every processor along with an index
+            of the files, see 'pysph merge_output'. """)
 
         # solver interfaces
         interfaces = parser.add_argument_group("Interfaces",
@@ -765,6 +972,134 @@ class Application(object):
             for obj in self.inlet_outlet:
                 solver.add_post_step_callback(obj.update)
 
+    def _create_nnps(self, particles, kernel, fixed_h, domain):
+        """Create the NNPS chosen by the command line options for the given
+        particle arrays.
+        """
+        options = self.options
+        solver = self.solver
+        cache = options.cache_nnps
+        # create the NNPS object
+        if options.with_opencl:
+            from pysph.base.gpu_nnps import ZOrderGPUNNPS
+            nnps = ZOrderGPUNNPS(
+                dim=solver.dim,
+                particles=particles,
+                radius_scale=kernel.radius_scale,
+                domain=domain,
+                cache=True,
+                sort_gids=options.sort_gids)
+
+        elif options.nnps == 'box':
+            nnps = BoxSortNNPS(
+                dim=solver.dim,
+                particles=particles,
+                radius_scale=kernel.radius_scale,
+                domain=domain,
+                cache=cache,
+                sort_gids=options.sort_gids)
+
+        elif options.nnps == 'll':
+            nnps = LinkedListNNPS(
+                dim=solver.dim,
+                particles=particles,
+                radius_scale=kernel.radius_scale,
+                domain=domain,
+                fixed_h=fixed_h,
+                cache=cache,
+                sort_gids=options.sort_gids)
+
+        elif options.nnps == 'sh':
+            nnps = SpatialHashNNPS(
+                dim=solver.dim,
+                particles=particles,
+                radius_scale=kernel.radius_scale,
+                domain=domain,
+                fixed_h=fixed_h,
+                cache=cache,
+                table_size=options.table_size,
+                sort_gids=options.sort_gids)
+
+        elif options.nnps == 'esh':
+            nnps = ExtendedSpatialHashNNPS(
+                dim=solver.dim,
+                particles=particles,
+                radius_scale=kernel.radius_scale,
+                domain=domain,
+                fixed_h=fixed_h,
+                cache=cache,
+                H=options.H,
+                table_size=options.table_size,
+                sort_gids=options.sort_gids,
+                approximate=options.approximate_nnps)
+
+        elif options.nnps == 'strat_hash':
+            nnps = StratifiedHashNNPS(
+                dim=solver.dim,
+                particles=particles,
+                radius_scale=kernel.radius_scale,
+                domain=domain,
+                fixed_h=fixed_h,
+                cache=cache,
+                table_size=options.table_size,
+                sort_gids=options.sort_gids,
+                num_levels=options.num_levels)
+
+        elif options.nnps == 'strat_sfc':
+            nnps = StratifiedSFCNNPS(
+                dim=solver.dim,
+                particles=particles,
+                radius_scale=kernel.radius_scale,
+                domain=domain,
+                fixed_h=fixed_h,
+                cache=cache,
+                sort_gids=options.sort_gids,
+                num_levels=options.num_levels)
+
+        elif options.nnps == 'tree':
+            nnps = OctreeNNPS(
+                dim=solver.dim,
+                particles=particles,
+                radius_scale=kernel.radius_scale,
+                domain=domain,
+                fixed_h=fixed_h,
+                cache=cache,
+                leaf_max_particles=options.leaf_max_particles,
+                sort_gids=options.sort_gids)
+
+        elif options.nnps == 'ci':
+            nnps = CellIndexingNNPS(
+                dim=solver.dim,
+                particles=particles,
+                radius_scale=kernel.radius_scale,
+                domain=domain,
+                fixed_h=fixed_h,
+                cache=cache,
+                sort_gids=options.sort_gids)
+
+        elif options.nnps == 'sfc':
+            nnps = ZOrderNNPS(
+                dim=solver.dim,
+                particles=particles,
+                radius_scale=kernel.radius_scale,
+                domain=domain,
+                fixed_h=fixed_h,
+                cache=cache,
+                sort_gids=options.sort_gids)
+
+        elif options.nnps == 'comp_tree':
+            nnps = CompressedOctreeNNPS(
+                dim=solver.dim,
+                particles=particles,
+                radius_scale=kernel.radius_scale,
+                domain=domain,
+                fixed_h=fixed_h,
+                cache=cache,
+                leaf_max_particles=options.leaf_max_particles,
+                sort_gids=options.sort_gids)
+
+        return nnps
+
     def _create_particles(self, particle_factory, *args, **kw):
         """ Create particles given a callable `particle_factory` and any
         arguments to it.
@@ -780,28 +1115,7 @@ class Application(object):
         # dummy particle arrays.
         if rank == 0:
             if options.restart_file is not None:
-                # FIXME: not tested, probably does not work!
-                solver = self.solver
-                data = load(options.restart_file)
-
-                arrays = data['arrays']
-                solver_data = data['solver_data']
-
-                # arrays and particles
-                particles = []
-                for array_name in arrays:
-                    particles.append(arrays[array_name])
-
-                # save the particles list
-                self.particles = particles
-
-                # time, timestep and solver iteration count at restart
-                t, dt, count = solver_data['t'], solver_data[
-                    'dt'], solver_data['count']
-
-                # rescale dt at restart
-                dt *= options.rescale_dt
-                solver.t, solver.dt, solver.count = t, dt, count
+                self._load_restart_file(options.restart_file)
 
             else:
                 self.particles = particle_factory(*args, **kw)
@@ -817,6 +1131,122 @@ class Application(object):
         if rank != 0:
             self.particles = utils.create_dummy_particles(particles_info)
 
+    def _estimate_cost(self):
+        """Estimate the memory and run time of the configured case, see
+        :py:mod:`pysph.solver.estimate`, and write it to the output
+        directory.
+        """
+        from pysph.solver.estimate import estimate_cost, format_estimate
+        options = self.options
+        if not 0.0 < options.estimate_fraction <= 1.0:
+            msg = "--estimate-fraction must be in (0, 1]."
+            raise ValueError(msg)
+        solver = self.solver
+        fixed_h = solver.fixed_h or options.fixed_h
+
+        def _create_nnps(particles):
+            return self._create_nnps(particles, solver.kernel, fixed_h, None)
+
+        estimate = estimate_cost(
+            solver, _create_nnps, fraction=options.estimate_fraction
+        )
+        self._message("Estimated cost:\n%s" % format_estimate(estimate))
+        fname = join(
+            self.output_dir, '%s_estimate_%d.json' % (self.fname, self.rank)
+        )
+        json.dump(estimate, open(fname, 'w'), indent=2)
+
+    def _get_output_encoding(self):
+        """Return the output encoding to use from the command line options.
+        """
+        options = self.options
+        precision = {}
+        if options.output_precision:
+            for item in options.output_precision.split(','):
+                prop, _, dtype = item.partition('=')
+                precision[prop.strip()] = dtype.strip()
+        if options.output_codec is not None:
+            codec = options.output_codec
+        else:
+            codec = 'gzip' if options.compress_output else 'none'
+        return OutputEncoding.from_string(
+            codec, shuffle=options.output_shuffle, precision=precision
+        )
+
+    def _get_restart_files(self, restart_file):
+        """Return the list of checkpoint files (one per rank) to restart
+        from or an empty list if `restart_file` is not a checkpoint.
+        """
+        if isdir(restart_file):
+            files = find_latest_checkpoint(restart_file, self.options.fname)
+            if len(files) == 0:
+                files = find_latest_checkpoint(restart_file)
+            if len(files) == 0:
+                msg = 'No checkpoints found in %s' % restart_file
+                raise RuntimeError(msg)
+            return files
+        elif restart_file.endswith(CHECKPOINT_EXTENSION):
+            return get_rank_files(restart_file)
+        else:
+            return []
+
+    def _load_restart_file(self, restart_file):
+        """Setup the particles and the solver state from the given output
+        file or checkpoint.  When restarting from a checkpoint written in
+        parallel, the particles of all the ranks are combined and
+        redistributed by the initial load balancing.
+        """
+        options = self.options
+        solver = self.solver
+        files = self._get_restart_files(restart_file)
+        if len(files) > 0:
+            self._message('Restarting from checkpoint %s' % files[0])
+            data = load_checkpoint(files[0])
+            particles = data['arrays']
+            for fname in files[1:]:
+                other = load_checkpoint(fname)['arrays']
+                for pa, pa_other in zip(particles, other):
+                    pa.append_parray(pa_other)
+            self._restart_meta = data['meta']
+        else:
+            data = load(restart_file)
+            arrays = data['arrays']
+            particles = [arrays[array_name] for array_name in arrays]
+
+        # save the particles list
+        self.particles = particles
+
+        # time, timestep and solver iteration count at restart
+        solver_data = data['solver_data']
+        t, dt, count = solver_data['t'], solver_data['dt'], \
+            solver_data['count']
+
+        # rescale dt at restart
+        dt *= options.rescale_dt
+        solver.t, solver.dt, solver.count = t, dt, int(count)
+
+    def _check_restart_meta(self):
+        """Compare the configuration with that recorded in the checkpoint
+        used to restart.
+        """
+        meta = self._restart_meta
+        if meta is None:
+            return
+        solver = self.solver
+        module_hash = solver.sph_compiler.get_module_hash()
+        if module_hash is not None and module_hash == meta.get('module_hash'):
+            self._message('Reusing the compiled module from the checkpoint.')
+        elif meta.get('module_hash') is not None:
+            logger.warning(
+                'Generated code differs from that used for the checkpoint.'
+            )
+        nnps = self.nnps.__class__.__name__
+        if meta.get('nnps') not in (None, nnps):
+            logger.warning(
+                'Checkpoint used %s but restarting with %s.' % (
+                    meta['nnps'], nnps)
+            )
+
     def _configure(self):
         """Configures the application using the options from the
         command-line.
@@ -827,6 +1257,10 @@ class Application(object):
             get_config().use_openmp = options.with_openmp
         if options.omp_schedule is not None:
             get_config().set_omp_schedule(options.omp_schedule)
+        elif options.pin_threads:
+            get_config().set_omp_schedule('static')
+        if options.pin_threads:
+            self._pin_threads()
         if options.with_opencl:
             get_config().use_opencl = True
         if options.use_double:
@@ -850,128 +1284,18 @@ class Application(object):
         # changed after the initial load-balancing.
         self._setup_parallel_manager_and_initial_load_balance()
 
-        if self.nnps is None:
-            cache = options.cache_nnps
-            # create the NNPS object
-            if options.with_opencl:
-                from pysph.base.gpu_nnps import ZOrderGPUNNPS
-                nnps = ZOrderGPUNNPS(
-                    dim=solver.dim,
-                    particles=self.particles,
-                    radius_scale=kernel.radius_scale,
-                    domain=self.domain,
-                    cache=True,
-                    sort_gids=options.sort_gids)
-
-            elif options.nnps == 'box':
-                nnps = BoxSortNNPS(
-                    dim=solver.dim,
-                    particles=self.particles,
-                    radius_scale=kernel.radius_scale,
-                    domain=self.domain,
-                    cache=cache,
-                    sort_gids=options.sort_gids)
-
-            elif options.nnps == 'll':
-                nnps = LinkedListNNPS(
-                    dim=solver.dim,
-                    particles=self.particles,
-                    radius_scale=kernel.radius_scale,
-                    domain=self.domain,
-                    fixed_h=fixed_h,
-                    cache=cache,
-                    sort_gids=options.sort_gids)
-
-            elif options.nnps == 'sh':
-                nnps = SpatialHashNNPS(
-                    dim=solver.dim,
-                    particles=self.particles,
-                    radius_scale=kernel.radius_scale,
-                    domain=self.domain,
-                    fixed_h=fixed_h,
-                    cache=cache,
-                    table_size=options.table_size,
-                    sort_gids=options.sort_gids)
-
-            elif options.nnps == 'esh':
-                nnps = ExtendedSpatialHashNNPS(
-                    dim=solver.dim,
-                    particles=self.particles,
-                    radius_scale=kernel.radius_scale,
-                    domain=self.domain,
-                    fixed_h=fixed_h,
-                    cache=cache,
-                    H=options.H,
-                    table_size=options.table_size,
-                    sort_gids=options.sort_gids,
-                    approximate=options.approximate_nnps)
-
-            elif options.nnps == 'strat_hash':
-                nnps = StratifiedHashNNPS(
-                    dim=solver.dim,
-                    particles=self.particles,
-                    radius_scale=kernel.radius_scale,
-                    domain=self.domain,
-                    fixed_h=fixed_h,
-                    cache=cache,
-                    table_size=options.table_size,
-                    sort_gids=options.sort_gids,
-                    num_levels=options.num_levels)
-
-            elif options.nnps == 'strat_sfc':
-                nnps = StratifiedSFCNNPS(
-                    dim=solver.dim,
-                    particles=self.particles,
-                    radius_scale=kernel.radius_scale,
-                    domain=self.domain,
-                    fixed_h=fixed_h,
-                    cache=cache,
-                    sort_gids=options.sort_gids,
-                    num_levels=options.num_levels)
-
-            elif options.nnps == 'tree':
-                nnps = OctreeNNPS(
-                    dim=solver.dim,
-                    particles=self.particles,
-                    radius_scale=kernel.radius_scale,
-                    domain=self.domain,
-                    fixed_h=fixed_h,
-                    cache=cache,
-                    leaf_max_particles=options.leaf_max_particles,
-                    sort_gids=options.sort_gids)
-
-            elif options.nnps == 'ci':
-                nnps = CellIndexingNNPS(
-                    dim=solver.dim,
-                    particles=self.particles,
-                    radius_scale=kernel.radius_scale,
-                    domain=self.domain,
-                    fixed_h=fixed_h,
-                    cache=cache,
-                    sort_gids=options.sort_gids)
-
-            elif options.nnps == 'sfc':
-                nnps = ZOrderNNPS(
-                    dim=solver.dim,
-                    particles=self.particles,
-                    radius_scale=kernel.radius_scale,
-                    domain=self.domain,
-                    fixed_h=fixed_h,
-                    cache=cache,
-                    sort_gids=options.sort_gids)
-
-            elif options.nnps == 'comp_tree':
-                nnps = CompressedOctreeNNPS(
-                    dim=solver.dim,
-                    particles=self.particles,
-                    radius_scale=kernel.radius_scale,
-                    domain=self.domain,
-                    fixed_h=fixed_h,
-                    cache=cache,
-                    leaf_max_particles=options.leaf_max_particles,
-                    sort_gids=options.sort_gids)
+        if options.pin_threads:
+            # Place the pages of the arrays, which were filled serially, with
+            # the threads that work on them.  Later reallocations when the
+            # arrays grow are also copied in parallel.
+            set_parallel_first_touch(True)
+            for pa in self.particles:
+                pa.first_touch()
 
-            self.nnps = nnps
+        if self.nnps is None:
+            self.nnps = self._create_nnps(
+                self.particles, kernel, fixed_h, self.domain
+            )
 
         nnps = self.nnps
         # once the NNPS has been set-up, we set the default Solver
@@ -997,10 +1321,8 @@ class Application(object):
         # Setup the solver output file name
         fname = options.fname
 
-        if in_parallel():
-            rank = self.rank
-            if self.num_procs > 1:
-                fname += '_' + str(rank)
+        if self.num_procs > 1:
+            fname += '_' + str(self.rank)
 
         # set the rank for the solver
         solver.rank = self.rank
@@ -1012,9 +1334,9 @@ class Application(object):
             solver.in_parallel = True
 
         # output file name
-        solver.set_output_fname(fname)
+        solver.set_output_fname(fname, prefix=options.fname)
 
-        solver.set_compress_output(options.compress_output)
+        solver.set_compress_output(self._get_output_encoding())
         # disable_output
         solver.set_disable_output(options.disable_output)
 
@@ -1022,6 +1344,26 @@ class Application(object):
         if options.freq is not None:
             solver.set_print_freq(options.freq)
 
+        # per-step timings output frequency
+        solver.set_timings_freq(options.timings_freq)
+
+        # memory report frequency
+        solver.set_memory_report(options.memory_report)
+
+        # unused properties
+        if options.unused_props is not None:
+            solver.set_unused_properties(
+                options.unused_props, keep=solver.keep_properties
+            )
+
+        # checkpoints
+        solver.set_checkpoint(
+            freq=options.checkpoint_freq,
+            interval=options.checkpoint_interval*60.0,
+            keep=options.checkpoint_keep, fname=options.fname,
+            meta=dict(args=self.args, nnps_option=options.nnps)
+        )
+
         # output printing level (default is not detailed)
         if options.detailed_output is not None:
             solver.set_output_printing_level(options.detailed_output)
@@ -1054,6 +1396,7 @@ class Application(object):
             nnps=nnps,
             kernel=kernel,
             fixed_h=fixed_h)
+        self._check_restart_meta()
 
         # add solver interfaces
         self.command_manager = CommandManager(solver, self.comm)
@@ -1104,6 +1447,22 @@ class Application(object):
                 logger.info('started multiprocessing interface on %s' %
                             (interface.address, ))
 
+    def _pin_threads(self):
+        """Pin this process and its OpenMP threads to a block of the cores
+        of its host, see :py:mod:`pysph.base.affinity`.
+        """
+        from pysph.base.affinity import get_local_rank_cpus, pin_threads
+        host = socket.gethostname()
+        local_rank, local_size = 0, 1
+        if self.num_procs > 1:
+            hosts = self.comm.allgather(host)
+            local_rank = hosts[:self.rank].count(host)
+            local_size = hosts.count(host)
+        cpus = get_local_rank_cpus(local_rank, local_size)
+        thread_cpus = pin_threads(cpus)
+        logger.info('Rank %d on %s pinned its threads to CPUs %s' %
+                    (self.rank, host, thread_cpus))
+
     def _setup_parallel_manager_and_initial_load_balance(self):
         """This will automatically distribute the particles among processors
         if this is a parallel run.
@@ -1118,6 +1477,13 @@ class Application(object):
         if num_procs > 1:
             options = self.options
 
+            if options.with_sfc or options.shm_procs > 1:
+                if options.with_sfc and not has_mpi():
+                    raise RuntimeError("Cannot run in parallel!")
+                self._setup_sfc_parallel_manager()
+                solver.set_parallel_manager(self.parallel_manager)
+                return
+
             if options.with_zoltan:
                 if not (has_zoltan() and has_mpi()):
                     raise RuntimeError("Cannot run in parallel!")
@@ -1182,12 +1548,69 @@ class Application(object):
                 raise ValueError("Invalid lb_freq %d" % lb_freq)
             pm.set_lb_freq(lb_freq)
 
+            if options.dynamic_lb:
+                pm.set_dynamic_lb(True, options.lb_threshold)
+
+            if options.halo_refresh or options.halo_overlap:
+                pm.set_halo_refresh(
+                    True, options.halo_skin, options.halo_overlap
+                )
+
             # wait till the initial partition is done
             comm.barrier()
 
         # set the solver's parallel manager
         solver.set_parallel_manager(self.parallel_manager)
 
+    def _setup_sfc_parallel_manager(self):
+        """Create the space filling curve parallel manager and do the initial
+        load balance.  The shared memory variant is used for the workers of
+        a `--shm-procs` run.
+        """
+        options = self.options
+        solver = self.solver
+
+        if options.shm_procs > 1:
+            from pysph.parallel.shm_parallel_manager import \
+                SharedMemoryParallelManager as manager
+            curve = options.sfc_curve or 'slab'
+        else:
+            manager = SFCParallelManager
+            curve = options.sfc_curve or 'hilbert'
+
+        lb_freq = options.lb_freq
+        if lb_freq < 1:
+            raise ValueError("Invalid lb_freq %d" % lb_freq)
+
+        radius_scale = (options.parallel_scale_factor *
+                        solver.kernel.radius_scale)
+        self.parallel_manager = pm = manager(
+            dim=solver.dim,
+            particles=self.particles,
+            comm=self.comm,
+            radius_scale=radius_scale,
+            ghost_layers=options.ghost_layers,
+            domain=self.domain,
+            update_cell_sizes=options.update_cell_sizes,
+            curve=curve
+        )
+
+        # do an initial load balance
+        pm.update()
+        pm.initial_update = False
+        pm.set_lb_freq(lb_freq)
+
+        self.comm.barrier()
+
+    def _run_shm_worker(self, comm, argv):
+        """Run the application as one of the workers of a shared memory
+        parallel run, `argv` is that passed to `run`.
+        """
+        self.comm = comm
+        self.num_procs = comm.Get_size()
+        self.rank = comm.Get_rank()
+        self.run(argv)
+
     def _setup_solver_callbacks(self, obj):
         """Setup any solver callbacks given an object with any of `pre_step`,
         `post_step' and `post_stage`
@@ -1281,6 +1704,19 @@ class Application(object):
             start_time = time.time()
 
             self._parse_command_line(force=argv is not None)
+
+            if self.options.shm_procs > 1:
+                from pysph.parallel.shm_comm import (
+                    SharedMemoryComm, run_workers
+                )
+                if not isinstance(self.comm, SharedMemoryComm):
+                    if self.num_procs > 1:
+                        msg = "--shm-procs cannot be used with MPI."
+                        raise RuntimeError(msg)
+                    run_workers(self._run_shm_worker, self.options.shm_procs,
+                                args=(argv,))
+                    return
+
             self._setup_logging()
 
             self.solver = self.create_solver()
@@ -1302,6 +1738,11 @@ class Application(object):
 
             self._configure()
 
+            if self.options.estimate:
+                # Exit like --help so that no post-processing is attempted.
+                self._estimate_cost()
+                sys.exit(0)
+
             self._setup_solver_callbacks(self)
             for tool in self.create_tools():
                 self.add_tool(tool)
@@ -0,0 +1,307 @@
+"""Checkpoints for a fast restart of a simulation.
+
+A checkpoint stores the complete state of the particles (all properties and
+constants) of one processor along with the solver state and any additional
+metadata in a single uncompressed file.  The file starts with a small JSON
+header followed by the raw array data, each array aligned to a 64 byte
+boundary so the file can be memory mapped when loading.
+
+Checkpoints are written atomically, i.e. the data is first written to a
+temporary file which is renamed once it is complete, so a job that is killed
+while writing never leaves a corrupt checkpoint behind.  A parallel job that
+is killed may however leave a checkpoint written by only some of the ranks,
+such incomplete checkpoints are skipped when looking for the latest one.
+"""
+
+import glob
+import json
+import os
+import re
+import struct
+
+import numpy
+
+from pysph.base.particle_array import ParticleArray
+from pysph.base.utils import get_particles_info
+
+MAGIC = b'PYSPHCKP'
+VERSION = 1
+ALIGN = 64
+EXTENSION = '.ckpt'
+
+_HEADER_FMT = '<8sQ'
+_HEADER_SIZE = struct.calcsize(_HEADER_FMT)
+
+try:
+    _replace = os.replace
+except AttributeError:
+    # Python 2.7, where os.rename only fails on Windows if the target exists.
+    _replace = os.rename
+
+
+def _aligned(offset):
+    return (offset + ALIGN - 1)//ALIGN*ALIGN
+
+
+def _to_python(value):
+    if isinstance(value, numpy.ndarray):
+        return value.tolist()
+    elif isinstance(value, numpy.generic):
+        return value.item()
+    raise TypeError('Cannot serialize %r' % value)
+
+
+def get_checkpoint_filename(dirname, fname, count, rank=0):
+    """Return the name of the checkpoint file for the given iteration count
+    and rank.
+    """
+    return os.path.join(
+        dirname, '%s_checkpoint_%d_%d%s' % (fname, count, rank, EXTENSION)
+    )
+
+
+def get_checkpoint_files(dirname, fname=None, rank=None):
+    """Return a list of (count, rank, filename) for the checkpoints in the
+    given directory sorted by the iteration count.
+
+    If `fname` is given only the checkpoints with that output file name are
+    returned and if `rank` is given, only the checkpoints of that rank.
+    """
+    name = '.*' if fname is None else re.escape(fname)
+    pattern = re.compile(
+        r'^%s_checkpoint_(\d+)_(\d+)%s$' % (name, re.escape(EXTENSION))
+    )
+    result = []
+    for path in glob.glob(os.path.join(dirname, '*' + EXTENSION)):
+        match = pattern.match(os.path.basename(path))
+        if match is None:
+            continue
+        count, _rank = int(match.group(1)), int(match.group(2))
+        if rank is None or rank == _rank:
+            result.append((count, _rank, path))
+    return sorted(result)
+
+
+def find_latest_checkpoint(dirname, fname=None):
+    """Return a list of the checkpoint files (one per rank) of the latest
+    complete checkpoint in the given directory.  If `fname` is None, any
+    checkpoint in the directory is considered.
+
+    A checkpoint is complete when the files of all the ranks that wrote it
+    exist, see `is_complete`.  Returns an empty list if there are no
+    complete checkpoints.
+    """
+    generations = {}
+    for count, rank, path in get_checkpoint_files(dirname, fname):
+        key = (count, _get_fname(path))
+        generations.setdefault(key, []).append(path)
+    for key in sorted(generations, reverse=True):
+        files = generations[key]
+        if is_complete(files):
+            return files
+    return []
+
+
+def is_complete(files):
+    """Return True if the given checkpoint files (one per rank) of the same
+    checkpoint are those of all the ranks that wrote it.
+
+    The number of ranks is the `num_procs` in the metadata of the checkpoint,
+    when this is not recorded the files must be those of the ranks 0 to
+    ``len(files) - 1``.
+    """
+    if len(files) == 0:
+        return False
+    header, data_start = read_checkpoint_header(files[0])
+    num_procs = header['meta'].get('num_procs', len(files))
+    ranks = sorted(_get_rank(path) for path in files)
+    return ranks == list(range(num_procs))
+
+
+def _match(filename):
+    return re.match(
+        r'^(.*)_checkpoint_(\d+)_(\d+)%s$' % re.escape(EXTENSION),
+        os.path.basename(filename)
+    )
+
+
+def _get_fname(filename):
+    match = _match(filename)
+    return None if match is None else match.group(1)
+
+
+def _get_rank(filename):
+    match = _match(filename)
+    return None if match is None else int(match.group(3))
+
+
+def get_rank_files(filename):
+    """Given the checkpoint file of one rank, return the files of all the
+    ranks that wrote the same checkpoint.
+
+    Raises a RuntimeError if the files of some of the ranks are missing.
+    """
+    match = _match(filename)
+    if match is None:
+        return [filename]
+    fname, count = match.group(1), int(match.group(2))
+    dirname = os.path.dirname(filename)
+    files = [path for _count, rank, path in
+             get_checkpoint_files(dirname, fname) if _count == count]
+    if not is_complete(files):
+        msg = 'Checkpoint %s is incomplete, the files of some ranks are '\
+              'missing.' % filename
+        raise RuntimeError(msg)
+    return files
+
+
+def write_checkpoint(filename, particles, solver_data, meta=None):
+    """Write a checkpoint of the given particles and solver state.
+
+    Only the real particles are written, remote and ghost particles are
+    recreated by the NNPS and the parallel manager on restart.
+
+    Parameters
+    ----------
+
+    filename: str
+        Name of the checkpoint file.
+
+    particles: sequence(ParticleArray)
+        Particle arrays to save.
+
+    solver_data: dict
+        The solver state, this should at least have the time `t`, the
+        timestep `dt` and the iteration `count`.
+
+    meta: dict
+        Any additional (JSON serializable) information to save.
+    """
+    info = get_particles_info(particles)
+    chunks = []
+    offset = 0
+    header_arrays = {}
+    for pa in particles:
+        pa_info = info[pa.name]
+        n = pa.get_number_of_particles(real=True)
+        props = {}
+        for prop, prop_info in pa_info['properties'].items():
+            data = numpy.ascontiguousarray(
+                pa.properties[prop].get_npy_array()[:n]
+            )
+            offset = _aligned(offset)
+            props[prop] = dict(
+                type=prop_info['type'], default=prop_info['default'],
+                dtype=data.dtype.str, shape=list(data.shape), offset=offset
+            )
+            chunks.append((offset, data))
+            offset += data.nbytes
+        constants = {}
+        for const, value in pa_info['constants'].items():
+            data = numpy.ascontiguousarray(value)
+            offset = _aligned(offset)
+            constants[const] = dict(
+                dtype=data.dtype.str, shape=list(data.shape), offset=offset
+            )
+            chunks.append((offset, data))
+            offset += data.nbytes
+        header_arrays[pa.name] = dict(
+            properties=props, constants=constants,
+            output_property_arrays=list(pa_info['output_property_arrays']),
+            time=pa.time
+        )
+
+    header = dict(
+        version=VERSION, arrays=header_arrays,
+        order=[pa.name for pa in particles], solver_data=solver_data,
+        meta=meta if meta is not None else {}
+    )
+    header_bytes = json.dumps(header, default=_to_python).encode('utf-8')
+    data_start = _aligned(_HEADER_SIZE + len(header_bytes))
+
+    tmp = filename + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(struct.pack(_HEADER_FMT, MAGIC, len(header_bytes)))
+        f.write(header_bytes)
+        for chunk_offset, data in chunks:
+            f.seek(data_start + chunk_offset)
+            f.write(data.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    _replace(tmp, filename)
+
+
+def read_checkpoint_header(filename):
+    """Return the header of the checkpoint and the offset of the data."""
+    with open(filename, 'rb') as f:
+        magic, size = struct.unpack(_HEADER_FMT, f.read(_HEADER_SIZE))
+        if magic != MAGIC:
+            raise RuntimeError('%s is not a PySPH checkpoint.' % filename)
+        header = json.loads(f.read(size).decode('utf-8'))
+    if header['version'] > VERSION:
+        msg = 'Unsupported checkpoint version %s in %s.' % (
+            header['version'], filename
+        )
+        raise RuntimeError(msg)
+    return header, _aligned(_HEADER_SIZE + size)
+
+
+def load_checkpoint(filename):
+    """Load a checkpoint written by `write_checkpoint`.
+
+    The file is memory mapped and the data copied directly into the new
+    particle arrays.
+
+    Returns a dictionary with the keys `arrays` (an ordered list of particle
+    arrays), `solver_data` and `meta`.
+    """
+    header, data_start = read_checkpoint_header(filename)
+    if os.path.getsize(filename) > data_start:
+        mm = numpy.memmap(filename, dtype=numpy.uint8, mode='r')
+    else:
+        mm = None
+
+    def _view(info):
+        dtype = numpy.dtype(str(info['dtype']))
+        shape = tuple(info['shape'])
+        if mm is None or numpy.prod(shape) == 0:
+            return numpy.zeros(shape, dtype=dtype)
+        return numpy.ndarray(
+            shape, dtype=dtype, buffer=mm, offset=data_start + info['offset']
+        )
+
+    particles = []
+    for name in header['order']:
+        pa_info = header['arrays'][name]
+        props = {}
+        for prop, info in pa_info['properties'].items():
+            props[prop] = dict(
+                name=prop, type=str(info['type']), default=info['default'],
+                data=_view(info)
+            )
+        constants = dict(
+            (str(const), _view(info))
+            for const, info in pa_info['constants'].items()
+        )
+        pa = ParticleArray(name=str(name), constants=constants, **props)
+        pa.set_output_arrays(
+            [str(x) for x in pa_info['output_property_arrays']]
+        )
+        pa.set_time(pa_info['time'])
+        particles.append(pa)
+    return dict(
+        arrays=particles, solver_data=header['solver_data'],
+        meta=header['meta']
+    )
+
+
+def remove_old_checkpoints(dirname, fname, keep, rank=0):
+    """Remove all but the latest `keep` checkpoints of the given rank."""
+    if keep < 1:
+        return
+    files = get_checkpoint_files(dirname, fname, rank)
+    for count, _rank, path in files[:-keep]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
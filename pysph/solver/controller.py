@@ -1,5 +1,6 @@
 ''' Implement infrastructure for the solver to add various interfaces '''
 
+import atexit
 from functools import wraps
 import threading
 try:
@@ -204,7 +205,8 @@ class CommandManager(object):
     solver_methods = set(('dump_output',))
 
     lazy_methods = set(('get_particle_array_names', 'get_named_particle_array',
-                'get_particle_array_combined', 'get_particle_array_from_procs'))
+                'get_particle_array_combined', 'get_particle_array_from_procs',
+                'publish_particle_array'))
 
     active_methods = set(('get_status', 'get_task_lock', 'set_log_level'))
 
@@ -231,6 +233,8 @@ class CommandManager(object):
         self.queue_lock_map = {}
         self.results = {}
         self.pause = set([])
+        # the SharedParticleArray last published for each array name.
+        self.published = {}
 
     @on_root_proc
     def add_interface(self, callable, block=True):
@@ -400,6 +404,32 @@ class CommandManager(object):
             pa.append_parray(p)
         return pa
 
+    def publish_particle_array(self, name, props=None):
+        ''' publish the named particle array in shared memory and return the
+        name of the segment
+
+        A client attaches to it with
+        :py:meth:`pysph.base.particle_buffer.SharedParticleArray.attach`, so
+        the particles are not pickled.  The previous segment of the array is
+        removed, clients which are attached to it can still read it.
+        '''
+        from pysph.base.particle_buffer import SharedParticleArray
+        for pa in self.solver.particles:
+            if pa.name == name:
+                if len(self.published) == 0:
+                    atexit.register(self._unlink_published)
+                old = self.published.pop(name, None)
+                if old is not None:
+                    old.unlink()
+                shared = SharedParticleArray.publish(pa, props)
+                self.published[name] = shared
+                return shared.name
+
+    def _unlink_published(self):
+        for shared in self.published.values():
+            shared.unlink()
+        self.published.clear()
+
     def get_status(self):
         ''' get the status of the controller '''
         return 'commands queued: %d'%len(self.queue)
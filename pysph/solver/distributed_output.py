@@ -0,0 +1,406 @@
+"""Read and merge the output of parallel runs dumped by each processor.
+
+With the 'distributed' parallel output mode each processor dumps its own
+particles to `<fname>_<rank>_<count>.npz` (or `.hdf5`).  Along with these,
+rank 0 writes a small JSON index per snapshot, `<fname>_<count>.index.json`,
+which records the file written by each rank and, for each particle array,
+the number of local particles and their bounding box.
+
+The index allows a reader to allocate the global arrays once and fill them
+in a single pass, optionally loading the files in parallel, and to open only
+the files of the ranks whose particles overlap a region of interest.  The
+`main` function is the `pysph merge_output` command which merges the
+distributed snapshots into one file each, using several processes.
+"""
+
+from __future__ import print_function
+
+import argparse
+import glob
+import json
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+import os
+import re
+import sys
+
+import numpy
+
+from pysph.base.utils import ParticleTAGS
+from pysph.solver.output import dump, load
+
+VERSION = 1
+INDEX_EXTENSION = '.index.json'
+
+try:
+    _replace = os.replace
+except AttributeError:
+    # Python 2.7, where os.rename only fails on Windows if the target exists.
+    _replace = os.rename
+
+
+def _to_python(value):
+    if isinstance(value, numpy.ndarray):
+        return value.tolist()
+    elif isinstance(value, numpy.generic):
+        return value.item()
+    raise TypeError('Cannot serialize %r' % value)
+
+
+def get_index_filename(dirname, fname, count):
+    """Return the name of the index file of the given iteration count."""
+    return os.path.join(dirname, '%s_%d%s' % (fname, count, INDEX_EXTENSION))
+
+
+def get_index_files(dirname, fname=None):
+    """Return a list of the index files in the given directory sorted by the
+    iteration count.  If `fname` is given only the index files with that
+    output file name are returned.
+    """
+    name = r'.*' if fname is None else re.escape(fname)
+    pattern = re.compile(
+        r'^%s_(\d+)%s$' % (name, re.escape(INDEX_EXTENSION))
+    )
+    result = []
+    for path in glob.glob(os.path.join(dirname, '*' + INDEX_EXTENSION)):
+        match = pattern.match(os.path.basename(path))
+        if match is not None:
+            result.append((int(match.group(1)), path))
+    return [path for count, path in sorted(result)]
+
+
+def get_local_info(particles):
+    """Return the number of local particles and their bounding box for each
+    of the given particle arrays.
+
+    The bounds are a pair of (x, y, z) minima and maxima and are None for an
+    array without local particles.
+    """
+    info = {}
+    for pa in particles:
+        n = pa.get_number_of_particles(real=True)
+        bounds = None
+        if n > 0:
+            mins, maxs = [], []
+            for name in 'xyz':
+                data = pa.get(name, only_real_particles=False)[:n]
+                mins.append(float(data.min()))
+                maxs.append(float(data.max()))
+            bounds = [mins, maxs]
+        info[pa.name] = dict(count=n, bounds=bounds)
+    return info
+
+
+def write_index(filename, solver_data, ranks):
+    """Write an index file atomically.
+
+    Parameters
+    ----------
+
+    filename: str
+        Name of the index file.
+
+    solver_data: dict
+        The solver data of the snapshot.
+
+    ranks: list(dict)
+        For each rank a dictionary with the `file` written by the rank (
+        relative to the index) and the `arrays` as returned by
+        `get_local_info`.
+    """
+    index = dict(version=VERSION, solver_data=solver_data, ranks=ranks)
+    tmp = filename + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(index, f, default=_to_python)
+    _replace(tmp, filename)
+
+
+def read_index(filename):
+    """Return the contents of an index file as a dictionary."""
+    with open(filename) as f:
+        index = json.load(f)
+    if index.get('version') != VERSION:
+        msg = 'Unsupported index file version %r.' % index.get('version')
+        raise RuntimeError(msg)
+    return index
+
+
+def _get_region(region):
+    lo = numpy.empty(3)
+    lo[:] = -numpy.inf
+    hi = -lo
+    if region is not None:
+        rmin, rmax = region
+        lo[:len(rmin)] = rmin
+        hi[:len(rmax)] = rmax
+    return lo, hi
+
+
+def get_overlapping_ranks(index, region=None, arrays=None):
+    """Return the ranks in the index that have particles of the given arrays
+    in the region.
+
+    Parameters
+    ----------
+
+    index: dict
+        As returned by `read_index`.
+
+    region: tuple
+        Optional pair of the minimum and maximum coordinates of a box, only
+        the leading coordinates may be given, for example `((0, 0), (1, 1))`
+        in 2D.
+
+    arrays: list(str)
+        Optional names of the particle arrays to consider.
+    """
+    lo, hi = _get_region(region)
+    result = []
+    for rank, info in enumerate(index['ranks']):
+        for name, array_info in info['arrays'].items():
+            if arrays is not None and name not in arrays:
+                continue
+            bounds = array_info['bounds']
+            if bounds is None:
+                continue
+            if numpy.all(numpy.asarray(bounds[0]) <= hi) and \
+               numpy.all(numpy.asarray(bounds[1]) >= lo):
+                result.append(rank)
+                break
+    return result
+
+
+def _select(pa, region):
+    """Return the indices of the particles of the array in the region which
+    are not remote, or None if all of them are selected.
+
+    The remote particles are copies of the particles of other processors,
+    the ghost particles (of a periodic domain for example) are kept.
+    """
+    mask = pa.get('tag', only_real_particles=False) != ParticleTAGS.Remote
+    if region is not None:
+        lo, hi = _get_region(region)
+        for i, name in enumerate('xyz'):
+            data = pa.get(name, only_real_particles=False)
+            mask &= (data >= lo[i]) & (data <= hi[i])
+    elif mask.all():
+        return None
+    return numpy.where(mask)[0]
+
+
+class ArrayConcatenator(object):
+    """Concatenate the particles, except the remote ones, of particle arrays
+    from several processors into preallocated particle arrays.
+
+    The first array added for each name is used to hold the result.  It is
+    resized once to the total number of particles given and the particles of
+    the other arrays are copied in place, so each particle is only copied
+    once.
+    """
+    def __init__(self, totals):
+        """Constructor.
+
+        Parameters
+        ----------
+
+        totals: dict
+            The expected number of particles of each array, keyed on the
+            array name.  The arrays grow if more particles are added.
+        """
+        self.totals = totals
+        self.arrays = {}
+        self.offsets = {}
+
+    def add(self, arrays, region=None):
+        """Add the particles, except the remote ones, in the region of the
+        given dictionary of particle arrays.
+        """
+        for name, pa in arrays.items():
+            if name not in self.totals:
+                continue
+            indices = _select(pa, region)
+            n = pa.get_number_of_particles()
+            if indices is not None:
+                n = len(indices)
+
+            if name not in self.arrays:
+                if indices is not None:
+                    pa = pa.extract_particles(indices)
+                pa.resize(max(self.totals[name], n))
+                self.arrays[name] = pa
+                self.offsets[name] = n
+                continue
+
+            dest = self.arrays[name]
+            start = self.offsets[name]
+            if start + n > dest.get_number_of_particles():
+                dest.resize(start + n)
+            for prop in dest.properties:
+                if prop not in pa.properties:
+                    continue
+                data = pa.get(prop, only_real_particles=False)
+                data = data[:n] if indices is None else data[indices]
+                dest.get(prop, only_real_particles=False)[start:start + n] = \
+                    data
+            self.offsets[name] = start + n
+
+    def get_arrays(self):
+        """Return the concatenated particle arrays keyed on the name."""
+        for name, pa in self.arrays.items():
+            pa.resize(self.offsets[name])
+            pa.align_particles()
+        return self.arrays
+
+
+def load_distributed(index_file, arrays=None, region=None, n_threads=1):
+    """Load a snapshot of a distributed output given its index file.
+
+    Parameters
+    ----------
+
+    index_file: str
+        The index file of the snapshot.
+
+    arrays: list(str)
+        Optional names of the particle arrays to load, all are loaded by
+        default.
+
+    region: tuple
+        Optional pair of the minimum and maximum coordinates of a box, only
+        the particles inside the box are loaded and only the files of the
+        ranks with particles in it are opened.
+
+    n_threads: int
+        Number of threads used to read the files.
+
+    Returns a dictionary with the `arrays` and `solver_data` like
+    :py:func:`pysph.solver.utils.load`.
+    """
+    index = read_index(index_file)
+    dirname = os.path.dirname(os.path.abspath(index_file))
+    ranks = get_overlapping_ranks(index, region, arrays)
+    if region is None:
+        ranks = list(range(len(index['ranks'])))
+
+    totals = {}
+    for rank in ranks:
+        for name, info in index['ranks'][rank]['arrays'].items():
+            if arrays is None or name in arrays:
+                totals[name] = totals.get(name, 0) + info['count']
+
+    files = [os.path.join(dirname, index['ranks'][rank]['file'])
+             for rank in ranks]
+
+    def _load(fname):
+        return load(fname)['arrays']
+
+    pool = None
+    if n_threads > 1 and len(files) > 1:
+        pool = ThreadPool(n_threads)
+    try:
+        loaded = pool.imap(_load, files) if pool else map(_load, files)
+        concatenator = ArrayConcatenator(totals)
+        for data in loaded:
+            concatenator.add(data, region)
+    finally:
+        if pool is not None:
+            pool.close()
+
+    return dict(arrays=concatenator.get_arrays(),
+                solver_data=index['solver_data'])
+
+
+def merge(index_file, output_dir=None, compress=False):
+    """Merge a snapshot of a distributed output into a single file.
+
+    The file is named `<fname>_<count>` with the same extension as the
+    distributed files and is written next to the index unless `output_dir`
+    is given.  Returns the name of the file written.
+    """
+    index = read_index(index_file)
+    data = load_distributed(index_file)
+    solver_data = data['solver_data']
+    base = os.path.basename(index_file)[:-len(INDEX_EXTENSION)]
+    ext = os.path.splitext(index['ranks'][0]['file'])[1]
+    if output_dir is None:
+        output_dir = os.path.dirname(os.path.abspath(index_file))
+    fname = os.path.join(output_dir, base + ext)
+    particles = list(data['arrays'].values())
+    return dump(fname, particles, solver_data, compress=compress)
+
+
+def _merge(args):
+    index_file, output_dir, compress = args
+    fname = merge(index_file, output_dir, compress)
+    print('Wrote %s' % fname)
+    return fname
+
+
+def _get_index_files(paths):
+    result = []
+    for path in paths:
+        if os.path.isdir(path):
+            result.extend(get_index_files(path))
+        else:
+            result.append(path)
+    return result
+
+
+def main(argv=None):
+    """Merge the distributed output of parallel runs."""
+    if argv is None:
+        argv = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(
+        prog='merge_output', description=__doc__, add_help=False
+    )
+
+    parser.add_argument(
+        "-h", "--help", action="store_true", default=False, dest="help",
+        help="show this help message and exit"
+    )
+
+    parser.add_argument(
+        "-j", "--jobs", metavar="jobs", type=int, default=1,
+        help="Number of snapshots to merge in parallel."
+    )
+
+    parser.add_argument(
+        "-d", "--outdir", metavar="outdir", type=str, default=None,
+        help="Directory to write the merged files to, defaults to that of "
+        "the index files."
+    )
+
+    parser.add_argument(
+        "--compress", action="store_true", default=False,
+        help="Compress the merged files."
+    )
+
+    parser.add_argument(
+        "inputfile", type=str, nargs='+',
+        help="List of index files or/and directories containing them."
+    )
+
+    if len(argv) > 0 and argv[0] in ['-h', '--help']:
+        parser.print_help()
+        sys.exit()
+
+    options = parser.parse_args(argv)
+    if options.outdir is not None and not os.path.exists(options.outdir):
+        os.makedirs(options.outdir)
+    tasks = [(f, options.outdir, options.compress)
+             for f in _get_index_files(options.inputfile)]
+    if options.jobs > 1 and len(tasks) > 1:
+        pool = Pool(options.jobs)
+        try:
+            pool.map(_merge, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for task in tasks:
+            _merge(task)
+
+
+if __name__ == '__main__':
+    main()
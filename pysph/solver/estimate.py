@@ -0,0 +1,196 @@
+"""Estimate the memory and run time of a simulation without running it.
+
+The estimate is made for a solver which has been setup.  The memory of the
+particles, the neighbor search structures and the parallel manager is that of
+the full case.  The neighbors of a sample of the particles are counted and
+one acceleration evaluation is timed on a down-sampled copy of the particles,
+the time and the size of the neighbor cache are then scaled by the ratio of
+the number of neighbor pairs of the full case to that of the copy.
+
+The run time only includes the acceleration evaluations and the NNPS updates
+of each step, the integrator stages, callbacks and output are not included.
+The time step is that of the initial conditions.
+"""
+
+from math import ceil
+
+import numpy
+
+from pysph.sph.acceleration_eval import AccelerationEval
+from pysph.sph.sph_compiler import SPHCompiler
+from pysph.solver.telemetry import (get_neighbor_statistics,
+    get_particle_counts, monotonic_clock, sum_memory_usage)
+
+
+def get_sample_indices(particles, fraction):
+    """Return the indices of the real particles of each array which lie in a
+    slab, along the longest side of the bounding box of all the particles,
+    holding about `fraction` of them.
+
+    Unlike a random sample, the slab keeps the number density and hence the
+    neighbors of the particles away from its faces.
+    """
+    counts = [pa.get_number_of_particles(real=True) for pa in particles]
+    if fraction >= 1.0 or sum(counts) == 0:
+        return [numpy.arange(n) for n in counts]
+    coords = []
+    for x in ('x', 'y', 'z'):
+        coords.append(numpy.concatenate(
+            [pa.get(x)[:n] for pa, n in zip(particles, counts)]
+        ))
+    axis = int(numpy.argmax([c.max() - c.min() for c in coords]))
+    limit = numpy.percentile(coords[axis], 100.0*fraction)
+    x = ('x', 'y', 'z')[axis]
+    return [numpy.where(pa.get(x)[:n] <= limit)[0]
+            for pa, n in zip(particles, counts)]
+
+
+def get_neighbor_pairs(particles, nnps, max_samples=1000):
+    """Return the number of neighbor pairs of all the real particles
+    estimated from the mean number of neighbors of a sample of at most
+    `max_samples` particles of each array, and the mean number of neighbors
+    of each array.
+    """
+    stats = get_neighbor_statistics(nnps, max_samples)
+    counts = get_particle_counts(particles)
+    means = dict((name, stats[name]['mean']) for name in stats)
+    pairs = sum(counts[name]*mean for name, mean in means.items())
+    return pairs, means
+
+
+def _scale_usage(usage, scale):
+    return tuple(int(x*scale) for x in usage)
+
+
+def estimate_cost(solver, create_nnps, fraction=0.1, repeat=3,
+                  max_samples=1000):
+    """Return a dictionary with the estimated memory and run time of the
+    given solver which must be setup but not yet run.
+
+    Parameters
+    ----------
+
+    solver: Solver
+        The solver to estimate the cost of.
+    create_nnps: callable
+        Called with a list of particle arrays to create an NNPS like that of
+        the solver for them.
+    fraction: float
+        The fraction of the particles in the down-sampled copy.
+    repeat: int
+        The number of times the evaluation is timed, the fastest is used.
+    max_samples: int
+        The maximum number of particles of each array whose neighbors are
+        counted.
+
+    The `memory` of the result is a dictionary of the tuple of the bytes
+    allocated and used by each component along with the `total`.  The `time`
+    is a dictionary of the time in seconds of an `nnps_update`, of an
+    `acceleration_eval`, of a `step` and of the `total` run, along with the
+    `evaluations_per_step`, the time step, `dt`, and the number of steps,
+    `n_steps`.
+    """
+    particles = solver.particles
+    nnps = solver.nnps
+    n_particles = get_particle_counts(particles)
+
+    start = monotonic_clock()
+    nnps.update()
+    t_update = monotonic_clock() - start
+    pairs, neighbors = get_neighbor_pairs(particles, nnps, max_samples)
+
+    # Evaluate the equations for a down-sampled copy of the particles.
+    indices = get_sample_indices(particles, fraction)
+    sample = [pa.extract_particles(index)
+              for pa, index in zip(particles, indices)]
+    a_eval = AccelerationEval(
+        sample, solver.acceleration_eval.equation_groups, solver.kernel,
+        backend=solver.acceleration_eval.backend
+    )
+    SPHCompiler(a_eval, None).compile()
+    sample_nnps = create_nnps(sample)
+    a_eval.set_nnps(sample_nnps)
+    t_eval = None
+    for i in range(max(repeat, 1)):
+        sample_nnps.update()
+        start = monotonic_clock()
+        a_eval.compute(solver.t, solver.dt)
+        elapsed = monotonic_clock() - start
+        t_eval = elapsed if t_eval is None else min(t_eval, elapsed)
+    sample_pairs, sample_neighbors = get_neighbor_pairs(
+        sample, sample_nnps, max_samples
+    )
+    if sample_pairs > 0:
+        scale = pairs/sample_pairs
+    else:
+        scale = float(sum(n_particles.values()))/max(
+            sum(get_particle_counts(sample).values()), 1
+        )
+
+    # The neighbor cache of the full case is only filled when the equations
+    # are evaluated, it is scaled from that of the copy.
+    usage = solver.get_memory_usage()
+    get_usage = getattr(sample_nnps, 'memory_usage', None)
+    if get_usage is not None:
+        nnps_usage = usage.setdefault('nnps', {})
+        for name, value in get_usage().items():
+            if name.startswith('cache_'):
+                nnps_usage[name] = _scale_usage(value, scale)
+    memory = dict(
+        (name, sum_memory_usage(value)) for name, value in usage.items()
+    )
+    memory['total'] = sum_memory_usage(usage)
+
+    dt = solver.dt
+    if solver.adaptive_timestep:
+        arrays = [pa for pa in sample if pa.get_number_of_particles() > 0]
+        adaptive_dt = solver.integrator.compute_time_step(
+            dt, solver.cfl, particle_arrays=arrays
+        )
+        if adaptive_dt is not None:
+            dt = adaptive_dt
+    n_steps = int(ceil(max(solver.tf - solver.t, 0.0)/dt))
+    n_steps = min(n_steps, max(solver.max_steps - solver.count, 0))
+    n_evals = solver.integrator.get_evaluations_per_step()
+    t_step = n_evals*(t_update + t_eval*scale)
+
+    return dict(
+        rank=solver.rank,
+        n_particles=n_particles,
+        n_sample=get_particle_counts(sample),
+        neighbors=neighbors,
+        sample_neighbors=sample_neighbors,
+        memory=memory,
+        time=dict(
+            nnps_update=t_update, acceleration_eval=t_eval*scale,
+            evaluations_per_step=n_evals, step=t_step, dt=dt,
+            n_steps=n_steps, total=t_step*n_steps
+        )
+    )
+
+
+def format_estimate(estimate):
+    """Return a report of the given result of `estimate_cost`.
+    """
+    lines = []
+    for name in sorted(estimate['n_particles']):
+        lines.append('  %-28s %12d particles %8.1f neighbors' % (
+            name, estimate['n_particles'][name],
+            estimate['neighbors'].get(name, 0.0)
+        ))
+    lines.append('  memory:')
+    memory = estimate['memory']
+    for name in sorted(memory):
+        allocated, used = memory[name]
+        lines.append('  %-28s %10.2f MiB allocated %10.2f MiB used' % (
+            '  ' + name, allocated/2.0**20, used/2.0**20
+        ))
+    t = estimate['time']
+    lines.append('  time:')
+    lines.append('    NNPS update %.4g s, acceleration evaluation %.4g s, '
+                 '%d per step' % (t['nnps_update'], t['acceleration_eval'],
+                                  t['evaluations_per_step']))
+    lines.append('    step %.4g s, dt %.4g, %d steps, total %.4g s (%.2f h)'
+                 % (t['step'], t['dt'], t['n_steps'], t['total'],
+                    t['total']/3600.0))
+    return '\n'.join(lines)
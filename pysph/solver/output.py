@@ -2,16 +2,165 @@
 An interface to output the data in various format
 """
 
+import logging
+from multiprocessing.pool import ThreadPool
 import numpy
 import os
 import sys
+import zlib
 
 from pysph.base.particle_array import ParticleArray
 from pysph.base.utils import get_particles_info, get_particle_array
-from pysph import has_h5py
+from pysph import has_h5py, has_hdf5plugin
+
+logger = logging.getLogger(__name__)
 
 output_formats = ('hdf5', 'npz')
 
+codecs = ('none', 'gzip', 'lzf', 'lz4', 'zstd')
+
+# Thread pools used to compress the output, keyed by the number of threads
+# and kept for the lifetime of the process.
+_pools = {}
+
+
+class OutputEncoding(object):
+    """Specifies how the particle properties are encoded in the output.
+
+    Parameters
+    ----------
+
+    codec: str
+        One of 'none', 'gzip', 'lzf', 'lz4' and 'zstd'.  'lz4' and 'zstd'
+        require the hdf5plugin package and fall back to 'gzip' if it is not
+        available.  The npz format only supports 'none' or zlib compression
+        for all the other codecs.
+    level: int
+        Compression level, None uses the default of the codec.
+    shuffle: bool
+        Apply the byte shuffle filter before compression (HDF5 only).  This
+        usually improves the compression of floating point data a lot.
+    precision: dict
+        Map of property names to a reduced precision floating point type
+        ('float32' or 'float16') used to store them.  This is lossy and
+        should only be used for fields that are only needed for
+        visualization.  The properties are converted back to their original
+        type when loaded.
+    chunk_size: int
+        Number of particles in each HDF5 chunk.
+    n_threads: int
+        Number of threads used to encode the chunks of large properties with
+        the gzip codec in parallel.  None uses the number of CPUs, values
+        less than 2 disable this.
+
+    """
+    def __init__(self, codec='none', level=None, shuffle=False,
+                 precision=None, chunk_size=1 << 16, n_threads=None):
+        if codec not in codecs:
+            msg = 'Unknown codec %r, use one of %s.' % (codec, codecs)
+            raise ValueError(msg)
+        self.codec = codec
+        self.level = level
+        self.shuffle = shuffle
+        self.precision = dict(precision) if precision is not None else {}
+        for prop, dtype in self.precision.items():
+            if numpy.dtype(dtype).kind != 'f':
+                msg = 'Reduced precision of %s must be a float type.' % prop
+                raise ValueError(msg)
+        self.chunk_size = chunk_size
+        if n_threads is None:
+            import multiprocessing
+            n_threads = multiprocessing.cpu_count()
+        self.n_threads = n_threads
+
+    def __repr__(self):
+        return ('OutputEncoding(codec=%r, level=%r, shuffle=%r, '
+                'precision=%r)' % (self.codec, self.level, self.shuffle,
+                                   self.precision))
+
+    @classmethod
+    def from_string(cls, spec, **kw):
+        """Create an encoding from a string like 'gzip', 'gzip:4' or
+        'zstd:3'.  Any keyword arguments are passed to the constructor.
+        """
+        codec, _, level = spec.partition(':')
+        level = int(level) if level else None
+        return cls(codec=codec.strip().lower(), level=level, **kw)
+
+    @property
+    def compressed(self):
+        return self.codec != 'none'
+
+    def reduce(self, name, array):
+        """Return the array to store for the given property."""
+        dtype = self.precision.get(name)
+        if dtype is None or array.dtype.kind != 'f':
+            return array
+        dtype = numpy.dtype(dtype)
+        if dtype.itemsize >= array.dtype.itemsize:
+            return array
+        return array.astype(dtype)
+
+    def get_hdf5_filter(self):
+        """Return the keyword arguments for `h5py.Group.create_dataset`."""
+        codec = self.codec
+        if codec in ('lz4', 'zstd') and not has_hdf5plugin():
+            logger.warning(
+                'hdf5plugin is not available, using gzip instead of %s.' %
+                codec
+            )
+            codec = 'gzip'
+        kw = {}
+        if codec == 'gzip':
+            level = 4 if self.level is None else self.level
+            kw.update(compression='gzip', compression_opts=level)
+        elif codec == 'lzf':
+            kw.update(compression='lzf')
+        elif codec == 'lz4':
+            import hdf5plugin
+            kw.update(hdf5plugin.LZ4())
+        elif codec == 'zstd':
+            import hdf5plugin
+            if self.level is None:
+                kw.update(hdf5plugin.Zstd())
+            else:
+                kw.update(hdf5plugin.Zstd(clevel=self.level))
+        if self.shuffle:
+            kw.update(shuffle=True)
+        return kw
+
+
+def get_encoding(compress):
+    """Return an `OutputEncoding` given either an encoding, a string
+    specifying the codec or a bool (True uses gzip).
+    """
+    if isinstance(compress, OutputEncoding):
+        return compress
+    elif isinstance(compress, str):
+        return OutputEncoding.from_string(compress)
+    elif compress:
+        return OutputEncoding('gzip')
+    else:
+        return OutputEncoding()
+
+
+def _shuffle_bytes(data):
+    itemsize = data.dtype.itemsize
+    if itemsize == 1:
+        return data.tobytes()
+    return numpy.ascontiguousarray(
+        data.view(numpy.uint8).reshape(-1, itemsize).T
+    ).tobytes()
+
+
+def _get_pool(n_threads):
+    """Return a (shared) thread pool with the given number of threads.
+    """
+    pool = _pools.get(n_threads)
+    if pool is None:
+        pool = _pools[n_threads] = ThreadPool(n_threads)
+    return pool
+
 
 def _to_str(s):
     if isinstance(s, bytes) and sys.version_info[0] > 2:
@@ -24,7 +173,8 @@ class Output(object):
     """ Class that handles output for simulation """
     def __init__(self, detailed_output=False, only_real=True, mpi_comm=None,
                  compress=False):
-        self.compress = compress
+        self.encoding = get_encoding(compress)
+        self.compress = self.encoding.compressed
         self.detailed_output = detailed_output
         self.only_real = only_real
         self.mpi_comm = mpi_comm
@@ -32,11 +182,15 @@ class Output(object):
     def dump(self, fname, particles, solver_data):
         self.particle_data = dict(get_particles_info(particles))
         self.all_array_data = {}
+        reduce = self.encoding.reduce
         for array in particles:
-            self.all_array_data[array.name] = array.get_property_arrays(
+            arrays = array.get_property_arrays(
                 all=self.detailed_output,
                 only_real=self.only_real
                 )
+            self.all_array_data[array.name] = dict(
+                (name, reduce(name, data)) for name, data in arrays.items()
+            )
         mpi_comm = self.mpi_comm
         if mpi_comm is not None:
             self.all_array_data = self._gather_array_data(
@@ -87,6 +241,9 @@ class Output(object):
 
 
 class NumpyOutput(Output):
+    """Output in the numpy npz format.  All codecs other than 'none' use
+    zlib compression.
+    """
 
     def _dump(self, filename):
         save_method = numpy.savez_compressed if self.compress else numpy.savez
@@ -100,7 +257,7 @@ class NumpyOutput(Output):
         def _get_dict_from_arrays(arrays):
             arrays.shape = (1,)
             return arrays[0]
-        data = numpy.load(fname)
+        data = numpy.load(fname, allow_pickle=True)
 
         if 'version' not in data.files:
             msg = "Wrong file type! No version number recorded."
@@ -122,9 +279,14 @@ class NumpyOutput(Output):
             particles = _get_dict_from_arrays(data["particles"])
 
             for array_name, array_info in particles.items():
+                # Restore each property with its recorded type.
+                props = {}
+                for prop, data in array_info["arrays"].items():
+                    props[prop] = dict(array_info["properties"].get(prop, {}))
+                    props[prop]['data'] = data
                 array = ParticleArray(name=array_name,
                                       constants=array_info["constants"],
-                                      **array_info["arrays"])
+                                      **props)
                 array.set_output_arrays(
                     array_info.get('output_property_arrays', [])
                 )
@@ -142,6 +304,10 @@ class HDFOutput(Output):
 
     def _dump(self, filename):
         import h5py
+        encoding = self.encoding
+        self._pool = None
+        if encoding.codec == 'gzip' and encoding.n_threads > 1:
+            self._pool = _get_pool(encoding.n_threads)
         with h5py.File(filename, 'w') as f:
             solver_grp = f.create_group('solver_data')
             particles_grp = f.create_group('particles')
@@ -210,19 +376,45 @@ class HDFOutput(Output):
         for constName, constArray in pconstants.items():
             constGroup.create_dataset(constName, data=constArray)
 
+    def _create_dataset(self, grp, name, array):
+        encoding = self.encoding
+        if not encoding.compressed or len(array) == 0:
+            return grp.create_dataset(name, data=array)
+
+        chunk = min(encoding.chunk_size, len(array))
+        kw = encoding.get_hdf5_filter()
+        n_chunks = (len(array) + chunk - 1)//chunk
+        if self._pool is None or n_chunks < 2 or \
+           kw.get('compression') != 'gzip':
+            return grp.create_dataset(name, data=array, chunks=(chunk,), **kw)
+
+        # Encode the chunks in parallel (zlib releases the GIL) and write
+        # them directly, bypassing the serial HDF5 filter pipeline.
+        dset = grp.create_dataset(
+            name, shape=array.shape, dtype=array.dtype, chunks=(chunk,), **kw
+        )
+        level = kw['compression_opts']
+        shuffle = encoding.shuffle
+
+        def _encode(start):
+            data = array[start:start + chunk]
+            if len(data) < chunk:
+                data = numpy.concatenate(
+                    (data, numpy.zeros(chunk - len(data), dtype=data.dtype))
+                )
+            raw = _shuffle_bytes(data) if shuffle else data.tobytes()
+            return start, zlib.compress(raw, level)
+
+        starts = range(0, len(array), chunk)
+        for start, payload in self._pool.imap(_encode, starts):
+            dset.id.write_direct_chunk((start,), payload)
+        return dset
+
     def _set_properties(self, pdata, ptype_grp, data):
         for propname, attributes in pdata['properties'].items():
             if propname in data:
                 array = data[propname]
-                if self.compress:
-                    prop = ptype_grp.create_dataset(
-                            propname, data=array)
-                else:
-                    prop = ptype_grp.create_dataset(
-                            propname, data=array,
-                            compression="gzip", compression_opts=9
-                            )
-
+                prop = self._create_dataset(ptype_grp, propname, array)
                 prop.attrs['stored'] = True
             else:
                 prop = ptype_grp.create_dataset(propname, (0,))
@@ -301,12 +493,16 @@ def dump(filename, particles, solver_data, detailed_output=False,
     mpi_comm: mpi4pi.MPI.Intracomm
         An MPI communicator to use for parallel commmunications.
 
-    compress: bool
-        Specify if the  file is to be compressed or not.
+    compress: bool, str or OutputEncoding
+        Specify if the  file is to be compressed or not.  This may also be
+        a codec specification like 'gzip:4' or an `OutputEncoding` which
+        also allows reduced precision output of selected properties.
 
     If `mpi_comm` is not passed or is set to None the local particles alone
     are dumped, otherwise only rank 0 dumps the output.
 
+    Returns the name of the file with the extension of the format used.
+
     """
     if filename.endswith(output_formats):
         fname = os.path.splitext(filename)[0]
@@ -321,3 +517,4 @@ def dump(filename, particles, solver_data, detailed_output=False,
         file_format = 'npz'
     filename = fname + '.' + file_format
     output.dump(filename, particles, solver_data)
+    return filename
@@ -6,10 +6,20 @@ import numpy
 
 # PySPH imports
 from pysph.base.kernels import CubicSpline
-from pysph.sph.acceleration_eval import AccelerationEval
+from pysph.sph.acceleration_eval import (AccelerationEval,
+                                         exclude_unused_properties,
+                                         get_unused_properties,
+                                         remove_unused_properties)
 from pysph.sph.sph_compiler import SPHCompiler
 
 from pysph.solver.utils import FloatPBar, load, dump
+from pysph.solver.telemetry import (StepTimer, format_memory_report,
+    get_memory_rss, get_memory_usage, get_neighbor_statistics,
+    get_particle_counts, get_thread_work, monotonic_clock, write_records)
+from pysph.solver.checkpoint import (get_checkpoint_filename,
+    remove_old_checkpoints, write_checkpoint)
+from pysph.solver.distributed_output import (get_index_filename,
+    get_local_info, write_index)
 
 import logging
 logger = logging.getLogger(__name__)
@@ -124,6 +134,9 @@ class Solver(object):
         # set the default mode to serial
         self.in_parallel = False
 
+        # the parallel manager, if any
+        self.pm = None
+
         # arrays to print output
         self.arrays_to_print = []
 
@@ -138,6 +151,7 @@ class Solver(object):
 
         # output filename
         self.fname = self.__class__.__name__
+        self.output_prefix = None
 
         # output drectory
         self.output_directory = self.fname+'_output'
@@ -164,6 +178,35 @@ class Solver(object):
         # flag for constant smoothing lengths
         self.fixed_h = fixed_h
 
+        # per-step timings of the last `timings_size` steps and the frequency
+        # at which they are written to the output directory (0 to disable).
+        self.timings_size = 1000
+        self.timings_freq = 0
+        self._timer = None
+        self._n_written_timings = 0
+        self.nnps = None
+
+        # the memory used and the peak memory of each phase are logged
+        # every `memory_report_freq` steps (0 to disable).
+        self.memory_report_freq = 0
+
+        # checkpoints are written every `checkpoint_freq` steps and/or every
+        # `checkpoint_interval` seconds (0 disables either) and only the
+        # last `checkpoint_keep` checkpoints are retained.
+        self.checkpoint_freq = 0
+        self.checkpoint_interval = 0.0
+        self.checkpoint_keep = 2
+        self.checkpoint_meta = {}
+        self.checkpoint_fname = None
+        self._last_checkpoint_time = None
+        self.sph_compiler = None
+
+        # what to do with the properties that no equation or stepper uses,
+        # one of 'keep', 'exclude' (from the exchange between processors)
+        # or 'remove', and the properties that must be kept.
+        self.unused_properties = 'keep'
+        self.keep_properties = None
+
         # Set all extra keyword arguments
         for attr, value in kwargs.items():
             if hasattr(self, attr):
@@ -198,6 +241,8 @@ class Solver(object):
             particles, equations, self.kernel, mode
         )
 
+        self._handle_unused_properties(before_compile=True)
+
         sep = '-'*70
         eqn_info = '[\n' + ',\n'.join([str(e) for e in equations]) + '\n]'
         logger.info('Using equations:\n%s\n%s\n%s'%(sep, eqn_info, sep))
@@ -209,13 +254,35 @@ class Solver(object):
             self.acceleration_eval, self.integrator
         )
         sph_compiler.compile()
+        self.sph_compiler = sph_compiler
 
         # Set the nnps for all concerned objects.
+        self.nnps = nnps
         self.acceleration_eval.set_nnps(nnps)
         self.integrator.set_nnps(nnps)
+        # Periodic ghosts are only refreshed after the stage, so the values
+        # initialized by the fused stages would not reach them.
+        if getattr(nnps, 'is_periodic', False) or self.post_stage_callbacks:
+            self.integrator.set_fuse_stages(False)
 
         # set the parallel manager for the integrator
         self.integrator.set_parallel_manager(self.pm)
+        self._handle_unused_properties(before_compile=False)
+
+        # only the properties read from remote particles need be refreshed
+        if self.pm is not None and hasattr(self.pm, 'set_halo_props'):
+            remote_props = self.acceleration_eval.get_remote_properties()
+            self.pm.set_halo_props(
+                dict((name, sorted(props))
+                     for name, props in remote_props.items())
+            )
+
+        # the relative cost of the particles for the load balancing
+        if self.pm is not None and hasattr(self.pm, 'set_array_weights'):
+            loop_counts = self.acceleration_eval.get_loop_counts()
+            self.pm.set_array_weights(
+                dict((name, 1.0 + n) for name, n in loop_counts.items())
+            )
 
         # Set the post_stage_callback.
         self.integrator.set_post_stage_callback(self._post_stage_callback)
@@ -242,6 +309,11 @@ class Solver(object):
         >>> solver.add_post_stage_callback(post_stage_callback_function)
         """
         self.post_stage_callbacks.append(callback)
+        # The callbacks run between a stage and the next acceleration
+        # evaluation and may modify (or copy to ghosts) the properties that
+        # the fused stages have already initialized.
+        if self.integrator is not None:
+            self.integrator.set_fuse_stages(False)
 
     def add_post_step_callback(self, callback):
         """These callbacks are called *after* each timestep is performed.
@@ -345,9 +417,15 @@ class Solver(object):
         else:
             self.arrays_to_print = self.particles
 
-    def set_output_fname(self, fname):
-        """ Set the output file name """
+    def set_output_fname(self, fname, prefix=None):
+        """ Set the output file name
+
+        `prefix` is the output file name shared by all the processors of a
+        parallel run, it is used to name the index files of the distributed
+        output and defaults to `fname`.
+        """
         self.fname = fname
+        self.output_prefix = prefix
 
     def set_output_printing_level(self, detailed_output):
         """ Set the output printing level """
@@ -372,6 +450,9 @@ class Solver(object):
 
     def set_compress_output(self, compress):
         """Compress the dumped output files.
+
+        `compress` may be a bool, a codec specification like 'gzip:4' or a
+        :py:class:`pysph.solver.output.OutputEncoding` instance.
         """
         self.compress_output = compress
 
@@ -384,7 +465,9 @@ class Solver(object):
                     dump a single file.
 
 
-        distributed : Each processor dumps a file locally.
+        distributed : Each processor dumps a file locally and rank 0 writes
+                      an index of the files, see
+                      :py:mod:`pysph.solver.distributed_output`.
 
         """
         assert mode in ("collected", "distributed")
@@ -401,6 +484,102 @@ class Solver(object):
     def set_parallel_manager(self, pm):
         self.pm = pm
 
+    def set_unused_properties(self, action, keep=None):
+        """Choose what to do with the properties which no equation or
+        integrator stepper reads or writes when the solver is setup.
+
+        Parameters
+        ----------
+
+        action: str
+            One of 'keep' which only logs them, 'exclude' which excludes them
+            from the exchange of particles between processors and 'remove'
+            which removes them from the particle arrays.
+        keep: list or dict
+            Properties which must be kept, either for all arrays or keyed on
+            the array name.  Properties used only by Python code, e.g. the
+            callbacks or tools, must be given here.  The output arrays are
+            always kept.
+        """
+        if action not in ('keep', 'exclude', 'remove'):
+            raise ValueError('Unknown action for unused properties: %r'
+                             % action)
+        self.unused_properties = action
+        self.keep_properties = keep
+
+    def set_checkpoint(self, freq=0, interval=0.0, keep=2, fname=None,
+                       meta=None):
+        """Write checkpoints every `freq` iterations and/or every
+        `interval` seconds of wall clock time (0 disables either), retaining
+        only the last `keep` checkpoints.
+
+        The checkpoint files are named using `fname` which defaults to the
+        output file name.  Any additional `meta` data (which must be JSON
+        serializable) is saved in each checkpoint.
+        """
+        self.checkpoint_freq = freq
+        self.checkpoint_interval = interval
+        self.checkpoint_keep = keep
+        self.checkpoint_fname = fname
+        if meta is not None:
+            self.checkpoint_meta = dict(meta)
+
+    def set_timings_freq(self, n, size=None):
+        """Write the per-step timings to the output directory every `n`
+        steps, 0 disables this.  If `size` is given, the timings of the last
+        `size` steps are retained in memory.
+        """
+        self.timings_freq = n
+        if size is not None:
+            self.timings_size = size
+
+    def set_memory_report(self, n):
+        """Log the memory allocated and used by the particles and the data
+        structures of the simulation and the peak resident memory of each
+        phase of the steps every `n` steps and at the end of the run, 0
+        disables this.
+        """
+        self.memory_report_freq = n
+
+    def get_memory_usage(self):
+        """Return a dictionary of the bytes allocated and used by the
+        particles, the neighbor search, the parallel manager and the
+        compiled acceleration evaluator, see
+        `pysph.solver.telemetry.get_memory_usage`.
+        """
+        return get_memory_usage(
+            self.particles, nnps=self.nnps, pm=self.pm,
+            acceleration_eval=self.acceleration_eval
+        )
+
+    def get_peak_memory(self):
+        """Return a dictionary of the peak resident memory in bytes of each
+        phase of the steps, this is only recorded when the memory report is
+        enabled with `set_memory_report`.
+        """
+        if self._timer is None:
+            return {}
+        return self._timer.get_peak_memory()
+
+    def get_timings(self):
+        """Return a list of the timings of the recently completed steps,
+        oldest first.
+
+        Each record is a dictionary with the iteration count, time, timestep,
+        number of real particles, total wall clock time (in seconds) of the
+        step, the throughput in particle updates per second, the resident
+        memory in bytes and a `phases` dictionary with the time spent in each
+        phase of the step.  When the memory report is enabled a `peak_rss`
+        dictionary has the peak resident memory of each phase.  The phases
+        are `pre_step_callbacks`, `parallel_update`, `nnps_update`,
+        `acceleration_eval`, `integrator_stages`, `post_stage_callbacks`,
+        `post_step_callbacks` (which includes any tools), `timestep`,
+        `output` and `commands`.
+        """
+        if self._timer is None:
+            return []
+        return self._timer.get_records()
+
     def barrier(self):
         if self.comm:
             self.comm.barrier()
@@ -436,12 +615,23 @@ class Solver(object):
         # integrate with.
         self.dt = self._get_timestep()
 
+        self._last_checkpoint_time = monotonic_clock()
+        self._timer = timer = StepTimer(
+            self.timings_size, track_memory=self.memory_report_freq > 0
+        )
+        self._n_written_timings = 0
+        self.integrator.get_timings(reset=True)
+
         while (self.tf - self.t) > self._epsilon and \
               (self.count < self.max_steps):
 
+            timer.start()
+            dt = self.dt
+
             # perform any pre step functions
             for callback in self.pre_step_callbacks:
                 callback(self)
+            timer.lap('pre_step_callbacks')
 
             if self.rank == 0:
                 logger.debug(
@@ -451,10 +641,12 @@ class Solver(object):
             # perform the integration and update the time.
             #print 'Solver Iteration', self.count, self.dt, self.t
             self.integrator.step(self.t, self.dt)
+            self._split_integrator_time(timer.lap())
 
             # perform any post step functions
             for callback in self.post_step_callbacks:
                 callback(self)
+            timer.lap('post_step_callbacks')
 
             # update time and iteration counters if successfully
             # integrated
@@ -464,9 +656,12 @@ class Solver(object):
 
             # Compute the next timestep.
             self.dt = self._get_timestep()
+            timer.lap('timestep')
 
             # Note: this may adjust dt to land at a desired time.
             self._dump_output_if_needed()
+            self._write_checkpoint_if_needed()
+            timer.lap('output')
 
             # update progress bar
             bar.update(self.t)
@@ -477,12 +672,19 @@ class Solver(object):
             if self.execute_commands is not None:
                 if self.count % self.command_interval == 0:
                     self.execute_commands(self)
+            timer.lap('commands')
+
+            self._record_timings(dt)
 
         # close the progress bar
         bar.finish()
 
         # final output save
         self.dump_output()
+        if self.timings_freq > 0:
+            self._write_timings()
+        if self.memory_report_freq > 0:
+            self._log_memory_report()
 
     def update_particle_time(self):
         for array in self.particles:
@@ -538,10 +740,57 @@ class Solver(object):
         if self.parallel_output_mode == "collected" and self.in_parallel:
             comm = self.comm
 
-        dump(fname, self.particles, self._get_solver_data(),
-             detailed_output=self.detailed_output,
-             only_real=self.output_only_real, mpi_comm=comm,
-             compress=self.compress_output)
+        fname = dump(
+            fname, self.particles, self._get_solver_data(),
+            detailed_output=self.detailed_output,
+            only_real=self.output_only_real, mpi_comm=comm,
+            compress=self.compress_output
+        )
+
+        if self.parallel_output_mode == "distributed" and self.in_parallel:
+            self._write_output_index(fname)
+
+    def write_checkpoint(self):
+        """Write a checkpoint of the current state to the output directory.
+
+        The checkpoint saves all the particle properties and constants, the
+        solver and integrator state and the hash of the compiled module, see
+        :py:mod:`pysph.solver.checkpoint`.  Each processor writes its own
+        file named as `<fname>_checkpoint_<count>_<rank>.ckpt`.
+
+        Returns the name of the file written.
+        """
+        solver_data = self._get_solver_data()
+        meta = dict(self.checkpoint_meta)
+        integrator = self.integrator
+        meta.update(
+            integrator=integrator.__class__.__name__,
+            max_level=getattr(integrator, 'max_level', 0),
+            kernel=self.kernel.__class__.__name__,
+            nnps=self.nnps.__class__.__name__ if self.nnps else None,
+            module_hash=(self.sph_compiler.get_module_hash()
+                         if self.sph_compiler else None),
+            num_procs=self.comm.Get_size() if self.in_parallel else 1
+        )
+        if not os.path.exists(self.output_directory):
+            os.makedirs(self.output_directory)
+        base = self.checkpoint_fname or self.fname
+        fname = get_checkpoint_filename(
+            self.output_directory, base, self.count, self.rank
+        )
+        write_checkpoint(fname, self.particles, solver_data, meta)
+        if self.in_parallel:
+            # Only remove the old checkpoints once every processor has
+            # written the new one, so a complete checkpoint always remains.
+            self.comm.barrier()
+        remove_old_checkpoints(
+            self.output_directory, base, self.checkpoint_keep, self.rank
+        )
+        self._last_checkpoint_time = monotonic_clock()
+        if self.rank == 0:
+            logger.info('Wrote checkpoint at time %g, iteration %d' % (
+                self.t, self.count))
+        return fname
 
     def load_output(self, count):
         """Load particle data from dumped output file.
@@ -709,6 +958,32 @@ class Solver(object):
             self.dump_output()
             self.barrier()
 
+    def _write_output_index(self, fname):
+        info = dict(
+            file=os.path.basename(fname),
+            arrays=get_local_info(self.particles)
+        )
+        ranks = self.comm.gather(info, root=0)
+        if self.rank == 0:
+            prefix = self.output_prefix or self.fname
+            write_index(
+                get_index_filename(self.output_directory, prefix, self.count),
+                self._get_solver_data(), ranks
+            )
+
+    def _write_checkpoint_if_needed(self):
+        freq, interval = self.checkpoint_freq, self.checkpoint_interval
+        write = freq > 0 and self.count % freq == 0
+        if interval > 0:
+            elapsed = monotonic_clock() - self._last_checkpoint_time
+            due = elapsed >= interval
+            if self.in_parallel:
+                # All processors must checkpoint the same iteration.
+                due = self.comm.bcast(due, root=0)
+            write = write or due
+        if write:
+            self.write_checkpoint()
+
     def _get_solver_data(self):
         if self._prev_dt is not None:
             dt = self._prev_dt/self._damping_factor
@@ -739,9 +1014,92 @@ class Solver(object):
 
         return dt
 
+    def _get_timings_filename(self):
+        return os.path.join(
+            self.output_directory,
+            '%s_timings_%d.jsonl'%(self.fname, self.rank)
+        )
+
+    def _record_timings(self, dt):
+        n_particles = get_particle_counts(self.particles)
+        total = sum(n_particles.values())
+        record = self._timer.stop(
+            count=self.count, t=self.t, dt=dt, rank=self.rank,
+            n_particles=n_particles, rss=get_memory_rss()
+        )
+        elapsed = record['total']
+        record['throughput'] = total/elapsed if elapsed > 0 else 0.0
+        if self.pm is not None and getattr(self.pm, 'dynamic_lb', False):
+            record['imbalance'] = self.pm.imbalance
+            logger.debug('Load imbalance %.3f at iteration %d' % (
+                self.pm.imbalance, self.count
+            ))
+        if self.timings_freq > 0 and self.count % self.timings_freq == 0:
+            self._write_timings()
+        freq = self.memory_report_freq
+        if freq > 0 and self.count % freq == 0:
+            self._log_memory_report()
+
+    def _split_integrator_time(self, elapsed):
+        timer = self._timer
+        phases = self.integrator.get_timings(reset=True)
+        for phase, value in phases.items():
+            timer.add(phase, value)
+        timer.add('integrator_stages', elapsed - sum(phases.values()))
+        if timer.track_memory:
+            timer.sample_memory('integrator')
+
+    def _log_memory_report(self):
+        report = format_memory_report(
+            self.get_memory_usage(), self.get_peak_memory()
+        )
+        logger.info('Memory of rank %d at iteration %d:\n%s' % (
+            self.rank, self.count, report
+        ))
+
+    def _write_timings(self):
+        """Append the records not yet written to the timings file.  The
+        latest record is also given the neighbor statistics and the work of
+        each thread.
+        """
+        timer = self._timer
+        records = timer.get_records()
+        n_new = min(len(records), timer.n_recorded - self._n_written_timings)
+        if n_new == 0:
+            return
+        records = records[-n_new:]
+        records[-1]['neighbors'] = get_neighbor_statistics(self.nnps)
+        records[-1]['threads'] = get_thread_work(self.nnps)
+        if not os.path.exists(self.output_directory):
+            os.makedirs(self.output_directory)
+        write_records(self._get_timings_filename(), records)
+        self._n_written_timings = timer.n_recorded
+
     def _get_undamped_timestep(self):
         return self.dt/self._damping_factor
 
+    def _handle_unused_properties(self, before_compile):
+        """Remove the unused properties before the equations are compiled or
+        exclude them from the exchange after, as chosen by
+        `set_unused_properties`.
+        """
+        action = self.unused_properties
+        args = (self.acceleration_eval, self.integrator, self.keep_properties)
+        if before_compile:
+            if action == 'remove':
+                unused = remove_unused_properties(*args)
+            else:
+                unused = get_unused_properties(*args)
+            for name, props in sorted(unused.items()):
+                if props:
+                    logger.info('Properties of %s not used by the equations '
+                                'or integrator: %s', name, sorted(props))
+        elif action != 'keep':
+            if action == 'exclude':
+                exclude_unused_properties(*args)
+            if self.pm is not None and hasattr(self.pm, 'update_lb_props'):
+                self.pm.update_lb_props()
+
     def _post_stage_callback(self, time, dt, stage):
         for callback in self.post_stage_callbacks:
             callback(time, dt, stage)
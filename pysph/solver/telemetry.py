@@ -0,0 +1,318 @@
+"""Utilities to record the performance of a running simulation.
+
+The solver uses a :class:`StepTimer` to record the wall clock time spent in
+the different phases of each time step in a ring buffer.  The records can be
+obtained using ``solver.get_timings()`` and are periodically written to the
+output directory as JSON lines along with the particle counts, neighbor
+statistics, memory usage and throughput.
+
+The memory allocated and used by the particles, the neighbor search, the
+parallel manager and the generated code is itemized by
+:func:`get_memory_usage` and periodically logged by the solver along with
+the peak resident memory of each phase of the time steps.
+"""
+
+from collections import deque
+import json
+import os
+
+import numpy
+
+try:
+    from time import perf_counter as monotonic_clock
+except ImportError:
+    from time import time as monotonic_clock
+
+from pyzoltan.core.carray import UIntArray
+
+
+def get_memory_rss():
+    """Return the resident set size of the current process in bytes.
+
+    On systems without `/proc` the peak resident set size is returned
+    instead.  If neither is available, 0 is returned.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages*os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        import sys
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on OS X and in kilobytes elsewhere.
+        return rss if sys.platform == 'darwin' else rss*1024
+    except (ImportError, AttributeError):
+        return 0
+
+
+# Set when the peak resident set size cannot be reset.
+_peak_reset_failed = False
+
+
+def get_peak_memory_rss(reset=False):
+    """Return the peak resident set size of the current process in bytes.
+
+    On Linux, if `reset` is True, the peak is reset to the current resident
+    set size after it is read so that the peak of the code that follows can
+    be measured.  Elsewhere the peak cannot be reset and, if it is not
+    available either, the current resident set size is returned.
+    """
+    global _peak_reset_failed
+    peak = 0
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    peak = int(line.split()[1])*1024
+                    break
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+    if peak == 0:
+        return get_memory_rss()
+    if reset and not _peak_reset_failed:
+        try:
+            with open('/proc/self/clear_refs', 'w') as f:
+                f.write('5')
+        except (IOError, OSError):
+            _peak_reset_failed = True
+    return peak
+
+
+def get_memory_usage(particles, nnps=None, pm=None, acceleration_eval=None):
+    """Return the memory used by the particles and the data structures of a
+    simulation.
+
+    Returns a dictionary with the `memory_usage()` of each particle array,
+    keyed on the name, under `particles` and that of the neighbor search,
+    the parallel manager and the acceleration evaluator, if they are given,
+    under `nnps`, `parallel_manager` and `acceleration_eval`.  Each usage is
+    a dictionary of the tuple of the bytes allocated and used by each item.
+    """
+    usage = dict(
+        particles=dict((pa.name, pa.memory_usage()) for pa in particles)
+    )
+    for name, obj in (('nnps', nnps), ('parallel_manager', pm),
+                      ('acceleration_eval', acceleration_eval)):
+        get_usage = getattr(obj, 'memory_usage', None)
+        if get_usage is not None:
+            usage[name] = get_usage()
+    return usage
+
+
+def sum_memory_usage(usage):
+    """Return the total bytes allocated and used given a possibly nested
+    dictionary of the usage of each item as returned by `get_memory_usage`.
+    """
+    if isinstance(usage, dict):
+        allocated = used = 0
+        for value in usage.values():
+            a, u = sum_memory_usage(value)
+            allocated += a
+            used += u
+        return allocated, used
+    return tuple(usage)
+
+
+def format_memory_report(usage, peak_memory=None):
+    """Return a report of the total memory, that of each component and of
+    each particle array given the output of `get_memory_usage` and
+    optionally the peak resident memory of each phase of the time step.
+    """
+    def _format(label, value):
+        allocated, used = sum_memory_usage(value)
+        return '  %-28s %10.2f MiB allocated %10.2f MiB used' % (
+            label, allocated/2.0**20, used/2.0**20
+        )
+
+    lines = [_format('total', usage)]
+    for name in sorted(usage):
+        lines.append(_format(name, usage[name]))
+        if name == 'particles':
+            for pa_name in sorted(usage[name]):
+                lines.append(_format('  ' + pa_name, usage[name][pa_name]))
+    if peak_memory:
+        lines.append('  peak resident memory of each phase:')
+        for phase in sorted(peak_memory):
+            lines.append('  %-28s %10.2f MiB' % (
+                '  ' + phase, peak_memory[phase]/2.0**20
+            ))
+    return '\n'.join(lines)
+
+
+def get_particle_counts(particles):
+    """Return a dictionary of the number of real particles in each array.
+    """
+    return dict(
+        (pa.name, pa.get_number_of_particles(real=True)) for pa in particles
+    )
+
+
+def get_neighbor_statistics(nnps, max_samples=100):
+    """Return the minimum, mean and maximum number of neighbors of a sample
+    of at most `max_samples` particles of each destination array.
+
+    The neighbors are summed over all the source arrays and are found without
+    using the neighbor cache, so this may be safely called at any time after
+    the NNPS has been updated.
+
+    Returns a dictionary keyed on the array name.
+    """
+    stats = {}
+    if nnps is None:
+        return stats
+    nbrs = UIntArray()
+    narrays = nnps.narrays
+    for dst_index in range(narrays):
+        dst = nnps.particles[dst_index]
+        n = dst.get_number_of_particles(real=True)
+        if n == 0:
+            continue
+        step = max(1, n//max_samples)
+        counts = numpy.zeros(len(range(0, n, step)), dtype=int)
+        for i, d_idx in enumerate(range(0, n, step)):
+            for src_index in range(narrays):
+                nnps.get_nearest_particles_no_cache(
+                    src_index, dst_index, d_idx, nbrs, False
+                )
+                counts[i] += nbrs.length
+        stats[dst.name] = dict(
+            min=int(counts.min()), mean=float(counts.mean()),
+            max=int(counts.max())
+        )
+    return stats
+
+
+def get_thread_work(nnps):
+    """Return the number of neighbors found by each OpenMP thread since the
+    last NNPS update and the imbalance, the ratio of the maximum to the mean
+    work.
+
+    The work is only tracked by the neighbor cache, so None is returned if
+    the cache is not used or no neighbors have been found yet.
+    """
+    get_work = getattr(nnps, 'get_thread_work', None)
+    work = None if get_work is None else get_work()
+    if work is None or work.sum() == 0:
+        return None
+    return dict(
+        work=[int(x) for x in work],
+        imbalance=float(work.max()/work.mean())
+    )
+
+
+class StepTimer(object):
+    """Records the time spent in the phases of each time step.
+
+    The records of the last `size` steps are kept in a ring buffer.
+
+    Example
+    -------
+
+    >>> timer = StepTimer()
+    >>> timer.start()
+    >>> do_something()
+    >>> elapsed = timer.lap('something')
+    >>> record = timer.stop(count=1)
+    >>> record['phases']['something'] == elapsed
+    True
+
+    """
+    def __init__(self, size=1000, track_memory=False):
+        self.records = deque(maxlen=size)
+        # Total number of steps recorded so far.
+        self.n_recorded = 0
+        # Record the peak resident memory of each phase.
+        self.track_memory = track_memory
+        self.peak_memory = {}
+        self._phases = None
+        self._memory = None
+        self._start = self._last = 0.0
+
+    def start(self):
+        """Start timing a new step."""
+        self._phases = {}
+        if self.track_memory:
+            self._memory = {}
+            get_peak_memory_rss(reset=True)
+        self._start = self._last = monotonic_clock()
+
+    def lap(self, phase=None):
+        """Return the time elapsed since the last lap (or start).
+
+        If `phase` is given the elapsed time is added to that phase and, if
+        the memory is tracked, its peak resident memory is recorded.
+        """
+        now = monotonic_clock()
+        elapsed = now - self._last
+        self._last = now
+        if phase is not None:
+            self.add(phase, elapsed)
+            if self.track_memory:
+                self.sample_memory(phase)
+        return elapsed
+
+    def add(self, phase, elapsed):
+        """Add `elapsed` seconds to the given phase of the current step."""
+        self._phases[phase] = self._phases.get(phase, 0.0) + elapsed
+
+    def sample_memory(self, phase):
+        """Record the peak resident memory since the last sample as that of
+        the given phase of the current step.
+        """
+        peak = get_peak_memory_rss(reset=True)
+        self._memory[phase] = max(self._memory.get(phase, 0), peak)
+        self.peak_memory[phase] = max(self.peak_memory.get(phase, 0), peak)
+
+    def get_peak_memory(self):
+        """Return a dictionary of the peak resident memory in bytes of each
+        phase over all the steps, this is empty unless the memory is tracked.
+        """
+        return dict(self.peak_memory)
+
+    def stop(self, **info):
+        """Finish timing the current step and store it in the buffer.
+
+        Any keyword arguments are stored along with the record which is
+        returned.
+        """
+        self.lap()
+        record = dict(info)
+        record['phases'] = self._phases
+        record['total'] = self._last - self._start
+        if self.track_memory:
+            record['peak_rss'] = self._memory
+        self.records.append(record)
+        self.n_recorded += 1
+        self._phases = None
+        return record
+
+    def get_records(self):
+        """Return a list of the records in the buffer, oldest first."""
+        return list(self.records)
+
+    def get_summary(self):
+        """Return a dictionary of the total time spent in each phase over all
+        the records in the buffer.
+        """
+        summary = {}
+        for record in self.records:
+            for phase, elapsed in record['phases'].items():
+                summary[phase] = summary.get(phase, 0.0) + elapsed
+        return summary
+
+
+def write_records(fname, records):
+    """Append the given records to `fname` as JSON lines."""
+    with open(fname, 'a') as f:
+        for record in records:
+            f.write(json.dumps(record, sort_keys=True))
+            f.write('\n')
+
+
+def read_records(fname):
+    """Read the records written by `write_records` from `fname`."""
+    with open(fname) as f:
+        return [json.loads(line) for line in f if line.strip()]
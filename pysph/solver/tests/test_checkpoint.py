@@ -0,0 +1,138 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from pysph.base.utils import get_particle_array
+from pysph.solver.checkpoint import (
+    find_latest_checkpoint, get_checkpoint_filename, get_checkpoint_files,
+    get_rank_files, is_complete, load_checkpoint, remove_old_checkpoints,
+    write_checkpoint
+)
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _make_particles(self, n=5):
+        x = np.linspace(0, 1, n)
+        fluid = get_particle_array(
+            name='fluid', x=x, y=x*2, m=1.0, h=0.1, rho=1000.0
+        )
+        fluid.add_property('ids', type='int', data=np.arange(n))
+        fluid.add_constant('c0', [10.0, 20.0])
+        fluid.set_output_arrays(['x', 'y', 'ids'])
+        fluid.set_time(0.5)
+        solid = get_particle_array(name='solid', x=[], y=[])
+        return [fluid, solid]
+
+    def test_write_and_load_roundtrip(self):
+        # Given
+        particles = self._make_particles()
+        fname = get_checkpoint_filename(self.root, 'test', 10)
+        solver_data = dict(t=0.5, dt=0.01, count=10)
+
+        # When
+        write_checkpoint(fname, particles, solver_data, dict(nnps='ll'))
+        data = load_checkpoint(fname)
+
+        # Then
+        self.assertFalse(os.path.exists(fname + '.tmp'))
+        self.assertEqual(data['solver_data'], solver_data)
+        self.assertEqual(data['meta'], dict(nnps='ll'))
+        arrays = data['arrays']
+        self.assertEqual([pa.name for pa in arrays], ['fluid', 'solid'])
+        fluid, orig = arrays[0], particles[0]
+        self.assertEqual(
+            sorted(fluid.properties.keys()), sorted(orig.properties.keys())
+        )
+        for prop in orig.properties:
+            np.testing.assert_array_equal(
+                fluid.get(prop), orig.get(prop), err_msg=prop
+            )
+            self.assertEqual(
+                fluid.properties[prop].get_c_type(),
+                orig.properties[prop].get_c_type()
+            )
+        self.assertEqual(fluid.default_values['rho'],
+                         orig.default_values['rho'])
+        np.testing.assert_array_equal(fluid.c0, [10.0, 20.0])
+        self.assertEqual(
+            sorted(fluid.output_property_arrays), ['ids', 'x', 'y']
+        )
+        self.assertEqual(fluid.time, 0.5)
+        self.assertEqual(arrays[1].get_number_of_particles(), 0)
+
+    def test_remove_old_checkpoints_keeps_latest(self):
+        # Given
+        particles = self._make_particles()
+        for count in (1, 2, 3, 10):
+            fname = get_checkpoint_filename(self.root, 'test', count)
+            write_checkpoint(fname, particles, dict(t=0.0, dt=0.1,
+                                                    count=count))
+
+        # When
+        remove_old_checkpoints(self.root, 'test', keep=2)
+
+        # Then
+        files = get_checkpoint_files(self.root, 'test')
+        self.assertEqual([count for count, rank, path in files], [3, 10])
+
+    def test_find_latest_checkpoint_returns_all_ranks(self):
+        # Given
+        particles = self._make_particles()
+        for count in (5, 6):
+            for rank in (0, 1):
+                fname = get_checkpoint_filename(self.root, 'test', count,
+                                                rank)
+                write_checkpoint(fname, particles, dict(t=0.0, dt=0.1,
+                                                        count=count))
+
+        # When
+        files = find_latest_checkpoint(self.root)
+
+        # Then
+        expected = [get_checkpoint_filename(self.root, 'test', 6, rank)
+                    for rank in (0, 1)]
+        self.assertEqual(files, expected)
+        self.assertEqual(get_rank_files(expected[1]), expected)
+        self.assertEqual(find_latest_checkpoint(self.root, 'other'), [])
+
+    def test_incomplete_checkpoints_are_skipped(self):
+        # Given
+        particles = self._make_particles()
+        meta = dict(num_procs=2)
+        for count, ranks in ((5, (0, 1)), (6, (0,))):
+            for rank in ranks:
+                fname = get_checkpoint_filename(self.root, 'test', count,
+                                                rank)
+                write_checkpoint(fname, particles, dict(t=0.0, dt=0.1,
+                                                        count=count), meta)
+
+        # When
+        files = find_latest_checkpoint(self.root)
+
+        # Then
+        expected = [get_checkpoint_filename(self.root, 'test', 5, rank)
+                    for rank in (0, 1)]
+        self.assertEqual(files, expected)
+        self.assertTrue(is_complete(expected))
+        incomplete = get_checkpoint_filename(self.root, 'test', 6, 0)
+        self.assertFalse(is_complete([incomplete]))
+        self.assertRaises(RuntimeError, get_rank_files, incomplete)
+
+        # When
+        os.remove(expected[1])
+
+        # Then
+        self.assertEqual(find_latest_checkpoint(self.root), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
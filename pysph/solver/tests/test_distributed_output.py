@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from pysph.base.utils import get_particle_array
+from pysph.solver.distributed_output import (
+    get_index_filename, get_index_files, get_local_info,
+    get_overlapping_ranks, load_distributed, main, read_index, write_index
+)
+from pysph.solver.output import dump, load
+from pysph.solver.utils import _concatenate_arrays, load_and_concatenate
+
+
+class TestDistributedOutput(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _dump_ranks(self, nprocs=3, n=4, count=10):
+        # Each rank owns the particles in [rank, rank + 1) and also has one
+        # remote particle which should never be read.
+        ranks = []
+        solver_data = dict(t=0.1, dt=0.01, count=count)
+        for rank in range(nprocs):
+            x = np.linspace(rank, rank + 0.9, n)
+            fluid = get_particle_array(
+                name='fluid', x=np.append(x, -1.0), gid=np.arange(n + 1),
+                tag=[0]*n + [1]
+            )
+            fluid.gid[:n] = rank*n + np.arange(n)
+            fname = os.path.join(
+                self.root, 'test_%d_%d.npz' % (rank, count)
+            )
+            fname = dump(fname, [fluid], solver_data, detailed_output=True,
+                         only_real=False)
+            ranks.append(dict(file=os.path.basename(fname),
+                              arrays=get_local_info([fluid])))
+        index_file = get_index_filename(self.root, 'test', count)
+        write_index(index_file, solver_data, ranks)
+        return index_file
+
+    def test_index_records_counts_and_bounds(self):
+        # When
+        index_file = self._dump_ranks()
+        index = read_index(index_file)
+
+        # Then
+        self.assertEqual(get_index_files(self.root), [index_file])
+        self.assertEqual(index['solver_data']['count'], 10)
+        self.assertEqual(len(index['ranks']), 3)
+        info = index['ranks'][2]['arrays']['fluid']
+        self.assertEqual(info['count'], 4)
+        np.testing.assert_allclose(info['bounds'], [[2, 0, 0], [2.9, 0, 0]])
+        self.assertEqual(
+            get_overlapping_ranks(index, region=((1.5,), (2.5,))), [1, 2]
+        )
+
+    def test_load_distributed(self):
+        # Given
+        index_file = self._dump_ranks()
+
+        for n_threads in (1, 2):
+            # When
+            data = load_distributed(index_file, n_threads=n_threads)
+
+            # Then
+            fluid = data['arrays']['fluid']
+            self.assertEqual(fluid.get_number_of_particles(), 12)
+            np.testing.assert_array_equal(fluid.gid, np.arange(12))
+            np.testing.assert_array_equal(fluid.tag, 0)
+            self.assertEqual(data['solver_data']['count'], 10)
+
+    def test_load_distributed_region(self):
+        # Given
+        index_file = self._dump_ranks()
+
+        # When
+        data = load_distributed(index_file, region=((1.5,), (2.5,)))
+
+        # Then
+        fluid = data['arrays']['fluid']
+        np.testing.assert_array_equal(fluid.gid, [6, 7, 8, 9])
+        self.assertTrue(np.all((fluid.x >= 1.5) & (fluid.x <= 2.5)))
+
+    def test_load_and_concatenate_without_index(self):
+        # Given
+        index_file = self._dump_ranks()
+        os.remove(index_file)
+
+        # When
+        data = load_and_concatenate('test', nprocs=3, directory=self.root)
+
+        # Then
+        fluid = data['arrays']['fluid']
+        np.testing.assert_array_equal(fluid.gid, np.arange(12))
+
+    def test_ghost_particles_are_kept(self):
+        # Given
+        arrays_by_rank = {}
+        for rank in range(2):
+            fluid = get_particle_array(
+                name='fluid', x=[rank, rank + 0.5, -1.0, 5.0],
+                gid=[2*rank, 2*rank + 1, 10, 20], tag=[0, 0, 1, 2]
+            )
+            arrays_by_rank[rank] = {'fluid': fluid}
+
+        # When
+        fluid = _concatenate_arrays(arrays_by_rank, 2)['fluid']
+
+        # Then
+        self.assertEqual(fluid.get_number_of_particles(), 6)
+        self.assertEqual(fluid.get_number_of_particles(real=True), 4)
+        gid, tag = fluid.get('gid', 'tag', only_real_particles=False)
+        np.testing.assert_array_equal(gid, [0, 1, 2, 3, 20, 20])
+        np.testing.assert_array_equal(tag, [0, 0, 0, 0, 2, 2])
+
+    def test_merge_output(self):
+        # Given
+        self._dump_ranks(count=10)
+        self._dump_ranks(count=20)
+        outdir = os.path.join(self.root, 'merged')
+
+        # When
+        main(['-j', '2', '-d', outdir, self.root])
+
+        # Then
+        for count in (10, 20):
+            data = load(os.path.join(outdir, 'test_%d.npz' % count))
+            fluid = data['arrays']['fluid']
+            np.testing.assert_array_equal(fluid.gid, np.arange(12))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+
+import numpy as np
+
+from pysph.base.kernels import CubicSpline
+from pysph.base.nnps import LinkedListNNPS
+from pysph.base.utils import get_particle_array
+from pysph.solver.estimate import (estimate_cost, format_estimate,
+                                   get_sample_indices)
+from pysph.solver.solver import Solver
+from pysph.sph.basic_equations import SummationDensity
+from pysph.sph.integrator import (EPECIntegrator, EulerIntegrator,
+                                  PECIntegrator, PEFRLIntegrator,
+                                  TVDRK3Integrator)
+from pysph.sph.integrator_step import EulerStep
+
+
+class TestEstimate(unittest.TestCase):
+    def _make_particles(self, n=20):
+        x, y = np.mgrid[0:2:2*n*1j, 0:1:n*1j]
+        dx = 1.0/(n - 1)
+        fluid = get_particle_array(
+            name='fluid', x=x.ravel(), y=y.ravel(), m=dx*dx, h=1.2*dx,
+            rho=1.0, arho=0.0
+        )
+        solid = get_particle_array(
+            name='solid', x=np.linspace(0, 2, 2*n), y=-dx, m=dx*dx,
+            h=1.2*dx, rho=1.0
+        )
+        return [fluid, solid]
+
+    def test_sample_is_a_slab_along_the_longest_side(self):
+        # Given
+        particles = self._make_particles()
+
+        # When
+        indices = get_sample_indices(particles, 0.25)
+
+        # Then
+        n_total = sum(pa.get_number_of_particles() for pa in particles)
+        n_sample = sum(len(index) for index in indices)
+        self.assertTrue(abs(n_sample - 0.25*n_total) < 0.05*n_total)
+        limit = max(
+            pa.x[index].max() for pa, index in zip(particles, indices)
+        )
+        for pa, index in zip(particles, indices):
+            self.assertTrue(np.all(pa.x[index] <= limit))
+            self.assertEqual(np.sum(pa.x <= limit), len(index))
+        self.assertTrue(limit < 0.6)
+
+        # When
+        indices = get_sample_indices(particles, 1.0)
+
+        # Then
+        for pa, index in zip(particles, indices):
+            self.assertEqual(list(index), list(range(len(pa.x))))
+
+    def test_estimate_cost_of_a_solver(self):
+        # Given
+        particles = self._make_particles()
+        kernel = CubicSpline(dim=2)
+        equations = [
+            SummationDensity(dest='fluid', sources=['fluid', 'solid'])
+        ]
+        solver = Solver(
+            dim=2, integrator=EulerIntegrator(fluid=EulerStep()),
+            kernel=kernel, dt=1e-3, tf=0.1, adaptive_timestep=False
+        )
+
+        def create_nnps(arrays):
+            return LinkedListNNPS(
+                dim=2, particles=arrays, radius_scale=kernel.radius_scale,
+                cache=True
+            )
+
+        nnps = create_nnps(particles)
+        solver.setup(particles, equations, nnps, kernel)
+        rho = particles[0].rho.copy()
+
+        # When
+        estimate = estimate_cost(solver, create_nnps, fraction=0.5)
+
+        # Then
+        self.assertEqual(estimate['n_particles'], {'fluid': 800, 'solid': 40})
+        n_sample = sum(estimate['n_sample'].values())
+        self.assertTrue(300 < n_sample < 540)
+        self.assertTrue(estimate['neighbors']['fluid'] > 10)
+        memory = estimate['memory']
+        particle_memory = sum(
+            pa.memory_usage()[name][0]
+            for pa in particles for name in pa.properties
+        )
+        self.assertTrue(memory['particles'][0] >= particle_memory)
+        self.assertTrue(memory['nnps'][1] > 0)
+        self.assertTrue(memory['total'][0] >= memory['particles'][0])
+        t = estimate['time']
+        self.assertEqual(t['evaluations_per_step'], 1)
+        self.assertAlmostEqual(t['dt'], 1e-3)
+        self.assertEqual(t['n_steps'], 100)
+        self.assertTrue(t['acceleration_eval'] > 0)
+        self.assertAlmostEqual(t['total'], t['step']*100)
+        self.assertTrue('fluid' in format_estimate(estimate))
+        # The particles of the solver are not changed.
+        np.testing.assert_array_equal(particles[0].rho, rho)
+
+    def test_evaluations_per_step(self):
+        self.assertEqual(EulerIntegrator().get_evaluations_per_step(), 1)
+        self.assertEqual(PECIntegrator().get_evaluations_per_step(), 1)
+        integrator = PECIntegrator()
+        integrator.set_max_level(2)
+        self.assertEqual(integrator.get_evaluations_per_step(), 4)
+        self.assertEqual(EPECIntegrator().get_evaluations_per_step(), 2)
+        self.assertEqual(TVDRK3Integrator().get_evaluations_per_step(), 3)
+        self.assertEqual(PEFRLIntegrator().get_evaluations_per_step(), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
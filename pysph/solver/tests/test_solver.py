@@ -9,10 +9,16 @@ try:
 except ImportError:
     import mock
 
+import os
+import shutil
+import tempfile
+
 import numpy as np
 import numpy.testing as npt
 
+from pysph.base.utils import get_particle_array
 from pysph.solver.solver import Solver
+from pysph.solver.telemetry import read_records, sum_memory_usage
 
 
 class TestSolver(TestCase):
@@ -107,6 +113,89 @@ class TestSolver(TestCase):
             np.max(np.abs(expected - record)) < 1e-12, error_message
         )
 
+    def test_solver_records_and_writes_timings(self):
+        # Given
+        dt = 0.1
+        tf = 1.0
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.integrator.get_timings.return_value = dict(
+            nnps_update=0.0, acceleration_eval=0.0
+        )
+        solver = Solver(
+            integrator=self.integrator, tf=tf, dt=dt, adaptive_timestep=False
+        )
+        solver.set_disable_output(True)
+        solver.set_output_directory(tmpdir)
+        solver.set_output_fname('test')
+        solver.set_timings_freq(3, size=4)
+        solver.acceleration_eval = self.a_eval
+        solver.particles = [get_particle_array(name='fluid', x=[0.0, 1.0])]
+
+        # When
+        solver.solve(show_progress=False)
+
+        # Then
+        timings = solver.get_timings()
+        self.assertEqual(len(timings), 4)
+        self.assertEqual([r['count'] for r in timings], [7, 8, 9, 10])
+        last = timings[-1]
+        self.assertEqual(last['n_particles'], {'fluid': 2})
+        self.assertAlmostEqual(last['dt'], dt)
+        phases = last['phases']
+        for phase in ('pre_step_callbacks', 'nnps_update',
+                      'acceleration_eval', 'integrator_stages',
+                      'post_step_callbacks', 'timestep', 'output',
+                      'commands'):
+            self.assertTrue(phase in phases, phase)
+        self.assertTrue(last['total'] >= sum(phases.values()) - 1e-12)
+        self.assertTrue(last['throughput'] >= 0.0)
+
+        fname = os.path.join(tmpdir, 'test_timings_0.jsonl')
+        records = read_records(fname)
+        self.assertEqual([r['count'] for r in records], list(range(1, 11)))
+        self.assertTrue('neighbors' in records[2])
+        self.assertTrue('neighbors' in records[-1])
+
+    def test_solver_reports_memory(self):
+        # Given
+        dt = 0.1
+        tf = 1.0
+        self.integrator.get_timings.return_value = dict(
+            nnps_update=0.0, acceleration_eval=0.0
+        )
+        self.a_eval.memory_usage.return_value = dict(neighbors=(64, 32))
+        solver = Solver(
+            integrator=self.integrator, tf=tf, dt=dt, adaptive_timestep=False
+        )
+        solver.set_disable_output(True)
+        solver.set_memory_report(5)
+        solver.acceleration_eval = self.a_eval
+        pa = get_particle_array(name='fluid', x=[0.0, 1.0])
+        solver.particles = [pa]
+
+        # When
+        with mock.patch('pysph.solver.solver.logger') as logger:
+            solver.solve(show_progress=False)
+
+        # Then
+        usage = solver.get_memory_usage()
+        self.assertEqual(usage['particles']['fluid'], pa.memory_usage())
+        self.assertEqual(usage['acceleration_eval'], dict(neighbors=(64, 32)))
+        self.assertEqual(sum_memory_usage(usage['acceleration_eval']),
+                         (64, 32))
+        allocated, used = sum_memory_usage(usage)
+        self.assertTrue(allocated >= used > 0)
+
+        peak = solver.get_peak_memory()
+        for phase in ('pre_step_callbacks', 'integrator', 'timestep',
+                      'output', 'commands'):
+            self.assertTrue(peak[phase] > 0, phase)
+        self.assertTrue('peak_rss' in solver.get_timings()[-1])
+        reports = [x for x in logger.info.call_args_list
+                   if 'Memory of rank' in x[0][0]]
+        self.assertEqual(len(reports), 3)
+
 
 if __name__ == '__main__':
     main()
@@ -7,12 +7,13 @@ from pysph import has_h5py
 
 try:
     # This is for Python-2.6.x
-    from unittest2 import TestCase, main, skipUnless
+    from unittest2 import TestCase, main, skipIf, skipUnless
 except ImportError:
-    from unittest import TestCase, main, skipUnless
+    from unittest import TestCase, main, skipIf, skipUnless
 
 from pysph.base.utils import get_particle_array, get_particle_array_wcsph
 from pysph.solver.utils import dump, load, dump_v1, get_files
+from pysph.solver.output import OutputEncoding
 
 
 class TestGetFiles(TestCase):
@@ -76,7 +77,8 @@ class TestOutputNumpy(TestCase):
         self.assertTrue(np.allclose(pa.y, pa1.y, atol=1e-14))
 
     def test_dump_and_load_works_with_compress(self):
-        x = np.linspace(0, 1.0, 10)
+        # Use enough particles that the compression overhead is negligible.
+        x = np.linspace(0, 1.0, 1000)
         y = x*2.0
         dt = 1.0
         pa = get_particle_array(name='fluid', x=x, y=y)
@@ -150,6 +152,26 @@ class TestOutputNumpy(TestCase):
         self.assertEqual(set(pa.output_property_arrays), set(output_arrays))
         self.assertEqual(set(pa1.output_property_arrays), set(output_arrays))
 
+    def test_that_property_types_are_saved(self):
+        # Given
+        x = np.linspace(0, 1.0, 10)
+        pa = get_particle_array(name='fluid', x=x)
+        pa.add_property('vmag', type='float', data=x)
+        pa.add_property('n', type='int', data=np.arange(10))
+        pa.set_output_arrays(['x', 'vmag', 'n', 'tag', 'gid'])
+
+        # When
+        fname = self._get_filename('simple')
+        dump(fname, [pa], solver_data={})
+        pa1 = load(fname)['arrays']['fluid']
+
+        # Then
+        for prop in pa.properties:
+            self.assertEqual(pa.properties[prop].get_c_type(),
+                             pa1.properties[prop].get_c_type())
+        np.testing.assert_array_equal(pa.vmag, pa1.vmag)
+        np.testing.assert_array_equal(pa.n, pa1.n)
+
 
 class TestOutputHdf5(TestOutputNumpy):
     @skipUnless(has_h5py(), "h5py module is not present")
@@ -160,6 +182,68 @@ class TestOutputHdf5(TestOutputNumpy):
         return join(self.root, fname) + '.hdf5'
 
 
+@skipIf(not has_h5py(), "h5py module is not present")
+class TestOutputEncoding(TestCase):
+    def setUp(self):
+        self.root = mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _dump_and_load(self, encoding, n=1000):
+        x = np.linspace(0, 1.0, n)
+        pa = get_particle_array(name='fluid', x=x, y=x*2.0, rho=1000.0)
+        fname = join(self.root, 'simple.hdf5')
+        dump(fname, [pa], solver_data={'dt': 1.0}, compress=encoding)
+        return pa, fname, load(fname)['arrays']['fluid']
+
+    def test_uncompressed_output_is_not_compressed(self):
+        import h5py
+        pa, fname, pa1 = self._dump_and_load(False)
+        with h5py.File(fname, 'r') as f:
+            dset = f['particles/fluid/arrays/x']
+            self.assertEqual(dset.compression, None)
+        np.testing.assert_array_equal(pa.x, pa1.x)
+
+    def test_parallel_chunked_gzip_with_shuffle(self):
+        import h5py
+        encoding = OutputEncoding(
+            'gzip', level=1, shuffle=True, chunk_size=64, n_threads=4
+        )
+        pa, fname, pa1 = self._dump_and_load(encoding, n=1001)
+        with h5py.File(fname, 'r') as f:
+            dset = f['particles/fluid/arrays/x']
+            self.assertEqual(dset.compression, 'gzip')
+            self.assertTrue(dset.shuffle)
+            self.assertEqual(dset.chunks, (64,))
+        for prop in pa.properties:
+            np.testing.assert_array_equal(pa.get(prop), pa1.get(prop))
+
+    def test_thread_pool_is_reused_across_dumps(self):
+        from pysph.solver import output
+        encoding = OutputEncoding('gzip', chunk_size=64, n_threads=2)
+        self._dump_and_load(encoding)
+        pool = output._pools[2]
+        self._dump_and_load(encoding)
+        self.assertIs(output._pools[2], pool)
+
+    def test_reduced_precision_output(self):
+        encoding = OutputEncoding.from_string(
+            'gzip:4', precision={'y': 'float16', 'rho': 'float32'}
+        )
+        pa, fname, pa1 = self._dump_and_load(encoding)
+        np.testing.assert_array_equal(pa.x, pa1.x)
+        self.assertEqual(pa1.y.dtype, np.float64)
+        np.testing.assert_allclose(pa.y, pa1.y, rtol=1e-3, atol=1e-3)
+        np.testing.assert_array_equal(pa.rho, pa1.rho)
+
+    def test_unknown_codec_raises_error(self):
+        self.assertRaises(ValueError, OutputEncoding, 'foo')
+        self.assertRaises(
+            ValueError, OutputEncoding, 'gzip', precision={'tag': 'int8'}
+        )
+
+
 class TestOutputNumpyV1(TestCase):
     def setUp(self):
         self.root = mkdtemp()
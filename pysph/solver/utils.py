@@ -11,6 +11,8 @@ import os
 from pysph.base.particle_array import ParticleArray
 from pysph.base.utils import get_particle_array, get_particles_info
 from pysph.solver.output import load, dump, output_formats
+from pysph.solver.distributed_output import (ArrayConcatenator,
+    get_index_filename, load_distributed)
 
 HAS_PBAR = True
 try:
@@ -191,6 +193,10 @@ def load_and_concatenate(prefix,nprocs=1,directory=".",count=None):
         The file iteration count to read. If None, the last available
         one is read
 
+    If the index file of the snapshot written with the distributed output
+    is available, the files are read using
+    :py:func:`pysph.solver.distributed_output.load_distributed`.
+
     """
 
     if count is None:
@@ -198,6 +204,10 @@ def load_and_concatenate(prefix,nprocs=1,directory=".",count=None):
         counts = sorted( [int(i) for i in counts] )
         count = counts[-1]
 
+    index_file = get_index_filename(directory, prefix, count)
+    if os.path.exists(index_file):
+        return load_distributed(index_file)
+
     arrays_by_rank = {}
 
     for rank in range(nprocs):
@@ -218,29 +228,22 @@ def _concatenate_arrays(arrays_by_rank, nprocs):
     if nprocs <= 0:
         return 0
 
-    array_names = arrays_by_rank[0].keys()
-    first_processors_arrays = arrays_by_rank[0]
-
-    if nprocs > 1:
-        ret = {}
-        for array_name in array_names:
-            first_array = first_processors_arrays[array_name]
-            for rank in range(1,nprocs):
-                other_processors_arrays = arrays_by_rank[rank]
-                other_array = other_processors_arrays[array_name]
-
-                # append the other array to the first array
-                first_array.append_parray(other_array)
+    if nprocs == 1:
+        return arrays_by_rank[0]
 
-                # remove the non local particles
-                first_array.remove_tagged_particles(1)
-
-            ret[array_name] = first_array
+    # Allocate the result once and copy the particles of each rank, the
+    # remote particles are dropped.
+    totals = {}
+    for rank in range(nprocs):
+        for name, array in arrays_by_rank[rank].items():
+            totals[name] = totals.get(name, 0) + \
+                array.get_number_of_particles()
 
-    else:
-        ret = arrays_by_rank[0]
+    concatenator = ArrayConcatenator(totals)
+    for rank in range(nprocs):
+        concatenator.add(arrays_by_rank[rank])
 
-    return ret
+    return concatenator.get_arrays()
 
 # SPH interpolation of data
 from pyzoltan.core.carray import UIntArray
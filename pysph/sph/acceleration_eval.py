@@ -6,7 +6,12 @@ except ImportError:
 
 from pysph.cpy.config import get_config
 from pysph.sph.equation import (CythonGroup, Group, OpenCLGroup,
-                                get_arrays_used_in_equation)
+                                get_arrays_used_in_equation,
+                                get_properties_used_in_reduce)
+
+
+# Properties used by the NNPS and the parallel manager.
+REQUIRED_PROPERTIES = ('x', 'y', 'z', 'h', 'gid', 'pid', 'tag')
 
 
 ###############################################################################
@@ -72,6 +77,73 @@ def check_equation_array_properties(equation, particle_arrays):
         raise RuntimeError(msg)
 
 
+###############################################################################
+def get_unused_properties(acceleration_eval, integrator=None, keep=None):
+    """Return a dictionary of the properties of each particle array which
+    are neither read nor written by the equations or the integrator
+    steppers.
+
+    Parameters
+    ----------
+
+    acceleration_eval: AccelerationEval
+        The acceleration evaluator.
+    integrator: Integrator
+        The integrator, if any.
+    keep: list or dict
+        Properties to keep, either for all arrays or keyed on the array name.
+
+    The output arrays and the `REQUIRED_PROPERTIES` are always kept.  Note
+    that properties used only by Python code, like the tools or the
+    callbacks of an application, must be passed in `keep`.
+    """
+    used = acceleration_eval.get_used_properties()
+    if integrator is not None:
+        for name, props in integrator.get_used_properties().items():
+            if used.get(name, set()) is not None:
+                used.setdefault(name, set()).update(props)
+    result = {}
+    for pa in acceleration_eval.particle_arrays:
+        if used.get(pa.name, set()) is None:
+            result[pa.name] = set()
+            continue
+        if isinstance(keep, dict):
+            _keep = set(keep.get(pa.name, ()))
+        else:
+            _keep = set(keep or ())
+        _keep.update(REQUIRED_PROPERTIES, pa.output_property_arrays)
+        _keep.update(used.get(pa.name, ()))
+        result[pa.name] = set(pa.properties.keys()) - _keep
+    return result
+
+
+def remove_unused_properties(acceleration_eval, integrator=None, keep=None):
+    """Remove the properties given by `get_unused_properties` from the
+    particle arrays and return them.  This must be done before the equations
+    are compiled.
+    """
+    unused = get_unused_properties(acceleration_eval, integrator, keep)
+    for pa in acceleration_eval.particle_arrays:
+        for prop in unused[pa.name]:
+            pa.remove_property(prop)
+    return unused
+
+
+def exclude_unused_properties(acceleration_eval, integrator=None, keep=None):
+    """Exclude the properties given by `get_unused_properties` from the
+    properties exchanged between processors and return them, see
+    `ParticleArray.set_lb_props`.
+    """
+    unused = get_unused_properties(acceleration_eval, integrator, keep)
+    for pa in acceleration_eval.particle_arrays:
+        props = unused[pa.name]
+        if props:
+            pa.set_lb_props(
+                [x for x in pa.get_lb_props() if x not in props]
+            )
+    return unused
+
+
 ###############################################################################
 class MegaGroup(object):
     """A mega-group refactors actual equation Groups into a more
@@ -190,6 +262,19 @@ class AccelerationEval(object):
     ##########################################################################
     # Private interface.
     ##########################################################################
+    def _iter_destinations(self):
+        """Iterate over the (mega_group, dest, data) of all the destinations
+        of the groups and sub-groups.
+        """
+        todo = list(self.mega_groups)
+        while todo:
+            mega_group = todo.pop(0)
+            if mega_group.has_subgroups:
+                todo[:0] = mega_group.data
+                continue
+            for dest, data in mega_group.data.items():
+                yield mega_group, dest, data
+
     def _get_backend(self, backend):
         if not backend:
             cfg = get_config()
@@ -208,6 +293,74 @@ class AccelerationEval(object):
         """
         self.c_acceleration_eval.compute(t, dt)
 
+    def get_remote_properties(self):
+        """Return a dictionary of the properties of each particle array that
+        may be read from remote particles during the evaluation.
+
+        These are the source properties used by the equations in every
+        group and the destination properties of groups that also operate
+        on the remote particles, i.e. those with ``real=False``.
+        """
+        props = defaultdict(set)
+        for mega_group, dest, data in self._iter_destinations():
+            eqs_with_no_source, sources, all_eqs = data
+            for src, group in sources.items():
+                src_arrays, dest_arrays = group.get_array_names()
+                props[src].update(x[2:] for x in src_arrays)
+            if not mega_group.real:
+                src_arrays, dest_arrays = all_eqs.get_array_names()
+                props[dest].update(x[2:] for x in dest_arrays)
+        return dict(props)
+
+    def get_used_properties(self):
+        """Return a dictionary of the properties and constants of each
+        particle array which the equations read or write.
+
+        The value for an array is None if an equation operating on it has a
+        `reduce` method whose source is not available, as this may use any
+        property.
+        """
+        props = dict((pa.name, set()) for pa in self.particle_arrays)
+
+        def _update(name, names):
+            if names is None or props[name] is None:
+                props[name] = None
+            else:
+                props[name].update(names)
+
+        for mega_group, dest, data in self._iter_destinations():
+            eqs_with_no_source, sources, all_eqs = data
+            src_arrays, dest_arrays = all_eqs.get_array_names()
+            _update(dest, [x[2:] for x in dest_arrays])
+            for src, group in sources.items():
+                src_arrays, dest_arrays = group.get_array_names()
+                _update(src, [x[2:] for x in src_arrays])
+                _update(dest, [x[2:] for x in dest_arrays])
+            for equation in all_eqs.equations:
+                _update(dest, get_properties_used_in_reduce(equation))
+        return props
+
+    def get_loop_counts(self):
+        """Return a dictionary of the number of neighbor loops done for the
+        particles of each destination array in one evaluation.  This is a
+        rough measure of the relative cost of the particles of each array.
+        """
+        counts = dict((pa.name, 0) for pa in self.particle_arrays)
+        for mega_group, dest, data in self._iter_destinations():
+            eqs_with_no_source, sources, all_eqs = data
+            for src, group in sources.items():
+                if group.has_loop() or group.has_loop_all():
+                    counts[dest] += 1
+        return counts
+
+    def memory_usage(self):
+        """Return a dictionary of the tuple of the bytes allocated and used
+        by each buffer of the compiled module.  This is empty if the module
+        is not compiled or does not report its buffers.
+        """
+        get_usage = getattr(self.c_acceleration_eval, 'memory_usage', None)
+        return {} if get_usage is None else get_usage()
+
     def set_compiled_object(self, c_acceleration_eval):
         """Set the high-performance compiled object to call internally.
         """
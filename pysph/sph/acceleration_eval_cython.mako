@@ -6,7 +6,7 @@ ${' '*4*level}${l}
 % endfor
 </%def>
 
-<%def name="do_group(helper, group, level=0)" buffered="True">
+<%def name="do_group(helper, group, level=0, split_pass=0)" buffered="True">
 #######################################################################
 ## Iterate over destinations in this group.
 #######################################################################
@@ -20,15 +20,29 @@ ${' '*4*level}${l}
 dst = self.${dest}
 ${indent(helper.get_dest_array_setup(dest, eqs_with_no_source, sources, group.real), 0)}
 dst_array_index = dst.index
+% if split_pass:
+SPLIT_MASK = dst.split_mask.data
+% endif
 
 #######################################################################
 ## Initialize all equations for this destination.
 #######################################################################
 % if all_eqs.has_initialize():
 # Initialization for destination ${dest}.
+% if helper.is_fused(group, dest):
+# This is done by the integrator when the stage loop was fused.
+if not skip_fused_initialize:
+    for d_idx in range(NP_DEST):
+        ${indent(helper.get_active_check(dest), 2)}
+        ${indent(helper.get_split_check(split_pass), 2)}
+        ${indent(all_eqs.get_initialize_code(helper.object.kernel), 2)}
+% else:
 for d_idx in range(NP_DEST):
+    ${indent(helper.get_active_check(dest), 1)}
+    ${indent(helper.get_split_check(split_pass), 1)}
     ${indent(all_eqs.get_initialize_code(helper.object.kernel), 1)}
 % endif
+% endif
 #######################################################################
 ## Handle all the equations that do not have a source.
 #######################################################################
@@ -36,6 +50,8 @@ for d_idx in range(NP_DEST):
 % if eqs_with_no_source.has_loop():
 # SPH Equations with no sources.
 for d_idx in range(NP_DEST):
+    ${indent(helper.get_active_check(dest), 1)}
+    ${indent(helper.get_split_check(split_pass), 1)}
     ${indent(eqs_with_no_source.get_loop_code(helper.object.kernel), 1)}
 % endif
 % endif
@@ -63,6 +79,8 @@ ${helper.get_parallel_block()}
     thread_id = threadid()
     ${indent(eq_group.get_variable_array_setup(), 1)}
     for d_idx in ${helper.get_parallel_range("NP_DEST")}:
+        ${indent(helper.get_active_check(dest), 2)}
+        ${indent(helper.get_split_check(split_pass), 2)}
         ###############################################################
         ## Find and iterate over neighbors.
         ###############################################################
@@ -90,13 +108,15 @@ ${helper.get_parallel_block()}
 % if all_eqs.has_post_loop():
 # Post loop for destination ${dest}.
 for d_idx in range(NP_DEST):
+    ${indent(helper.get_active_check(dest), 1)}
+    ${indent(helper.get_split_check(split_pass), 1)}
     ${indent(all_eqs.get_post_loop_code(helper.object.kernel), 1)}
 % endif
 
 ###################################################################
 ## Do any reductions for the destination.
 ###################################################################
-% if all_eqs.has_reduce():
+% if all_eqs.has_reduce() and split_pass != 1:
 ${indent(all_eqs.get_reduce_code(), 0)}
 % endif
 
@@ -106,7 +126,7 @@ ${indent(all_eqs.get_reduce_code(), 0)}
 #######################################################################
 ## Update NNPS locally if needed
 #######################################################################
-% if group.update_nnps:
+% if group.update_nnps and split_pass != 1:
 # Updating NNPS.
 nnps.update_domain()
 nnps.update()
@@ -149,6 +169,9 @@ cdef class ParticleArrayWrapper:
     cdef public ParticleArray array
     ${indent(helper.get_array_decl_for_wrapper(), 1)}
     cdef public str name
+    # Particles evaluated before the remote data arrives, see
+    # AccelerationEval.set_split.
+    cdef public IntArray split_mask
 
     def __init__(self, pa, index):
         self.index = index
@@ -179,6 +202,10 @@ cdef class AccelerationEval:
     cdef void **nbrs
     # CFL time step conditions
     cdef public double dt_cfl, dt_force, dt_viscous
+    # Set by the integrator when it has already done the initialize loops.
+    cdef public bint skip_fused_initialize
+    # Called to wait for the remote data when the evaluation is split.
+    cdef public object split_wait
     ${indent(helper.get_kernel_defs(), 1)}
     ${indent(helper.get_equation_defs(), 1)}
 
@@ -213,6 +240,52 @@ cdef class AccelerationEval:
             name = pa.name
             getattr(self, name).set_array(pa)
 
+    def set_split(self, object wait, dict masks):
+        """Split the next evaluation into two passes.
+
+        The first group is evaluated for the particles whose mask (keyed on
+        the array name) is non-zero, then `wait()` is called after which the
+        remaining particles are evaluated.  The masked particles should
+        thus not need any data that is only available after `wait()` is
+        called.  Arrays without a mask are only evaluated in the second
+        pass.  If the first group cannot be split, `wait()` is called before
+        the evaluation.
+        """
+        cdef ParticleArrayWrapper wrapper
+        cdef IntArray mask
+        cdef long n
+        for pa in self.particle_arrays:
+            wrapper = getattr(self, pa.name)
+            n = wrapper.size()
+            mask = masks.get(pa.name)
+            if mask is None or mask.length < n:
+                mask = IntArray(n)
+                mask.get_npy_array()[:] = 0
+            wrapper.split_mask = mask
+        self.split_wait = wait
+
+    def memory_usage(self):
+        """Return a dictionary of the bytes allocated and used by the
+        neighbors of each thread and by the masks of a split evaluation.
+        """
+        cdef UIntArray arr
+        cdef ParticleArrayWrapper wrapper
+        cdef long allocated = 0, used = 0
+        for arr in self._nbr_refs:
+            a, u = arr.memory_usage()
+            allocated += a
+            used += u
+        usage = dict(neighbors=(allocated, used))
+        allocated = used = 0
+        for pa in self.particle_arrays:
+            wrapper = getattr(self, pa.name)
+            if wrapper.split_mask is not None:
+                a, u = wrapper.split_mask.memory_usage()
+                allocated += a
+                used += u
+        usage['split_masks'] = (allocated, used)
+        return usage
+
     cpdef compute(self, double t, double dt):
         cdef long nbr_idx, NP_SRC, NP_DEST
         cdef long s_idx, d_idx
@@ -222,6 +295,16 @@ cdef class AccelerationEval:
         cdef ParticleArrayWrapper src, dst
 
         cdef int max_iterations, min_iterations, _iteration_count
+        cdef bint skip_fused_initialize = self.skip_fused_initialize
+        self.skip_fused_initialize = False
+        cdef object split_wait = self.split_wait
+        self.split_wait = None
+        cdef int* SPLIT_MASK
+        % if helper.get_split_group_index() < 0:
+        if split_wait is not None:
+            split_wait()
+            split_wait = None
+        % endif
 
         #######################################################################
         ##  Declare all the arrays.
@@ -261,6 +344,16 @@ cdef class AccelerationEval:
             ${indent(do_group(helper, sub_group, 3), 3)}
             % endfor
 
+            % elif g_idx == helper.get_split_group_index():
+            if split_wait is not None:
+                # Interior particles.
+                ${indent(do_group(helper, group, 4, split_pass=1), 4)}
+                split_wait()
+                split_wait = None
+                # Remaining particles.
+                ${indent(do_group(helper, group, 4, split_pass=2), 4)}
+            else:
+                ${indent(do_group(helper, group, 4), 4)}
             % else:
             ${indent(do_group(helper, group, 3), 3)}
             % endif
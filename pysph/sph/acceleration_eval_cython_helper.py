@@ -57,12 +57,24 @@ def get_all_array_names(particle_arrays):
        >>> pa = ParticleArray(name='f', x=x)
        >>> get_all_array_names([pa])
        {'DoubleArray': {'x'}, 'IntArray': {'pid', 'tag'}, 'UIntArray': {'gid'}}
+
+    A property must have the same type in all the particle arrays as the
+    generated code accesses it through a single C type, a RuntimeError is
+    raised otherwise.
     """
     props = defaultdict(set)
+    types = {}
     for array in particle_arrays:
         for properties in (array.properties, array.constants):
             for name, arr in properties.items():
                 a_type = arr.__class__.__name__
+                if types.setdefault(name, (a_type, array.name))[0] != a_type:
+                    other_type, other = types[name]
+                    msg = ('Property %r is a %s in %r but a %s in %r, use '
+                           'the same type in all particle arrays.' % (
+                               name, a_type, array.name, other_type, other
+                           ))
+                    raise RuntimeError(msg)
                 props[a_type].add(name)
     return dict(props)
 
@@ -118,6 +130,9 @@ class AccelerationEvalCythonHelper(object):
         self.known_types = get_known_types_for_arrays(
             self.all_array_names
         )
+        # Destinations whose initialize loops of the first group may be
+        # fused with the integrator stages, set by the integrator helper.
+        self.fused_dests = set()
         self._ext_mod = None
         self._module = None
 
@@ -228,14 +243,68 @@ class AccelerationEvalCythonHelper(object):
         group = self.object.all_group
         src, dest = group.get_array_names()
         src.update(dest)
+        if any(self.has_active_mask(pa.name)
+               for pa in self.object.particle_arrays):
+            src.add('d_dt_active')
         return group.get_array_declarations(src, self.known_types)
 
+    def has_active_mask(self, dest_name):
+        """Returns True if only the active particles of the destination are
+        to be evaluated, this is used for block time stepping.
+        """
+        for pa in self.object.particle_arrays:
+            if pa.name == dest_name:
+                return 'dt_active' in pa.properties
+        return False
+
+    def is_fused(self, group, dest_name):
+        """Returns True if the initialize loop for the destination in the
+        given group may have been done by the integrator.
+        """
+        mega_groups = self.object.mega_groups
+        return (len(mega_groups) > 0 and group is mega_groups[0] and
+                dest_name in self.fused_dests)
+
+    def get_active_check(self, dest_name):
+        if self.has_active_mask(dest_name):
+            return 'if d_dt_active[d_idx] == 0:\n    continue'
+        else:
+            return ''
+
+    def get_split_group_index(self):
+        """Returns the index of the group that may be evaluated in two
+        passes, first for the interior particles and then, once the remote
+        data has arrived, for the rest.  This is the first group with any
+        equations if it is neither iterated nor has sub-groups, otherwise
+        -1 is returned.
+        """
+        for g_idx, group in enumerate(self.object.mega_groups):
+            if len(group.data) > 0:
+                if group.iterate or group.has_subgroups:
+                    return -1
+                return g_idx
+        return -1
+
+    def get_split_check(self, split_pass):
+        """Returns the code to skip the particles not evaluated in the
+        given pass of a split group, the first pass only does the particles
+        whose split mask is set.
+        """
+        if split_pass == 1:
+            return 'if SPLIT_MASK[d_idx] == 0:\n    continue'
+        elif split_pass == 2:
+            return 'if SPLIT_MASK[d_idx] != 0:\n    continue'
+        else:
+            return ''
+
     def get_dest_array_setup(self, dest_name, eqs_with_no_source, sources,
                              real):
         src, dest_arrays = eqs_with_no_source.get_array_names()
         for g in sources.values():
             s, d = g.get_array_names()
             dest_arrays.update(d)
+        if self.has_active_mask(dest_name):
+            dest_arrays.add('d_dt_active')
         lines = ['NP_DEST = self.%s.size(real=%s)' % (dest_name, real)]
         lines += ['%s = dst.%s.data' % (n, n[2:])
                   for n in sorted(dest_arrays)]
@@ -338,6 +338,46 @@ def get_arrays_used_in_equation(equation):
     return src_arrays, dest_arrays
 
 
+def get_properties_used_in_reduce(equation):
+    """Return the names of the attributes of the particle array used by the
+    `reduce` method of the equation, if any.
+
+    These are the attributes accessed on the particle array argument and the
+    string arguments of its methods, e.g. ``dst.gpu.pull('x')``.  Returns
+    None if the source of the method is not available, an empty set if the
+    equation has no `reduce` method.
+    """
+    meth = getattr(equation, 'reduce', None)
+    if meth is None:
+        return set()
+    try:
+        tree = ast.parse(dedent(inspect.getsource(meth)))
+    except (IOError, OSError, TypeError):
+        return None
+    dst = inspect.getargspec(meth).args[1]
+
+    def _is_dst(node):
+        while isinstance(node, (ast.Attribute, ast.Call)):
+            node = node.value if isinstance(node, ast.Attribute) else \
+                node.func
+        return isinstance(node, ast.Name) and node.id == dst
+
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute) and \
+           isinstance(node.value, ast.Name) and node.value.id == dst:
+            names.add(node.attr)
+        elif isinstance(node, ast.Call) and (
+                _is_dst(node.func) or
+                (isinstance(node.func, ast.Name) and
+                 node.func.id == 'getattr' and _is_dst(node.args[0]))):
+            for arg in node.args:
+                value = getattr(arg, 'value', getattr(arg, 's', None))
+                if isinstance(value, str):
+                    names.add(value)
+    return names
+
+
 def get_init_args(obj, method, ignore=None):
     """Return the arguments for the method given, typically an __init__.
     """
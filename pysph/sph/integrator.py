@@ -6,6 +6,8 @@ These classes are used to generate the code for the actual integrators
 from the `sph_eval` module.
 """
 
+import inspect
+
 from numpy import sqrt
 import numpy as np
 
@@ -21,6 +23,10 @@ class Integrator(object):
     ODES of the form :math:`\frac{dy}{dt} = F(y)`.
     """
 
+    # The number of calls to `compute_accelerations` in `one_timestep`,
+    # subclasses that evaluate the accelerations more often must set this.
+    n_evaluations = 1
+
     def __init__(self, **kw):
         """Pass fluid names and suitable `IntegratorStep` instances.
 
@@ -38,6 +44,14 @@ class Integrator(object):
 
         self.steppers = kw
         self.parallel_manager = None
+        # The number of power-of-two time step levels used for block
+        # (individual) time stepping, zero disables it.
+        self.max_level = 0
+        self._cfl = None
+        # The stepper methods fused with the initialization of the next
+        # acceleration evaluation, set when the integrator is compiled.
+        self.fused_plan = []
+        self._fuse_stages = True
         # This is set later when the underlying compiled integrator is created
         # by the SPHCompiler.
         self.c_integrator = None
@@ -48,10 +62,12 @@ class Integrator(object):
         args = ', '.join(['%s=%s' % (k, s[k]) for k in s])
         return '%s(%s)' % (name, args)
 
-    def _get_dt_adapt_factors(self):
-        a_eval = self.c_integrator.acceleration_eval
+    def _get_dt_adapt_factors(self, particle_arrays=None):
+        if particle_arrays is None:
+            a_eval = self.c_integrator.acceleration_eval
+            particle_arrays = a_eval.particle_arrays
         factors = [-1.0, -1.0, -1.0]
-        for pa in a_eval.particle_arrays:
+        for pa in particle_arrays:
             for i, name in enumerate(('dt_cfl', 'dt_force', 'dt_visc')):
                 if name in pa.properties:
                     if pa.gpu:
@@ -62,9 +78,201 @@ class Integrator(object):
         cfl_f, force_f, visc_f = factors
         return cfl_f, force_f, visc_f
 
+    def _get_h_minimum(self, particle_arrays):
+        hmin = 1.0
+        for pa in particle_arrays:
+            if pa.gpu:
+                h = pa.gpu.get_device_array('h')
+            else:
+                h = pa.get_carray('h')
+
+            h.update_min_max()
+
+            if h.minimum < hmin:
+                hmin = h.minimum
+
+        return hmin
+
+    def _get_block_arrays(self):
+        a_eval = self.c_integrator.acceleration_eval
+        return [pa for pa in a_eval.particle_arrays
+                if 'dt_active' in pa.properties]
+
+    def _get_particle_timesteps(self, pa):
+        """Return the locally stable time step for each particle of the
+        given array or None if no adaptive constraints are available.
+        """
+        if self._cfl is None:
+            return None
+        h = pa.get('h')
+        dt = np.ones_like(h)*1e20
+        found = False
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if 'dt_cfl' in pa.properties:
+                fac = pa.get('dt_cfl')
+                dt = np.where(fac > 0, np.minimum(dt, h/fac), dt)
+                found = True
+            if 'dt_force' in pa.properties:
+                fac = pa.get('dt_force')
+                dt = np.where(
+                    fac > 0, np.minimum(dt, np.sqrt(h/np.sqrt(fac))), dt
+                )
+                found = True
+            if 'dt_visc' in pa.properties:
+                fac = pa.get('dt_visc')
+                dt = np.where(fac > 0, np.minimum(dt, h/fac), dt)
+                found = True
+        return self._cfl*dt if found else None
+
+    def _block_step(self, time, dt):
+        """Advance the system by `dt` using hierarchical block time steps.
+
+        The step is split into ``2**max_level`` sub-steps.  A particle at
+        level `l` is integrated with a time step of ``2**l`` sub-steps and is
+        active only on the last sub-step of its block.  While inactive, its
+        position is drifted with its current velocity so that its neighbors
+        see a prediction, this drift is undone before it is integrated.
+        """
+        n_sub = 1 << self.max_level
+        dt_sub = dt/n_sub
+        arrays = self._get_block_arrays()
+        self.update_block_levels(dt_sub)
+        for k in range(n_sub):
+            for pa in arrays:
+                level, active = pa.get('dt_level', 'dt_active')
+                block = 1 << level
+                active[:] = ((k + 1) % block) == 0
+                self._drift(pa, active == 1, -(block - 1)*dt_sub)
+            self.c_integrator.step(time + k*dt_sub, dt_sub)
+            for pa in arrays:
+                active = pa.get('dt_active')
+                self._drift(pa, active == 0, dt_sub)
+
+        for pa in arrays:
+            pa.get('dt_active')[:] = 1
+
+    def _drift(self, pa, mask, dt):
+        """Move the masked particles of `pa` with their velocity by `dt`
+        which may be a scalar or an array.
+        """
+        if not set(('u', 'v', 'w')).issubset(pa.properties):
+            return
+        if np.ndim(dt) > 0:
+            dt = dt[mask]
+        for x, u in (('x', 'u'), ('y', 'v'), ('z', 'w')):
+            xa, ua = pa.get(x, u)
+            xa[mask] += dt*ua[mask]
+
     ##########################################################################
     # Public interface.
     ##########################################################################
+    def set_max_level(self, max_level):
+        """Enable hierarchical block time stepping with up to `max_level`
+        power-of-two time step levels.  Setting it to zero (the default)
+        advances all particles with the same time step.
+
+        This must be called before the integrator is compiled.  The arrays
+        being integrated are given the integer properties ``dt_level`` and
+        ``dt_active``, only the active particles are integrated and have
+        their accelerations evaluated at each sub-step.  When an adaptive
+        time step is used, the time step passed to `step` is the coarsest
+        one, i.e. ``2**max_level`` times the globally stable time step.
+        """
+        self.max_level = max_level
+
+    def setup_block_properties(self, particle_arrays):
+        """Add the properties needed for block time stepping to the arrays
+        that are integrated.
+        """
+        if self.max_level < 1:
+            return
+        for pa in particle_arrays:
+            if pa.name in self.steppers:
+                if 'dt_level' not in pa.properties:
+                    pa.add_property('dt_level', type='int', default=0)
+                if 'dt_active' not in pa.properties:
+                    pa.add_property('dt_active', type='int', default=1)
+
+    def update_block_levels(self, dt_sub):
+        """Bin the particles into time step levels given the smallest
+        (sub-step) time step, `dt_sub`.
+
+        Particles without an adaptive time step constraint are placed on the
+        coarsest level.
+        """
+        max_level = self.max_level
+        for pa in self._get_block_arrays():
+            level = pa.get('dt_level')
+            dt = self._get_particle_timesteps(pa)
+            if dt is None:
+                level[:] = max_level
+            else:
+                with np.errstate(divide='ignore'):
+                    lvl = np.floor(np.log2(dt/dt_sub))
+                level[:] = np.clip(lvl, 0, max_level)
+
+    def get_used_properties(self):
+        """Return a dictionary of the properties of each particle array read
+        or written by the steppers.
+        """
+        props = {}
+        for dest, stepper in self.steppers.items():
+            names = set()
+            for method in dir(stepper):
+                if method.startswith('stage') or method == 'initialize':
+                    args = inspect.getargspec(getattr(stepper, method)).args
+                    names.update(x[2:] for x in args
+                                 if x.startswith('d_') and x != 'd_idx')
+            if self.max_level > 0:
+                names.update(('dt_level', 'dt_active'))
+            props[dest] = names
+        return props
+
+    def get_fused_plan(self):
+        """Return a list of (stepper_method, destinations) describing the
+        stepper loops in `one_timestep` that are fused with the `initialize`
+        loops of the first equation group of the acceleration evaluation
+        that follows them.
+        """
+        return list(self.fused_plan)
+
+    def get_evaluations_per_step(self):
+        """Return the number of acceleration evaluations in each time step
+        given by the `n_evaluations` attribute of the integrator.
+
+        With block time stepping the evaluations of all the sub-steps are
+        counted although only the active particles are evaluated in each.
+        """
+        return self.n_evaluations*(1 << self.max_level)
+
+    def get_timings(self, reset=True):
+        """Return a dictionary of the wall clock time (in seconds) spent in
+        the parallel update, the NNPS update, the acceleration evaluation and
+        the post-stage callbacks since the timings were last reset.
+
+        An empty dictionary is returned if the compiled integrator does not
+        record any timings.
+        """
+        c_integrator = self.c_integrator
+        if c_integrator is None or not hasattr(c_integrator, 'timings'):
+            return {}
+        timings = dict(c_integrator.timings)
+        if reset:
+            c_integrator.reset_timings()
+        return timings
+
+    def set_fuse_stages(self, fuse):
+        """Enable or disable the fusion of the stepper loops with the
+        initialization of the next acceleration evaluation.
+
+        Fusion is always disabled when running in parallel.  It should be
+        disabled if a post-stage callback modifies properties used by the
+        `initialize` method of the equations in the first group.
+        """
+        self._fuse_stages = fuse
+        if self.c_integrator is not None:
+            self.c_integrator.fuse_stages = fuse
+
     def set_fixed_h(self, fixed_h):
         # compute h_minimum once for constant smoothing lengths
         if fixed_h:
@@ -77,32 +285,26 @@ class Integrator(object):
 
     def compute_h_minimum(self):
         a_eval = self.c_integrator.acceleration_eval
+        self.h_minimum = self._get_h_minimum(a_eval.particle_arrays)
 
-        hmin = 1.0
-        for pa in a_eval.particle_arrays:
-            if pa.gpu:
-                h = pa.gpu.get_device_array('h')
-            else:
-                h = pa.get_carray('h')
-
-            h.update_min_max()
-
-            if h.minimum < hmin:
-                hmin = h.minimum
-
-        self.h_minimum = hmin
-
-    def compute_time_step(self, dt, cfl):
+    def compute_time_step(self, dt, cfl, particle_arrays=None):
         """If there are any adaptive timestep constraints, the appropriate
         timestep is returned, else None is returned.
-        """
-        dt_cfl_fac, dt_force_fac, dt_visc_fac = self._get_dt_adapt_factors()
 
-        # iterate over particles and find hmin if using variable h
-        if not self.fixed_h:
-            self.compute_h_minimum()
+        The constraints are found from the given particle arrays, by default
+        those of the acceleration evaluator.
+        """
+        dt_cfl_fac, dt_force_fac, dt_visc_fac = self._get_dt_adapt_factors(
+            particle_arrays
+        )
 
-        hmin = self.h_minimum
+        if particle_arrays is not None:
+            hmin = self._get_h_minimum(particle_arrays)
+        else:
+            # iterate over particles and find hmin if using variable h
+            if not self.fixed_h:
+                self.compute_h_minimum()
+            hmin = self.h_minimum
 
         # default time steps set to some large value
         dt_cfl = dt_force = dt_viscous = 1e10
@@ -124,10 +326,11 @@ class Integrator(object):
 
         # return the computed time steps. If dt factors aren't
         # defined, the default dt is returned
+        self._cfl = cfl
         if dt_min <= 0.0 or abs(dt_min - 1e10) < 1:
             return None
         else:
-            return cfl*dt_min
+            return cfl*dt_min*(1 << self.max_level)
 
     def one_timestep(self, t, dt):
         """User written function that actually does one timestep.
@@ -172,6 +375,8 @@ class Integrator(object):
         """Set the high-performance compiled object to call internally.
         """
         self.c_integrator = c_integrator
+        if hasattr(c_integrator, 'fuse_stages'):
+            c_integrator.fuse_stages = self._fuse_stages
 
     def set_parallel_manager(self, pm):
         self.c_integrator.set_parallel_manager(pm)
@@ -195,7 +400,10 @@ class Integrator(object):
         To implement the integration step please override the
         ``one_timestep`` method.
         """
-        self.c_integrator.step(time, dt)
+        if self.max_level > 0:
+            self._block_step(time, dt)
+        else:
+            self.c_integrator.step(time, dt)
 
 
 ###############################################################################
@@ -278,6 +486,9 @@ class EPECIntegrator(Integrator):
     This would require additional storage for the accelerations.
 
     """
+
+    n_evaluations = 2
+
     def one_timestep(self, t, dt):
         self.initialize()
 
@@ -316,6 +527,9 @@ class TVDRK3Integrator(Integrator):
         + \Delta t F(y^{n + \frac{2}{3}}))
 
     """
+
+    n_evaluations = 3
+
     def one_timestep(self, t, dt):
         self.initialize()
 
@@ -363,6 +577,8 @@ class PEFRLIntegrator(Integrator):
 
     """
 
+    n_evaluations = 4
+
     def one_timestep(self, t, dt):
 
         self.stage1()
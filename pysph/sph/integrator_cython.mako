@@ -11,6 +11,11 @@ from libc.math cimport M_PI as pi
 
 from pysph.base.nnps_base cimport NNPS
 
+try:
+    from time import perf_counter as _timer
+except ImportError:
+    from time import time as _timer
+
 
 ${helper.get_stepper_code()}
 
@@ -20,8 +25,11 @@ cdef class Integrator:
     cdef public ParticleArrayWrapper ${helper.get_particle_array_names()}
     cdef public AccelerationEval acceleration_eval
     cdef public object parallel_manager
+    cdef object _add_work
     cdef public NNPS nnps
     cdef public double dt, t, orig_t
+    cdef public bint fuse_stages
+    cdef public dict timings
     cdef object _post_stage_callback
 
     ${indent(helper.get_stepper_defs(), 1)}
@@ -29,6 +37,9 @@ cdef class Integrator:
     def __init__(self, acceleration_eval, steppers):
         self.acceleration_eval = acceleration_eval
         self._post_stage_callback = None
+        self._add_work = None
+        self.fuse_stages = True
+        self.reset_timings()
         % for name in sorted(helper.object.steppers.keys()):
         self.${name} = acceleration_eval.${name}
         % endfor
@@ -39,18 +50,45 @@ cdef class Integrator:
 
     def set_parallel_manager(self, object pm):
         self.parallel_manager = pm
+        # The compute time is reported for the dynamic load balancing.
+        self._add_work = getattr(pm, 'add_work', None)
 
     def set_post_stage_callback(self, object callback):
         self._post_stage_callback = callback
 
+    def reset_timings(self):
+        self.timings = dict(
+            parallel_update=0.0, nnps_update=0.0, acceleration_eval=0.0,
+            post_stage_callbacks=0.0
+        )
+
     cpdef compute_accelerations(self):
+        cdef double t0, t1, t2, t3
+        cdef object pm = self.parallel_manager
+        t0 = _timer()
         # update NNPS since particles have moved
-        if self.parallel_manager:
-            self.parallel_manager.update()
+        if pm:
+            pm.update()
+        t1 = _timer()
         self.nnps.update()
+        t2 = _timer()
+
+        # Evaluate the interior particles while the remote data arrives.
+        if pm and getattr(pm, 'halo_pending', False):
+            self.acceleration_eval.set_split(
+                pm.finish_remote_refresh, pm.get_interior_masks()
+            )
 
         # Evaluate
         self.acceleration_eval.compute(self.t, self.dt)
+        t3 = _timer()
+
+        timings = self.timings
+        timings['parallel_update'] += t1 - t0
+        timings['nnps_update'] += t2 - t1
+        timings['acceleration_eval'] += t3 - t2
+        if self._add_work is not None:
+            self._add_work(t3 - t1)
 
     cpdef do_post_stage(self, double stage_dt, int stage):
         """This is called after every stage of the integrator.
@@ -65,9 +103,12 @@ cdef class Integrator:
 
          - stage : int: the stage completed (starting from 1).
         """
+        cdef double t0
         self.t = self.orig_t + stage_dt
         if self._post_stage_callback is not None:
+            t0 = _timer()
             self._post_stage_callback(self.t, self.dt, stage)
+            self.timings['post_stage_callbacks'] += _timer() - t0
 
     cpdef step(self, double t, double dt):
         """Main step routine.
@@ -93,10 +134,54 @@ cdef class Integrator:
         # ---------------------------------------------------------------------
         # Destination ${dest}.
         dst = self.${dest}
+        dt = self.dt
         # Only iterate over real particles.
         NP_DEST = dst.size(real=True)
         ${indent(helper.get_array_setup(dest, method), 2)}
         for d_idx in range(NP_DEST):
+            % if helper.has_block_timestep(dest):
+            # Block time stepping: skip inactive particles and use the
+            # particle's own time step.
+            if d_dt_active[d_idx] == 0:
+                continue
+            dt = ldexp(self.dt, d_dt_level[d_idx])
+            % endif
+            ${indent(helper.get_stepper_loop(dest, method), 3)}
+        % endfor
+    % endfor
+
+    % for method in helper.get_fused_method_names():
+    cdef ${method}_fused(self):
+        """Fused version of ${method} that also runs the initialize loops of
+        the next acceleration evaluation.
+        """
+        if not self.fuse_stages or self.parallel_manager is not None:
+            self.${method}()
+            return
+
+        cdef long NP_DEST
+        cdef long d_idx
+        cdef ParticleArrayWrapper dst
+        cdef double dt = self.dt
+        cdef double t = self.t
+        ${indent(helper.get_array_declarations(method, fused=True), 2)}
+
+        % for dest in sorted(helper.object.steppers.keys()):
+        # ---------------------------------------------------------------------
+        # Destination ${dest}.
+        dst = self.${dest}
+        dt = self.dt
+        # Only iterate over real particles.
+        NP_DEST = dst.size(real=True)
+        ${indent(helper.get_array_setup(dest, method, fused=True), 2)}
+        for d_idx in range(NP_DEST):
+            % if helper.has_block_timestep(dest):
+            if d_dt_active[d_idx] == 0:
+                continue
+            dt = ldexp(self.dt, d_dt_level[d_idx])
+            % endif
             ${indent(helper.get_stepper_loop(dest, method), 3)}
+            ${indent(helper.get_fused_initialize_loop(dest), 3)}
         % endfor
+        self.acceleration_eval.skip_fused_initialize = True
     % endfor
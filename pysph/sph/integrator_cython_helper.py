@@ -7,6 +7,7 @@ from the `sph_eval` module.
 """
 
 import inspect
+import re
 from os.path import join, dirname
 from textwrap import dedent
 from mako.template import Template
@@ -16,6 +17,13 @@ from pysph.sph.equation import get_array_names
 from pysph.cpy.api import CythonGenerator, get_func_definition
 
 
+# Arrays used by the generated stepper loops for block time stepping.
+BLOCK_ARRAYS = set(('d_dt_active', 'd_dt_level'))
+
+# Matches a plain method call statement like "self.stage1()".
+_CALL = re.compile(r'^\s*self\.(\w+)\(.*\)\s*$')
+
+
 class IntegratorCythonHelper(object):
     """A helper that generates Cython code for the Integrator class.
     """
@@ -26,6 +34,11 @@ class IntegratorCythonHelper(object):
         self._particle_arrays = dict((x.name, x) for x in pas)
         if self.object is not None:
             self._check_integrator_steppers()
+            self._fused_initialize = self._get_fusable_initialize()
+            self._fused_plan = self._make_fused_plan()
+            acceleration_eval_helper.fused_dests = set(
+                self._fused_initialize.keys()
+            ) if self._fused_plan else set()
 
     def get_code(self):
         if self.object is not None:
@@ -42,6 +55,7 @@ class IntegratorCythonHelper(object):
         )
         # Setup the integrator to use this compiled module.
         self.object.set_compiled_object(cython_integrator)
+        self.object.fused_plan = self.get_fused_plan()
 
     ##########################################################################
     # Mako interface.
@@ -90,12 +104,16 @@ class IntegratorCythonHelper(object):
         meth = getattr(stepper, method)
         return inspect.getargspec(meth).args
 
-    def get_array_declarations(self, method):
+    def get_array_declarations(self, method, fused=False):
         arrays = set()
         for dest in self.object.steppers:
             s, d = get_array_names(self.get_args(dest, method))
             self._check_arrays_for_properties(dest, s | d)
             arrays.update(s | d)
+            if self.has_block_timestep(dest):
+                arrays.update(BLOCK_ARRAYS)
+            if fused and dest in self._fused_initialize:
+                arrays.update(self._get_fused_initialize_arrays(dest))
 
         known_types = self.acceleration_eval_helper.known_types
         decl = []
@@ -106,11 +124,23 @@ class IntegratorCythonHelper(object):
 
         return '\n'.join(decl)
 
-    def get_array_setup(self, dest, method):
+    def get_array_setup(self, dest, method, fused=False):
         s, d = get_array_names(self.get_args(dest, method))
-        lines = ['%s = dst.%s.data' % (n, n[2:]) for n in sorted(s | d)]
+        arrays = s | d
+        if self.has_block_timestep(dest):
+            arrays.update(BLOCK_ARRAYS)
+        if fused and dest in self._fused_initialize:
+            arrays.update(self._get_fused_initialize_arrays(dest))
+        lines = ['%s = dst.%s.data' % (n, n[2:]) for n in sorted(arrays)]
         return '\n'.join(lines)
 
+    def has_block_timestep(self, dest):
+        """Returns True if the destination uses block time stepping, i.e. it
+        has the properties setup by `Integrator.setup_block_properties`.
+        """
+        props = self._particle_arrays[dest].properties
+        return 'dt_active' in props and 'dt_level' in props
+
     def get_stepper_loop(self, dest, method):
         args = self.get_args(dest, method)
         if 'self' in args:
@@ -121,6 +151,38 @@ class IntegratorCythonHelper(object):
         )
         return c
 
+    def get_fused_initialize_loop(self, dest):
+        """Returns the calls to the `initialize` methods of the equations of
+        the first group for the given destination, these are fused into the
+        stepper loop preceding an acceleration evaluation.
+        """
+        lines = []
+        for equation in self._fused_initialize.get(dest, []):
+            args = inspect.getargspec(equation.initialize).args
+            args = [x for x in args if x != 'self']
+            if 'SPH_KERNEL' in args:
+                kernel = 'self.acceleration_eval.kernel'
+                args[args.index('SPH_KERNEL')] = kernel
+            lines.append('self.acceleration_eval.{eq}.initialize({args})'
+                         .format(eq=equation.var_name, args=', '.join(args)))
+        return '\n'.join(lines)
+
+    def get_fused_dests(self):
+        return sorted(self._fused_initialize.keys())
+
+    def get_fused_method_names(self):
+        return sorted(set(method for method, dests in self._fused_plan))
+
+    def get_fused_plan(self):
+        """Returns a list of (stepper_method, destinations) in the order in
+        which they are called in `one_timestep`.  Each of these stepper
+        methods is fused with the `initialize` loops of the first equation
+        group of the acceleration evaluation that follows it, for the listed
+        destinations.
+        """
+        dests = self.get_fused_dests()
+        return [(method, list(dests)) for method, _ in self._fused_plan]
+
     def get_stepper_method_wrapper_names(self):
         """Returns the names of the methods we should wrap.  For a 2 stage
         method this will return ('initialize', 'stage1', 'stage2')
@@ -133,14 +195,88 @@ class IntegratorCythonHelper(object):
         return list(sorted(methods))
 
     def get_timestep_code(self):
-        method = self.object.one_timestep
-        sourcelines = inspect.getsourcelines(method)[0]
-        defn, lines = get_func_definition(sourcelines)
+        lines = self._get_timestep_lines()
+        for idx in set(idx for _, idx in self._fused_plan):
+            line = lines[idx]
+            method = _CALL.match(line).group(1)
+            lines[idx] = line.replace(method, method + '_fused', 1)
         return dedent(''.join(lines))
 
     ##########################################################################
     # Private interface.
     ##########################################################################
+    def _get_fusable_initialize(self):
+        """Find the destinations whose `initialize` loops in the first group
+        of the acceleration evaluation can be fused with the stepper loops.
+
+        Returns a dictionary keyed on the destination with the list of
+        equations having an initialize method.
+
+        The first group must not be iterated, have sub-groups or operate on
+        non-real particles.  The initialize methods must not use the time or
+        timestep, which are updated between the stage and the evaluation,
+        nor the positions, which may be wrapped by the domain manager.
+        """
+        a_eval = self.acceleration_eval_helper.object
+        if len(a_eval.mega_groups) == 0:
+            return {}
+        group = a_eval.mega_groups[0]
+        if group.iterate or group.has_subgroups or not group.real:
+            return {}
+
+        unsafe = set(('t', 'dt', 'd_x', 'd_y', 'd_z'))
+        result = {}
+        for dest, (eqs_with_no_source, sources, all_eqs) in \
+                group.data.items():
+            if dest not in self.object.steppers:
+                continue
+            equations = [eq for eq in all_eqs.equations
+                         if hasattr(eq, 'initialize')]
+            if len(equations) == 0:
+                continue
+            fusable = True
+            for equation in equations:
+                args = set(inspect.getargspec(equation.initialize).args)
+                if args & unsafe or any(x.startswith('s_') for x in args):
+                    fusable = False
+            if fusable:
+                result[dest] = equations
+        return result
+
+    def _get_fused_initialize_arrays(self, dest):
+        arrays = set()
+        for equation in self._fused_initialize[dest]:
+            s, d = get_array_names(
+                inspect.getargspec(equation.initialize).args
+            )
+            arrays.update(d)
+        return arrays
+
+    def _get_timestep_lines(self):
+        method = self.object.one_timestep
+        sourcelines = inspect.getsourcelines(method)[0]
+        defn, lines = get_func_definition(sourcelines)
+        return lines
+
+    def _make_fused_plan(self):
+        """Returns a list of (method, line_index) for the stepper method
+        calls in `one_timestep` that are directly followed by a call to
+        `compute_accelerations` (ignoring `do_post_stage`).
+        """
+        if len(self._fused_initialize) == 0:
+            return []
+        methods = self.get_stepper_method_wrapper_names()
+        calls = []
+        for idx, line in enumerate(self._get_timestep_lines()):
+            match = _CALL.match(line)
+            if match is not None and match.group(1) != 'do_post_stage':
+                calls.append((match.group(1), idx))
+        plan = []
+        for (name, idx), (next_name, _) in zip(calls[:-1], calls[1:]):
+            if name in methods and next_name == 'compute_accelerations':
+                plan.append((name, idx))
+        return plan
+
 
     def _check_arrays_for_properties(self, dest, args):
         """Given a particle array name and a set of arguments used by an
@@ -76,6 +76,8 @@ class OpenCLIntegrator(object):
         # update NNPS since particles have moved
         if self.parallel_manager:
             self.parallel_manager.update()
+            if getattr(self.parallel_manager, 'halo_pending', False):
+                self.parallel_manager.finish_remote_refresh()
         self.nnps.update()
 
         # Evaluate
@@ -9,6 +9,12 @@ class Scheme(object):
     """An API for an SPH scheme.
     """
 
+    #: Optional storage policy of the scheme as a dict mapping property names
+    #: or patterns to C types, see :func:`pysph.base.utils.set_storage_policy`.
+    #: This takes precedence over the global policy and may be set using
+    #: `configure`.
+    storage_policy = None
+
     def __init__(self, fluids, solids, dim):
         """
         Parameters
@@ -111,7 +117,11 @@ class Scheme(object):
             Desired properties to have in the array.
         clean : bool
             Remove undesirable properties.
+
+        The properties are stored with the types given by the storage policy
+        of the scheme and the global storage policy.
         """
+        from pysph.base.utils import apply_storage_policy, get_property_type
         all_props = set(desired_props)
         if clean:
             to_remove = set(pa.properties.keys()) - all_props
@@ -120,7 +130,10 @@ class Scheme(object):
 
         to_add = all_props - set(pa.properties.keys())
         for prop in to_add:
-            pa.add_property(prop)
+            pa.add_property(
+                prop, type=get_property_type(prop, self.storage_policy)
+            )
+        apply_storage_policy(pa, self.storage_policy)
 
     def _smart_getattr(self, obj, var):
         res = getattr(obj, var)
@@ -838,8 +851,7 @@ class AdamiHuAdamsScheme(TVFScheme):
                  'ax', 'ay', 'az']
         for fluid in self.fluids:
             pa = particle_arrays[fluid]
-            for prop in props:
-                pa.add_property(prop)
+            self._ensure_properties(pa, props, clean=False)
 
 
 class GasDScheme(Scheme):
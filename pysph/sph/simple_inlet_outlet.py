@@ -97,46 +97,41 @@ class SimpleInlet(object):
         props = self.inlet_pa.get_property_arrays()
         inlet_props = {}
         for prop, array in props.items():
-            new_array = np.array([], dtype=array.dtype)
-            for i in range(1, self.n):
-                if prop == self.axis:
-                    new_array = np.append(new_array, array - i*self.spacing)
-                else:
-                    new_array = np.append(new_array, array)
-            inlet_props[prop] = new_array
+            if prop == self.axis:
+                copies = [array - i*self.spacing for i in range(1, self.n)]
+            else:
+                copies = [array]*(self.n - 1)
+            inlet_props[prop] = np.concatenate(
+                [np.array([], dtype=array.dtype)] + copies
+            )
         self.inlet_pa.add_particles(**inlet_props)
 
     def update(self, solver=None):
         """This is called by the solver after each timestep and is passed
         the solver instance.
         """
-        pa_add = {}
         inlet_pa = self.inlet_pa
         xmin, xmax, ymin, ymax = self.xmin, self.xmax, self.ymin, self.ymax
         zmin, zmax = self.zmin, self.zmax
-        lx, ly, lz = xmax - xmin, ymax - ymin, zmax - zmin
-        x, y, z = inlet_pa.x, inlet_pa.y, inlet_pa.z
 
-        xcond = (x > xmax) | (x < xmin)
-        ycond = (y > ymax) | (y < ymin)
-        zcond = (z > zmax) | (z < zmin)
         # All the indices of particles which have left.
-        all_idx = np.where(xcond | ycond | zcond)[0]
-        # The indices which need to be wrapped around.
-        x_idx = np.where(xcond)[0]
-        y_idx = np.where(ycond)[0]
-        z_idx = np.where(zcond)[0]
+        indices = inlet_pa.get_indices_in_box(
+            xmin, xmax, ymin, ymax, zmin, zmax, inside=False
+        )
+        if indices.length == 0:
+            return
 
         # adding particles to the destination array.
-        props = inlet_pa.get_property_arrays()
-        for prop, array in props.items():
-            pa_add[prop] = np.array(array[all_idx])
-        self.dest_pa.add_particles(**pa_add)
+        self.dest_pa.append_particles(inlet_pa, indices)
 
         # moving the moved particles back to the array beginning.
-        inlet_pa.x[x_idx] -= np.sign(inlet_pa.x[x_idx] - xmax)*lx
-        inlet_pa.y[y_idx] -= np.sign(inlet_pa.y[y_idx] - ymax)*ly
-        inlet_pa.z[z_idx] -= np.sign(inlet_pa.z[z_idx] - zmax)*lz
+        idx = indices.get_npy_array()
+        for name, lo, hi in (('x', xmin, xmax), ('y', ymin, ymax),
+                             ('z', zmin, zmax)):
+            pos = inlet_pa.get_carray(name).get_npy_array()
+            values = pos[idx]
+            wrap = (values > hi) | (values < lo)
+            pos[idx[wrap]] -= np.sign(values[wrap] - hi)*(hi - lo)
 
 
 class SimpleOutlet(object):
@@ -144,6 +139,10 @@ class SimpleOutlet(object):
     """This outlet simply moves the particles that comes into it from the
     source and removes any that leave the box.
 
+    Only the real particles are moved or removed, the remote and ghost
+    particles are copies of particles owned by another processor or by the
+    periodic domain, which update them.
+
     """
     def __init__(self, outlet_pa, source_pa, xmin=-1.0, xmax=1.0,
                  ymin=-1.0, ymax=1.0, zmin=-1.0, zmax=1.0, callback=None):
@@ -183,29 +182,33 @@ class SimpleOutlet(object):
         """This is called by the solver after each timestep and is passed
         the solver instance.
         """
-        xmin, xmax, ymin, ymax = self.xmin, self.xmax, self.ymin, self.ymax
-        zmin, zmax = self.zmin, self.zmax
+        box = (self.xmin, self.xmax, self.ymin, self.ymax, self.zmin,
+               self.zmax)
         outlet_pa = self.outlet_pa
         source_pa = self.source_pa
-        x, y, z = source_pa.x, source_pa.y, source_pa.z
-        idx = np.where((x <= xmax) & (x >= xmin) & (y <= ymax) & (y >= ymin) &
-                       (z <= zmax) & (z >= zmin))[0]
-
-        # adding particles to the destination array.
-        pa_add = {}
-        props = source_pa.get_property_arrays()
-        for prop, array in props.items():
-            pa_add[prop] = np.array(array[idx])
+        indices = source_pa.get_indices_in_box(*box)
 
+        # adding particles to the destination array, which aligns it.
+        aligned = False
         if self.callback is not None:
+            # The callback is called on every update even if no particles
+            # have entered the outlet.
+            idx = indices.get_npy_array()
+            pa_add = {}
+            props = source_pa.get_property_arrays()
+            for prop, array in props.items():
+                pa_add[prop] = np.array(array[idx])
             self.callback(outlet_pa, pa_add)
-
-        outlet_pa.add_particles(**pa_add)
+            outlet_pa.add_particles(**pa_add)
+            aligned = indices.length > 0
+        elif indices.length > 0:
+            outlet_pa.append_particles(source_pa, indices)
+            aligned = True
 
         # removing the particles that moved into the outlet
-        source_pa.remove_particles(idx)
+        if indices.length > 0:
+            source_pa.remove_particles(indices)
 
-        x, y, z = outlet_pa.x, outlet_pa.y, outlet_pa.z
-        idx = np.where((x > xmax) | (x < xmin) | (y > ymax) | (y < ymin) |
-                       (z > zmax) | (z < zmin))[0]
-        outlet_pa.remove_particles(idx)
+        indices = outlet_pa.get_indices_in_box(*box, inside=False)
+        if indices.length > 0:
+            outlet_pa.remove_particles(indices, aligned=aligned)
@@ -12,6 +12,10 @@ class SPHCompiler(object):
         """
         self.acceleration_eval = acceleration_eval
         self.integrator = integrator
+        if integrator is not None:
+            integrator.setup_block_properties(
+                acceleration_eval.particle_arrays
+            )
         self.backend = acceleration_eval.backend
         self._setup_helpers()
         self.module = None
@@ -41,6 +45,13 @@ class SPHCompiler(object):
                     mod, c_a_eval
                 )
 
+    def get_module_hash(self):
+        """Return the hash of the generated extension module or None if no
+        extension module has been built.
+        """
+        ext_mod = getattr(self.acceleration_eval_helper, '_ext_mod', None)
+        return None if ext_mod is None else ext_mod.hash
+
     # Private interface. ####################################################
     def _get_code(self):
         main = self.acceleration_eval_helper.get_code()
@@ -16,14 +16,18 @@ from pysph.cpy.api import declare
 from pysph.sph.equation import Equation, Group
 from pysph.sph.acceleration_eval import (
     AccelerationEval, MegaGroup, CythonGroup,
-    check_equation_array_properties
+    check_equation_array_properties, get_unused_properties,
+    remove_unused_properties
 )
 from pysph.sph.basic_equations import SummationDensity
+from pysph.sph.integrator import EulerIntegrator
+from pysph.sph.integrator_step import IntegratorStep
 from pysph.base.kernels import CubicSpline
 from pysph.base.nnps import LinkedListNNPS as NNPS
 from pysph.sph.sph_compiler import SPHCompiler
 
 from pysph.base.reduce_array import serial_reduce_array
+from pyzoltan.core.carray import IntArray
 
 
 class DummyEquation(Equation):
@@ -174,6 +178,12 @@ class MixedTypeEquation(Equation):
         d_u[d_idx] = d_au[d_idx] + d_pid[d_idx]
 
 
+class SimpleStep(IntegratorStep):
+    def stage1(self, d_idx, d_u, d_v, d_au, dt):
+        d_u[d_idx] += dt*d_au[d_idx]
+        d_v[d_idx] = d_u[d_idx]
+
+
 class SimpleReduction(Equation):
     def initialize(self, d_idx, d_au):
         d_au[d_idx] = 0.0
@@ -264,6 +274,141 @@ class TestAccelerationEval1D(unittest.TestCase):
         a_eval.set_nnps(nnps)
         return a_eval
 
+    def test_get_remote_properties(self):
+        # Given
+        equations = [
+            Group(equations=[SimpleEquation(dest='fluid', sources=['fluid'])]),
+            Group(equations=[
+                SimpleEquation(dest='fluid', sources=None)
+            ], real=False),
+        ]
+        a_eval = AccelerationEval(
+            particle_arrays=[self.pa], equations=equations,
+            kernel=CubicSpline(dim=self.dim)
+        )
+
+        # When
+        props = a_eval.get_remote_properties()
+
+        # Then
+        self.assertEqual(list(props.keys()), ['fluid'])
+        self.assertTrue(set(['m', 'u', 'au']).issubset(props['fluid']))
+        self.assertFalse('rho' in props['fluid'])
+
+        # When
+        a_eval = AccelerationEval(
+            particle_arrays=[self.pa], equations=equations[:1],
+            kernel=CubicSpline(dim=self.dim)
+        )
+
+        # Then
+        self.assertEqual(a_eval.get_remote_properties(), {'fluid': set(['m'])})
+
+    def test_get_loop_counts(self):
+        # Given
+        solid = get_particle_array(name='solid', x=[0.0], h=0.1, m=1.0)
+        equations = [
+            Group(equations=[
+                SimpleEquation(dest='fluid', sources=['fluid', 'solid']),
+                SimpleEquation(dest='solid', sources=None),
+            ]),
+            Group(equations=[SimpleEquation(dest='fluid', sources=['solid'])]),
+        ]
+        a_eval = AccelerationEval(
+            particle_arrays=[self.pa, solid], equations=equations,
+            kernel=CubicSpline(dim=self.dim)
+        )
+
+        # When
+        counts = a_eval.get_loop_counts()
+
+        # Then
+        self.assertEqual(counts, {'fluid': 3, 'solid': 0})
+
+    def test_get_used_properties(self):
+        # Given
+        solid = get_particle_array(name='solid', x=[0.0], h=0.1, m=1.0)
+        solid.add_constant('total_mass', [0.0])
+        equations = [
+            Group(equations=[
+                SimpleEquation(dest='fluid', sources=['solid']),
+                SimpleReduction(dest='solid', sources=None),
+            ]),
+        ]
+        a_eval = AccelerationEval(
+            particle_arrays=[self.pa, solid], equations=equations,
+            kernel=CubicSpline(dim=self.dim)
+        )
+
+        # When
+        props = a_eval.get_used_properties()
+
+        # Then
+        self.assertEqual(props['fluid'], set(['u', 'au']))
+        self.assertEqual(
+            props['solid'], set(['m', 'au', 'total_mass', 'gpu'])
+        )
+
+    def test_unused_properties_are_found_and_removed(self):
+        # Given
+        self.pa.add_property('color')
+        self.pa.set_output_arrays(['x', 'm', 'rho'])
+        equations = [SimpleEquation(dest='fluid', sources=['fluid'])]
+        a_eval = AccelerationEval(
+            particle_arrays=[self.pa], equations=equations,
+            kernel=CubicSpline(dim=self.dim)
+        )
+        integrator = EulerIntegrator(fluid=SimpleStep())
+
+        # When
+        unused = get_unused_properties(a_eval, integrator, keep=['p'])
+
+        # Then
+        self.assertEqual(unused, {'fluid': set(['color', 'w', 'av', 'aw'])})
+
+        # When
+        unused = remove_unused_properties(
+            a_eval, integrator, keep={'fluid': ['p', 'aw']}
+        )
+
+        # Then
+        self.assertEqual(unused, {'fluid': set(['color', 'w', 'av'])})
+        self.assertFalse('color' in self.pa.properties)
+        self.assertTrue('aw' in self.pa.properties)
+        self.assertTrue('rho' in self.pa.properties)
+
+    def test_should_split_evaluation_of_first_group(self):
+        # Given
+        pa = self.pa
+        equations = [SimpleEquation(dest='fluid', sources=['fluid'])]
+        a_eval = self._make_accel_eval(equations)
+        mask = IntArray(10)
+        mask.get_npy_array()[:] = [1, 1, 1, 1, 1, 1, 0, 0, 0, 0]
+        calls = []
+
+        def wait():
+            # Particles 0-5 do not have 9 as a neighbor.
+            calls.append(list(pa.u))
+            pa.m[9] = 2.0
+
+        # When
+        a_eval.c_acceleration_eval.set_split(wait, {'fluid': mask})
+        a_eval.compute(0.1, 0.1)
+
+        # Then
+        self.assertEqual(len(calls), 1)
+        expect = np.asarray([3., 4., 5., 5., 5., 5., 0., 0., 0., 0.])
+        self.assertListEqual(calls[0], list(expect))
+        expect = np.asarray([3., 4., 5., 5., 5., 5., 5., 6., 5., 4.])
+        self.assertListEqual(list(pa.u), list(expect))
+
+        # When
+        a_eval.compute(0.1, 0.1)
+
+        # Then
+        self.assertEqual(len(calls), 1)
+        self.assertListEqual(list(pa.u), list(expect))
+
     def test_should_support_constants(self):
         # Given
         pa = self.pa
@@ -32,6 +32,14 @@ class TestGetAllArrayNames(unittest.TestCase):
         self.assertEqual(result['IntArray'], set(('pid', 'tag')))
         self.assertEqual(result['UIntArray'], set(('gid',)))
 
+    def test_that_conflicting_types_raise_an_error(self):
+        x = np.linspace(0, 1, 10)
+        pa1 = ParticleArray(name='f', x=x)
+        pa1.add_property('rho', type='float')
+        pa2 = ParticleArray(name='b', x=x)
+        pa2.add_property('rho')
+        self.assertRaises(RuntimeError, get_all_array_names, [pa1, pa2])
+
 
 class TestGetKnownTypesForAllArrays(unittest.TestCase):
     def test_that_all_types_are_detected_correctly(self):
@@ -1,4 +1,5 @@
 # Standard library imports.
+import sys
 import unittest
 
 # Library imports.
@@ -11,11 +12,14 @@ from pysph.cpy.config import get_config
 from pysph.sph.equation import Equation
 from pysph.sph.acceleration_eval import AccelerationEval
 from pysph.base.kernels import CubicSpline
-from pysph.base.nnps import LinkedListNNPS
+from pysph.base.nnps import DomainManager, LinkedListNNPS
+from pysph.solver.solver import Solver
+from pysph.sph.basic_equations import SummationDensity
+from pysph.sph.equation import Group
 from pysph.sph.sph_compiler import SPHCompiler
-from pysph.sph.integrator import (LeapFrogIntegrator, PECIntegrator,
-                                  PEFRLIntegrator)
-from pysph.sph.integrator_step import (LeapFrogStep, PEFRLStep,
+from pysph.sph.integrator import (Integrator, LeapFrogIntegrator,
+                                  PECIntegrator, PEFRLIntegrator)
+from pysph.sph.integrator_step import (EulerStep, LeapFrogStep, PEFRLStep,
                                        TwoStageRigidBodyStep)
 
 
@@ -26,6 +30,16 @@ class SHM(Equation):
         d_au[d_idx] = -d_x[d_idx]
 
 
+class SHMLoop(Equation):
+    """Simple harmonic oscillator equation that initializes the acceleration.
+    """
+    def initialize(self, d_idx, d_au):
+        d_au[d_idx] = 0.0
+
+    def loop(self, d_idx, d_x, d_au):
+        d_au[d_idx] += -d_x[d_idx]
+
+
 class TestIntegrator(unittest.TestCase):
     def test_detection_of_missing_arrays_for_integrator(self):
         # Given.
@@ -226,6 +240,224 @@ class TestPEFRLIntegrator(TestIntegratorBase):
         self.assertTrue(err1/err2 > 16.0)
 
 
+class TwoEulerStepsIntegrator(Integrator):
+    n_evaluations = 2
+
+    def one_timestep(self, t, dt):
+        self.compute_accelerations()
+        self.stage1()
+        self.do_post_stage(dt, 1)
+        self.compute_accelerations()
+        self.stage1()
+        self.do_post_stage(dt, 2)
+
+
+class TestFusedStages(TestIntegratorBase):
+    def _make_integrator(self):
+        integrator = TwoEulerStepsIntegrator(fluid=EulerStep())
+        equations = [SHMLoop(dest="fluid", sources=None)]
+        self._setup_integrator(equations=equations, integrator=integrator)
+        return integrator
+
+    def test_fused_plan_is_exposed(self):
+        # Given/When
+        integrator = self._make_integrator()
+
+        # Then
+        self.assertEqual(integrator.get_fused_plan(), [('stage1', ['fluid'])])
+
+    def test_fused_stages_give_same_result(self):
+        # Given
+        x0, u0 = self.pa.x.copy(), self.pa.u.copy()
+        integrator = self._make_integrator()
+
+        # When
+        self._integrate(integrator, 0.1, 1.0, lambda t: None)
+        fused = self.pa.x[0], self.pa.u[0], self.pa.au[0]
+
+        self.pa.x[:] = x0
+        self.pa.u[:] = u0
+        integrator.set_fuse_stages(False)
+        self._integrate(integrator, 0.1, 1.0, lambda t: None)
+
+        # Then
+        self.assertEqual(fused, (self.pa.x[0], self.pa.u[0], self.pa.au[0]))
+
+
+class VolumeForce(Equation):
+    """Reads the density of the neighbors computed in the previous group.
+    """
+    def initialize(self, d_idx, d_au):
+        d_au[d_idx] = 0.0
+
+    def loop(self, d_idx, d_au, s_idx, s_m, s_rho, DWIJ):
+        d_au[d_idx] += -s_m[s_idx]/s_rho[s_idx]*DWIJ[0]
+
+
+class TestFusedStagesWithPeriodicDomain(unittest.TestCase):
+    def _run(self, fuse_stages):
+        dx = 0.05
+        x = np.arange(0.5*dx, 1.0, dx)
+        u = 0.1*np.sin(2*np.pi*x)
+        h = np.ones_like(x)*1.3*dx
+        pa = get_particle_array(name='fluid', x=x, u=u, h=h, m=h/1.3)
+        for prop in ('ax', 'ay', 'az', 'arho'):
+            pa.add_property(prop)
+        pa.rho[:] = 1.0
+        kernel = CubicSpline(dim=1)
+        integrator = TwoEulerStepsIntegrator(fluid=EulerStep())
+        integrator.set_fuse_stages(fuse_stages)
+        equations = [
+            Group(equations=[
+                SummationDensity(dest='fluid', sources=['fluid'])
+            ]),
+            Group(equations=[VolumeForce(dest='fluid', sources=['fluid'])]),
+        ]
+        domain = DomainManager(xmin=0.0, xmax=1.0, periodic_in_x=True)
+        nnps = LinkedListNNPS(dim=1, particles=[pa], domain=domain,
+                              radius_scale=kernel.radius_scale)
+        solver = Solver(dim=1, integrator=integrator, kernel=kernel,
+                        dt=1e-3, tf=1e-2)
+        solver.setup(particles=[pa], equations=equations, nnps=nnps)
+        solver.add_post_stage_callback(nnps.update_domain)
+
+        t = 0.0
+        for i in range(5):
+            integrator.step(t, 1e-3)
+            t += 1e-3
+        n = pa.get_number_of_particles(real=True)
+        return pa.x[:n].copy(), pa.u[:n].copy(), pa.rho[:n].copy()
+
+    def test_fused_and_unfused_results_are_identical(self):
+        # Given/When
+        fused = self._run(fuse_stages=True)
+        unfused = self._run(fuse_stages=False)
+
+        # Then
+        for a, b in zip(fused, unfused):
+            self.assertTrue(np.all(np.isfinite(a)))
+            np.testing.assert_array_equal(a, b)
+
+
+class FakeTimer(object):
+    """A clock which advances by `tick` on every reading and by the time
+    explicitly waited for.
+    """
+    def __init__(self, tick):
+        self.now = 0.0
+        self.tick = tick
+
+    def __call__(self):
+        now = self.now
+        self.now += self.tick
+        return now
+
+    def wait(self, seconds):
+        self.now += seconds
+
+
+class SlowParallelManager(object):
+    """A parallel manager whose update blocks as if waiting for the other
+    processors and which records the work reported to it.
+    """
+    def __init__(self, timer, wait):
+        self.timer = timer
+        self.wait = wait
+        self.work = []
+
+    def update(self):
+        self.timer.wait(self.wait)
+
+    def add_work(self, seconds):
+        self.work.append(seconds)
+
+
+class TestWorkReported(TestIntegratorBase):
+    def test_only_compute_time_is_reported(self):
+        # Given
+        integrator = TwoEulerStepsIntegrator(fluid=EulerStep())
+        equations = [SHMLoop(dest="fluid", sources=None)]
+        self._setup_integrator(equations=equations, integrator=integrator)
+        timer = FakeTimer(tick=1.0)
+        pm = SlowParallelManager(timer, wait=100.0)
+        integrator.set_parallel_manager(pm)
+        # The generated integrator reads the clock from its module.
+        module = sys.modules[type(integrator.c_integrator).__module__]
+        orig_timer = module._timer
+        module._timer = timer
+
+        # When
+        try:
+            integrator.step(0.0, 0.1)
+        finally:
+            module._timer = orig_timer
+
+        # Then
+        timings = integrator.get_timings()
+        self.assertEqual(pm.work, [2.0, 2.0])
+        self.assertEqual(timings['parallel_update'], 2*(100.0 + 1.0))
+        self.assertEqual(timings['nnps_update'], 2.0)
+        self.assertEqual(timings['acceleration_eval'], 2.0)
+
+
+class TestBlockTimestepping(TestIntegratorBase):
+    def setUp(self):
+        x = np.asarray([1.0, 1.0])
+        u = np.asarray([0.0, 0.0])
+        h = np.ones_like(x)
+        pa = get_particle_array(name='fluid', x=x, u=u, h=h, m=h)
+        for prop in ('ax', 'ay', 'az', 'ae', 'arho', 'e', 'dt_cfl'):
+            pa.add_property(prop)
+        self.pa = pa
+
+    def _leapfrog(self, dt, n_steps):
+        x, u = 1.0, 0.0
+        for i in range(n_steps):
+            x += 0.5*dt*u
+            u += -dt*x
+            x += 0.5*dt*u
+        return x, u
+
+    def test_block_properties_are_added(self):
+        # Given.
+        integrator = LeapFrogIntegrator(fluid=LeapFrogStep())
+        integrator.set_max_level(2)
+        equations = [SHM(dest="fluid", sources=None)]
+
+        # When
+        self._setup_integrator(equations=equations, integrator=integrator)
+
+        # Then
+        self.assertTrue('dt_level' in self.pa.properties)
+        self.assertTrue('dt_active' in self.pa.properties)
+        np.testing.assert_array_equal(self.pa.dt_active, [1, 1])
+
+    def test_particles_are_advanced_with_their_own_timestep(self):
+        # Given.
+        integrator = LeapFrogIntegrator(fluid=LeapFrogStep())
+        integrator.set_max_level(1)
+        equations = [SHM(dest="fluid", sources=None)]
+        self._setup_integrator(equations=equations, integrator=integrator)
+        integrator.set_fixed_h(True)
+        # The first particle is constrained, the second is not.
+        self.pa.dt_cfl[:] = [1.0, 0.0]
+
+        # When
+        dt = integrator.compute_time_step(0.1, 0.25)
+        integrator.step(0.0, dt)
+
+        # Then
+        self.assertAlmostEqual(dt, 0.5)
+        np.testing.assert_array_equal(self.pa.dt_level, [0, 1])
+        np.testing.assert_array_equal(self.pa.dt_active, [1, 1])
+        x0, u0 = self._leapfrog(0.25, 2)
+        x1, u1 = self._leapfrog(0.5, 1)
+        self.assertAlmostEqual(self.pa.x[0], x0, places=14)
+        self.assertAlmostEqual(self.pa.u[0], u0, places=14)
+        self.assertAlmostEqual(self.pa.x[1], x1, places=14)
+        self.assertAlmostEqual(self.pa.u[1], u1, places=14)
+
+
 class TestLeapFrogIntegratorGPU(TestIntegratorBase):
     def _setup_integrator(self, equations, integrator):
         pytest.importorskip('pysph.base.gpu_nnps')
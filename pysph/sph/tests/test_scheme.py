@@ -1,5 +1,6 @@
 from argparse import ArgumentParser
 
+from pysph.base.utils import get_particle_array
 from pysph.sph.scheme import SchemeChooser, WCSPHScheme
 from pysph.sph.wc.edac import EDACScheme
 
@@ -34,3 +35,23 @@ def test_scheme_chooser_does_not_clobber_default():
     # Then
     assert s.scheme.alpha == 0.3
     assert s.scheme.beta == 0.4
+
+
+def test_scheme_storage_policy_sets_property_types():
+    # Given
+    s = WCSPHScheme(
+        ['f'], [], dim=2, rho0=1.0, c0=10.0, h0=0.1, hdx=1.3
+    )
+    s.configure(storage_policy={'a*': 'float', 'dt_*': 'float'})
+    f = get_particle_array(name='f', x=[0.0, 1.0], arho=[1.0, 2.0])
+
+    # When
+    s.setup_properties([f])
+
+    # Then
+    types = dict((k, v.get_c_type()) for k, v in f.properties.items())
+    assert types['arho'] == 'float'
+    assert types['au'] == 'float'
+    assert types['dt_cfl'] == 'float'
+    assert types['rho'] == 'double'
+    assert list(f.arho) == [1.0, 2.0]
@@ -249,6 +249,42 @@ class TestSimpleOutlet1D(unittest.TestCase):
         self.assertEqual(len(props['x']), 4)
         self.assertEqual(sorted(props.keys()), sorted(o_pa.properties.keys()))
 
+        # When
+        outlet.update()
+
+        # Then
+        # The callback is also called when no particles enter the outlet.
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(len(calls[1][1]['x']), 0)
+        self.assertEqual(self.outlet_pa.get_number_of_particles(), 4)
+
+    def test_outlet_only_moves_real_particles(self):
+        # Given
+        # The last two particles are remote copies of particles of another
+        # processor, they are inside and outside the outlet.
+        self.source_pa.tag[-2:] = 1
+        self.source_pa.align_particles()
+        self.outlet_pa.add_particles(x=[1.2, 1.6], tag=[0, 1])
+        outlet = SimpleOutlet(self.outlet_pa, self.source_pa, xmin=1.0,
+                              xmax=1.5)
+
+        # When
+        self.source_pa.get_carray('x').get_npy_array()[:] += 0.45
+        outlet.update()
+
+        # Then
+        source_x = self.source_pa.get('x', only_real_particles=False)
+        source_tag = self.source_pa.get('tag', only_real_particles=False)
+        self.assertEqual(len(source_x), 8)
+        self.assertEqual(list(source_tag[-2:]), [1, 1])
+        self.assertTrue(np.all(source_x[-2:] >= 1.0))
+        outlet_x = self.outlet_pa.get('x', only_real_particles=False)
+        outlet_tag = self.outlet_pa.get('tag', only_real_particles=False)
+        self.assertTrue(np.allclose(
+            sorted(outlet_x[outlet_tag == 0]), [1.05, 1.15, 1.2]
+        ))
+        self.assertEqual(list(outlet_x[outlet_tag == 1]), [1.6])
+
 
 if __name__ == '__main__':
     unittest.main()
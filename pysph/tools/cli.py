@@ -19,6 +19,10 @@ def output_vtk(args):
     from pysph.solver.vtk_output import main
     main(args)
 
+def merge_output(args):
+    from pysph.solver.distributed_output import main
+    main(args)
+
 def _has_pysph_dir():
     init_py = join('pysph', '__init__.py')
     init_pyc = join('pysph', '__init__.pyc')
@@ -54,6 +58,13 @@ def main():
          add_help=False
     )
     vtk_out.set_defaults(func=output_vtk)
+
+    merge_out = subparsers.add_parser(
+        'merge_output', help='Merge the distributed output of parallel runs',
+         add_help=False
+    )
+    merge_out.set_defaults(func=merge_output)
+
     tests = subparsers.add_parser(
         'test', help='Run entire PySPH test-suite',
         add_help=False
@@ -16,6 +16,9 @@ cdef void* aligned_malloc(size_t bytes) nogil
 cdef void* aligned_realloc(void* existing, size_t bytes, size_t old_size) nogil
 cdef void aligned_free(void* p) nogil
 
+cpdef set_parallel_first_touch(bint value)
+cpdef bint get_parallel_first_touch()
+
 # forward declaration
 cdef class BaseArray
 cdef class LongArray(BaseArray)
@@ -28,6 +31,9 @@ cdef class BaseArray:
     """Base class for managed C-arrays."""
     cdef public long length, alloc
     cdef np.ndarray _npy_array
+    # the array whose memory holds the data when it is in an arena
+    cdef BaseArray _arena
+    cdef bint _pooled
 
     cdef void c_align_array(self, LongArray new_indices) nogil
     cdef void c_reserve(self, long size) nogil
@@ -40,6 +46,10 @@ cdef class BaseArray:
     cpdef np.ndarray get_npy_array(self)
     cpdef set_data(self, np.ndarray)
     cpdef squeeze(self)
+    cpdef first_touch(self)
+    cpdef set_arena(self, BaseArray arena, long offset, long alloc)
+    cpdef BaseArray get_arena(self)
+    cpdef tuple memory_usage(self)
     cpdef remove(self, np.ndarray index_list, bint input_sorted=*)
     cpdef extend(self, np.ndarray in_array)
     cpdef reset(self)
@@ -75,6 +85,7 @@ cdef class IntArray(BaseArray):
     cpdef set_data(self, np.ndarray)
     cpdef set_view(self, IntArray, long start, long end)
     cpdef squeeze(self)
+    cpdef first_touch(self)
     cpdef remove(self, np.ndarray index_list, bint input_sorted=*)
     cpdef extend(self, np.ndarray in_array)
     cpdef reset(self)
@@ -105,6 +116,7 @@ cdef class UIntArray(BaseArray):
     cpdef set_data(self, np.ndarray)
     cpdef set_view(self, UIntArray, long start, long end)
     cpdef squeeze(self)
+    cpdef first_touch(self)
     cpdef remove(self, np.ndarray index_list, bint input_sorted=*)
     cpdef extend(self, np.ndarray in_array)
     cpdef reset(self)
@@ -135,6 +147,7 @@ cdef class LongArray(BaseArray):
     cpdef set_data(self, np.ndarray)
     cpdef set_view(self, LongArray, long start, long end)
     cpdef squeeze(self)
+    cpdef first_touch(self)
     cpdef remove(self, np.ndarray index_list, bint input_sorted=*)
     cpdef extend(self, np.ndarray in_array)
     cpdef reset(self)
@@ -165,6 +178,7 @@ cdef class FloatArray(BaseArray):
     cpdef set_data(self, np.ndarray)
     cpdef set_view(self, FloatArray, long start, long end)
     cpdef squeeze(self)
+    cpdef first_touch(self)
     cpdef remove(self, np.ndarray index_list, bint input_sorted=*)
     cpdef extend(self, np.ndarray in_array)
     cpdef reset(self)
@@ -195,6 +209,7 @@ cdef class DoubleArray(BaseArray):
     cpdef set_data(self, np.ndarray)
     cpdef set_view(self, DoubleArray, long start, long end)
     cpdef squeeze(self)
+    cpdef first_touch(self)
     cpdef remove(self, np.ndarray index_list, bint input_sorted=*)
     cpdef extend(self, np.ndarray in_array)
     cpdef reset(self)
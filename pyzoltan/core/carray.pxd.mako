@@ -24,6 +24,9 @@ cdef void* aligned_malloc(size_t bytes) nogil
 cdef void* aligned_realloc(void* existing, size_t bytes, size_t old_size) nogil
 cdef void aligned_free(void* p) nogil
 
+cpdef set_parallel_first_touch(bint value)
+cpdef bint get_parallel_first_touch()
+
 # forward declaration
 cdef class BaseArray
 cdef class LongArray(BaseArray)
@@ -36,6 +39,9 @@ cdef class BaseArray:
     """Base class for managed C-arrays."""
     cdef public long length, alloc
     cdef np.ndarray _npy_array
+    # the array whose memory holds the data when it is in an arena
+    cdef BaseArray _arena
+    cdef bint _pooled
 
     cdef void c_align_array(self, LongArray new_indices) nogil
     cdef void c_reserve(self, long size) nogil
@@ -48,6 +54,10 @@ cdef class BaseArray:
     cpdef np.ndarray get_npy_array(self)
     cpdef set_data(self, np.ndarray)
     cpdef squeeze(self)
+    cpdef first_touch(self)
+    cpdef set_arena(self, BaseArray arena, long offset, long alloc)
+    cpdef BaseArray get_arena(self)
+    cpdef tuple memory_usage(self)
     cpdef remove(self, np.ndarray index_list, bint input_sorted=*)
     cpdef extend(self, np.ndarray in_array)
     cpdef reset(self)
@@ -84,6 +94,7 @@ cdef class ${CLASSNAME}(BaseArray):
     cpdef set_data(self, np.ndarray)
     cpdef set_view(self, ${CLASSNAME}, long start, long end)
     cpdef squeeze(self)
+    cpdef first_touch(self)
     cpdef remove(self, np.ndarray index_list, bint input_sorted=*)
     cpdef extend(self, np.ndarray in_array)
     cpdef reset(self)
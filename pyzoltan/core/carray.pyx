@@ -28,6 +28,7 @@ The numpy array may however be copied and used in any manner.
 
 # For malloc etc.
 from libc.stdlib cimport *
+from libc.string cimport memset
 IF UNAME_SYSNAME == "Windows":
     cdef extern from "msstdint.h" nogil:
         ctypedef unsigned int uintptr_t
@@ -36,6 +37,8 @@ ELSE:
 
 cimport numpy as np
 
+from cython.parallel import prange
+
 import numpy as np
 
 # logging imports
@@ -67,6 +70,49 @@ cdef extern from "stdlib.h":
 # numpy module initialization call
 import_array()
 
+# Reallocated arrays of at least this many bytes are copied by the OpenMP
+# threads when the parallel first touch is enabled.
+cdef size_t FIRST_TOUCH_MIN_BYTES = 1 << 20
+cdef size_t PAGE_SIZE = 4096
+cdef bint _parallel_first_touch = 0
+
+cpdef set_parallel_first_touch(bint value):
+    """Enable the parallel first touch of the reallocated arrays.
+
+    When enabled, the large arrays are copied on a reallocation by the OpenMP
+    threads with a static schedule, so on a NUMA machine the pages of each
+    block of the array are placed on the node of the thread that works on
+    that block in statically scheduled loops.  This has no effect if the
+    module is built without OpenMP.
+    """
+    global _parallel_first_touch
+    _parallel_first_touch = value
+
+cpdef bint get_parallel_first_touch():
+    return _parallel_first_touch
+
+cdef void _parallel_copy(char *dst, char *src, size_t n_bytes,
+                         size_t n_copy) nogil:
+    """Copy `n_copy` bytes from `src` to `dst` and zero the rest of the
+    `n_bytes` of `dst`, each page being written by the thread that would
+    process it with a static schedule.
+    """
+    cdef long i
+    cdef long n_pages = (n_bytes + PAGE_SIZE - 1)/PAGE_SIZE
+    cdef size_t start, end
+    if n_copy > n_bytes:
+        n_copy = n_bytes
+    for i in prange(n_pages, schedule='static'):
+        start = i*PAGE_SIZE
+        end = min(start + PAGE_SIZE, n_bytes)
+        if end <= n_copy:
+            memcpy(<void*>(dst + start), <void*>(src + start), end - start)
+        elif start < n_copy:
+            memcpy(<void*>(dst + start), <void*>(src + start), n_copy - start)
+            memset(<void*>(dst + n_copy), 0, end - n_copy)
+        else:
+            memset(<void*>(dst + start), 0, end - start)
+
 cdef inline long aligned(long n, int item_size) nogil:
     """Align `n` items each having size (in bytes) `item_size` to
     64 bytes and return the appropriate number of items that would
@@ -110,8 +156,13 @@ cdef void* _aligned_realloc(void *existing, size_t bytes, size_t old_size) nogil
     """
     cdef void* result = _aligned_malloc(bytes)
 
-    # Copy everything from the old to the new and free the old.
-    memcpy(<void*>result, <void*>existing, old_size)
+    # Copy everything that fits from the old to the new and free the old.
+    if old_size > bytes:
+        old_size = bytes
+    if _parallel_first_touch and bytes >= FIRST_TOUCH_MIN_BYTES:
+        _parallel_copy(<char*>result, <char*>existing, bytes, old_size)
+    else:
+        memcpy(<void*>result, <void*>existing, old_size)
     aligned_free(<void*>existing)
 
     return result
@@ -206,6 +257,29 @@ cdef class BaseArray:
         """
         raise NotImplementedError, 'BaseArray::squeeze'
 
+    cpdef first_touch(self):
+        """Reallocate the data so its pages are first touched by the OpenMP
+        threads with a static schedule, see `set_parallel_first_touch`.
+        """
+        raise NotImplementedError, 'BaseArray::first_touch'
+
+    cpdef set_arena(self, BaseArray arena, long offset, long alloc):
+        """Move the data into the memory of another array, see the
+        subclasses.
+        """
+        raise NotImplementedError, 'BaseArray::set_arena'
+
+    cpdef BaseArray get_arena(self):
+        """Return the array whose memory holds the data or None.
+        """
+        return self._arena
+
+    cpdef tuple memory_usage(self):
+        """Return the bytes allocated for and used by the data, see the
+        subclasses.
+        """
+        raise NotImplementedError, 'BaseArray::memory_usage'
+
     cpdef remove(self, np.ndarray index_list, bint input_sorted=0):
         """Remove the particles with indices in index_list.
         """
@@ -330,6 +404,9 @@ cdef class IntArray(BaseArray):
     def __dealloc__(self):
         """Frees the array.
         """
+        if self._pooled:
+            # the memory belongs to the arena.
+            return
         if self._old_data == NULL:
             aligned_free(<void*>self.data)
         else:
@@ -421,7 +498,20 @@ cdef class IntArray(BaseArray):
     cdef void c_reserve(self, long size) nogil:
         cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
         cdef void* data = NULL
-        if size > self.alloc:
+        if size > self.alloc and self._pooled:
+            # the arena is too small, move to our own memory.
+            data = aligned_malloc(size*sizeof(int))
+            if data == NULL:
+                with gil:
+                    raise MemoryError
+            memcpy(data, <void*>self.data, self.length*sizeof(int))
+            self.data = <int*>data
+            self.alloc = size
+            arr.data = <char *>self.data
+            self._pooled = 0
+            with gil:
+                self._arena = None
+        elif size > self.alloc:
             data = <int*>aligned_realloc(
                 self.data, size*sizeof(int),
                 self.alloc*sizeof(int)
@@ -446,8 +536,10 @@ cdef class IntArray(BaseArray):
     cdef void c_resize(self, long size) nogil:
         cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
 
-        # reserve memory
-        self.c_reserve(size)
+        # reserve memory, growing geometrically so that repeatedly adding a
+        # few elements is amortized constant time.
+        if size > self.alloc:
+            self.c_reserve(max(size, 2*self.alloc))
 
         # update the lengths
         self.length = size
@@ -469,6 +561,9 @@ cdef class IntArray(BaseArray):
         cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
         cdef void* data = NULL
         cdef size_t size = max(self.length, 16)
+        if self._pooled:
+            # the arena is managed by its owner.
+            return
         data = <int*>aligned_realloc(
             self.data, size*sizeof(int),
             self.alloc*sizeof(int)
@@ -490,6 +585,18 @@ cdef class IntArray(BaseArray):
         """
         return 'int'
 
+    cpdef tuple memory_usage(self):
+        """Return a tuple of the number of bytes allocated for the data and
+        the number used by the elements.
+
+        A view only counts the memory it owns and uses none of it, an array
+        in an arena counts its share of the arena.
+        """
+        cdef long itemsize = sizeof(int)
+        if self._old_data != NULL:
+            return self.alloc*itemsize, 0
+        return self.alloc*itemsize, self.length*itemsize
+
     cdef int* get_data_ptr(self):
         """Return the internal data pointer.
         """
@@ -523,9 +630,11 @@ cdef class IntArray(BaseArray):
             self._parent = None
 
     cpdef resize(self, long size):
-        """Resizes internal data to ``size*sizeof(int)`` bytes
-        and sets the length to the new size.
+        """Sets the length to the new size, reallocating the internal data
+        if needed.
 
+        When it grows, the capacity is at least doubled, use `reserve` to
+        allocate an exact size and `squeeze` to release the unused memory.
         """
         if self._old_data != NULL:
             raise RuntimeError('Cannot reize array which is a view.')
@@ -566,6 +675,78 @@ cdef class IntArray(BaseArray):
 
         self.c_squeeze()
 
+    cpdef first_touch(self):
+        """Reallocate the data so its pages are first touched by the OpenMP
+        threads with a static schedule, see `set_parallel_first_touch`.
+
+        This should be called once the array has been filled by a single
+        thread, as the pages of a buffer stay where they were first touched.
+        """
+        if self._old_data != NULL:
+            raise RuntimeError('Cannot first touch array which is a view.')
+        if self._pooled:
+            raise RuntimeError('Cannot first touch array in an arena.')
+
+        cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
+        cdef size_t n_bytes = self.alloc*sizeof(int)
+        cdef int* data = <int*>aligned_malloc(n_bytes)
+        if data == NULL:
+            raise MemoryError
+
+        with nogil:
+            _parallel_copy(
+                <char*>data, <char*>self.data, n_bytes,
+                self.length*sizeof(int)
+            )
+        aligned_free(<void*>self.data)
+        self.data = data
+        arr.data = <char *>self.data
+
+    cpdef set_arena(self, BaseArray arena, long offset, long alloc):
+        """Move the data into the memory of the `arena` array.
+
+        The data is copied to `alloc` elements starting `offset` bytes into
+        the memory of the arena, which is kept alive by this array.  The
+        array is not reallocated while its length is within `alloc`, if it
+        has to grow further it moves back to its own memory.  Pass None as
+        the arena to move the data back to memory owned by the array.
+
+        This allows several arrays to share one allocation, see
+        :py:meth:`pysph.base.particle_array.ParticleArray.set_pooled`.
+        """
+        if self._old_data != NULL:
+            raise RuntimeError('Cannot move array which is a view.')
+
+        cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
+        cdef np.ndarray buf
+        cdef int* data
+        cdef long nbytes
+        if arena is None:
+            if not self._pooled:
+                return
+            alloc = max(self.length, 16)
+            data = <int*>aligned_malloc(alloc*sizeof(int))
+        else:
+            if arena is self:
+                raise ValueError('An array cannot be its own arena.')
+            if alloc < self.length:
+                raise ValueError('The arena is smaller than the array.')
+            buf = arena.get_npy_array()
+            nbytes = arena.alloc*buf.itemsize
+            if offset < 0 or offset + alloc*sizeof(int) > nbytes:
+                raise ValueError('The array does not fit in the arena.')
+            data = <int*>(<char*>buf.data + offset)
+
+        memcpy(<void*>data, <void*>self.data,
+               self.length*sizeof(int))
+        if not self._pooled:
+            aligned_free(<void*>self.data)
+        self.data = data
+        self.alloc = alloc
+        arr.data = <char *>self.data
+        self._arena = arena
+        self._pooled = arena is not None
+
     cpdef remove(self, np.ndarray index_list, bint input_sorted=0):
         """Remove the particles with indices in index_list.
 
@@ -628,10 +809,13 @@ cdef class IntArray(BaseArray):
         """
         if self._old_data != NULL:
             raise RuntimeError('Cannot extend array which is a view.')
-        cdef long len = in_array.size
-        cdef long i
-        for i in range(len):
-            self.append(in_array[i])
+        cdef long length = self.length
+        cdef np.ndarray arr = np.ascontiguousarray(
+            in_array, dtype=self._npy_array.dtype
+        ).ravel()
+        self.c_resize(length + arr.size)
+        memcpy(<void*>(self.data + length), arr.data,
+               arr.size*sizeof(int))
 
     cpdef copy_values(self, LongArray indices, BaseArray dest):
         """Copies values of indices in indices from self to `dest`.
@@ -795,6 +979,9 @@ cdef class UIntArray(BaseArray):
     def __dealloc__(self):
         """Frees the array.
         """
+        if self._pooled:
+            # the memory belongs to the arena.
+            return
         if self._old_data == NULL:
             aligned_free(<void*>self.data)
         else:
@@ -886,7 +1073,20 @@ cdef class UIntArray(BaseArray):
     cdef void c_reserve(self, long size) nogil:
         cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
         cdef void* data = NULL
-        if size > self.alloc:
+        if size > self.alloc and self._pooled:
+            # the arena is too small, move to our own memory.
+            data = aligned_malloc(size*sizeof(unsigned int))
+            if data == NULL:
+                with gil:
+                    raise MemoryError
+            memcpy(data, <void*>self.data, self.length*sizeof(unsigned int))
+            self.data = <unsigned int*>data
+            self.alloc = size
+            arr.data = <char *>self.data
+            self._pooled = 0
+            with gil:
+                self._arena = None
+        elif size > self.alloc:
             data = <unsigned int*>aligned_realloc(
                 self.data, size*sizeof(unsigned int),
                 self.alloc*sizeof(unsigned int)
@@ -911,8 +1111,10 @@ cdef class UIntArray(BaseArray):
     cdef void c_resize(self, long size) nogil:
         cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
 
-        # reserve memory
-        self.c_reserve(size)
+        # reserve memory, growing geometrically so that repeatedly adding a
+        # few elements is amortized constant time.
+        if size > self.alloc:
+            self.c_reserve(max(size, 2*self.alloc))
 
         # update the lengths
         self.length = size
@@ -934,6 +1136,9 @@ cdef class UIntArray(BaseArray):
         cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
         cdef void* data = NULL
         cdef size_t size = max(self.length, 16)
+        if self._pooled:
+            # the arena is managed by its owner.
+            return
         data = <unsigned int*>aligned_realloc(
             self.data, size*sizeof(unsigned int),
             self.alloc*sizeof(unsigned int)
@@ -955,6 +1160,18 @@ cdef class UIntArray(BaseArray):
         """
         return 'unsigned int'
 
+    cpdef tuple memory_usage(self):
+        """Return a tuple of the number of bytes allocated for the data and
+        the number used by the elements.
+
+        A view only counts the memory it owns and uses none of it, an array
+        in an arena counts its share of the arena.
+        """
+        cdef long itemsize = sizeof(unsigned int)
+        if self._old_data != NULL:
+            return self.alloc*itemsize, 0
+        return self.alloc*itemsize, self.length*itemsize
+
     cdef unsigned int* get_data_ptr(self):
         """Return the internal data pointer.
         """
@@ -988,9 +1205,11 @@ cdef class UIntArray(BaseArray):
             self._parent = None
 
     cpdef resize(self, long size):
-        """Resizes internal data to ``size*sizeof(unsigned int)`` bytes
-        and sets the length to the new size.
+        """Sets the length to the new size, reallocating the internal data
+        if needed.
 
+        When it grows, the capacity is at least doubled, use `reserve` to
+        allocate an exact size and `squeeze` to release the unused memory.
         """
         if self._old_data != NULL:
             raise RuntimeError('Cannot reize array which is a view.')
@@ -1031,6 +1250,78 @@ cdef class UIntArray(BaseArray):
 
         self.c_squeeze()
 
+    cpdef first_touch(self):
+        """Reallocate the data so its pages are first touched by the OpenMP
+        threads with a static schedule, see `set_parallel_first_touch`.
+
+        This should be called once the array has been filled by a single
+        thread, as the pages of a buffer stay where they were first touched.
+        """
+        if self._old_data != NULL:
+            raise RuntimeError('Cannot first touch array which is a view.')
+        if self._pooled:
+            raise RuntimeError('Cannot first touch array in an arena.')
+
+        cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
+        cdef size_t n_bytes = self.alloc*sizeof(unsigned int)
+        cdef unsigned int* data = <unsigned int*>aligned_malloc(n_bytes)
+        if data == NULL:
+            raise MemoryError
+
+        with nogil:
+            _parallel_copy(
+                <char*>data, <char*>self.data, n_bytes,
+                self.length*sizeof(unsigned int)
+            )
+        aligned_free(<void*>self.data)
+        self.data = data
+        arr.data = <char *>self.data
+
+    cpdef set_arena(self, BaseArray arena, long offset, long alloc):
+        """Move the data into the memory of the `arena` array.
+
+        The data is copied to `alloc` elements starting `offset` bytes into
+        the memory of the arena, which is kept alive by this array.  The
+        array is not reallocated while its length is within `alloc`, if it
+        has to grow further it moves back to its own memory.  Pass None as
+        the arena to move the data back to memory owned by the array.
+
+        This allows several arrays to share one allocation, see
+        :py:meth:`pysph.base.particle_array.ParticleArray.set_pooled`.
+        """
+        if self._old_data != NULL:
+            raise RuntimeError('Cannot move array which is a view.')
+
+        cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
+        cdef np.ndarray buf
+        cdef unsigned int* data
+        cdef long nbytes
+        if arena is None:
+            if not self._pooled:
+                return
+            alloc = max(self.length, 16)
+            data = <unsigned int*>aligned_malloc(alloc*sizeof(unsigned int))
+        else:
+            if arena is self:
+                raise ValueError('An array cannot be its own arena.')
+            if alloc < self.length:
+                raise ValueError('The arena is smaller than the array.')
+            buf = arena.get_npy_array()
+            nbytes = arena.alloc*buf.itemsize
+            if offset < 0 or offset + alloc*sizeof(unsigned int) > nbytes:
+                raise ValueError('The array does not fit in the arena.')
+            data = <unsigned int*>(<char*>buf.data + offset)
+
+        memcpy(<void*>data, <void*>self.data,
+               self.length*sizeof(unsigned int))
+        if not self._pooled:
+            aligned_free(<void*>self.data)
+        self.data = data
+        self.alloc = alloc
+        arr.data = <char *>self.data
+        self._arena = arena
+        self._pooled = arena is not None
+
     cpdef remove(self, np.ndarray index_list, bint input_sorted=0):
         """Remove the particles with indices in index_list.
 
@@ -1093,10 +1384,13 @@ cdef class UIntArray(BaseArray):
         """
         if self._old_data != NULL:
             raise RuntimeError('Cannot extend array which is a view.')
-        cdef long len = in_array.size
-        cdef long i
-        for i in range(len):
-            self.append(in_array[i])
+        cdef long length = self.length
+        cdef np.ndarray arr = np.ascontiguousarray(
+            in_array, dtype=self._npy_array.dtype
+        ).ravel()
+        self.c_resize(length + arr.size)
+        memcpy(<void*>(self.data + length), arr.data,
+               arr.size*sizeof(unsigned int))
 
     cpdef copy_values(self, LongArray indices, BaseArray dest):
         """Copies values of indices in indices from self to `dest`.
@@ -1260,6 +1554,9 @@ cdef class LongArray(BaseArray):
     def __dealloc__(self):
         """Frees the array.
         """
+        if self._pooled:
+            # the memory belongs to the arena.
+            return
         if self._old_data == NULL:
             aligned_free(<void*>self.data)
         else:
@@ -1351,7 +1648,20 @@ cdef class LongArray(BaseArray):
     cdef void c_reserve(self, long size) nogil:
         cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
         cdef void* data = NULL
-        if size > self.alloc:
+        if size > self.alloc and self._pooled:
+            # the arena is too small, move to our own memory.
+            data = aligned_malloc(size*sizeof(long))
+            if data == NULL:
+                with gil:
+                    raise MemoryError
+            memcpy(data, <void*>self.data, self.length*sizeof(long))
+            self.data = <long*>data
+            self.alloc = size
+            arr.data = <char *>self.data
+            self._pooled = 0
+            with gil:
+                self._arena = None
+        elif size > self.alloc:
             data = <long*>aligned_realloc(
                 self.data, size*sizeof(long),
                 self.alloc*sizeof(long)
@@ -1376,8 +1686,10 @@ cdef class LongArray(BaseArray):
     cdef void c_resize(self, long size) nogil:
         cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
 
-        # reserve memory
-        self.c_reserve(size)
+        # reserve memory, growing geometrically so that repeatedly adding a
+        # few elements is amortized constant time.
+        if size > self.alloc:
+            self.c_reserve(max(size, 2*self.alloc))
 
         # update the lengths
         self.length = size
@@ -1399,6 +1711,9 @@ cdef class LongArray(BaseArray):
         cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
         cdef void* data = NULL
         cdef size_t size = max(self.length, 16)
+        if self._pooled:
+            # the arena is managed by its owner.
+            return
         data = <long*>aligned_realloc(
             self.data, size*sizeof(long),
             self.alloc*sizeof(long)
@@ -1420,6 +1735,18 @@ cdef class LongArray(BaseArray):
         """
         return 'long'
 
+    cpdef tuple memory_usage(self):
+        """Return a tuple of the number of bytes allocated for the data and
+        the number used by the elements.
+
+        A view only counts the memory it owns and uses none of it, an array
+        in an arena counts its share of the arena.
+        """
+        cdef long itemsize = sizeof(long)
+        if self._old_data != NULL:
+            return self.alloc*itemsize, 0
+        return self.alloc*itemsize, self.length*itemsize
+
     cdef long* get_data_ptr(self):
         """Return the internal data pointer.
         """
@@ -1453,9 +1780,11 @@ cdef class LongArray(BaseArray):
             self._parent = None
 
     cpdef resize(self, long size):
-        """Resizes internal data to ``size*sizeof(long)`` bytes
-        and sets the length to the new size.
+        """Sets the length to the new size, reallocating the internal data
+        if needed.
 
+        When it grows, the capacity is at least doubled, use `reserve` to
+        allocate an exact size and `squeeze` to release the unused memory.
         """
         if self._old_data != NULL:
             raise RuntimeError('Cannot reize array which is a view.')
@@ -1496,6 +1825,78 @@ cdef class LongArray(BaseArray):
 
         self.c_squeeze()
 
+    cpdef first_touch(self):
+        """Reallocate the data so its pages are first touched by the OpenMP
+        threads with a static schedule, see `set_parallel_first_touch`.
+
+        This should be called once the array has been filled by a single
+        thread, as the pages of a buffer stay where they were first touched.
+        """
+        if self._old_data != NULL:
+            raise RuntimeError('Cannot first touch array which is a view.')
+        if self._pooled:
+            raise RuntimeError('Cannot first touch array in an arena.')
+
+        cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
+        cdef size_t n_bytes = self.alloc*sizeof(long)
+        cdef long* data = <long*>aligned_malloc(n_bytes)
+        if data == NULL:
+            raise MemoryError
+
+        with nogil:
+            _parallel_copy(
+                <char*>data, <char*>self.data, n_bytes,
+                self.length*sizeof(long)
+            )
+        aligned_free(<void*>self.data)
+        self.data = data
+        arr.data = <char *>self.data
+
+    cpdef set_arena(self, BaseArray arena, long offset, long alloc):
+        """Move the data into the memory of the `arena` array.
+
+        The data is copied to `alloc` elements starting `offset` bytes into
+        the memory of the arena, which is kept alive by this array.  The
+        array is not reallocated while its length is within `alloc`, if it
+        has to grow further it moves back to its own memory.  Pass None as
+        the arena to move the data back to memory owned by the array.
+
+        This allows several arrays to share one allocation, see
+        :py:meth:`pysph.base.particle_array.ParticleArray.set_pooled`.
+        """
+        if self._old_data != NULL:
+            raise RuntimeError('Cannot move array which is a view.')
+
+        cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
+        cdef np.ndarray buf
+        cdef long* data
+        cdef long nbytes
+        if arena is None:
+            if not self._pooled:
+                return
+            alloc = max(self.length, 16)
+            data = <long*>aligned_malloc(alloc*sizeof(long))
+        else:
+            if arena is self:
+                raise ValueError('An array cannot be its own arena.')
+            if alloc < self.length:
+                raise ValueError('The arena is smaller than the array.')
+            buf = arena.get_npy_array()
+            nbytes = arena.alloc*buf.itemsize
+            if offset < 0 or offset + alloc*sizeof(long) > nbytes:
+                raise ValueError('The array does not fit in the arena.')
+            data = <long*>(<char*>buf.data + offset)
+
+        memcpy(<void*>data, <void*>self.data,
+               self.length*sizeof(long))
+        if not self._pooled:
+            aligned_free(<void*>self.data)
+        self.data = data
+        self.alloc = alloc
+        arr.data = <char *>self.data
+        self._arena = arena
+        self._pooled = arena is not None
+
     cpdef remove(self, np.ndarray index_list, bint input_sorted=0):
         """Remove the particles with indices in index_list.
 
@@ -1558,10 +1959,13 @@ cdef class LongArray(BaseArray):
         """
         if self._old_data != NULL:
             raise RuntimeError('Cannot extend array which is a view.')
-        cdef long len = in_array.size
-        cdef long i
-        for i in range(len):
-            self.append(in_array[i])
+        cdef long length = self.length
+        cdef np.ndarray arr = np.ascontiguousarray(
+            in_array, dtype=self._npy_array.dtype
+        ).ravel()
+        self.c_resize(length + arr.size)
+        memcpy(<void*>(self.data + length), arr.data,
+               arr.size*sizeof(long))
 
     cpdef copy_values(self, LongArray indices, BaseArray dest):
         """Copies values of indices in indices from self to `dest`.
@@ -1725,6 +2129,9 @@ cdef class FloatArray(BaseArray):
     def __dealloc__(self):
         """Frees the array.
         """
+        if self._pooled:
+            # the memory belongs to the arena.
+            return
         if self._old_data == NULL:
             aligned_free(<void*>self.data)
         else:
@@ -1816,7 +2223,20 @@ cdef class FloatArray(BaseArray):
     cdef void c_reserve(self, long size) nogil:
         cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
         cdef void* data = NULL
-        if size > self.alloc:
+        if size > self.alloc and self._pooled:
+            # the arena is too small, move to our own memory.
+            data = aligned_malloc(size*sizeof(float))
+            if data == NULL:
+                with gil:
+                    raise MemoryError
+            memcpy(data, <void*>self.data, self.length*sizeof(float))
+            self.data = <float*>data
+            self.alloc = size
+            arr.data = <char *>self.data
+            self._pooled = 0
+            with gil:
+                self._arena = None
+        elif size > self.alloc:
             data = <float*>aligned_realloc(
                 self.data, size*sizeof(float),
                 self.alloc*sizeof(float)
@@ -1841,8 +2261,10 @@ cdef class FloatArray(BaseArray):
     cdef void c_resize(self, long size) nogil:
         cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
 
-        # reserve memory
-        self.c_reserve(size)
+        # reserve memory, growing geometrically so that repeatedly adding a
+        # few elements is amortized constant time.
+        if size > self.alloc:
+            self.c_reserve(max(size, 2*self.alloc))
 
         # update the lengths
         self.length = size
@@ -1864,6 +2286,9 @@ cdef class FloatArray(BaseArray):
         cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
         cdef void* data = NULL
         cdef size_t size = max(self.length, 16)
+        if self._pooled:
+            # the arena is managed by its owner.
+            return
         data = <float*>aligned_realloc(
             self.data, size*sizeof(float),
             self.alloc*sizeof(float)
@@ -1885,6 +2310,18 @@ cdef class FloatArray(BaseArray):
         """
         return 'float'
 
+    cpdef tuple memory_usage(self):
+        """Return a tuple of the number of bytes allocated for the data and
+        the number used by the elements.
+
+        A view only counts the memory it owns and uses none of it, an array
+        in an arena counts its share of the arena.
+        """
+        cdef long itemsize = sizeof(float)
+        if self._old_data != NULL:
+            return self.alloc*itemsize, 0
+        return self.alloc*itemsize, self.length*itemsize
+
     cdef float* get_data_ptr(self):
         """Return the internal data pointer.
         """
@@ -1918,9 +2355,11 @@ cdef class FloatArray(BaseArray):
             self._parent = None
 
     cpdef resize(self, long size):
-        """Resizes internal data to ``size*sizeof(float)`` bytes
-        and sets the length to the new size.
+        """Sets the length to the new size, reallocating the internal data
+        if needed.
 
+        When it grows, the capacity is at least doubled, use `reserve` to
+        allocate an exact size and `squeeze` to release the unused memory.
         """
         if self._old_data != NULL:
             raise RuntimeError('Cannot reize array which is a view.')
@@ -1961,6 +2400,78 @@ cdef class FloatArray(BaseArray):
 
         self.c_squeeze()
 
+    cpdef first_touch(self):
+        """Reallocate the data so its pages are first touched by the OpenMP
+        threads with a static schedule, see `set_parallel_first_touch`.
+
+        This should be called once the array has been filled by a single
+        thread, as the pages of a buffer stay where they were first touched.
+        """
+        if self._old_data != NULL:
+            raise RuntimeError('Cannot first touch array which is a view.')
+        if self._pooled:
+            raise RuntimeError('Cannot first touch array in an arena.')
+
+        cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
+        cdef size_t n_bytes = self.alloc*sizeof(float)
+        cdef float* data = <float*>aligned_malloc(n_bytes)
+        if data == NULL:
+            raise MemoryError
+
+        with nogil:
+            _parallel_copy(
+                <char*>data, <char*>self.data, n_bytes,
+                self.length*sizeof(float)
+            )
+        aligned_free(<void*>self.data)
+        self.data = data
+        arr.data = <char *>self.data
+
+    cpdef set_arena(self, BaseArray arena, long offset, long alloc):
+        """Move the data into the memory of the `arena` array.
+
+        The data is copied to `alloc` elements starting `offset` bytes into
+        the memory of the arena, which is kept alive by this array.  The
+        array is not reallocated while its length is within `alloc`, if it
+        has to grow further it moves back to its own memory.  Pass None as
+        the arena to move the data back to memory owned by the array.
+
+        This allows several arrays to share one allocation, see
+        :py:meth:`pysph.base.particle_array.ParticleArray.set_pooled`.
+        """
+        if self._old_data != NULL:
+            raise RuntimeError('Cannot move array which is a view.')
+
+        cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
+        cdef np.ndarray buf
+        cdef float* data
+        cdef long nbytes
+        if arena is None:
+            if not self._pooled:
+                return
+            alloc = max(self.length, 16)
+            data = <float*>aligned_malloc(alloc*sizeof(float))
+        else:
+            if arena is self:
+                raise ValueError('An array cannot be its own arena.')
+            if alloc < self.length:
+                raise ValueError('The arena is smaller than the array.')
+            buf = arena.get_npy_array()
+            nbytes = arena.alloc*buf.itemsize
+            if offset < 0 or offset + alloc*sizeof(float) > nbytes:
+                raise ValueError('The array does not fit in the arena.')
+            data = <float*>(<char*>buf.data + offset)
+
+        memcpy(<void*>data, <void*>self.data,
+               self.length*sizeof(float))
+        if not self._pooled:
+            aligned_free(<void*>self.data)
+        self.data = data
+        self.alloc = alloc
+        arr.data = <char *>self.data
+        self._arena = arena
+        self._pooled = arena is not None
+
     cpdef remove(self, np.ndarray index_list, bint input_sorted=0):
         """Remove the particles with indices in index_list.
 
@@ -2023,10 +2534,13 @@ cdef class FloatArray(BaseArray):
         """
         if self._old_data != NULL:
             raise RuntimeError('Cannot extend array which is a view.')
-        cdef long len = in_array.size
-        cdef long i
-        for i in range(len):
-            self.append(in_array[i])
+        cdef long length = self.length
+        cdef np.ndarray arr = np.ascontiguousarray(
+            in_array, dtype=self._npy_array.dtype
+        ).ravel()
+        self.c_resize(length + arr.size)
+        memcpy(<void*>(self.data + length), arr.data,
+               arr.size*sizeof(float))
 
     cpdef copy_values(self, LongArray indices, BaseArray dest):
         """Copies values of indices in indices from self to `dest`.
@@ -2190,6 +2704,9 @@ cdef class DoubleArray(BaseArray):
     def __dealloc__(self):
         """Frees the array.
         """
+        if self._pooled:
+            # the memory belongs to the arena.
+            return
         if self._old_data == NULL:
             aligned_free(<void*>self.data)
         else:
@@ -2281,7 +2798,20 @@ cdef class DoubleArray(BaseArray):
     cdef void c_reserve(self, long size) nogil:
         cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
         cdef void* data = NULL
-        if size > self.alloc:
+        if size > self.alloc and self._pooled:
+            # the arena is too small, move to our own memory.
+            data = aligned_malloc(size*sizeof(double))
+            if data == NULL:
+                with gil:
+                    raise MemoryError
+            memcpy(data, <void*>self.data, self.length*sizeof(double))
+            self.data = <double*>data
+            self.alloc = size
+            arr.data = <char *>self.data
+            self._pooled = 0
+            with gil:
+                self._arena = None
+        elif size > self.alloc:
             data = <double*>aligned_realloc(
                 self.data, size*sizeof(double),
                 self.alloc*sizeof(double)
@@ -2306,8 +2836,10 @@ cdef class DoubleArray(BaseArray):
     cdef void c_resize(self, long size) nogil:
         cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
 
-        # reserve memory
-        self.c_reserve(size)
+        # reserve memory, growing geometrically so that repeatedly adding a
+        # few elements is amortized constant time.
+        if size > self.alloc:
+            self.c_reserve(max(size, 2*self.alloc))
 
         # update the lengths
         self.length = size
@@ -2329,6 +2861,9 @@ cdef class DoubleArray(BaseArray):
         cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
         cdef void* data = NULL
         cdef size_t size = max(self.length, 16)
+        if self._pooled:
+            # the arena is managed by its owner.
+            return
         data = <double*>aligned_realloc(
             self.data, size*sizeof(double),
             self.alloc*sizeof(double)
@@ -2350,6 +2885,18 @@ cdef class DoubleArray(BaseArray):
         """
         return 'double'
 
+    cpdef tuple memory_usage(self):
+        """Return a tuple of the number of bytes allocated for the data and
+        the number used by the elements.
+
+        A view only counts the memory it owns and uses none of it, an array
+        in an arena counts its share of the arena.
+        """
+        cdef long itemsize = sizeof(double)
+        if self._old_data != NULL:
+            return self.alloc*itemsize, 0
+        return self.alloc*itemsize, self.length*itemsize
+
     cdef double* get_data_ptr(self):
         """Return the internal data pointer.
         """
@@ -2383,9 +2930,11 @@ cdef class DoubleArray(BaseArray):
             self._parent = None
 
     cpdef resize(self, long size):
-        """Resizes internal data to ``size*sizeof(double)`` bytes
-        and sets the length to the new size.
+        """Sets the length to the new size, reallocating the internal data
+        if needed.
 
+        When it grows, the capacity is at least doubled, use `reserve` to
+        allocate an exact size and `squeeze` to release the unused memory.
         """
         if self._old_data != NULL:
             raise RuntimeError('Cannot reize array which is a view.')
@@ -2426,6 +2975,78 @@ cdef class DoubleArray(BaseArray):
 
         self.c_squeeze()
 
+    cpdef first_touch(self):
+        """Reallocate the data so its pages are first touched by the OpenMP
+        threads with a static schedule, see `set_parallel_first_touch`.
+
+        This should be called once the array has been filled by a single
+        thread, as the pages of a buffer stay where they were first touched.
+        """
+        if self._old_data != NULL:
+            raise RuntimeError('Cannot first touch array which is a view.')
+        if self._pooled:
+            raise RuntimeError('Cannot first touch array in an arena.')
+
+        cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
+        cdef size_t n_bytes = self.alloc*sizeof(double)
+        cdef double* data = <double*>aligned_malloc(n_bytes)
+        if data == NULL:
+            raise MemoryError
+
+        with nogil:
+            _parallel_copy(
+                <char*>data, <char*>self.data, n_bytes,
+                self.length*sizeof(double)
+            )
+        aligned_free(<void*>self.data)
+        self.data = data
+        arr.data = <char *>self.data
+
+    cpdef set_arena(self, BaseArray arena, long offset, long alloc):
+        """Move the data into the memory of the `arena` array.
+
+        The data is copied to `alloc` elements starting `offset` bytes into
+        the memory of the arena, which is kept alive by this array.  The
+        array is not reallocated while its length is within `alloc`, if it
+        has to grow further it moves back to its own memory.  Pass None as
+        the arena to move the data back to memory owned by the array.
+
+        This allows several arrays to share one allocation, see
+        :py:meth:`pysph.base.particle_array.ParticleArray.set_pooled`.
+        """
+        if self._old_data != NULL:
+            raise RuntimeError('Cannot move array which is a view.')
+
+        cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
+        cdef np.ndarray buf
+        cdef double* data
+        cdef long nbytes
+        if arena is None:
+            if not self._pooled:
+                return
+            alloc = max(self.length, 16)
+            data = <double*>aligned_malloc(alloc*sizeof(double))
+        else:
+            if arena is self:
+                raise ValueError('An array cannot be its own arena.')
+            if alloc < self.length:
+                raise ValueError('The arena is smaller than the array.')
+            buf = arena.get_npy_array()
+            nbytes = arena.alloc*buf.itemsize
+            if offset < 0 or offset + alloc*sizeof(double) > nbytes:
+                raise ValueError('The array does not fit in the arena.')
+            data = <double*>(<char*>buf.data + offset)
+
+        memcpy(<void*>data, <void*>self.data,
+               self.length*sizeof(double))
+        if not self._pooled:
+            aligned_free(<void*>self.data)
+        self.data = data
+        self.alloc = alloc
+        arr.data = <char *>self.data
+        self._arena = arena
+        self._pooled = arena is not None
+
     cpdef remove(self, np.ndarray index_list, bint input_sorted=0):
         """Remove the particles with indices in index_list.
 
@@ -2488,10 +3109,13 @@ cdef class DoubleArray(BaseArray):
         """
         if self._old_data != NULL:
             raise RuntimeError('Cannot extend array which is a view.')
-        cdef long len = in_array.size
-        cdef long i
-        for i in range(len):
-            self.append(in_array[i])
+        cdef long length = self.length
+        cdef np.ndarray arr = np.ascontiguousarray(
+            in_array, dtype=self._npy_array.dtype
+        ).ravel()
+        self.c_resize(length + arr.size)
+        memcpy(<void*>(self.data + length), arr.data,
+               arr.size*sizeof(double))
 
     cpdef copy_values(self, LongArray indices, BaseArray dest):
         """Copies values of indices in indices from self to `dest`.
@@ -36,6 +36,7 @@ The numpy array may however be copied and used in any manner.
 
 # For malloc etc.
 from libc.stdlib cimport *
+from libc.string cimport memset
 IF UNAME_SYSNAME == "Windows":
     cdef extern from "msstdint.h" nogil:
         ctypedef unsigned int uintptr_t
@@ -44,6 +45,8 @@ ELSE:
 
 cimport numpy as np
 
+from cython.parallel import prange
+
 import numpy as np
 
 # logging imports
@@ -75,6 +78,49 @@ cdef extern from "stdlib.h":
 # numpy module initialization call
 import_array()
 
+# Reallocated arrays of at least this many bytes are copied by the OpenMP
+# threads when the parallel first touch is enabled.
+cdef size_t FIRST_TOUCH_MIN_BYTES = 1 << 20
+cdef size_t PAGE_SIZE = 4096
+cdef bint _parallel_first_touch = 0
+
+cpdef set_parallel_first_touch(bint value):
+    """Enable the parallel first touch of the reallocated arrays.
+
+    When enabled, the large arrays are copied on a reallocation by the OpenMP
+    threads with a static schedule, so on a NUMA machine the pages of each
+    block of the array are placed on the node of the thread that works on
+    that block in statically scheduled loops.  This has no effect if the
+    module is built without OpenMP.
+    """
+    global _parallel_first_touch
+    _parallel_first_touch = value
+
+cpdef bint get_parallel_first_touch():
+    return _parallel_first_touch
+
+cdef void _parallel_copy(char *dst, char *src, size_t n_bytes,
+                         size_t n_copy) nogil:
+    """Copy `n_copy` bytes from `src` to `dst` and zero the rest of the
+    `n_bytes` of `dst`, each page being written by the thread that would
+    process it with a static schedule.
+    """
+    cdef long i
+    cdef long n_pages = (n_bytes + PAGE_SIZE - 1)/PAGE_SIZE
+    cdef size_t start, end
+    if n_copy > n_bytes:
+        n_copy = n_bytes
+    for i in prange(n_pages, schedule='static'):
+        start = i*PAGE_SIZE
+        end = min(start + PAGE_SIZE, n_bytes)
+        if end <= n_copy:
+            memcpy(<void*>(dst + start), <void*>(src + start), end - start)
+        elif start < n_copy:
+            memcpy(<void*>(dst + start), <void*>(src + start), n_copy - start)
+            memset(<void*>(dst + n_copy), 0, end - n_copy)
+        else:
+            memset(<void*>(dst + start), 0, end - start)
+
 cdef inline long aligned(long n, int item_size) nogil:
     """Align `n` items each having size (in bytes) `item_size` to
     64 bytes and return the appropriate number of items that would
@@ -118,8 +164,13 @@ cdef void* _aligned_realloc(void *existing, size_t bytes, size_t old_size) nogil
     """
     cdef void* result = _aligned_malloc(bytes)
 
-    # Copy everything from the old to the new and free the old.
-    memcpy(<void*>result, <void*>existing, old_size)
+    # Copy everything that fits from the old to the new and free the old.
+    if old_size > bytes:
+        old_size = bytes
+    if _parallel_first_touch and bytes >= FIRST_TOUCH_MIN_BYTES:
+        _parallel_copy(<char*>result, <char*>existing, bytes, old_size)
+    else:
+        memcpy(<void*>result, <void*>existing, old_size)
     aligned_free(<void*>existing)
 
     return result
@@ -216,6 +267,29 @@ cdef class BaseArray:
         """
         raise NotImplementedError, 'BaseArray::squeeze'
 
+    cpdef first_touch(self):
+        """Reallocate the data so its pages are first touched by the OpenMP
+        threads with a static schedule, see `set_parallel_first_touch`.
+        """
+        raise NotImplementedError, 'BaseArray::first_touch'
+
+    cpdef set_arena(self, BaseArray arena, long offset, long alloc):
+        """Move the data into the memory of another array, see the
+        subclasses.
+        """
+        raise NotImplementedError, 'BaseArray::set_arena'
+
+    cpdef BaseArray get_arena(self):
+        """Return the array whose memory holds the data or None.
+        """
+        return self._arena
+
+    cpdef tuple memory_usage(self):
+        """Return the bytes allocated for and used by the data, see the
+        subclasses.
+        """
+        raise NotImplementedError, 'BaseArray::memory_usage'
+
     cpdef remove(self, np.ndarray index_list, bint input_sorted=0):
         """Remove the particles with indices in index_list.
         """
@@ -341,6 +415,9 @@ cdef class ${CLASSNAME}(BaseArray):
     def __dealloc__(self):
         """Frees the array.
         """
+        if self._pooled:
+            # the memory belongs to the arena.
+            return
         if self._old_data == NULL:
             aligned_free(<void*>self.data)
         else:
@@ -433,7 +510,20 @@ cdef class ${CLASSNAME}(BaseArray):
     cdef void c_reserve(self, long size) nogil:
         cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
         cdef void* data = NULL
-        if size > self.alloc:
+        if size > self.alloc and self._pooled:
+            # the arena is too small, move to our own memory.
+            data = aligned_malloc(size*sizeof(${ARRAY_TYPE}))
+            if data == NULL:
+                with gil:
+                    raise MemoryError
+            memcpy(data, <void*>self.data, self.length*sizeof(${ARRAY_TYPE}))
+            self.data = <${ARRAY_TYPE}*>data
+            self.alloc = size
+            arr.data = <char *>self.data
+            self._pooled = 0
+            with gil:
+                self._arena = None
+        elif size > self.alloc:
             data = <${ARRAY_TYPE}*>aligned_realloc(
                 self.data, size*sizeof(${ARRAY_TYPE}),
                 self.alloc*sizeof(${ARRAY_TYPE})
@@ -458,8 +548,10 @@ cdef class ${CLASSNAME}(BaseArray):
     cdef void c_resize(self, long size) nogil:
         cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
 
-        # reserve memory
-        self.c_reserve(size)
+        # reserve memory, growing geometrically so that repeatedly adding a
+        # few elements is amortized constant time.
+        if size > self.alloc:
+            self.c_reserve(max(size, 2*self.alloc))
 
         # update the lengths
         self.length = size
@@ -481,6 +573,9 @@ cdef class ${CLASSNAME}(BaseArray):
         cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
         cdef void* data = NULL
         cdef size_t size = max(self.length, 16)
+        if self._pooled:
+            # the arena is managed by its owner.
+            return
         data = <${ARRAY_TYPE}*>aligned_realloc(
             self.data, size*sizeof(${ARRAY_TYPE}),
             self.alloc*sizeof(${ARRAY_TYPE})
@@ -503,6 +598,18 @@ cdef class ${CLASSNAME}(BaseArray):
         """
         return '${ARRAY_TYPE}'
 
+    cpdef tuple memory_usage(self):
+        """Return a tuple of the number of bytes allocated for the data and
+        the number used by the elements.
+
+        A view only counts the memory it owns and uses none of it, an array
+        in an arena counts its share of the arena.
+        """
+        cdef long itemsize = sizeof(${ARRAY_TYPE})
+        if self._old_data != NULL:
+            return self.alloc*itemsize, 0
+        return self.alloc*itemsize, self.length*itemsize
+
     cdef ${ARRAY_TYPE}* get_data_ptr(self):
         """Return the internal data pointer.
         """
@@ -536,9 +643,11 @@ cdef class ${CLASSNAME}(BaseArray):
             self._parent = None
 
     cpdef resize(self, long size):
-        """Resizes internal data to ``size*sizeof(${ARRAY_TYPE})`` bytes
-        and sets the length to the new size.
+        """Sets the length to the new size, reallocating the internal data
+        if needed.
 
+        When it grows, the capacity is at least doubled, use `reserve` to
+        allocate an exact size and `squeeze` to release the unused memory.
         """
         if self._old_data != NULL:
             raise RuntimeError('Cannot reize array which is a view.')
@@ -579,6 +688,78 @@ cdef class ${CLASSNAME}(BaseArray):
 
         self.c_squeeze()
 
+    cpdef first_touch(self):
+        """Reallocate the data so its pages are first touched by the OpenMP
+        threads with a static schedule, see `set_parallel_first_touch`.
+
+        This should be called once the array has been filled by a single
+        thread, as the pages of a buffer stay where they were first touched.
+        """
+        if self._old_data != NULL:
+            raise RuntimeError('Cannot first touch array which is a view.')
+        if self._pooled:
+            raise RuntimeError('Cannot first touch array in an arena.')
+
+        cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
+        cdef size_t n_bytes = self.alloc*sizeof(${ARRAY_TYPE})
+        cdef ${ARRAY_TYPE}* data = <${ARRAY_TYPE}*>aligned_malloc(n_bytes)
+        if data == NULL:
+            raise MemoryError
+
+        with nogil:
+            _parallel_copy(
+                <char*>data, <char*>self.data, n_bytes,
+                self.length*sizeof(${ARRAY_TYPE})
+            )
+        aligned_free(<void*>self.data)
+        self.data = data
+        arr.data = <char *>self.data
+
+    cpdef set_arena(self, BaseArray arena, long offset, long alloc):
+        """Move the data into the memory of the `arena` array.
+
+        The data is copied to `alloc` elements starting `offset` bytes into
+        the memory of the arena, which is kept alive by this array.  The
+        array is not reallocated while its length is within `alloc`, if it
+        has to grow further it moves back to its own memory.  Pass None as
+        the arena to move the data back to memory owned by the array.
+
+        This allows several arrays to share one allocation, see
+        :py:meth:`pysph.base.particle_array.ParticleArray.set_pooled`.
+        """
+        if self._old_data != NULL:
+            raise RuntimeError('Cannot move array which is a view.')
+
+        cdef PyArrayObject* arr = <PyArrayObject*>self._npy_array
+        cdef np.ndarray buf
+        cdef ${ARRAY_TYPE}* data
+        cdef long nbytes
+        if arena is None:
+            if not self._pooled:
+                return
+            alloc = max(self.length, 16)
+            data = <${ARRAY_TYPE}*>aligned_malloc(alloc*sizeof(${ARRAY_TYPE}))
+        else:
+            if arena is self:
+                raise ValueError('An array cannot be its own arena.')
+            if alloc < self.length:
+                raise ValueError('The arena is smaller than the array.')
+            buf = arena.get_npy_array()
+            nbytes = arena.alloc*buf.itemsize
+            if offset < 0 or offset + alloc*sizeof(${ARRAY_TYPE}) > nbytes:
+                raise ValueError('The array does not fit in the arena.')
+            data = <${ARRAY_TYPE}*>(<char*>buf.data + offset)
+
+        memcpy(<void*>data, <void*>self.data,
+               self.length*sizeof(${ARRAY_TYPE}))
+        if not self._pooled:
+            aligned_free(<void*>self.data)
+        self.data = data
+        self.alloc = alloc
+        arr.data = <char *>self.data
+        self._arena = arena
+        self._pooled = arena is not None
+
     cpdef remove(self, np.ndarray index_list, bint input_sorted=0):
         """Remove the particles with indices in index_list.
 
@@ -641,10 +822,13 @@ cdef class ${CLASSNAME}(BaseArray):
         """
         if self._old_data != NULL:
             raise RuntimeError('Cannot extend array which is a view.')
-        cdef long len = in_array.size
-        cdef long i
-        for i in range(len):
-            self.append(in_array[i])
+        cdef long length = self.length
+        cdef np.ndarray arr = np.ascontiguousarray(
+            in_array, dtype=self._npy_array.dtype
+        ).ravel()
+        self.c_resize(length + arr.size)
+        memcpy(<void*>(self.data + length), arr.data,
+               arr.size*sizeof(${ARRAY_TYPE}))
 
     cpdef copy_values(self, LongArray indices, BaseArray dest):
         """Copies values of indices in indices from self to `dest`.
@@ -262,7 +262,9 @@ def get_basic_extensions():
             name="pyzoltan.core.carray",
             sources=["pyzoltan/core/carray.pyx"],
             include_dirs=include_dirs,
-            extra_compile_args=extra_compile_args,
+            extra_compile_args=extra_compile_args + openmp_compile_args,
+            extra_link_args=openmp_link_args,
+            cython_compile_time_env={'OPENMP': openmp_env},
             language="c++"
         ),
 
@@ -271,7 +273,9 @@ def get_basic_extensions():
             sources=["pysph/base/particle_array.pyx"],
             depends=get_deps("pyzoltan/core/carray"),
             include_dirs=include_dirs,
-            extra_compile_args=extra_compile_args,
+            extra_compile_args=extra_compile_args + openmp_compile_args,
+            extra_link_args=openmp_link_args,
+            cython_compile_time_env={'OPENMP': openmp_env},
             language="c++",
             define_macros=MACROS,
         ),
@@ -428,6 +432,32 @@ def get_basic_extensions():
             define_macros=MACROS,
         ),
 
+        Extension(
+            name="pysph.base.affinity",
+            sources=["pysph/base/affinity.pyx"],
+            depends=get_deps("pysph/base/nnps_base"),
+            include_dirs=include_dirs,
+            extra_compile_args=extra_compile_args + openmp_compile_args,
+            extra_link_args=openmp_link_args,
+            cython_compile_time_env={'OPENMP': openmp_env},
+            language="c++",
+            define_macros=MACROS,
+        ),
+
+        Extension(
+            name="pysph.parallel.cell_index",
+            sources=["pysph/parallel/cell_index.pyx"],
+            depends=get_deps(
+                "pyzoltan/core/carray", "pysph/base/nnps_base"
+            ),
+            include_dirs=include_dirs,
+            extra_compile_args=extra_compile_args + openmp_compile_args,
+            extra_link_args=openmp_link_args,
+            cython_compile_time_env={'OPENMP': openmp_env},
+            language="c++",
+            define_macros=MACROS,
+        ),
+
         # kernels used for tests
         Extension(
             name="pysph.base.c_kernels",
@@ -601,7 +631,7 @@ def get_parallel_extensions():
                 "pyzoltan/core/carray",
                 "pyzoltan/core/zoltan", "pyzoltan/core/zoltan_comm",
                 "pysph/base/point", "pysph/base/particle_array",
-                "pysph/base/nnps_base"
+                "pysph/base/nnps_base", "pysph/parallel/cell_index"
             ),
             include_dirs=include_dirs + mpi_inc_dirs + zoltan_include_dirs,
             library_dirs=zoltan_library_dirs,